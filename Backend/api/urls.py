@@ -1,9 +1,11 @@
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
+from stress_classification.views import ReadinessView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    re_path(r'^health/ready/?$', ReadinessView.as_view(), name='health-ready'),
     path('auth/', include('security.urls')),
     path('api/stress-classification/', include('stress_classification.urls')),
     path('api/', include('patient_management.urls')),
@@ -18,4 +18,4 @@ python manage.py migrate --noinput
 
 # Start server
 echo "Starting server..."
-exec gunicorn api.wsgi:application -b 0.0.0.0:6543
\ No newline at end of file
+exec gunicorn api.wsgi:application -c gunicorn.conf.py
\ No newline at end of file
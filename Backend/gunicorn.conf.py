@@ -0,0 +1,27 @@
+"""
+Konfiguracja gunicorna.
+
+Wagi modelu klasyfikacji stresu są ładowane w procesie master (preload_app),
+a każdy worker po forku wykonuje autotuning i rozgrzewkowy forward pass,
+zanim zacznie przyjmować ruch. Przy pustym cache autotuningu mierzy tylko jeden
+worker (blokada pliku cache), a pozostałe odczytują jego wynik.
+"""
+import os
+
+# Ładowanie modelu w StressClassificationConfig.ready() - przed forkiem workerów
+os.environ.setdefault('STRESS_EAGER_LOAD', 'True')
+
+bind = '0.0.0.0:6543'
+workers = int(os.getenv('WEB_CONCURRENCY', '1'))
+preload_app = True
+
+
+def post_fork(server, worker):
+    """Rozgrzewa model w nowym workerze (pula wątków torch tworzona dopiero po forku)."""
+    from stress_classification.ml_service import get_stress_service
+
+    service = get_stress_service()
+    server.log.info(
+        "Worker %s gotowy: model %s rozgrzany w %.2f s",
+        worker.pid, service.model_version, service.warm_up_seconds
+    )
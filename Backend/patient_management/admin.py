@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Patient, Visit
+from .models import Patient, PatientClassifierHead, PatientStressAggregate, Visit
 
 
 @admin.register(Patient)
@@ -14,3 +14,14 @@ class VisitAdmin(admin.ModelAdmin):
     list_filter = ['visit_date']
     search_fields = ['patient__first_name', 'patient__last_name']
 
+
+
+@admin.register(PatientClassifierHead)
+class PatientClassifierHeadAdmin(admin.ModelAdmin):
+    list_display = ['patient', 'model_version', 'labelled_windows', 'global_accuracy', 'adapted_accuracy', 'trained_at']
+    exclude = ['weights']
+
+
+@admin.register(PatientStressAggregate)
+class PatientStressAggregateAdmin(admin.ModelAdmin):
+    list_display = ['patient', 'total_sessions', 'total_duration_seconds', 'updated_at']
@@ -0,0 +1,171 @@
+"""
+Przyrostowo utrzymywane sumy klas stresu pacjenta (PatientStressAggregate).
+
+Wkład wizyty do sum pacjenta to: 1 sesja, jej czas trwania oraz - dla wizyt o dodatnim
+czasie trwania - czas (waga) i procent każdej klasy pomnożony przez czas. Zapis wizyty
+odejmuje jej poprzedni wkład i dodaje nowy (wyrażenia F, w jednej transakcji), więc rozkład
+klas pacjentów to odczyt O(liczba pacjentów) zamiast agregacji wszystkich wizyt.
+
+Zmiany omijające sygnały (bulk_create, QuerySet.update) wymagają odbudowy poleceniem
+`python manage.py rebuild_stress_aggregates`.
+"""
+from typing import Dict, Iterable, Optional
+
+from django.db import transaction
+from django.db.models import Count, F, FloatField, Q, Sum, Value
+from django.db.models.functions import Coalesce, Concat
+
+from .models import Patient, PatientStressAggregate, Visit
+from .statistics import STRESS_CLASS_FIELDS, stress_classes
+
+# Pole procentu wizyty -> kolumna sumy ważonej w PatientStressAggregate
+WEIGHTED_FIELDS = {
+    'baseline_percentage': 'weighted_baseline',
+    'stress_percentage': 'weighted_stress',
+    'amusement_percentage': 'weighted_amusement',
+    'meditation_percentage': 'weighted_meditation',
+    'unusable_percentage': 'weighted_unusable',
+}
+AGGREGATE_FIELDS = ('total_sessions', 'total_duration_seconds', 'total_weight', *WEIGHTED_FIELDS.values())
+
+REBUILD_BATCH_SIZE = 1000
+
+# Pola wizyty wpływające na sumy (zapis z update_fields bez nich nie zmienia agregatu)
+VISIT_FIELDS = ('patient', 'total_duration_seconds', *STRESS_CLASS_FIELDS)
+
+
+def visit_contribution(values: Dict) -> Dict:
+    """Wkład wizyty (słownik pól wizyty) do sum pacjenta."""
+    duration = values['total_duration_seconds'] or 0
+    weight = duration if duration > 0 else 0
+    contribution = {'total_sessions': 1, 'total_duration_seconds': duration, 'total_weight': weight}
+    for field, column in WEIGHTED_FIELDS.items():
+        contribution[column] = (values[field] or 0.0) * weight
+    return contribution
+
+
+def stored_contribution(visit_id: int, lock: bool = False) -> Optional[tuple]:
+    """
+    (id pacjenta, wkład) wizyty zapisanej w bazie lub None dla nowej wizyty.
+
+    lock=True blokuje wiersz wizyty (SELECT ... FOR UPDATE) do końca bieżącej transakcji.
+    """
+    visits = Visit.objects.filter(pk=visit_id)
+    if lock:
+        visits = visits.select_for_update()
+    values = visits.values('patient_id', 'total_duration_seconds', *STRESS_CLASS_FIELDS).first()
+    if values is None:
+        return None
+    return values['patient_id'], visit_contribution(values)
+
+
+def instance_contribution(visit) -> tuple:
+    return visit.patient_id, visit_contribution({field: getattr(visit, field) for field in ('total_duration_seconds', *STRESS_CLASS_FIELDS)})
+
+
+def aggregate_values(visits) -> Iterable[Dict]:
+    """Sumy pacjentów policzone od zera z wizyt (jedno zapytanie GROUP BY, bez kolumn JSON)."""
+    weighted = Q(total_duration_seconds__gt=0)
+    sums = {
+        column: Coalesce(Sum(Coalesce(F(field), Value(0.0)) * F('total_duration_seconds'), filter=weighted,
+                             output_field=FloatField()), Value(0.0), output_field=FloatField())
+        for field, column in WEIGHTED_FIELDS.items()
+    }
+    return (
+        visits.values('patient_id')
+        .annotate(
+            total_sessions=Count('id'),
+            # Nazwy kolumn agregatu różne od pól wizyty (F() w sumach odnosi się do pól wizyty)
+            duration_sum=Coalesce(Sum('total_duration_seconds'), 0),
+            weight_sum=Coalesce(Sum('total_duration_seconds', filter=weighted), 0),
+            **sums,
+        )
+        .order_by('patient_id')
+    )
+
+
+def _row_defaults(row: Dict) -> Dict:
+    defaults = {column: row[column] for column in ('total_sessions', *WEIGHTED_FIELDS.values())}
+    defaults['total_duration_seconds'] = row['duration_sum']
+    defaults['total_weight'] = row['weight_sum']
+    return defaults
+
+
+def rebuild_patient_aggregates(patient_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Przelicza sumy od zera (wszyscy pacjenci lub wskazani) i zwraca liczbę zapisanych wierszy.
+
+    Pacjenci bez wizyt dostają wiersz z zerami.
+    """
+    visits = Visit.objects.all()
+    if patient_ids is not None:
+        patient_ids = list(patient_ids)
+        visits = visits.filter(patient_id__in=patient_ids)
+    empty = dict.fromkeys(AGGREGATE_FIELDS, 0)
+
+    with transaction.atomic():
+        rows = {row['patient_id']: _row_defaults(row) for row in aggregate_values(visits)}
+        if patient_ids is None:
+            PatientStressAggregate.objects.all().delete()
+            created = PatientStressAggregate.objects.bulk_create([
+                PatientStressAggregate(patient_id=patient_id, **rows.get(patient_id, empty))
+                for patient_id in Patient.objects.values_list('id', flat=True)
+            ], batch_size=REBUILD_BATCH_SIZE)
+            return len(created)
+        for patient_id in patient_ids:
+            PatientStressAggregate.objects.update_or_create(patient_id=patient_id, defaults=rows.get(patient_id, empty))
+    return len(patient_ids)
+
+
+def apply_visit_change(previous: Optional[tuple], current: Optional[tuple]):
+    """
+    Odejmuje poprzedni wkład wizyty i dodaje bieżący (None - brak wkładu).
+
+    previous / current - pary (id pacjenta, wkład). Pacjent bez wiersza agregatu (np. po
+    bulk_create) jest przeliczany od zera, a przy usuwaniu wizyty brakujący wiersz jest pomijany.
+    """
+    deltas = {}
+    for pair, sign in ((previous, -1), (current, 1)):
+        if pair is None:
+            continue
+        patient_id, contribution = pair
+        delta = deltas.setdefault(patient_id, dict.fromkeys(AGGREGATE_FIELDS, 0))
+        for column, value in contribution.items():
+            delta[column] += sign * value
+
+    with transaction.atomic():
+        for patient_id, delta in deltas.items():
+            if not any(delta.values()):
+                continue
+            updated = PatientStressAggregate.objects.filter(patient_id=patient_id).update(
+                **{column: F(column) + value for column, value in delta.items()}
+            )
+            if not updated and current is not None and current[0] == patient_id:
+                rebuild_patient_aggregates([patient_id])
+
+
+def aggregated_stress_distribution(patient_id: Optional[int] = None):
+    """Rozkład klas pacjentów z tabeli agregatów (format jak statistics.patient_stress_distribution)."""
+    rows = PatientStressAggregate.objects.filter(total_sessions__gt=0)
+    if patient_id is not None:
+        rows = rows.filter(patient_id=patient_id)
+    rows = (
+        rows.annotate(patient_name=Concat('patient__first_name', Value(' '), 'patient__last_name'))
+        .values('patient_id', 'patient_name', *AGGREGATE_FIELDS)
+        .order_by('patient_id')
+    )
+    result = []
+    for row in rows:
+        weight = row['total_weight']
+        averages = {
+            field: row[column] / weight if weight > 0 else 0.0
+            for field, column in WEIGHTED_FIELDS.items()
+        }
+        result.append({
+            'patient_id': row['patient_id'],
+            'patient_name': row['patient_name'],
+            'total_sessions': row['total_sessions'],
+            'total_duration_seconds': row['total_duration_seconds'],
+            'stress_classes': stress_classes(averages),
+        })
+    return result
@@ -0,0 +1,50 @@
+"""
+Alerty stresu: wizyty, w których procent stresu lub najdłuższy epizod stresu przekracza próg.
+
+Warunek `stress_percentage >= próg OR peak_stress_seconds >= próg` z zakresem dat korzysta
+z częściowych indeksów (stress_percentage, visit_date) i (peak_stress_seconds, visit_date)
+(BitmapOr w PostgreSQL), więc odczytywane są tylko wizyty kwalifikujące się do alertu.
+Wagą alertu (severity) jest większy ze stosunków wartości do progu.
+"""
+import os
+
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Visit
+from .statistics import PATIENT_NAME, filter_visits
+
+# --- PROGI ALERTÓW (domyślne, nadpisywane parametrami zapytania) ---
+ALERT_STRESS_PERCENTAGE = float(os.getenv('ALERT_STRESS_PERCENTAGE', '50'))
+ALERT_PEAK_STRESS_SECONDS = float(os.getenv('ALERT_PEAK_STRESS_SECONDS', '120'))
+
+ALERT_FIELDS = ('id', 'patient_id', 'patient_name', 'visit_date', 'stress_percentage', 'peak_stress_seconds', 'severity')
+
+
+def alert_visits(min_stress=ALERT_STRESS_PERCENTAGE, min_peak_seconds=ALERT_PEAK_STRESS_SECONDS,
+                 date_from=None, date_to=None, patient_id=None):
+    """Wiersze `values()` wizyt przekraczających progi z adnotacją severity (bez kolumn JSON)."""
+    visits = filter_visits(Visit.objects.all(), patient_id, date_from, date_to)
+    severity = Greatest(
+        Coalesce(F('stress_percentage') / Value(min_stress), Value(0.0)),
+        Coalesce(F('peak_stress_seconds') / Value(min_peak_seconds), Value(0.0)),
+        output_field=FloatField(),
+    )
+    return (
+        visits.filter(Q(stress_percentage__gte=min_stress) | Q(peak_stress_seconds__gte=min_peak_seconds))
+        .annotate(patient_name=PATIENT_NAME, severity=severity)
+        .values(*ALERT_FIELDS)
+    )
+
+
+def alert_row(row):
+    """Wiersz alertu w formacie odpowiedzi."""
+    return {
+        'visit_id': row['id'],
+        'patient_id': row['patient_id'],
+        'patient_name': row['patient_name'],
+        'visit_date': row['visit_date'].isoformat(),
+        'stress_percentage': round(row['stress_percentage'], 1) if row['stress_percentage'] is not None else None,
+        'peak_stress_seconds': row['peak_stress_seconds'],
+        'severity': round(row['severity'], 2),
+    }
@@ -0,0 +1,173 @@
+"""
+Benchmarki zapytań modułu pacjentów.
+
+Każdy benchmark zwraca słownik z wynikami (gotowy do zapisu jako JSON) i jest dostępny
+z linii poleceń przez `python manage.py patient_benchmark <nazwa>`. Dane testowe są
+tworzone w transakcji wycofywanej po pomiarze - baza pozostaje bez zmian.
+"""
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from typing import Callable, Dict
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .aggregates import aggregated_stress_distribution, rebuild_patient_aggregates
+from .endpoint_budgets import BUDGET_PASSWORD, BUDGET_PATIENT_VISITS, run_endpoint_budgets
+from .models import Patient, Visit
+from .statistics import STRESS_CLASS_FIELDS, patient_stress_distribution, session_distribution, session_rows
+
+SEED_BATCH_SIZE = 5000
+
+
+class _Rollback(Exception):
+    pass
+
+
+@contextmanager
+def rolled_back():
+    """Transakcja wycofywana po wyjściu z bloku (dane benchmarku nie trafiają do bazy)."""
+    try:
+        with transaction.atomic():
+            yield
+            raise _Rollback
+    except _Rollback:
+        pass
+
+
+def seed_visits(num_patients: int, num_visits: int, timeline_points: int = 20, seed: int = 0):
+    """Tworzy pacjentów i wizyty z losowymi procentami klas i krótką osią czasu (bez sygnałów)."""
+    generator = np.random.default_rng(seed)
+    patients = Patient.objects.bulk_create([
+        Patient(first_name='Pacjent', last_name=str(i), dob=date(1980, 1, 1), gender='K', pesel=f'9{i:010d}')
+        for i in range(num_patients)
+    ], batch_size=SEED_BATCH_SIZE)
+
+    timeline = [{'timestamp': float(i), 'predicted_class': 'Baseline', 'confidence': 0.9} for i in range(timeline_points)]
+    start = timezone.now() - timedelta(days=365)
+    percentages = generator.dirichlet(np.ones(len(STRESS_CLASS_FIELDS)), size=num_visits) * 100
+    durations = generator.integers(60, 3600, size=num_visits)
+    owners = generator.integers(0, num_patients, size=num_visits)
+    for offset in range(0, num_visits, SEED_BATCH_SIZE):
+        Visit.objects.bulk_create([
+            Visit(
+                patient=patients[owners[i]],
+                visit_date=start + timedelta(minutes=int(i)),
+                total_duration_seconds=int(durations[i]),
+                timeline_data=timeline,
+                **dict(zip(STRESS_CLASS_FIELDS, percentages[i].tolist())),
+            )
+            for i in range(offset, min(offset + SEED_BATCH_SIZE, num_visits))
+        ])
+
+
+def seed_endpoint_data(num_patients: int, num_visits: int, timeline_points: int = 20) -> Dict:
+    """
+    Dane harnessu budżetów endpointów: wolumen losowych wizyt oraz pacjent ze stałą liczbą wizyt
+    (żądania modyfikujące dotyczą jego), użytkownik i aktualne sumy PatientStressAggregate.
+    """
+    seed_visits(num_patients, num_visits, timeline_points)
+    patient = Patient.objects.create(first_name='Anna', last_name='Budżetowa', dob=date(1985, 5, 5), gender='K', pesel='85050500000')
+    timeline = [{'timestamp': float(i), 'predicted_class': 'Stress', 'confidence': 0.9} for i in range(timeline_points)]
+    start = timezone.now() - timedelta(days=BUDGET_PATIENT_VISITS)
+    visits = Visit.objects.bulk_create([
+        Visit(patient=patient, visit_date=start + timedelta(days=i), total_duration_seconds=600, stress_percentage=float(5 * i),
+              baseline_percentage=float(100 - 5 * i), peak_stress_seconds=float(10 * i), timeline_data=timeline)
+        for i in range(BUDGET_PATIENT_VISITS)
+    ])
+    rebuild_patient_aggregates()
+    user = get_user_model().objects.create_user(email='budzet@example.com', password=BUDGET_PASSWORD)
+    return {'user': user, 'patient': patient.id, 'visit': visits[0].id, 'num_patients': num_patients + 1}
+
+
+def legacy_stress_distribution(visits):
+    """Poprzednia implementacja: pełne obiekty wizyt i średnie ważone liczone w Pythonie."""
+    sums = {}
+    for visit in visits.select_related('patient'):
+        row = sums.setdefault(visit.patient_id, {'sessions': 0, 'weight': 0, 'weighted': [0.0] * len(STRESS_CLASS_FIELDS)})
+        row['sessions'] += 1
+        duration = visit.total_duration_seconds or 0
+        if duration > 0:
+            row['weight'] += duration
+            for i, field in enumerate(STRESS_CLASS_FIELDS):
+                row['weighted'][i] += (getattr(visit, field) or 0.0) * duration
+    return {
+        patient_id: [value / row['weight'] if row['weight'] else 0.0 for value in row['weighted']]
+        for patient_id, row in sums.items()
+    }
+
+
+def _measure(function: Callable) -> tuple:
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        result = function()
+        seconds = time.perf_counter() - start
+    return {'seconds': round(seconds, 3), 'queries': len(queries)}, result
+
+
+def benchmark_stress_distribution(num_visits: int = 100000, num_patients: int = 1000, timeline_points: int = 20,
+                                  page_size: int = 100) -> Dict:
+    """
+    Porównuje rozkład klas stresu liczony w Pythonie (pełne obiekty wizyt) z agregacją w bazie
+    i odczytem tabeli PatientStressAggregate oraz mierzy stronę listy sesji i przebudowę sum.
+    Sprawdza też zgodność średnich implementacji.
+    """
+    with rolled_back():
+        start = time.perf_counter()
+        seed_visits(num_patients, num_visits, timeline_points)
+        seed_seconds = time.perf_counter() - start
+
+        visits = Visit.objects.all()
+        legacy, legacy_result = _measure(lambda: legacy_stress_distribution(visits))
+        database, patients = _measure(lambda: patient_stress_distribution(visits))
+        rebuild, _ = _measure(rebuild_patient_aggregates)
+        aggregate_table, aggregated = _measure(aggregated_stress_distribution)
+        sessions, _ = _measure(lambda: [session_distribution(row) for row in session_rows(visits)[:page_size]])
+
+    max_difference = max(
+        abs(patient['stress_classes'][field] - legacy_result[patient['patient_id']][i])
+        for patient in patients for i, field in enumerate(STRESS_CLASS_FIELDS)
+    )
+    return {
+        'num_visits': num_visits,
+        'num_patients': num_patients,
+        'timeline_points': timeline_points,
+        'seed_seconds': round(seed_seconds, 3),
+        'legacy_python': legacy,
+        'database_aggregation': database,
+        'aggregate_table': aggregate_table,
+        'aggregate_rebuild': rebuild,
+        'aggregate_matches_visits': aggregated == patients,
+        'session_page': dict(sessions, page_size=page_size),
+        'speedup': round(legacy['seconds'] / max(database['seconds'], 1e-6), 1),
+        'max_percentage_difference': round(max_difference, 4),
+    }
+
+
+def benchmark_endpoint_budgets(num_visits: int = 100000, num_patients: int = 1000) -> Dict:
+    """
+    Harness budżetów endpointów na dużym wolumenie: zapytania, wiersze, rozmiar odpowiedzi
+    i czas każdego przypadku oraz lista przekroczeń zadeklarowanych budżetów.
+
+    Dane w bazie są wycofywane; indeks podobieństwa w katalogu runtime może zachować embedding
+    symulowanej wizyty (wyszukiwanie pomija nieistniejące wizyty).
+    """
+    with rolled_back():
+        context = seed_endpoint_data(num_patients, num_visits)
+        results = run_endpoint_budgets(context)
+    return {
+        'num_visits': num_visits,
+        'num_patients': num_patients,
+        'endpoints': results,
+        'violations': sum(len(result['violations']) for result in results),
+    }
+
+
+BENCHMARKS = {
+    'stress-distribution': benchmark_stress_distribution,
+    'endpoint-budgets': benchmark_endpoint_budgets,
+}
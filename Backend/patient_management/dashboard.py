@@ -0,0 +1,105 @@
+"""
+Podsumowanie panelu (dashboard) liczone w bazie i przechowywane krótko w cache.
+
+Liczniki i średnie to jedno zapytanie agregujące; listy alertów są ograniczone do kilku
+najnowszych wizyt. Wynik trafia do cache Django na DASHBOARD_CACHE_TTL sekund i jest
+usuwany przy każdej zmianie wizyty lub pacjenta (signals). Przy cache lokalnym dla procesu
+(domyślny LocMemCache) inne workery widzą zmianę najpóźniej po upływie TTL.
+"""
+import os
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Avg, Count, F, FloatField, Q
+from django.db.models.fields.json import KT
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
+
+from .models import Patient, Visit
+from .statistics import PATIENT_NAME
+
+# --- KONFIGURACJA PODSUMOWANIA ---
+DASHBOARD_CACHE_KEY = 'patient_management:dashboard_summary'
+DASHBOARD_CACHE_TTL = int(os.getenv('DASHBOARD_CACHE_TTL', '30'))
+RECENT_VISITS_DAYS = 30                  # Okno "aktywnych wizyt"
+ATTENTION_STRESS_PERCENTAGE = 50.0       # Wizyta powyżej progu - pacjent wymaga uwagi
+ALERTS_LIMIT = 5
+STRESS_MOMENT_VISITS = 10                # Liczba najnowszych wizyt przeszukiwanych pod kątem momentów stresu
+
+# Procent stresu wizyty: kolumna z klasyfikacji lub podsumowanie w stress_history (starsze wizyty)
+VISIT_STRESS = Coalesce(
+    F('stress_percentage'),
+    Cast(KT('stress_history__summary__stress_percentage'), FloatField()),
+)
+
+
+def compute_dashboard_summary() -> dict:
+    """Statystyki panelu: liczniki, średni stres oraz najnowsze wizyty i momenty wysokiego stresu."""
+    now = timezone.now()
+    visits = Visit.objects.annotate(stress=VISIT_STRESS)
+    high_stress = Q(stress__gt=ATTENTION_STRESS_PERCENTAGE)
+
+    totals = visits.aggregate(
+        recent_visits=Count('id', filter=Q(visit_date__gte=now - timedelta(days=RECENT_VISITS_DAYS))),
+        average_stress_percentage=Avg('stress'),
+        patients_needing_attention=Count('patient', filter=high_stress, distinct=True),
+    )
+    high_stress_visits = (
+        visits.filter(high_stress)
+        .annotate(patient_name=PATIENT_NAME, stress_level=F('stress'))
+        .order_by('-visit_date')
+        .values('id', 'patient_id', 'patient_name', 'stress_level', 'visit_date')[:ALERTS_LIMIT]
+    )
+    moment_visits = (
+        Visit.objects.filter(stress_history__has_key='stress_moments')
+        .annotate(patient_name=PATIENT_NAME)
+        .order_by('-visit_date')
+        .values('id', 'patient_id', 'patient_name', 'stress_history__stress_moments')[:STRESS_MOMENT_VISITS]
+    )
+
+    moments = [
+        {
+            'visit_id': visit['id'],
+            'patient_id': visit['patient_id'],
+            'patient_name': visit['patient_name'],
+            'timestamp': moment.get('timestamp'),
+            'duration_seconds': moment.get('duration_seconds'),
+            'confidence': moment.get('confidence'),
+        }
+        for visit in moment_visits
+        for moment in visit['stress_history__stress_moments'] or []
+    ]
+    moments.sort(key=lambda moment: moment['timestamp'] or '', reverse=True)
+
+    average = totals['average_stress_percentage']
+    return {
+        'total_patients': Patient.objects.count(),
+        'recent_visits': totals['recent_visits'],
+        'average_stress_percentage': round(average, 1) if average is not None else None,
+        'patients_needing_attention': totals['patients_needing_attention'],
+        'high_stress_visits': [
+            {
+                'visit_id': visit['id'],
+                'patient_id': visit['patient_id'],
+                'patient_name': visit['patient_name'],
+                'stress_percentage': round(visit['stress_level'], 1),
+                'visit_date': visit['visit_date'].isoformat(),
+            }
+            for visit in high_stress_visits
+        ],
+        'recent_stress_moments': moments[:ALERTS_LIMIT],
+        'generated_at': now.isoformat(),
+    }
+
+
+def get_dashboard_summary() -> dict:
+    """Podsumowanie panelu z cache (liczone ponownie po wygaśnięciu lub zmianie danych)."""
+    summary = cache.get(DASHBOARD_CACHE_KEY)
+    if summary is None:
+        summary = compute_dashboard_summary()
+        cache.set(DASHBOARD_CACHE_KEY, summary, DASHBOARD_CACHE_TTL)
+    return summary
+
+
+def invalidate_dashboard_summary():
+    cache.delete(DASHBOARD_CACHE_KEY)
@@ -0,0 +1,277 @@
+"""
+Budżety zapytań, wierszy, rozmiaru odpowiedzi i czasu dla wszystkich endpointów API.
+
+Każda ścieżka z `api/urls.py` (poza panelem administracyjnym) ma co najmniej jeden przypadek
+w ENDPOINT_CASES z zadeklarowanym budżetem. Pomiar jednego żądania obejmuje:
+- liczbę zapytań SQL i wierszy zwróconych przez zapytania SELECT (execute_wrapper połączenia),
+- odczytane ciężkie kolumny JSON wizyt (HEAVY_COLUMNS) - dozwolone tylko przy heavy_columns,
+- rozmiar odpowiedzi i czas ścienny.
+
+Budżety wierszy i rozmiaru mogą rosnąć z liczbą pacjentów (`rows_per_patient`,
+`bytes_per_patient`) - pozostałe limity nie zależą od wolumenu danych, więc N+1 zapytań
+albo odczyt timeline na liście przekracza budżet niezależnie od rozmiaru bazy.
+
+Harness uruchamiają testy (PatientEndpointBudgetTests) oraz benchmark
+`python manage.py patient_benchmark endpoint-budgets`. Wywołania OpenAI (analiza AI wizyty
+i analiza długoterminowa) są zastępowane - mierzony jest wyłącznie kod aplikacji.
+"""
+import time
+from contextlib import ExitStack
+from typing import Dict, List
+from unittest import mock
+
+from django.db import connection
+from django.urls import URLPattern, URLResolver, get_resolver
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .dashboard import ALERTS_LIMIT, STRESS_MOMENT_VISITS, invalidate_dashboard_summary
+from .pagination import PAGE_SIZE, SessionCursorPagination
+
+# Kolumny JSON wizyt, których nie powinny czytać listy i podsumowania
+HEAVY_COLUMNS = ('timeline_data', 'stress_history', 'window_labels', 'session_embedding')
+
+# Przestrzenie nazw URL poza harnessem (z uzasadnieniem)
+EXCLUDED_NAMESPACES = {
+    'admin': "Panel administracyjny Django - poza API aplikacji",
+}
+
+BUDGET_PASSWORD = 'Budzet-Endpointow-2025'
+BUDGET_PATIENT_VISITS = 20      # Wizyty pacjenta, na którym wykonywane są zapisy (benchmarks.seed_endpoint_data)
+SESSION_PAGE_SIZE = SessionCursorPagination.page_size
+SIMULATION_SECONDS = 600
+
+LIMITS = ('queries', 'rows', 'bytes', 'seconds')
+
+
+class EndpointCase:
+    """
+    Jedno żądanie harnessu z budżetem.
+
+    path / data mogą odwoływać się do kontekstu (pola `{nazwa}` w ścieżce, data jako funkcja
+    kontekstu). `store` zapisuje wartości z odpowiedzi do kontekstu dla kolejnych przypadków,
+    `before` jest wywoływane przed pomiarem (np. wyczyszczenie cache).
+    """
+
+    def __init__(self, route: str, method: str, path: str, budget: Dict, data=None, status=200,
+                 store=None, before=None, authenticated: bool = True):
+        self.route = route
+        self.method = method
+        self.path = path
+        self.budget = budget
+        self.data = data
+        self.statuses = status if isinstance(status, tuple) else (status,)
+        self.store = store
+        self.before = before
+        self.authenticated = authenticated
+
+
+class QueryRecorder:
+    """execute_wrapper zliczający zapytania, wiersze SELECT i odczytane ciężkie kolumny."""
+
+    def __init__(self):
+        self.queries = 0
+        self.rows = 0
+        self.heavy_columns = set()
+
+    def __call__(self, execute, sql, params, many, context):
+        result = execute(sql, params, many, context)
+        self.queries += 1
+        if sql.lstrip().upper().startswith('SELECT'):
+            self.rows += max(context['cursor'].rowcount, 0)
+            selected = sql.split(' FROM ', 1)[0]
+            self.heavy_columns.update(column for column in HEAVY_COLUMNS if f'"{column}"' in selected)
+        return result
+
+
+def budget(queries: int, rows: int, size: int, seconds: float, heavy_columns: bool = False,
+           rows_per_patient: int = 0, bytes_per_patient: int = 0) -> Dict:
+    """Budżet przypadku; size - maksymalny rozmiar odpowiedzi w bajtach."""
+    return {
+        'queries': queries, 'rows': rows, 'bytes': size, 'seconds': seconds, 'heavy_columns': heavy_columns,
+        'rows_per_patient': rows_per_patient, 'bytes_per_patient': bytes_per_patient,
+    }
+
+
+def _store(**fields):
+    """store dla EndpointCase: pola kontekstu z funkcji danych odpowiedzi."""
+    def store(context, data):
+        context.update({name: extract(data) for name, extract in fields.items()})
+    return store
+
+
+def _labels(context):
+    # Naprzemienne klasy Baseline / Stress - wystarczająco oznaczonych okien do douczania głowy
+    return {'labels': [i % 2 for i in range(context['simulated_windows'])]}
+
+
+def _token_refresh(context):
+    return {'refresh': str(RefreshToken.for_user(context['user']))}
+
+
+def _logout(context):
+    return {'refresh_token': str(RefreshToken.for_user(context['user']))}
+
+
+def _login(context):
+    return {'email': context['user'].email, 'password': BUDGET_PASSWORD}
+
+
+# Limity czasu: zapytania do bazy, haszowanie hasła (logowanie, rejestracja), inferencja / douczanie modelu
+DB_SECONDS = 1.0
+AUTH_SECONDS = 2.0
+ML_SECONDS = 30.0
+
+ENDPOINT_CASES = [
+    # --- Infrastruktura i dokumentacja ---
+    EndpointCase('health-ready', 'get', '/health/ready/', budget(0, 0, 2000, DB_SECONDS), status=(200, 503), authenticated=False),
+    EndpointCase('schema', 'get', '/api/schema/', budget(0, 0, 200000, 5.0), authenticated=False),
+    EndpointCase('swagger-ui', 'get', '/api/schema/swagger-ui/', budget(0, 0, 10000, DB_SECONDS), authenticated=False),
+    EndpointCase('api-root', 'get', '/api/', budget(0, 0, 1000, DB_SECONDS)),
+
+    # --- Użytkownicy ---
+    EndpointCase('security:register', 'post', '/auth/register/', budget(4, 0, 2000, AUTH_SECONDS), status=201, authenticated=False, data={
+        'email': 'nowy.terapeuta@example.com', 'password': BUDGET_PASSWORD, 'password2': BUDGET_PASSWORD,
+        'first_name': 'Nowy', 'last_name': 'Terapeuta',
+    }),
+    EndpointCase('security:login', 'post', '/auth/login/', budget(2, 1, 2000, AUTH_SECONDS), data=_login, authenticated=False),
+    EndpointCase('security:token_refresh', 'post', '/auth/token/refresh/', budget(6, 1, 2000, DB_SECONDS), data=_token_refresh,
+                 authenticated=False),
+    EndpointCase('security:current_user', 'get', '/auth/user/me/', budget(0, 0, 1000, DB_SECONDS)),
+    EndpointCase('security:update_user', 'patch', '/auth/user/update/', budget(1, 0, 1000, DB_SECONDS), data={'first_name': 'Anna'}),
+    EndpointCase('security:logout', 'post', '/auth/logout/', budget(6, 1, 1000, DB_SECONDS), data=_logout),
+
+    # --- Klasyfikacja stresu (bez bazy aplikacji) ---
+    EndpointCase('stress_classification:classify', 'post', '/api/stress-classification/', budget(0, 0, 100000, ML_SECONDS), data={},
+                 authenticated=False),
+    EndpointCase('stress_classification:diagnostics', 'get', '/api/stress-classification/diagnostics/', budget(0, 0, 10000, DB_SECONDS),
+                 authenticated=False),
+    EndpointCase('stress_classification:shadow-report', 'get', '/api/stress-classification/shadow/', budget(0, 0, 10000, DB_SECONDS),
+                 authenticated=False),
+
+    # --- Pacjenci ---
+    EndpointCase('patient-list', 'get', '/api/patients/', budget(1, PAGE_SIZE + 1, 10000, DB_SECONDS)),
+    # Zapis pacjenta serializuje zagnieżdżone wizyty, usunięcie pobiera wizyty do kaskady (sygnały) - stąd kolumny JSON
+    EndpointCase('patient-list', 'post', '/api/patients/', budget(3, 0, 1000, DB_SECONDS, heavy_columns=True), status=201, data={
+        'first_name': 'Ewa', 'last_name': 'Kowal', 'dob': '1990-02-02', 'gender': 'K', 'pesel': '90020212345',
+    }, store=_store(created_patient=lambda data: data['id'])),
+    EndpointCase('patient-detail', 'get', '/api/patients/{patient}/', budget(2, BUDGET_PATIENT_VISITS + 1, 20000, DB_SECONDS, heavy_columns=True)),
+    EndpointCase('patient-detail', 'patch', '/api/patients/{created_patient}/', budget(3, 1, 1000, DB_SECONDS, heavy_columns=True),
+                 data={'notes': 'Kontrola'}),
+    EndpointCase('patient-detail', 'delete', '/api/patients/{created_patient}/', budget(5, 1, 0, DB_SECONDS, heavy_columns=True), status=204),
+    EndpointCase('patient-with-visits', 'get', '/api/patients/{patient}/full/',
+                 budget(2, BUDGET_PATIENT_VISITS + 1, 20000, DB_SECONDS, heavy_columns=True)),
+
+    # --- Wizyty ---
+    EndpointCase('visit-list', 'get', '/api/visits/', budget(1, PAGE_SIZE + 1, 40000, DB_SECONDS)),
+    EndpointCase('visit-list', 'get', '/api/visits/?patient={patient}&date_from=2024-01-01', budget(1, PAGE_SIZE + 1, 40000, DB_SECONDS)),
+    EndpointCase('visit-calendar', 'get', '/api/visits/calendar/?date_from=2024-01-01', budget(1, PAGE_SIZE + 1, 10000, DB_SECONDS)),
+    # Zapis wizyty: sygnał analizy długoterminowej odczytuje wszystkie wizyty pacjenta
+    EndpointCase('visit-list', 'post', '/api/visits/', budget(6, BUDGET_PATIENT_VISITS + 4, 2000, DB_SECONDS, heavy_columns=True), status=201,
+                 data=lambda context: {
+                     'patient': context['patient'], 'visit_date': '2025-03-10T10:00:00Z', 'psychologist_notes': 'Wizyta kontrolna',
+                 }, store=_store(created_visit=lambda data: data['id'])),
+    EndpointCase('visit-detail', 'get', '/api/visits/{visit}/', budget(1, 1, 10000, DB_SECONDS, heavy_columns=True)),
+    EndpointCase('visit-detail', 'patch', '/api/visits/{created_visit}/', budget(7, BUDGET_PATIENT_VISITS + 4, 2000, DB_SECONDS, heavy_columns=True),
+                 data={'psychologist_notes': 'Uzupełnione notatki'}),
+    EndpointCase('visit-detail', 'delete', '/api/visits/{created_visit}/', budget(6, 1, 0, DB_SECONDS, heavy_columns=True), status=204),
+
+    # --- Sesje i model pacjenta ---
+    EndpointCase('create-visit-simulation', 'post', '/api/visits/patient/{patient}/simulate/',
+                 budget(18, BUDGET_PATIENT_VISITS + 4, 50000, ML_SECONDS, heavy_columns=True), status=201,
+                 data={'duration_sec': SIMULATION_SECONDS},
+                 store=_store(simulated_visit=lambda data: data['visit']['id'],
+                              simulated_windows=lambda data: len(data['visit']['timeline_data']))),
+    # Wizyta z embeddingiem i do k (domyślnie 10) sąsiadów jednym zapytaniem
+    EndpointCase('similar-visits', 'get', '/api/visits/{simulated_visit}/similar/', budget(2, 11, 10000, DB_SECONDS, heavy_columns=True)),
+    EndpointCase('visit-window-labels', 'put', '/api/visits/{simulated_visit}/labels/', budget(2, 1, 1000, DB_SECONDS, heavy_columns=True),
+                 data=_labels),
+    EndpointCase('ai-analysis-service', 'post', '/api/visits/{simulated_visit}/analyze/',
+                 budget(7, BUDGET_PATIENT_VISITS + 4, 50000, DB_SECONDS, heavy_columns=True)),
+    EndpointCase('patient-head-adaptation', 'post', '/api/patients/{patient}/adapt/', budget(8, 2, 1000, ML_SECONDS, heavy_columns=True)),
+    EndpointCase('patient-head-adaptation', 'delete', '/api/patients/{patient}/adapt/', budget(1, 0, 0, DB_SECONDS), status=204),
+
+    # --- Statystyki (stress_history czytane tylko jako klucz stress_moments ostatnich wizyt) ---
+    EndpointCase('dashboard-summary', 'get', '/api/dashboard/summary/', budget(4, 2 + ALERTS_LIMIT + STRESS_MOMENT_VISITS, 5000, DB_SECONDS,
+                                                                             heavy_columns=True), before=invalidate_dashboard_summary),
+    EndpointCase('stress-alerts', 'get', '/api/alerts/', budget(1, PAGE_SIZE + 1, 15000, DB_SECONDS)),
+    EndpointCase('stress-class-distribution', 'get', '/api/stress-class-distribution/',
+                 budget(2, SESSION_PAGE_SIZE + 1, 40000, DB_SECONDS, rows_per_patient=1, bytes_per_patient=400)),
+    EndpointCase('stress-class-distribution', 'get', '/api/stress-class-distribution/?date_from=2024-01-01',
+                 budget(2, SESSION_PAGE_SIZE + 1, 40000, DB_SECONDS, rows_per_patient=1, bytes_per_patient=400)),
+]
+
+
+def api_routes() -> set:
+    """Nazwy wszystkich ścieżek URL projektu (z przestrzenią nazw) poza EXCLUDED_NAMESPACES."""
+    def walk(patterns, namespace):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                if pattern.namespace in EXCLUDED_NAMESPACES:
+                    continue
+                nested = namespace
+                if pattern.namespace:
+                    nested = f'{namespace}{pattern.namespace}:'
+                yield from walk(pattern.url_patterns, nested)
+            elif isinstance(pattern, URLPattern) and pattern.name:
+                yield namespace + pattern.name
+    return set(walk(get_resolver().url_patterns, ''))
+
+
+def budget_violations(result: Dict, case: EndpointCase, num_patients: int) -> List[str]:
+    limits = dict(case.budget)
+    limits['rows'] += case.budget['rows_per_patient'] * num_patients
+    limits['bytes'] += case.budget['bytes_per_patient'] * num_patients
+    violations = [f"{name}: {result[name]} > {limits[name]}" for name in LIMITS if result[name] > limits[name]]
+    if result['status'] not in case.statuses:
+        violations.append(f"status: {result['status']} (oczekiwano {case.statuses})")
+    if result['heavy_columns'] and not case.budget['heavy_columns']:
+        violations.append(f"ciężkie kolumny: {', '.join(result['heavy_columns'])}")
+    return violations
+
+
+def measure_endpoint(client: APIClient, case: EndpointCase, context: Dict) -> Dict:
+    """Wykonuje żądanie przypadku i zwraca pomiar z listą przekroczeń budżetu."""
+    if case.before:
+        case.before()
+    path = case.path.format(**context)
+    data = case.data(context) if callable(case.data) else case.data
+    client.force_authenticate(context['user'] if case.authenticated else None)
+    options = {} if case.method == 'get' else {'format': 'json'}
+
+    recorder = QueryRecorder()
+    with connection.execute_wrapper(recorder):
+        start = time.perf_counter()
+        response = getattr(client, case.method)(path, data, **options)
+        seconds = time.perf_counter() - start
+
+    result = {
+        'route': case.route,
+        'method': case.method.upper(),
+        'path': path,
+        'status': response.status_code,
+        'queries': recorder.queries,
+        'rows': recorder.rows,
+        'bytes': len(response.content),
+        'seconds': round(seconds, 3),
+        'heavy_columns': sorted(recorder.heavy_columns),
+    }
+    result['violations'] = budget_violations(result, case, context['num_patients'])
+    if case.store and response.status_code in case.statuses:
+        case.store(context, response.data)
+    return result
+
+
+def run_endpoint_budgets(context: Dict, cases=None) -> List[Dict]:
+    """
+    Mierzy wszystkie przypadki po kolei (kolejne przypadki korzystają z kontekstu poprzednich).
+
+    context - dane z `benchmarks.seed_endpoint_data` (użytkownik, pacjent, wizyta, liczba pacjentów).
+    """
+    client = APIClient()
+    with ExitStack() as stack:
+        # Zewnętrzne API (OpenAI) poza pomiarem: analiza wizyty zwraca stały tekst, analiza w sygnałach - błąd
+        stack.enter_context(mock.patch('patient_management.views.ai_analysis_service', return_value="Podsumowanie sesji"))
+        stack.enter_context(mock.patch('patient_management.signals.ai_analysis_service', side_effect=ValueError))
+        stack.enter_context(mock.patch('patient_management.signals.analyze_long_term_progress', side_effect=ValueError))
+        return [measure_endpoint(client, case, context) for case in (cases or ENDPOINT_CASES)]
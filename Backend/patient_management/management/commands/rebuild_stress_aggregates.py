@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from patient_management.aggregates import rebuild_patient_aggregates
+
+
+class Command(BaseCommand):
+    help = "Przelicza od zera sumy klas stresu pacjentów (PatientStressAggregate) z zapisanych wizyt."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--patient', type=int, action='append', dest='patients',
+                            help="ID pacjenta (można podać wielokrotnie; domyślnie wszyscy)")
+
+    def handle(self, *args, **options):
+        count = rebuild_patient_aggregates(options['patients'])
+        self.stdout.write(self.style.SUCCESS(f"Przeliczono sumy {count} pacjentów"))
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.11 on 2026-10-19 05:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient_management', '0009_visit_ai_summary_story_visit_amusement_percentage_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='visit',
+            name='hrv_metrics',
+            field=models.JSONField(blank=True, help_text='Metryki HRV sesji (RMSSD, SDNN, pNN50, LF/HF, średnie tętno)', null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.11 on 2026-10-19 05:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient_management', '0010_visit_hrv_metrics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='visit',
+            name='signal_quality_ratio',
+            field=models.FloatField(blank=True, help_text='Średni indeks jakości sygnału (SQI) okien sesji (0.0-1.0)', null=True),
+        ),
+        migrations.AddField(
+            model_name='visit',
+            name='unusable_percentage',
+            field=models.FloatField(blank=True, help_text='Procent okien pominiętych z powodu niskiej jakości sygnału (0.0-100.0)', null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.11 on 2026-10-19 05:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient_management', '0011_visit_signal_quality'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patient',
+            name='normalization_profile',
+            field=models.JSONField(blank=True, help_text='Statystyki Welforda (count, mean, m2) sygnałów z poprzednich wizyt do normalizacji per pacjent.', null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.11 on 2026-10-19 05:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient_management', '0012_patient_normalization_profile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='visit',
+            name='embedding_model_version',
+            field=models.CharField(blank=True, help_text='Wersja modelu, który wygenerował embedding', max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='visit',
+            name='session_embedding',
+            field=models.JSONField(blank=True, help_text='Znormalizowany embedding sesji z modelu klasyfikacji', null=True),
+        ),
+    ]
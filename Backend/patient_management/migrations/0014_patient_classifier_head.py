@@ -0,0 +1,43 @@
+# Generated by Django 4.2.11 on 2026-10-19 06:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient_management', '0013_visit_session_embedding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='visit',
+            name='window_labels',
+            field=models.JSONField(blank=True, help_text='Klasa (0-3) lub null dla każdego okna timeline, nadana przez terapeutę', null=True),
+        ),
+        migrations.CreateModel(
+            name='VisitFeatureCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_version', models.CharField(help_text='Wersja modelu, który wygenerował cechy', max_length=64)),
+                ('num_windows', models.IntegerField()),
+                ('dimension', models.IntegerField()),
+                ('features', models.BinaryField(help_text='Macierz (num_windows, dimension) float16; okna bez cech - NaN')),
+                ('visit', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='feature_cache', to='patient_management.visit')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PatientClassifierHead',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_version', models.CharField(help_text='Wersja modelu bazowego, dla której douczono głowę', max_length=64)),
+                ('weights', models.BinaryField(help_text='Wagi głowy (.npz)')),
+                ('labelled_windows', models.IntegerField()),
+                ('global_accuracy', models.FloatField(blank=True, help_text='Dokładność głowy globalnej na oknach walidacyjnych', null=True)),
+                ('adapted_accuracy', models.FloatField(blank=True, help_text='Dokładność głowy pacjenta na oknach walidacyjnych', null=True)),
+                ('trained_at', models.DateTimeField(auto_now=True)),
+                ('patient', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='classifier_head', to='patient_management.patient')),
+            ],
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.11 on 2026-10-19 06:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+PERCENTAGES = {
+    'baseline_percentage': 'weighted_baseline',
+    'stress_percentage': 'weighted_stress',
+    'amusement_percentage': 'weighted_amusement',
+    'meditation_percentage': 'weighted_meditation',
+    'unusable_percentage': 'weighted_unusable',
+}
+
+
+def populate_aggregates(apps, schema_editor):
+    """Sumy dla istniejących wizyt (dalej utrzymywane przyrostowo przez sygnały)."""
+    Patient = apps.get_model('patient_management', 'Patient')
+    Visit = apps.get_model('patient_management', 'Visit')
+    PatientStressAggregate = apps.get_model('patient_management', 'PatientStressAggregate')
+
+    aggregates = {
+        patient_id: PatientStressAggregate(patient_id=patient_id)
+        for patient_id in Patient.objects.values_list('id', flat=True)
+    }
+    visits = Visit.objects.values('patient_id', 'total_duration_seconds', *PERCENTAGES).iterator()
+    for visit in visits:
+        aggregate = aggregates[visit['patient_id']]
+        duration = visit['total_duration_seconds'] or 0
+        weight = max(duration, 0)
+        aggregate.total_sessions += 1
+        aggregate.total_duration_seconds += duration
+        aggregate.total_weight += weight
+        for field, column in PERCENTAGES.items():
+            setattr(aggregate, column, getattr(aggregate, column) + (visit[field] or 0.0) * weight)
+    PatientStressAggregate.objects.bulk_create(aggregates.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient_management', '0014_patient_classifier_head'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PatientStressAggregate',
+            fields=[
+                ('patient', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stress_aggregate', serialize=False, to='patient_management.patient')),
+                ('total_sessions', models.IntegerField(default=0)),
+                ('total_duration_seconds', models.BigIntegerField(default=0)),
+                ('total_weight', models.BigIntegerField(default=0, help_text='Suma czasu trwania wizyt o dodatnim czasie (mianownik średnich)')),
+                ('weighted_baseline', models.FloatField(default=0.0)),
+                ('weighted_stress', models.FloatField(default=0.0)),
+                ('weighted_amusement', models.FloatField(default=0.0)),
+                ('weighted_meditation', models.FloatField(default=0.0)),
+                ('weighted_unusable', models.FloatField(default=0.0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(populate_aggregates, migrations.RunPython.noop),
+    ]
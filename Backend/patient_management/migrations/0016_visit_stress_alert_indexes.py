@@ -0,0 +1,41 @@
+# Generated by Django 4.2.11 on 2026-10-19 06:22
+
+from django.db import migrations, models
+
+
+def backfill_peak_stress(apps, schema_editor):
+    """Najdłuższy epizod stresu dla wizyt z zapisanym timeline (krok domyślnie 10 s)."""
+    Visit = apps.get_model('patient_management', 'Visit')
+    visits = Visit.objects.filter(timeline_data__isnull=False).only('id', 'timeline_data', 'step_size')
+    for visit in visits.iterator(chunk_size=500):
+        if not isinstance(visit.timeline_data, list):
+            continue
+        longest = current = 0
+        for point in visit.timeline_data:
+            current = current + 1 if isinstance(point, dict) and point.get('feeling') == 'Stress' else 0
+            longest = max(longest, current)
+        Visit.objects.filter(pk=visit.pk).update(peak_stress_seconds=longest * (visit.step_size or 10.0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient_management', '0015_patient_stress_aggregate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='visit',
+            name='peak_stress_seconds',
+            field=models.FloatField(blank=True, help_text='Czas najdłuższego nieprzerwanego epizodu stresu w sesji (w sekundach)', null=True),
+        ),
+        migrations.RunPython(backfill_peak_stress, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='visit',
+            index=models.Index(condition=models.Q(('stress_percentage__isnull', False)), fields=['stress_percentage', 'visit_date'], name='visit_stress_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visit',
+            index=models.Index(condition=models.Q(('peak_stress_seconds__isnull', False)), fields=['peak_stress_seconds', 'visit_date'], name='visit_peak_stress_date_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.11 on 2026-10-19 06:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient_management', '0016_visit_stress_alert_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='visit',
+            index=models.Index(fields=['patient', 'visit_date'], name='visit_patient_date_idx'),
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 
 class Patient(models.Model):
@@ -13,6 +13,11 @@ class Patient(models.Model):
         null=True,
         help_text="Długoterminowa analiza AI dotycząca postępów pacjenta w terapii."
     )
+    normalization_profile = models.JSONField(
+        blank=True,
+        null=True,
+        help_text="Statystyki Welforda (count, mean, m2) sygnałów z poprzednich wizyt do normalizacji per pacjent."
+    )
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
@@ -35,12 +40,86 @@ class Visit(models.Model):
     stress_percentage = models.FloatField(blank=True, null=True, help_text="Procent czasu przypisany do stanu Stress (0.0-100.0)")
     amusement_percentage = models.FloatField(blank=True, null=True, help_text="Procent czasu przypisany do stanu Amusement (0.0-100.0)")
     meditation_percentage = models.FloatField(blank=True, null=True, help_text="Procent czasu przypisany do stanu Meditation (0.0-100.0)")
+    unusable_percentage = models.FloatField(blank=True, null=True, help_text="Procent okien pominiętych z powodu niskiej jakości sygnału (0.0-100.0)")
+
+    # Najdłuższy nieprzerwany epizod stresu (kolejne okna klasy Stress) - do alertów
+    peak_stress_seconds = models.FloatField(blank=True, null=True, help_text="Czas najdłuższego nieprzerwanego epizodu stresu w sesji (w sekundach)")
+
+    # Jakość sygnału sesji - średni indeks SQI okien (0.0-1.0)
+    signal_quality_ratio = models.FloatField(blank=True, null=True, help_text="Średni indeks jakości sygnału (SQI) okien sesji (0.0-1.0)")
 
     # Dane symulacji / timeline sesji
     timeline_data = models.JSONField(blank=True, null=True, help_text="Lista punktów czasowych tworzących oś czasu sesji")
 
+    # Metryki zmienności rytmu serca (HRV) całej sesji wyliczone z BVP
+    hrv_metrics = models.JSONField(blank=True, null=True, help_text="Metryki HRV sesji (RMSSD, SDNN, pNN50, LF/HF, średnie tętno)")
+
+    # Embedding sesji (uśrednione cechy modelu) do wyszukiwania podobnych wizyt
+    session_embedding = models.JSONField(blank=True, null=True, help_text="Znormalizowany embedding sesji z modelu klasyfikacji")
+    embedding_model_version = models.CharField(max_length=64, blank=True, null=True, help_text="Wersja modelu, który wygenerował embedding")
+
+    # Etykiety okien nadane przez terapeutę (do douczania głowy klasyfikatora pacjenta)
+    window_labels = models.JSONField(blank=True, null=True, help_text="Klasa (0-3) lub null dla każdego okna timeline, nadana przez terapeutę")
+
     # Dodatkowe pole z bardziej narracyjnym podsumowaniem sesji (jeśli wygenerowane)
     ai_summary_story = models.TextField(blank=True, null=True, help_text="Historia wygenerowana przez model AI podsumowująca sesję")
 
+    class Meta:
+        indexes = [
+            # Kalendarz / wizyty pacjenta w zakresie dat - jeden skan zakresu indeksu
+            models.Index(fields=['patient', 'visit_date'], name='visit_patient_date_idx'),
+            # Alerty: zakres procentu stresu / długości epizodu w zakresie dat (tylko wizyty z wartością)
+            models.Index(
+                fields=['stress_percentage', 'visit_date'], name='visit_stress_date_idx',
+                condition=models.Q(stress_percentage__isnull=False),
+            ),
+            models.Index(
+                fields=['peak_stress_seconds', 'visit_date'], name='visit_peak_stress_date_idx',
+                condition=models.Q(peak_stress_seconds__isnull=False),
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Sygnały zapisu aktualizują PatientStressAggregate - odczyt poprzedniego wkładu (pre_save,
+        # z blokadą wiersza) i jego odjęcie (post_save) muszą być w jednej transakcji
+        with transaction.atomic(using=kwargs.get('using'), savepoint=False):
+            super().save(*args, **kwargs)
+
+
+class VisitFeatureCache(models.Model):
+    """Cechy okien wizyty z zamrożonej części modelu (float16), zapisane raz przy klasyfikacji."""
+    visit = models.OneToOneField(Visit, related_name='feature_cache', on_delete=models.CASCADE)
+    model_version = models.CharField(max_length=64, help_text="Wersja modelu, który wygenerował cechy")
+    num_windows = models.IntegerField()
+    dimension = models.IntegerField()
+    features = models.BinaryField(help_text="Macierz (num_windows, dimension) float16; okna bez cech - NaN")
+
+
+class PatientClassifierHead(models.Model):
+    """Głowa klasyfikatora douczona na oznaczonych oknach pacjenta."""
+    patient = models.OneToOneField(Patient, related_name='classifier_head', on_delete=models.CASCADE)
+    model_version = models.CharField(max_length=64, help_text="Wersja modelu bazowego, dla której douczono głowę")
+    weights = models.BinaryField(help_text="Wagi głowy (.npz)")
+    labelled_windows = models.IntegerField()
+    global_accuracy = models.FloatField(blank=True, null=True, help_text="Dokładność głowy globalnej na oknach walidacyjnych")
+    adapted_accuracy = models.FloatField(blank=True, null=True, help_text="Dokładność głowy pacjenta na oknach walidacyjnych")
+    trained_at = models.DateTimeField(auto_now=True)
+
 
+class PatientStressAggregate(models.Model):
+    """
+    Bieżące sumy klas stresu pacjenta ważone czasem trwania wizyt.
 
+    Aktualizowane przyrostowo przy zapisie i usunięciu wizyty (signals), odbudowywane
+    poleceniem `rebuild_stress_aggregates`. Średnia klasy = weighted_<klasa> / total_weight.
+    """
+    patient = models.OneToOneField(Patient, related_name='stress_aggregate', on_delete=models.CASCADE, primary_key=True)
+    total_sessions = models.IntegerField(default=0)
+    total_duration_seconds = models.BigIntegerField(default=0)
+    total_weight = models.BigIntegerField(default=0, help_text="Suma czasu trwania wizyt o dodatnim czasie (mianownik średnich)")
+    weighted_baseline = models.FloatField(default=0.0)
+    weighted_stress = models.FloatField(default=0.0)
+    weighted_amusement = models.FloatField(default=0.0)
+    weighted_meditation = models.FloatField(default=0.0)
+    weighted_unusable = models.FloatField(default=0.0)
+    updated_at = models.DateTimeField(auto_now=True)
@@ -0,0 +1,40 @@
+"""
+Paginacja kursorowa (keyset) list pacjentów i wizyt.
+
+Kursor koduje pozycję w porządku sortowania, więc kolejne strony to zapytania
+`WHERE visit_date < ... ORDER BY ... LIMIT n` - bez OFFSET i bez COUNT(*) całej tabeli.
+"""
+from rest_framework.pagination import CursorPagination
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class PatientCursorPagination(CursorPagination):
+    page_size = PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = MAX_PAGE_SIZE
+    ordering = ('id',)
+
+
+class VisitCursorPagination(CursorPagination):
+    page_size = PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = MAX_PAGE_SIZE
+    ordering = ('-visit_date', '-id')
+
+
+class SessionCursorPagination(CursorPagination):
+    """Lista sesji w rozkładzie klas stresu (wiersze `values()`)."""
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    ordering = ('id',)
+
+
+class AlertCursorPagination(CursorPagination):
+    """Alerty stresu od najpoważniejszych (wiersze `values()` z adnotacją severity)."""
+    page_size = PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = MAX_PAGE_SIZE
+    ordering = ('-severity', '-visit_date', '-id')
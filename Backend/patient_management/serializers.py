@@ -1,23 +1,116 @@
 from rest_framework import serializers
+from stress_classification.ml_service import NUM_CLASSES
 from .models import Patient, Visit
 
 
-class VisitSerializer(serializers.ModelSerializer):
+# Pola wizyty pomijane na listach: oś czasu, historia stresu, etykiety okien i długie teksty AI
+VISIT_HEAVY_FIELDS = ['timeline_data', 'stress_history', 'window_labels', 'ai_summary', 'ai_summary_story']
+
+# Pola wizyt zagnieżdżonych w pacjencie pobierane tylko na żądanie (`visit_fields=`)
+PATIENT_VISIT_DEFERRED_FIELDS = ['timeline_data', 'window_labels']
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer z opcjonalnym ograniczeniem zwracanych pól (parametr `fields=` zapytania).
+
+    fields - pola zwracane (None - wszystkie), omit - pola pomijane, gdy `fields` nie podano.
+    Nieznane nazwy pól kończą się błędem walidacji (400), a nie cichym pominięciem.
+    """
+
+    def __init__(self, *args, fields=None, omit=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is None:
+            for name in omit or ():
+                self.fields.pop(name, None)
+            return
+        unknown = set(fields) - set(self.fields)
+        if unknown:
+            raise serializers.ValidationError({'fields': f"Nieznane pola: {', '.join(sorted(unknown))}"})
+        for name in set(self.fields) - set(fields):
+            self.fields.pop(name)
+
+
+class VisitSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Visit
-        fields = '__all__'
+        # Embedding sesji służy tylko do wyszukiwania podobnych wizyt - nie trafia do odpowiedzi
+        exclude = ['session_embedding']
+        # Etykiety okien zmieniane są tylko przez endpoint z walidacją długości timeline
+        read_only_fields = ['window_labels']
 
 
-class PatientSerializer(serializers.ModelSerializer):
-    visits = VisitSerializer(many=True, read_only=True)
+class VisitListSerializer(serializers.ModelSerializer):
+    """Wizyta na liście - bez ciężkich pól JSON i tekstów AI (dostępne przez `fields=` lub szczegóły)"""
+
+    class Meta:
+        model = Visit
+        exclude = ['session_embedding'] + VISIT_HEAVY_FIELDS
+
+
+# Kolumny wizyty odczytywane dla kalendarza (patient_name - adnotacja zapytania)
+VISIT_CALENDAR_COLUMNS = ['id', 'patient', 'visit_date', 'stress_percentage']
+
+
+class VisitCalendarSerializer(serializers.ModelSerializer):
+    """Wizyta w kalendarzu - tylko data, pacjent i procent stresu"""
+    patient_name = serializers.CharField(read_only=True)
+
+    class Meta:
+        model = Visit
+        fields = ['id', 'patient', 'patient_name', 'visit_date', 'stress_percentage']
+
+
+class PatientSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """Pacjent z wizytami; oś czasu i etykiety okien wizyt tylko przez `visit_fields`"""
+    visits = VisitSerializer(many=True, read_only=True, omit=PATIENT_VISIT_DEFERRED_FIELDS)
 
     class Meta:
         model = Patient
         fields = ['id', 'first_name', 'last_name', 'dob', 'gender', 'pesel', 'notes', 'long_term_summary', 'visits']
 
+    def __init__(self, *args, visit_fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if visit_fields is not None and 'visits' in self.fields:
+            try:
+                self.fields['visits'] = VisitSerializer(many=True, read_only=True, fields=visit_fields)
+            except serializers.ValidationError as error:
+                raise serializers.ValidationError({'visit_fields': error.detail['fields']})
+
+
+class PatientListSerializer(serializers.ModelSerializer):
+    """Pacjent na liście - bez wizyt, notatek i podsumowania długoterminowego"""
+
+    class Meta:
+        model = Patient
+        fields = ['id', 'first_name', 'last_name', 'dob', 'gender', 'pesel']
+
 
 class VisitSimulationInputSerializer(serializers.Serializer):
     """Serializer dla danych wejściowych do symulacji tworzącej wizytę"""
     duration_sec = serializers.IntegerField(min_value=1, required=False, default=300, help_text="Długość symulacji w sekundach (domyślnie 300)")
     # opcjonalnie można podać datę wizyty w ISO lub zostanie użyta teraz
     visit_date = serializers.DateTimeField(required=False, allow_null=True)
+
+
+class VisitWindowLabelsSerializer(serializers.Serializer):
+    """Etykiety okien wizyty nadane przez terapeutę (jedna na punkt timeline, null - bez etykiety)"""
+    labels = serializers.ListField(
+        child=serializers.IntegerField(min_value=0, max_value=NUM_CLASSES - 1, allow_null=True),
+        help_text="Klasa okna: 0 Baseline, 1 Stress, 2 Amusement, 3 Meditation lub null"
+    )
+
+
+class SimilarVisitSerializer(serializers.ModelSerializer):
+    """Skrócony opis wizyty w wynikach wyszukiwania podobnych sesji"""
+    patient_name = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Visit
+        fields = [
+            'id', 'patient', 'patient_name', 'visit_date', 'total_duration_seconds',
+            'baseline_percentage', 'stress_percentage', 'amusement_percentage', 'meditation_percentage',
+        ]
+
+    def get_patient_name(self, obj):
+        return f"{obj.patient.first_name} {obj.patient.last_name}"
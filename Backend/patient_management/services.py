@@ -3,32 +3,177 @@ Serwisy do symulacji sesji i analizy AI
 """
 import os
 from typing import List, Dict, Any, Tuple
+from django.db import transaction
 from openai import OpenAI
 import numpy as np
 from stress_classification.data_simulator import generate_simulated_data
-from stress_classification.views import get_stress_service
+from stress_classification.head_adaptation import (
+    MIN_LABELLED_WINDOWS,
+    decode_features,
+    deserialize_head_state,
+    encode_features,
+)
+from stress_classification.ml_service import (
+    get_stress_service,
+    PATIENT_HEAD_ENABLED,
+    PATIENT_NORMALIZATION_ENABLED,
+    UNUSABLE_CLASS,
+    UNUSABLE_CLASS_NAME,
+)
+from stress_classification.normalization import ProfileCache, merge_statistics
+from .models import Patient, PatientClassifierHead, Visit, VisitFeatureCache
+
+# Profile normalizacji pacjentów trzymane w procesie (bez zapytania do bazy przy każdej klasyfikacji)
+_profile_cache = ProfileCache()
+
+# Wagi głów klasyfikatora pacjentów (None - pacjent bez głowy dla bieżącej wersji modelu)
+_head_cache = ProfileCache()
+
+
+def _load_normalization_profile(patient_id: int):
+    return Patient.objects.filter(pk=patient_id).values_list('normalization_profile', flat=True).first()
+
+
+def get_normalization_profile(patient_id: int):
+    """Zwraca profil normalizacji pacjenta z pamięci podręczną LRU (baza tylko przy braku wpisu)."""
+    return _profile_cache.get(patient_id, _load_normalization_profile)
+
+
+def invalidate_normalization_profile(patient_id: int):
+    _profile_cache.invalidate(patient_id)
+
+
+def update_normalization_profile(patient_id: int, statistics: Dict[str, Any]):
+    """
+    Dołącza statystyki nagrania do profilu pacjenta (przyrostowo, wzór Chana).
+    
+    Wiersz pacjenta jest blokowany na czas aktualizacji, aby równoległe wizyty nie nadpisały
+    swoich statystyk. Zwraca zaktualizowany profil.
+    """
+    with transaction.atomic():
+        patient = Patient.objects.select_for_update().only('id', 'normalization_profile').get(pk=patient_id)
+        profile = merge_statistics(patient.normalization_profile, statistics)
+        Patient.objects.filter(pk=patient_id).update(normalization_profile=profile)
+    _profile_cache.put(patient_id, profile)
+    return profile
+
+
+def _load_patient_head(patient_id: int):
+    row = PatientClassifierHead.objects.filter(
+        patient_id=patient_id, model_version=get_stress_service().model_version
+    ).values_list('weights', flat=True).first()
+    return deserialize_head_state(bytes(row)) if row is not None else None
+
+
+def get_patient_head(patient_id: int):
+    """Zwraca wagi głowy klasyfikatora pacjenta dla bieżącej wersji modelu (z pamięci podręcznej LRU)."""
+    return _head_cache.get(patient_id, _load_patient_head)
+
+
+def invalidate_patient_head(patient_id: int):
+    _head_cache.invalidate(patient_id)
+
+
+def save_feature_cache(visit: Visit, feature_cache: Dict[str, Any]):
+    """Zapisuje cechy okien wizyty (float16) do późniejszego douczania głowy pacjenta."""
+    features = feature_cache['features']
+    VisitFeatureCache.objects.update_or_create(
+        visit=visit,
+        defaults={
+            'model_version': feature_cache['model_version'],
+            'num_windows': features.shape[0],
+            'dimension': features.shape[1],
+            'features': encode_features(features),
+        }
+    )
+
+
+def labelled_window_features(patient_id: int, model_version: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Cechy i etykiety oznaczonych okien wszystkich wizyt pacjenta z cechami danej wersji modelu.
+    
+    Pomijane są okna bez etykiety oraz okna bez cech (odrzucone przez filtr jakości lub kaskadę).
+    """
+    rows = VisitFeatureCache.objects.filter(
+        visit__patient_id=patient_id, model_version=model_version, visit__window_labels__isnull=False
+    ).values_list('features', 'num_windows', 'dimension', 'visit__window_labels')
+    
+    all_features, all_labels = [], []
+    for data, num_windows, dimension, window_labels in rows:
+        features = decode_features(bytes(data), num_windows, dimension)
+        labels = np.array([-1 if label is None else label for label in window_labels[:num_windows]], dtype=int)
+        labelled = np.flatnonzero((labels >= 0) & np.isfinite(features[:len(labels)]).all(axis=1))
+        all_features.append(features[labelled])
+        all_labels.append(labels[labelled])
+    
+    if not all_features:
+        return np.empty((0, 0), dtype=np.float32), np.empty(0, dtype=int)
+    return np.concatenate(all_features), np.concatenate(all_labels)
+
+
+def adapt_patient_head(patient_id: int) -> Dict[str, Any]:
+    """
+    Douczanie głowy klasyfikatora pacjenta na oznaczonych oknach jego wizyt.
+    
+    Raises:
+        ValueError: za mało oznaczonych okien z cechami bieżącego modelu
+    """
+    stress_service = get_stress_service()
+    features, labels = labelled_window_features(patient_id, stress_service.model_version)
+    if len(labels) < MIN_LABELLED_WINDOWS:
+        raise ValueError(
+            f"Za mało oznaczonych okien z cechami bieżącego modelu ({len(labels)}, wymagane {MIN_LABELLED_WINDOWS})"
+        )
+    
+    weights, report = stress_service.adapt_head(features, labels)
+    PatientClassifierHead.objects.update_or_create(
+        patient_id=patient_id,
+        defaults={
+            'model_version': report['model_version'],
+            'weights': weights,
+            'labelled_windows': report['labelled_windows'],
+            'global_accuracy': report['global_accuracy'],
+            'adapted_accuracy': report['adapted_accuracy'],
+        }
+    )
+    invalidate_patient_head(patient_id)
+    return report
 
 
 def create_session_simulation(
-    duration_sec: int = 300
+    duration_sec: int = 300,
+    patient_id: int = None
 ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
     """
     Generuje symulowane dane sesji używając generate_simulated_data i klasyfikacji stresu.
     
     Args:
         duration_sec: Długość symulacji w sekundach (domyślnie 300)
+        patient_id: Pacjent, którego profil normalizacji (STRESS_PATIENT_NORMALIZATION)
+            i głowa klasyfikatora (STRESS_PATIENT_HEADS) zostaną użyte
     
     Returns:
         Tuple zawierający:
         - timeline_data: Lista słowników reprezentujących punkty czasowe
-        - metadata: Słownik z metadanymi (step_size, total_duration_seconds, procenty stanów)
+        - metadata: Słownik z metadanymi (step_size, total_duration_seconds, procenty stanów,
+          unusable_percentage, signal_quality_ratio, hrv_metrics, signal_statistics, session_embedding,
+          feature_cache, classifier_head)
     """
     # Generuj symulowane dane biometryczne
     acc, bvp, eda, temp = generate_simulated_data(duration_sec=duration_sec)
     
     # Użyj serwisu klasyfikacji stresu do analizy danych
     stress_service = get_stress_service()
-    classification_result = stress_service.classify(acc, bvp, eda, temp)
+    normalization_profile = None
+    if PATIENT_NORMALIZATION_ENABLED and patient_id is not None:
+        normalization_profile = get_normalization_profile(patient_id)
+    classifier_head = None
+    if PATIENT_HEAD_ENABLED and patient_id is not None:
+        classifier_head = get_patient_head(patient_id)
+    classification_result = stress_service.classify(
+        acc, bvp, eda, temp, normalization_profile=normalization_profile,
+        classifier_head=classifier_head, return_feature_cache=True
+    )
     
     # Przetwórz wyniki klasyfikacji na format timeline_data
     timeline = []
@@ -45,7 +190,17 @@ def create_session_simulation(
     for segment in segments:
         timestamp = segment.get('time_seconds', 0)  # Użyj time_seconds z segmentu
         class_id = segment.get('class_id', 0)  # Użyj class_id zamiast predicted_class
-        feeling = class_names[class_id] if class_id < len(class_names) else 'Baseline'
+        
+        # Okno odrzucone przez filtr jakości sygnału - brak poziomu stresu
+        if class_id == UNUSABLE_CLASS:
+            timeline.append({
+                "timestamp_seconds": int(timestamp),
+                "stress_level": None,
+                "feeling": UNUSABLE_CLASS_NAME
+            })
+            continue
+        
+        feeling = class_names[class_id] if 0 <= class_id < len(class_names) else 'Baseline'
         
         # Użyj stress_level z segmentu jeśli dostępny, w przeciwnym razie oblicz
         stress_level = segment.get('stress_level', 2)
@@ -75,16 +230,21 @@ def create_session_simulation(
         stress_percentage = 0.0
         amusement_percentage = 0.0
         meditation_percentage = 0.0
+        unusable_percentage = 0.0
     else:
         baseline_count = sum(1 for point in timeline if point['feeling'] == 'Baseline')
         stress_count = sum(1 for point in timeline if point['feeling'] == 'Stress')
         amusement_count = sum(1 for point in timeline if point['feeling'] == 'Amusement')
         meditation_count = sum(1 for point in timeline if point['feeling'] == 'Meditation')
+        unusable_count = sum(1 for point in timeline if point['feeling'] == UNUSABLE_CLASS_NAME)
         
         baseline_percentage = (baseline_count / total_points) * 100.0
         stress_percentage = (stress_count / total_points) * 100.0
         amusement_percentage = (amusement_count / total_points) * 100.0
         meditation_percentage = (meditation_count / total_points) * 100.0
+        unusable_percentage = (unusable_count / total_points) * 100.0
+    
+    signal_quality = metadata_classification.get('signal_quality') or {}
     
     # Przygotuj metadata
     metadata = {
@@ -93,12 +253,61 @@ def create_session_simulation(
         'baseline_percentage': baseline_percentage,
         'stress_percentage': stress_percentage,
         'amusement_percentage': amusement_percentage,
-        'meditation_percentage': meditation_percentage
+        'meditation_percentage': meditation_percentage,
+        'unusable_percentage': unusable_percentage,
+        'peak_stress_seconds': longest_stress_episode_seconds(timeline, step_size),
+        'signal_quality_ratio': signal_quality.get('mean_sqi'),
+        'hrv_metrics': classification_result.get('hrv'),
+        'signal_statistics': classification_result.get('signal_statistics'),
+        'session_embedding': classification_result.get('session_embedding'),
+        'feature_cache': classification_result.get('feature_cache'),
+        'classifier_head': metadata_classification.get('classifier_head')
     }
     
     return timeline, metadata
 
 
+def longest_stress_episode_seconds(timeline: List[Dict[str, Any]], step_size: float) -> float:
+    """Czas najdłuższego ciągu kolejnych punktów timeline z klasą Stress (w sekundach)."""
+    longest = current = 0
+    for point in timeline:
+        current = current + 1 if point.get('feeling') == 'Stress' else 0
+        longest = max(longest, current)
+    return longest * step_size
+
+
+def usable_stress_levels(timeline: List[Dict[str, Any]]) -> List[float]:
+    """Poziomy stresu z timeline z pominięciem okien o niskiej jakości sygnału (stress_level = None)."""
+    levels = (point.get('stress_level', 0) for point in timeline)
+    return [level for level in levels if level is not None]
+
+
+def format_hrv_inline(hrv_metrics: Dict[str, Any]) -> str:
+    """Zwraca krótki opis HRV wizyty do promptu analizy długoterminowej (pusty, gdy brak danych)."""
+    if not hrv_metrics or hrv_metrics.get('rmssd_ms') is None:
+        return ''
+    return f', HRV RMSSD: {hrv_metrics["rmssd_ms"]:.0f} ms, SDNN: {hrv_metrics.get("sdnn_ms") or 0:.0f} ms'
+
+
+def format_hrv_section(hrv_metrics: Dict[str, Any]) -> str:
+    """Zwraca sekcję promptu z metrykami HRV sesji (pusta, gdy brak danych)."""
+    if not hrv_metrics or hrv_metrics.get('rmssd_ms') is None:
+        return ''
+
+    def value(key, unit='', precision=1):
+        metric = hrv_metrics.get(key)
+        return f'{metric:.{precision}f}{unit}' if metric is not None else 'brak danych'
+
+    return f"""
+Zmienność rytmu serca (HRV) z sygnału BVP:
+- Średnie tętno: {value('mean_heart_rate_bpm', ' bpm')}
+- RMSSD: {value('rmssd_ms', ' ms')}
+- SDNN: {value('sdnn_ms', ' ms')}
+- pNN50: {value('pnn50', '%')}
+- LF/HF: {value('lf_hf_ratio', precision=2)}
+"""
+
+
 def analyze_long_term_progress(visits_data: List[Dict[str, Any]]) -> str:
     """
     Analizuje długoterminowe postępy pacjenta na podstawie wszystkich wizyt i sesji.
@@ -133,7 +342,7 @@ def analyze_long_term_progress(visits_data: List[Dict[str, Any]]) -> str:
 
             for session in visit_sessions:
                 timeline = session.get('timeline_data', [])
-                stress_levels = [point.get('stress_level', 0) for point in timeline]
+                stress_levels = usable_stress_levels(timeline)
                 visit_stats['stress_levels'].extend(stress_levels)
                 visit_stats['stress_percentage'] += session.get('stress_percentage', 0)
                 visit_stats['meditation_percentage'] += session.get('meditation_percentage', 0)
@@ -148,7 +357,7 @@ def analyze_long_term_progress(visits_data: List[Dict[str, Any]]) -> str:
         else:
             # Nowe podejście: wizyta zawiera bezpośrednio timeline_data i procenty
             timeline = visit.get('timeline_data') or visit.get('stress_history') or []
-            stress_levels = [point.get('stress_level', 0) for point in timeline] if isinstance(timeline, list) else []
+            stress_levels = usable_stress_levels(timeline) if isinstance(timeline, list) else []
             avg_stress = sum(stress_levels) / len(stress_levels) if stress_levels else 0
             num_sessions = 1 if timeline else 0
 
@@ -167,6 +376,7 @@ def analyze_long_term_progress(visits_data: List[Dict[str, Any]]) -> str:
             'amusement_percentage': visit_stats.get('amusement_percentage', 0),
             'psychologist_notes': visit.get('psychologist_notes', ''),
             'ai_summary': visit.get('ai_summary') or visit.get('ai_summary_story', ''),
+            'hrv_metrics': visit.get('hrv_metrics') or {},
             'num_sessions': num_sessions
         })
 
@@ -182,6 +392,7 @@ Historia wizyt:
                f' Stres: {v["stress_percentage"]:.1f}%,' +
                f' Medytacja: {v["meditation_percentage"]:.1f}%,' +
                f' Rozrywka: {v["amusement_percentage"]:.1f}%' +
+               format_hrv_inline(v["hrv_metrics"]) +
                (f'\\nNotatki psychologa: {v["psychologist_notes"]}' if v["psychologist_notes"] else '') +
                (f'\\nPodsumowanie AI: {v["ai_summary"]}' if v["ai_summary"] else '')
                for v in visits_summary])}
@@ -225,6 +436,7 @@ def ai_analysis_service(session_data: Dict[str, Any]) -> str:
             - stress_percentage: Procent Stress
             - amusement_percentage: Procent Amusement
             - meditation_percentage: Procent Meditation
+            - hrv_metrics: Metryki HRV sesji (opcjonalnie)
     
     Returns:
         Wygenerowana historia/podsumowanie sesji
@@ -241,7 +453,7 @@ def ai_analysis_service(session_data: Dict[str, Any]) -> str:
     total_duration = session_data.get('total_duration_seconds', 0)
     
     # Oblicz statystyki z timeline
-    stress_levels = [point.get('stress_level', 0) for point in timeline]
+    stress_levels = usable_stress_levels(timeline)
     feelings_distribution = {}
     for point in timeline:
         feeling = point.get('feeling', 'Baseline')
@@ -254,7 +466,7 @@ def ai_analysis_service(session_data: Dict[str, Any]) -> str:
     # Znajdź okresy wysokiego stresu
     high_stress_periods = []
     for i, point in enumerate(timeline):
-        if point.get('stress_level', 0) >= 7:
+        if (point.get('stress_level') or 0) >= 7:
             high_stress_periods.append({
                 'time': point.get('timestamp_seconds', 0),
                 'level': point.get('stress_level', 0),
@@ -271,18 +483,19 @@ Rozkład stanów emocjonalnych:
 - Stress: {session_data.get('stress_percentage', 0):.1f}%
 - Amusement: {session_data.get('amusement_percentage', 0):.1f}%
 - Meditation: {session_data.get('meditation_percentage', 0):.1f}%
+- Okna pominięte (niska jakość sygnału): {session_data.get('unusable_percentage') or 0:.1f}%
 
 Statystyki poziomu stresu:
 - Średni poziom: {avg_stress:.1f}/10
 - Maksymalny poziom: {max_stress}/10
 - Minimalny poziom: {min_stress}/10
-
+{format_hrv_section(session_data.get('hrv_metrics'))}
 Liczba punktów pomiarowych: {len(timeline)}
 
 Stwórz profesjonalne, narracyjne podsumowanie sesji w języku polskim, które:
 1. Opisuje ogólny przebieg sesji
 2. Wskazuje kluczowe momenty (szczególnie okresy wysokiego stresu)
-3. Interpretuje zmiany stanów emocjonalnych
+3. Interpretuje zmiany stanów emocjonalnych (oraz HRV, jeśli dostępne)
 4. Zawiera wnioski i obserwacje
 
 Odpowiedź powinna być napisana w formie ciągłej narracji, jak notatka psychologa po sesji."""
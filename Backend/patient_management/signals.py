@@ -1,7 +1,11 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
-from .models import Visit
-from .services import analyze_long_term_progress, ai_analysis_service
+from .aggregates import VISIT_FIELDS, apply_visit_change, instance_contribution, stored_contribution
+from .dashboard import invalidate_dashboard_summary
+from .models import Patient, Visit
+from .services import analyze_long_term_progress, ai_analysis_service, invalidate_normalization_profile
+from .similarity import index_visit, unindex_visit
 
 
 @receiver(post_save, sender=Visit)
@@ -26,7 +30,9 @@ def update_patient_long_term_analysis(sender, instance, created, **kwargs):
                 'baseline_percentage': instance.baseline_percentage or 0,
                 'stress_percentage': instance.stress_percentage or 0,
                 'amusement_percentage': instance.amusement_percentage or 0,
-                'meditation_percentage': instance.meditation_percentage or 0
+                'meditation_percentage': instance.meditation_percentage or 0,
+                'unusable_percentage': instance.unusable_percentage or 0,
+                'hrv_metrics': instance.hrv_metrics
             }
 
             ai_summary = ai_analysis_service(session_data)
@@ -54,6 +60,7 @@ def update_patient_long_term_analysis(sender, instance, created, **kwargs):
                 'stress_percentage': visit.stress_percentage,
                 'meditation_percentage': visit.meditation_percentage,
                 'amusement_percentage': visit.amusement_percentage,
+                'hrv_metrics': visit.hrv_metrics,
             })
         else:
             # Jeśli wizyta nie posiada danych timeline, pomiń ją w analizie długoterminowej
@@ -65,4 +72,68 @@ def update_patient_long_term_analysis(sender, instance, created, **kwargs):
         patient.long_term_summary = long_term_analysis
         patient.save(update_fields=['long_term_summary'])
     except Exception as e:
-        print(f"Błąd podczas generowania długoterminowej analizy pacjenta: {str(e)}")
\ No newline at end of file
+        print(f"Błąd podczas generowania długoterminowej analizy pacjenta: {str(e)}")
+
+
+@receiver(post_save, sender=Patient)
+def invalidate_patient_normalization_profile(sender, instance, **kwargs):
+    """Zapis pacjenta (np. edycja lub reset profilu w adminie) unieważnia profil w pamięci procesu."""
+    invalidate_normalization_profile(instance.pk)
+
+
+@receiver(post_save, sender=Visit)
+def update_similarity_index(sender, instance, update_fields=None, **kwargs):
+    """Dodaje embedding zapisanej wizyty do indeksu podobnych sesji (przyrostowo)."""
+    if update_fields is not None and 'session_embedding' not in update_fields:
+        return
+    index_visit(instance)
+
+
+@receiver(post_delete, sender=Visit)
+def remove_from_similarity_index(sender, instance, **kwargs):
+    unindex_visit(instance.pk)
+
+
+def _affects_stress_aggregate(update_fields):
+    return update_fields is None or bool({'patient_id', *VISIT_FIELDS} & set(update_fields))
+
+
+@receiver(pre_save, sender=Visit)
+def remember_stress_contribution(sender, instance, update_fields=None, using=None, **kwargs):
+    """
+    Zapamiętuje wkład wizyty do sum pacjenta sprzed zapisu (odejmowany w post_save).
+
+    Wiersz wizyty jest blokowany do końca transakcji zapisu (Visit.save), więc równoczesny
+    zapis tej samej wizyty odczyta wkład dopiero po zatwierdzeniu tego zapisu.
+    """
+    if _affects_stress_aggregate(update_fields):
+        lock = transaction.get_connection(using).in_atomic_block
+        instance._previous_stress_contribution = stored_contribution(instance.pk, lock=lock) if instance.pk else None
+
+
+@receiver(post_save, sender=Visit)
+def update_stress_aggregate(sender, instance, update_fields=None, **kwargs):
+    """Przyrostowa aktualizacja PatientStressAggregate (poprzedni wkład wizyty -> bieżący)."""
+    if not _affects_stress_aggregate(update_fields):
+        return
+    previous = instance.__dict__.pop('_previous_stress_contribution', None)
+    apply_visit_change(previous, instance_contribution(instance))
+
+
+@receiver(pre_delete, sender=Visit)
+def remember_deleted_stress_contribution(sender, instance, **kwargs):
+    instance._previous_stress_contribution = instance_contribution(instance)
+
+
+@receiver(post_delete, sender=Visit)
+def remove_from_stress_aggregate(sender, instance, **kwargs):
+    apply_visit_change(instance.__dict__.pop('_previous_stress_contribution', None), None)
+
+
+@receiver(post_save, sender=Visit)
+@receiver(post_delete, sender=Visit)
+@receiver(post_save, sender=Patient)
+@receiver(post_delete, sender=Patient)
+def invalidate_dashboard(sender, **kwargs):
+    """Zmiana wizyty lub pacjenta unieważnia podsumowanie panelu w cache."""
+    invalidate_dashboard_summary()
@@ -0,0 +1,81 @@
+"""
+Wyszukiwanie wizyt o podobnym przebiegu fizjologicznym (embeddingi sesji + indeks ANN).
+
+Indeks (stress_classification.embedding_index) jest jeden na proces i obejmuje embeddingi
+wygenerowane bieżącą wersją modelu. Przy pierwszym użyciu wczytywany jest z pliku w katalogu
+runtime serwisu, a gdy pliku brak lub pochodzi z innej wersji modelu - budowany z bazy.
+Zapis wizyty aktualizuje indeks przyrostowo (sygnały post_save / post_delete).
+"""
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from stress_classification.embedding_index import EmbeddingIndex
+from stress_classification.ml_service import get_stress_service
+from .models import Visit
+
+INDEX_FILENAME = 'session_embeddings.npz'
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def build_index(index: EmbeddingIndex) -> EmbeddingIndex:
+    """Buduje indeks z embeddingów wizyt zapisanych dla wersji modelu indeksu."""
+    rows = list(
+        Visit.objects.filter(embedding_model_version=index.model_version, session_embedding__isnull=False)
+        .values_list('id', 'session_embedding')
+    )
+    ids = [visit_id for visit_id, _ in rows]
+    vectors = np.array([vector for _, vector in rows], dtype=np.float32)
+    index.build(ids, vectors)
+    index.save()
+    return index
+
+
+def get_similarity_index() -> EmbeddingIndex:
+    """Zwraca indeks embeddingów bieżącego modelu (wczytany z pliku lub zbudowany z bazy)."""
+    global _index
+    service = get_stress_service()
+    index = _index
+    if index is not None and index.model_version == service.model_version:
+        index.refresh()
+        return index
+
+    with _index_lock:
+        if _index is None or _index.model_version != service.model_version:
+            index = EmbeddingIndex(service._get_runtime_dir() / INDEX_FILENAME, model_version=service.model_version)
+            if not index.load():
+                build_index(index)
+            _index = index
+        return _index
+
+
+def index_visit(visit: Visit):
+    """Dodaje (lub zastępuje) embedding wizyty w indeksie, jeśli pochodzi z bieżącego modelu."""
+    if not visit.session_embedding:
+        return
+    index = get_similarity_index()
+    if visit.embedding_model_version != index.model_version:
+        return
+    index.add(visit.id, np.asarray(visit.session_embedding, dtype=np.float32))
+
+
+def unindex_visit(visit_id: int):
+    """Usuwa wizytę z indeksu (jeśli proces go wczytał; wyniki i tak pomijają nieistniejące wizyty)."""
+    index = _index
+    if index is not None:
+        index.remove(visit_id)
+
+
+def find_similar_visits(visit: Visit, k: int = 10) -> Optional[List[Tuple[int, float]]]:
+    """
+    Zwraca do `k` par (id wizyty, podobieństwo) najbardziej podobnych wizyt (z pominięciem samej wizyty).
+
+    None, gdy wizyta nie ma embeddingu zgodnego z bieżącym modelem.
+    """
+    index = get_similarity_index()
+    if not visit.session_embedding or visit.embedding_model_version != index.model_version:
+        return None
+    return index.search(np.asarray(visit.session_embedding, dtype=np.float32), k=k, exclude=visit.id)
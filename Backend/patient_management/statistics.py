@@ -0,0 +1,96 @@
+"""
+Statystyki klas stresu liczone w bazie danych.
+
+Zapytania używają wyłącznie `values()` i agregatów, więc nie tworzą obiektów modeli
+i nie odczytują kolumn JSON wizyt (timeline, historia stresu, embedding).
+"""
+from django.db.models import CharField, Count, F, FloatField, Q, Sum, Value
+from django.db.models.functions import Coalesce, Concat, NullIf
+
+# Procenty klas wizyty (w kolejności zwracanej w `stress_classes`)
+STRESS_CLASS_FIELDS = (
+    'baseline_percentage',
+    'stress_percentage',
+    'amusement_percentage',
+    'meditation_percentage',
+    'unusable_percentage',
+)
+
+PATIENT_NAME = Concat('patient__first_name', Value(' '), 'patient__last_name', output_field=CharField())
+
+
+def filter_visits(visits, patient_id=None, date_from=None, date_to=None):
+    """Filtr wizyt po pacjencie i zakresie dat (date_from włącznie, date_to wyłącznie)."""
+    if patient_id is not None:
+        visits = visits.filter(patient_id=patient_id)
+    if date_from is not None:
+        visits = visits.filter(visit_date__gte=date_from)
+    if date_to is not None:
+        visits = visits.filter(visit_date__lt=date_to)
+    return visits
+
+
+def stress_classes(row, prefix=''):
+    """Słownik `stress_classes` odpowiedzi z wiersza zapytania (procenty zaokrąglone do 0.01)."""
+    return {field: round(row[prefix + field] or 0.0, 2) for field in STRESS_CLASS_FIELDS}
+
+
+def patient_stress_distribution(visits):
+    """
+    Średnie ważone czasem trwania procenty klas dla każdego pacjenta (jedno zapytanie GROUP BY).
+
+    Wizyty bez czasu trwania liczą się do liczby sesji, ale nie do średnich; brak procentu = 0.
+    """
+    weighted = Q(total_duration_seconds__gt=0)
+    total_weight = NullIf(Sum('total_duration_seconds', filter=weighted), 0)
+    averages = {
+        f'avg_{field}': Coalesce(
+            Sum(Coalesce(F(field), Value(0.0)) * F('total_duration_seconds'), filter=weighted, output_field=FloatField())
+            / total_weight,
+            Value(0.0),
+            output_field=FloatField(),
+        )
+        for field in STRESS_CLASS_FIELDS
+    }
+    rows = (
+        visits.annotate(patient_name=PATIENT_NAME)
+        .values('patient_id', 'patient_name')
+        .annotate(
+            total_sessions=Count('id'),
+            duration_seconds=Coalesce(Sum('total_duration_seconds'), 0),
+            **averages,
+        )
+        .order_by('patient_id')
+    )
+    return [
+        {
+            'patient_id': row['patient_id'],
+            'patient_name': row['patient_name'],
+            'total_sessions': row['total_sessions'],
+            'total_duration_seconds': row['duration_seconds'],
+            'stress_classes': stress_classes(row, prefix='avg_'),
+        }
+        for row in rows
+    ]
+
+
+def session_rows(visits):
+    """Wiersze sesji (bez kolumn JSON) posortowane po id - gotowe do paginacji kursorowej."""
+    return (
+        visits.annotate(patient_name=PATIENT_NAME)
+        .values('id', 'patient_id', 'patient_name', 'total_duration_seconds', 'visit_date', *STRESS_CLASS_FIELDS)
+        .order_by('id')
+    )
+
+
+def session_distribution(row):
+    """Wiersz sesji w formacie odpowiedzi (session_id pozostawione dla kompatybilności)."""
+    return {
+        'session_id': row['id'],
+        'patient_id': row['patient_id'],
+        'patient_name': row['patient_name'],
+        'visit_id': row['id'],
+        'duration_seconds': row['total_duration_seconds'] or 0,
+        'created_at': row['visit_date'].isoformat() if row['visit_date'] else None,
+        'stress_classes': stress_classes(row),
+    }
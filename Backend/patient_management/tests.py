@@ -1,3 +1,644 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+import threading
+from datetime import date
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from stress_classification.ml_service import get_stress_service
+from . import signals, similarity
+from .dashboard import invalidate_dashboard_summary
+from .endpoint_budgets import ENDPOINT_CASES, EndpointCase, api_routes, budget, run_endpoint_budgets
+from .aggregates import aggregated_stress_distribution, rebuild_patient_aggregates
+from .alerts import alert_visits
+from .benchmarks import seed_endpoint_data
+from .models import Patient, PatientClassifierHead, PatientStressAggregate, Visit, VisitFeatureCache
+from .statistics import patient_stress_distribution
+from .services import (
+    get_normalization_profile,
+    invalidate_normalization_profile,
+    invalidate_patient_head,
+    longest_stress_episode_seconds,
+    update_normalization_profile,
+)
+
+
+class AuthenticatedAPITestCase(TestCase):
+    """Klient API zalogowany jako lekarz i wspólne dane pacjentów."""
+
+    # Analiza AI w sygnałach wizyt zachowuje się jak bez klucza OpenAI (błąd logowany przez sygnał)
+    disable_ai_analysis = False
+
+    def setUp(self):
+        if self.disable_ai_analysis:
+            for target in ('analyze_long_term_progress', 'ai_analysis_service'):
+                patcher = mock.patch(f'patient_management.signals.{target}', side_effect=ValueError)
+                patcher.start()
+                self.addCleanup(patcher.stop)
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user(email='doctor@example.com', password='x'))
+
+    def create_patients(self):
+        """Pacjenci Anna Nowak i Jan Lis (bulk_create - bez sygnałów)."""
+        self.anna, self.jan = Patient.objects.bulk_create([
+            Patient(first_name='Anna', last_name='Nowak', dob=date(1985, 5, 5), gender='K', pesel='85050512345'),
+            Patient(first_name='Jan', last_name='Lis', dob=date(1980, 1, 1), gender='M', pesel='80010112345'),
+        ])
+
+
+class NormalizationProfileCacheTests(TestCase):
+    """Profil normalizacji pacjenta - przyrostowa aktualizacja i odczyt z pamięci procesu."""
+
+    def setUp(self):
+        self.patient = Patient.objects.create(
+            first_name='Jan', last_name='Kowalski', dob=date(1990, 1, 1), gender='M', pesel='90010112345'
+        )
+        invalidate_normalization_profile(self.patient.pk)
+
+    def test_profile_lookup_hits_database_once(self):
+        with self.assertNumQueries(1):
+            self.assertIsNone(get_normalization_profile(self.patient.pk))
+        with self.assertNumQueries(0):
+            self.assertIsNone(get_normalization_profile(self.patient.pk))
+
+    def test_update_merges_visits_and_refreshes_cache(self):
+        update_normalization_profile(self.patient.pk, {'count': 2, 'mean': [1.0], 'm2': [2.0]})
+        update_normalization_profile(self.patient.pk, {'count': 2, 'mean': [3.0], 'm2': [2.0]})
+
+        with self.assertNumQueries(0):
+            profile = get_normalization_profile(self.patient.pk)
+        self.assertEqual(profile, {'count': 4, 'mean': [2.0], 'm2': [8.0]})
+        self.patient.refresh_from_db()
+        self.assertEqual(self.patient.normalization_profile, profile)
+
+
+class SimilarVisitsViewTests(AuthenticatedAPITestCase):
+    """Wyszukiwanie podobnych wizyt przez indeks embeddingów sesji."""
+
+    def setUp(self):
+        super().setUp()
+        self.runtime_dir = tempfile.TemporaryDirectory()
+        self.env_patch = mock.patch.dict(os.environ, {'STRESS_RUNTIME_DIR': self.runtime_dir.name})
+        self.env_patch.start()
+        similarity._index = None
+        self.model_version = get_stress_service().model_version
+        self.create_patients()
+        self.patient = self.anna
+
+    def tearDown(self):
+        similarity._index = None
+        self.env_patch.stop()
+        self.runtime_dir.cleanup()
+
+    def create_visit(self, vector):
+        # Bez timeline sygnał analizy AI nie odpytuje OpenAI
+        return Visit.objects.create(
+            patient=self.patient, visit_date=timezone.now(),
+            session_embedding=list(vector), embedding_model_version=self.model_version,
+        )
+
+    def test_returns_nearest_visits_and_indexes_new_ones(self):
+        query = self.create_visit([1.0, 0.0, 0.0])
+        far = self.create_visit([0.0, 1.0, 0.0])
+        near = self.create_visit([0.9, 0.1, 0.0])
+
+        response = self.client.get(f'/api/visits/{query.id}/similar/?k=2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.data['results']], [near.id, far.id])
+        self.assertEqual(response.data['results'][0]['patient_name'], 'Anna Nowak')
+
+        # Wizyta zapisana po zbudowaniu indeksu trafia do niego przyrostowo
+        nearest = self.create_visit(np.array([1.0, 0.01, 0.0]))
+        response = self.client.get(f'/api/visits/{query.id}/similar/?k=1')
+        self.assertEqual(response.data['results'][0]['id'], nearest.id)
+
+    def test_rejects_invalid_k_and_visits_without_embedding(self):
+        visit = Visit.objects.create(patient=self.patient, visit_date=timezone.now())
+        self.assertEqual(self.client.get(f'/api/visits/{visit.id}/similar/?k=0').status_code, 400)
+        self.assertEqual(self.client.get(f'/api/visits/{visit.id}/similar/').status_code, 400)
+        self.assertEqual(self.client.get('/api/visits/999999/similar/').status_code, 404)
+
+
+class PatientHeadAdaptationTests(AuthenticatedAPITestCase):
+    """Douczanie głowy klasyfikatora pacjenta na oznaczonych oknach wizyt."""
+
+    disable_ai_analysis = True
+
+    def setUp(self):
+        super().setUp()
+        self.runtime_dir = tempfile.TemporaryDirectory()
+        self.env_patch = mock.patch.dict(os.environ, {'STRESS_RUNTIME_DIR': self.runtime_dir.name})
+        self.env_patch.start()
+        similarity._index = None
+        self.patient = Patient.objects.create(
+            first_name='Ewa', last_name='Lis', dob=date(1992, 2, 2), gender='K', pesel='92020212345'
+        )
+        invalidate_patient_head(self.patient.pk)
+
+    def tearDown(self):
+        invalidate_patient_head(self.patient.pk)
+        similarity._index = None
+        self.env_patch.stop()
+        self.runtime_dir.cleanup()
+
+    def simulate_visit(self):
+        response = self.client.post(
+            f'/api/visits/patient/{self.patient.pk}/simulate/', {'duration_sec': 1800}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.data
+
+    def test_labelled_windows_adapt_head_used_for_next_visits(self):
+        visit = self.simulate_visit()
+        cache = VisitFeatureCache.objects.get(visit_id=visit['visit']['id'])
+        self.assertEqual(len(bytes(cache.features)), cache.num_windows * cache.dimension * 2)
+
+        # Terapeuta oznacza wszystkie użyteczne okna jako medytację
+        labels = [None if point['stress_level'] is None else 3 for point in visit['timeline']]
+        response = self.client.put(f'/api/visits/{visit["visit"]["id"]}/labels/', {'labels': labels}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.post(f'/api/patients/{self.patient.pk}/adapt/')
+        self.assertEqual(response.status_code, 200)
+        self.assertGreaterEqual(response.data['adapted_accuracy'], response.data['global_accuracy'])
+        self.assertTrue(PatientClassifierHead.objects.filter(patient=self.patient).exists())
+
+        feelings = [point['feeling'] for point in self.simulate_visit()['timeline'] if point['stress_level'] is not None]
+        self.assertGreater(feelings.count('Meditation') / len(feelings), 0.9)
+
+        self.assertEqual(self.client.delete(f'/api/patients/{self.patient.pk}/adapt/').status_code, 204)
+        self.assertEqual(self.client.delete(f'/api/patients/{self.patient.pk}/adapt/').status_code, 404)
+
+    def test_rejects_invalid_labels_and_too_few_windows(self):
+        visit = Visit.objects.create(
+            patient=self.patient, visit_date=timezone.now(),
+            timeline_data=[{'timestamp_seconds': 0, 'stress_level': 2, 'feeling': 'Baseline'}] * 3,
+        )
+        url = f'/api/visits/{visit.id}/labels/'
+        self.assertEqual(self.client.put(url, {'labels': [0, 1]}, format='json').status_code, 400)
+        self.assertEqual(self.client.put(url, {'labels': [0, 7, None]}, format='json').status_code, 400)
+        self.assertEqual(self.client.put(url, {'labels': [0, 1, None]}, format='json').status_code, 200)
+        visit.refresh_from_db()
+        self.assertEqual(visit.window_labels, [0, 1, None])
+
+        self.assertEqual(self.client.post(f'/api/patients/{self.patient.pk}/adapt/').status_code, 400)
+        self.assertEqual(self.client.post('/api/patients/999999/adapt/').status_code, 404)
+
+
+class PaginatedListEndpointsTests(AuthenticatedAPITestCase):
+    """Listy pacjentów i wizyt - paginacja kursorowa, `fields=` oraz budżety zapytań i rozmiaru."""
+
+    # Budżet rozmiaru odpowiedzi listy na wizytę (bajty JSON) - bez osi czasu i tekstów AI
+    VISIT_ROW_BYTES_BUDGET = 600
+
+    def setUp(self):
+        super().setUp()
+        self.patients = Patient.objects.bulk_create([
+            Patient(first_name='Jan', last_name=f'Nowak{i}', dob=date(1980, 1, 1), gender='M',
+                    pesel=f'800101{i:05d}', long_term_summary='Podsumowanie ' * 200)
+            for i in range(3)
+        ])
+        timeline = [{'timestamp': float(i), 'predicted_class': 'Baseline', 'confidence': 0.9} for i in range(600)]
+        # bulk_create nie wysyła sygnałów (bez analizy AI)
+        Visit.objects.bulk_create([
+            Visit(patient=self.patients[i % 3], visit_date=timezone.now() - timezone.timedelta(hours=i),
+                  stress_percentage=float(i), timeline_data=timeline, ai_summary_story='Historia ' * 500)
+            for i in range(60)
+        ])
+
+    def test_visit_list_is_paginated_light_and_within_budgets(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/visits/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 50)
+        self.assertNotIn('timeline_data', response.data['results'][0])
+        self.assertNotIn('ai_summary_story', response.data['results'][0])
+        self.assertLess(len(response.content), 50 * self.VISIT_ROW_BYTES_BUDGET)
+
+        # Druga strona z kursora - bez powtórzeń, od najnowszej wizyty
+        second = self.client.get(response.data['next'])
+        ids = [row['id'] for row in response.data['results'] + second.data['results']]
+        self.assertEqual(len(set(ids)), 60)
+        self.assertIsNone(second.data['next'])
+        dates = [row['visit_date'] for row in response.data['results']]
+        self.assertEqual(dates, sorted(dates, reverse=True))
+
+    def test_fields_parameter_selects_subset(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/visits/?fields=id,patient,timeline_data&page_size=5')
+        self.assertEqual(set(response.data['results'][0]), {'id', 'patient', 'timeline_data'})
+        self.assertEqual(len(response.data['results'][0]['timeline_data']), 600)
+
+        response = self.client.get('/api/visits/?fields=id,unknown')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('fields', response.data)
+
+    def test_patient_list_excludes_visits_unless_requested(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/patients/')
+        self.assertEqual(set(response.data['results'][0]), {'id', 'first_name', 'last_name', 'dob', 'gender', 'pesel'})
+        self.assertLess(len(response.content), 1000)
+
+        # Zagnieżdżone wizyty jednym dodatkowym zapytaniem (prefetch), niezależnie od liczby pacjentów
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/patients/?fields=id,long_term_summary,visits')
+        self.assertEqual(sum(len(row['visits']) for row in response.data['results']), 60)
+
+
+class PatientVisitsPrefetchTests(AuthenticatedAPITestCase):
+    """Wizyty zagnieżdżone w pacjencie - stała liczba zapytań i odroczone ciężkie kolumny."""
+
+    def seed(self, patients, visits_per_patient):
+        created = Patient.objects.bulk_create([
+            Patient(first_name='Jan', last_name='Nowak', dob=date(1980, 1, 1), gender='M',
+                    pesel=f'{Patient.objects.count() + i:011d}')
+            for i in range(patients)
+        ])
+        Visit.objects.bulk_create([
+            Visit(patient=patient, visit_date=timezone.now(), timeline_data=[{'timestamp': 0.0}] * 100,
+                  stress_history={'summary': {'stress_percentage': 10.0}})
+            for patient in created for _ in range(visits_per_patient)
+        ])
+        return created[0]
+
+    def test_query_count_does_not_depend_on_patients_or_visits(self):
+        for patients, visits_per_patient in ((2, 1), (6, 5)):
+            patient = self.seed(patients, visits_per_patient)
+            with self.assertNumQueries(2):
+                self.client.get('/api/patients/?fields=id,first_name,visits')
+            with self.assertNumQueries(2):
+                response = self.client.get(f'/api/patients/{patient.id}/')
+            self.assertEqual(len(response.data['visits']), visits_per_patient)
+            with self.assertNumQueries(2):
+                response = self.client.get(f'/api/patients/{patient.id}/full/')
+            self.assertEqual(len(response.data['visits']), visits_per_patient)
+
+    def test_heavy_visit_columns_are_deferred_unless_requested(self):
+        patient = self.seed(1, 2)
+        response = self.client.get(f'/api/patients/{patient.id}/full/')
+        visit = response.data['visits'][0]
+        self.assertNotIn('timeline_data', visit)
+        self.assertEqual(visit['stress_history']['summary']['stress_percentage'], 10.0)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/patients/{patient.id}/full/?visit_fields=id,timeline_data')
+        self.assertEqual(set(response.data['visits'][0]), {'id', 'timeline_data'})
+        self.assertEqual(len(response.data['visits'][0]['timeline_data']), 100)
+
+        self.assertEqual(self.client.get(f'/api/patients/{patient.id}/full/?visit_fields=bogus').status_code, 400)
+        self.assertEqual(self.client.get(f'/api/patients/{patient.id}/?visit_fields=bogus').status_code, 400)
+
+
+class StressClassDistributionTests(AuthenticatedAPITestCase):
+    """Rozkład klas stresu - agregacja w bazie, filtry i paginacja sesji."""
+
+    def setUp(self):
+        super().setUp()
+        self.create_patients()
+        day = timezone.make_aware(timezone.datetime(2025, 3, 10, 12))
+        Visit.objects.bulk_create([
+            Visit(patient=self.anna, visit_date=day, total_duration_seconds=300, baseline_percentage=50.0,
+                  stress_percentage=50.0, timeline_data=[{'timestamp': 0.0}]),
+            Visit(patient=self.anna, visit_date=day + timezone.timedelta(days=1), total_duration_seconds=100,
+                  baseline_percentage=10.0, stress_percentage=None, unusable_percentage=90.0),
+            # Bez czasu trwania - liczy się do sesji, nie do średnich
+            Visit(patient=self.anna, visit_date=day + timezone.timedelta(days=2), stress_percentage=100.0),
+            Visit(patient=self.jan, visit_date=day, total_duration_seconds=60, meditation_percentage=100.0),
+        ])
+        # bulk_create omija sygnały - sumy pacjentów przeliczane jak poleceniem rebuild_stress_aggregates
+        rebuild_patient_aggregates()
+
+    def test_weighted_averages_are_computed_without_json_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/stress-class-distribution/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries), 2)
+        self.assertFalse(any('timeline_data' in query['sql'] for query in queries))
+
+        anna = response.data['patients'][0]
+        self.assertEqual((anna['patient_name'], anna['total_sessions'], anna['total_duration_seconds']), ('Anna Nowak', 3, 400))
+        self.assertEqual(anna['stress_classes'], {
+            'baseline_percentage': 40.0, 'stress_percentage': 37.5, 'amusement_percentage': 0.0,
+            'meditation_percentage': 0.0, 'unusable_percentage': 22.5,
+        })
+        self.assertEqual(response.data['summary'], {'total_patients': 2, 'total_sessions': 4})
+        session = response.data['sessions'][1]
+        self.assertEqual((session['patient_name'], session['duration_seconds']), ('Anna Nowak', 100))
+        self.assertEqual(session['stress_classes']['stress_percentage'], 0.0)
+
+    def test_filters_and_session_pagination(self):
+        response = self.client.get(f'/api/stress-class-distribution/?patient={self.anna.id}&date_from=2025-03-11&date_to=2025-03-12')
+        self.assertEqual([row['total_sessions'] for row in response.data['patients']], [2])
+        self.assertEqual(len(response.data['sessions']), 2)
+
+        response = self.client.get('/api/stress-class-distribution/?page_size=3')
+        self.assertEqual(len(response.data['sessions']), 3)
+        response = self.client.get(response.data['next'])
+        self.assertEqual([row['patient_name'] for row in response.data['sessions']], ['Jan Lis'])
+        self.assertIsNone(response.data['next'])
+
+        response = self.client.get('/api/stress-class-distribution/?date_from=wczoraj&patient=x')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {'date_from', 'patient'})
+
+
+class PatientStressAggregateTests(AuthenticatedAPITestCase):
+    """Sumy klas stresu pacjenta utrzymywane przyrostowo przy zmianach wizyt."""
+
+    disable_ai_analysis = True
+
+    def setUp(self):
+        super().setUp()
+        self.create_patients()
+
+    def assertMatchesVisits(self):
+        self.assertEqual(aggregated_stress_distribution(), patient_stress_distribution(Visit.objects.all()))
+
+    def test_create_update_move_and_delete_visits(self):
+        first = Visit.objects.create(patient=self.anna, visit_date=timezone.now(), total_duration_seconds=300,
+                                     stress_percentage=40.0, baseline_percentage=60.0)
+        second = Visit.objects.create(patient=self.anna, visit_date=timezone.now(), total_duration_seconds=100,
+                                      stress_percentage=100.0)
+        self.assertMatchesVisits()
+        self.assertEqual(aggregated_stress_distribution()[0]['stress_classes']['stress_percentage'], 55.0)
+
+        second.total_duration_seconds = 0
+        second.save()
+        self.assertMatchesVisits()
+
+        # Zapis pól spoza sum nie dotyka agregatu
+        with CaptureQueriesContext(connection) as queries:
+            first.save(update_fields=['psychologist_notes'])
+        self.assertFalse(any('patientstressaggregate' in query['sql'] for query in queries))
+
+        first.patient = self.jan
+        first.save()
+        self.assertMatchesVisits()
+        self.assertEqual(PatientStressAggregate.objects.get(pk=self.anna.pk).total_sessions, 1)
+
+        second.delete()
+        self.assertMatchesVisits()
+        self.assertEqual([row['patient_name'] for row in aggregated_stress_distribution()], ['Jan Lis'])
+
+    def test_rebuild_command_restores_sums_after_bulk_changes(self):
+        Visit.objects.create(patient=self.anna, visit_date=timezone.now(), total_duration_seconds=60, stress_percentage=10.0)
+        Visit.objects.filter(patient=self.anna).update(stress_percentage=90.0)
+        Visit.objects.bulk_create([Visit(patient=self.jan, visit_date=timezone.now(), total_duration_seconds=30)])
+        self.assertNotEqual(aggregated_stress_distribution(), patient_stress_distribution(Visit.objects.all()))
+
+        call_command('rebuild_stress_aggregates', stdout=io.StringIO())
+        self.assertMatchesVisits()
+
+        # Pacjent bez wiersza agregatu jest przeliczany przy pierwszym zapisie wizyty
+        PatientStressAggregate.objects.filter(pk=self.jan.pk).delete()
+        Visit.objects.create(patient=self.jan, visit_date=timezone.now(), total_duration_seconds=30, meditation_percentage=50.0)
+        self.assertMatchesVisits()
+
+
+@skipUnless(connection.vendor == 'postgresql', "Blokada wiersza (SELECT ... FOR UPDATE) sprawdzana na PostgreSQL")
+class ConcurrentVisitSaveTests(TransactionTestCase):
+    """Równoczesne zapisy tej samej wizyty w osobnych połączeniach nie psują sum pacjenta."""
+
+    def setUp(self):
+        for target in ('analyze_long_term_progress', 'ai_analysis_service'):
+            patcher = mock.patch(f'patient_management.signals.{target}', side_effect=ValueError)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patient = Patient.objects.create(first_name='Anna', last_name='Nowak', dob=date(1985, 5, 5), gender='K',
+                                         pesel='85050512345')
+        self.visit = Visit.objects.create(patient=patient, visit_date=timezone.now(), total_duration_seconds=100,
+                                          stress_percentage=10.0)
+
+    def save_in_thread(self, stress_percentage):
+        def run():
+            try:
+                visit = Visit.objects.get(pk=self.visit.pk)
+                visit.stress_percentage = stress_percentage
+                visit.save()
+            finally:
+                connections.close_all()
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        return thread
+
+    def test_second_save_waits_for_first_before_reading_previous_contribution(self):
+        first_read, release_first = threading.Event(), threading.Event()
+        original = signals.stored_contribution
+
+        def pausing_stored_contribution(visit_id, lock=False):
+            contribution = original(visit_id, lock=lock)
+            if threading.current_thread() is first:
+                # Pierwszy zapis odczytał poprzedni wkład, ale jeszcze nie zapisał wizyty
+                first_read.set()
+                release_first.wait(5)
+            return contribution
+
+        with mock.patch.object(signals, 'stored_contribution', side_effect=pausing_stored_contribution):
+            first = self.save_in_thread(50.0)
+            self.assertTrue(first_read.wait(5))
+            second = self.save_in_thread(90.0)
+            # Bez blokady drugi zapis odczytałby ten sam poprzedni wkład i zakończył się przed pierwszym
+            second.join(0.5)
+            self.assertTrue(second.is_alive())
+            release_first.set()
+            first.join(5)
+            second.join(5)
+
+        self.assertEqual(Visit.objects.get(pk=self.visit.pk).stress_percentage, 90.0)
+        self.assertEqual(aggregated_stress_distribution(), patient_stress_distribution(Visit.objects.all()))
+
+
+class DashboardSummaryTests(AuthenticatedAPITestCase):
+    """Podsumowanie panelu - agregaty w bazie, cache i unieważnianie przy zmianie wizyt."""
+
+    disable_ai_analysis = True
+
+    def setUp(self):
+        super().setUp()
+        invalidate_dashboard_summary()
+        self.create_patients()
+        now = timezone.now()
+        Visit.objects.bulk_create([
+            Visit(patient=self.anna, visit_date=now - timezone.timedelta(days=1), stress_percentage=80.0),
+            Visit(patient=self.anna, visit_date=now - timezone.timedelta(days=60), stress_percentage=20.0),
+            # Starszy format - procent stresu tylko w podsumowaniu historii
+            Visit(patient=self.jan, visit_date=now - timezone.timedelta(days=2), stress_history={
+                'summary': {'stress_percentage': 50.0},
+                'stress_moments': [{'timestamp': '2025-01-01T10:00:00', 'duration_seconds': 30, 'confidence': 0.9}],
+            }),
+        ])
+
+    def tearDown(self):
+        invalidate_dashboard_summary()
+
+    def test_summary_is_aggregated_and_small(self):
+        response = self.client.get('/api/dashboard/summary/')
+        self.assertEqual(response.status_code, 200)
+        summary = response.data
+        self.assertEqual((summary['total_patients'], summary['recent_visits']), (2, 2))
+        self.assertEqual(summary['average_stress_percentage'], 50.0)
+        self.assertEqual(summary['patients_needing_attention'], 1)
+        self.assertEqual([visit['patient_name'] for visit in summary['high_stress_visits']], ['Anna Nowak'])
+        self.assertEqual(summary['recent_stress_moments'][0]['patient_name'], 'Jan Lis')
+        self.assertLess(len(response.content), 1024)
+
+    def test_summary_is_cached_until_visits_change(self):
+        self.client.get('/api/dashboard/summary/')
+        with self.assertNumQueries(0):
+            self.client.get('/api/dashboard/summary/')
+
+        Visit.objects.create(patient=self.jan, visit_date=timezone.now(), stress_percentage=90.0)
+        response = self.client.get('/api/dashboard/summary/')
+        self.assertEqual(response.data['patients_needing_attention'], 2)
+        self.assertEqual(response.data['high_stress_visits'][0]['patient_name'], 'Jan Lis')
+
+
+def seed_calm_visits(patient, start, count=5000):
+    """Wizyty bez alertów (co godzinę od `start`) i odświeżone statystyki planisty."""
+    Visit.objects.bulk_create([
+        Visit(patient=patient, visit_date=start + timezone.timedelta(hours=i), stress_percentage=5.0)
+        for i in range(count)
+    ])
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE patient_management_visit')
+
+
+class StressAlertsTests(AuthenticatedAPITestCase):
+    """Alerty stresu - progi, kolejność po severity, paginacja i użycie indeksów częściowych."""
+
+    def setUp(self):
+        super().setUp()
+        self.create_patients()
+        day = timezone.make_aware(timezone.datetime(2025, 3, 10, 12))
+        self.high, self.peak, self.calm, self.old = Visit.objects.bulk_create([
+            Visit(patient=self.anna, visit_date=day, stress_percentage=90.0, peak_stress_seconds=30.0),
+            Visit(patient=self.jan, visit_date=day, stress_percentage=10.0, peak_stress_seconds=300.0),
+            Visit(patient=self.jan, visit_date=day, stress_percentage=20.0, peak_stress_seconds=20.0),
+            Visit(patient=self.anna, visit_date=day - timezone.timedelta(days=30), stress_percentage=60.0),
+        ])
+
+    def test_alerts_are_filtered_and_ordered_by_severity(self):
+        response = self.client.get('/api/alerts/')
+        self.assertEqual(response.status_code, 200)
+        rows = response.data['results']
+        # 300 s / 120 s = 2.5 > 90% / 50% = 1.8 > 60% / 50% = 1.2
+        self.assertEqual([row['visit_id'] for row in rows], [self.peak.id, self.high.id, self.old.id])
+        self.assertEqual(rows[0]['severity'], 2.5)
+        self.assertEqual(rows[1]['patient_name'], 'Anna Nowak')
+
+        response = self.client.get('/api/alerts/', {'min_stress': 80, 'min_peak_seconds': 1000, 'date_from': '2025-03-10'})
+        self.assertEqual([row['visit_id'] for row in response.data['results']], [self.high.id])
+
+    def test_alerts_are_paginated_with_cursor(self):
+        first = self.client.get('/api/alerts/', {'page_size': 2})
+        self.assertEqual(len(first.data['results']), 2)
+        second = self.client.get(first.data['next'])
+        self.assertEqual([row['visit_id'] for row in second.data['results']], [self.old.id])
+        self.assertIsNone(second.data['next'])
+
+    def test_invalid_thresholds_are_rejected(self):
+        response = self.client.get('/api/alerts/', {'min_stress': 'abc', 'min_peak_seconds': '-5', 'date_to': 'wczoraj'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {'min_stress', 'min_peak_seconds', 'date_to'})
+
+    @skipUnless(connection.vendor == 'postgresql', "Plan zapytania sprawdzany dla planisty PostgreSQL")
+    def test_alert_query_uses_partial_indexes(self):
+        # Wolumen, przy którym alerty są rzadkie - planista wybiera indeksy na podstawie statystyk
+        day = timezone.make_aware(timezone.datetime(2025, 3, 1))
+        seed_calm_visits(self.jan, day)
+        alerts = alert_visits(date_from=day, date_to=day + timezone.timedelta(days=30))
+        plan = alerts.explain()
+        self.assertIn('visit_stress_date_idx', plan)
+        self.assertIn('visit_peak_stress_date_idx', plan)
+
+    def test_longest_stress_episode(self):
+        timeline = [{'feeling': feeling} for feeling in ('Stress', 'Baseline', 'Stress', 'Stress', 'Stress', 'Amusement')]
+        self.assertEqual(longest_stress_episode_seconds(timeline, 10.0), 30.0)
+        self.assertEqual(longest_stress_episode_seconds([], 10.0), 0.0)
+
+
+class VisitCalendarTests(AuthenticatedAPITestCase):
+    """Filtry wizyt po pacjencie i zakresie dat oraz lekka lista kalendarza."""
+
+    def setUp(self):
+        super().setUp()
+        self.create_patients()
+        march = timezone.make_aware(timezone.datetime(2025, 3, 31, 23, 30))
+        self.march, self.april, self.other = Visit.objects.bulk_create([
+            Visit(patient=self.anna, visit_date=march, stress_percentage=40.0, timeline_data=[{'timestamp': 0.0}]),
+            Visit(patient=self.anna, visit_date=march + timezone.timedelta(hours=1), stress_percentage=10.0),
+            Visit(patient=self.jan, visit_date=march, stress_percentage=70.0),
+        ])
+
+    def test_list_is_filtered_by_patient_and_dates(self):
+        response = self.client.get('/api/visits/', {'patient': self.anna.id, 'date_from': '2025-03-01', 'date_to': '2025-03-31'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([visit['id'] for visit in response.data['results']], [self.march.id])
+
+        response = self.client.get('/api/visits/', {'patient': 'anna', 'date_from': '1 marca'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {'patient', 'date_from'})
+
+    def test_calendar_returns_light_rows_in_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/visits/calendar/', {'date_from': '2025-03-01', 'date_to': '2025-03-31'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            sorted((visit['patient_name'], visit['stress_percentage']) for visit in response.data['results']),
+            [('Anna Nowak', 40.0), ('Jan Lis', 70.0)],
+        )
+        self.assertEqual(set(response.data['results'][0]), {'id', 'patient', 'patient_name', 'visit_date', 'stress_percentage'})
+        visit_queries = [query['sql'] for query in queries if 'patient_management_visit' in query['sql']]
+        self.assertEqual(len(visit_queries), 1)
+        self.assertNotIn('timeline_data', visit_queries[0])
+
+    @skipUnless(connection.vendor == 'postgresql', "Plan zapytania sprawdzany dla planisty PostgreSQL")
+    def test_patient_month_uses_composite_index(self):
+        start = timezone.make_aware(timezone.datetime(2025, 3, 1))
+        seed_calm_visits(self.jan, start - timezone.timedelta(days=365))
+        visits = Visit.objects.filter(patient_id=self.anna.id, visit_date__gte=start, visit_date__lt=start + timezone.timedelta(days=31))
+        self.assertIn('visit_patient_date_idx', visits.order_by('-visit_date').explain())
+
+
+class PatientEndpointBudgetTests(TestCase):
+    """Budżety zapytań, wierszy, rozmiaru i czasu wszystkich endpointów (wolumen z ENDPOINT_BUDGET_*)."""
+    num_patients = int(os.getenv('ENDPOINT_BUDGET_PATIENTS', '50'))
+    num_visits = int(os.getenv('ENDPOINT_BUDGET_VISITS', '1000'))
+
+    def setUp(self):
+        # Symulacja i douczanie zapisują indeks embeddingów i głowy pacjentów w katalogu runtime
+        self.runtime_dir = tempfile.TemporaryDirectory()
+        self.env_patch = mock.patch.dict(os.environ, {'STRESS_RUNTIME_DIR': self.runtime_dir.name})
+        self.env_patch.start()
+        similarity._index = None
+        self.context = seed_endpoint_data(self.num_patients, self.num_visits)
+
+    def tearDown(self):
+        invalidate_dashboard_summary()
+        similarity._index = None
+        self.env_patch.stop()
+        self.runtime_dir.cleanup()
+
+    def test_every_route_has_a_budget(self):
+        self.assertEqual(api_routes() - {case.route for case in ENDPOINT_CASES}, set())
+
+    def test_endpoints_stay_within_budget(self):
+        results = run_endpoint_budgets(self.context)
+        violations = [f"{result['method']} {result['path']}: {'; '.join(result['violations'])}" for result in results if result['violations']]
+        self.assertEqual(violations, [])
+
+    def test_heavy_columns_on_list_exceed_budget(self):
+        case = EndpointCase('visit-list', 'get', '/api/visits/?fields=id,timeline_data', budget(1, 51, 100000, 1.0))
+        result, = run_endpoint_budgets(self.context, [case])
+        self.assertEqual(result['heavy_columns'], ['timeline_data'])
+        self.assertEqual(len(result['violations']), 1)
@@ -6,7 +6,12 @@ from .views import (
     PatientWithVisitsView,
     CreateSessionSimulationView,
     AIAnalysisServiceView,
-    StressClassDistributionView
+    StressClassDistributionView,
+    SimilarVisitsView,
+    VisitWindowLabelsView,
+    PatientHeadAdaptationView,
+    DashboardSummaryView,
+    StressAlertsView
 )
 
 router = DefaultRouter()
@@ -18,7 +23,12 @@ urlpatterns = [
     # Specyficzne ścieżki muszą być przed routerem, aby uniknąć konfliktów
     path('visits/patient/<int:patient_id>/simulate/', CreateSessionSimulationView.as_view(), name='create-visit-simulation'),
     path('visits/<int:visit_id>/analyze/', AIAnalysisServiceView.as_view(), name='ai-analysis-service'),
+    path('visits/<int:visit_id>/similar/', SimilarVisitsView.as_view(), name='similar-visits'),
+    path('visits/<int:visit_id>/labels/', VisitWindowLabelsView.as_view(), name='visit-window-labels'),
+    path('patients/<int:patient_id>/adapt/', PatientHeadAdaptationView.as_view(), name='patient-head-adaptation'),
     path('patients/<int:pk>/full/', PatientWithVisitsView.as_view(), name='patient-with-visits'),
+    path('dashboard/summary/', DashboardSummaryView.as_view(), name='dashboard-summary'),
+    path('alerts/', StressAlertsView.as_view(), name='stress-alerts'),
     path('stress-class-distribution/', StressClassDistributionView.as_view(), name='stress-class-distribution'),
     path('', include(router.urls)),
 ]
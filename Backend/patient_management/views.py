@@ -1,43 +1,248 @@
 from rest_framework import viewsets
+from rest_framework.decorators import action
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
-from drf_spectacular.utils import extend_schema, OpenApiExample
+from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiExample, OpenApiParameter
 from django.contrib.auth import get_user_model
-from collections import defaultdict
+from django.db.models import Prefetch
+from rest_framework.exceptions import ValidationError
 
-from .models import Patient, Visit
-
-User = get_user_model()
+from .models import Patient, PatientClassifierHead, Visit
+from .pagination import AlertCursorPagination, PatientCursorPagination, SessionCursorPagination, VisitCursorPagination
 from .serializers import (
+    PatientListSerializer,
     PatientSerializer,
+    SimilarVisitSerializer,
+    VISIT_CALENDAR_COLUMNS,
+    VisitCalendarSerializer,
+    VisitListSerializer,
     VisitSerializer,
     VisitSimulationInputSerializer,
+    VisitWindowLabelsSerializer,
+)
+from .services import (
+    adapt_patient_head,
+    ai_analysis_service,
+    create_session_simulation,
+    invalidate_patient_head,
+    save_feature_cache,
+    update_normalization_profile,
 )
-from .services import create_session_simulation, ai_analysis_service
+from .similarity import find_similar_visits
+from .aggregates import aggregated_stress_distribution
+from .alerts import ALERT_PEAK_STRESS_SECONDS, ALERT_STRESS_PERCENTAGE, alert_row, alert_visits
+from .dashboard import DASHBOARD_CACHE_TTL, get_dashboard_summary
+from .statistics import PATIENT_NAME, filter_visits, patient_stress_distribution, session_distribution, session_rows
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime, timedelta
+import time
+
+User = get_user_model()
+
+FIELDS_PARAMETER = OpenApiParameter(
+    name='fields', type=str, required=False,
+    description="Lista pól odpowiedzi oddzielonych przecinkami (domyślnie na liście - pola bez ciężkich danych)"
+)
+VISIT_FIELDS_PARAMETER = OpenApiParameter(
+    name='visit_fields', type=str, required=False,
+    description="Pola wizyt zagnieżdżonych w pacjencie (domyślnie bez timeline_data i window_labels)"
+)
+VISIT_FILTER_PARAMETERS = [
+    OpenApiParameter(name='patient', type=int, required=False, description="ID pacjenta"),
+    OpenApiParameter(name='date_from', type=str, required=False, description="Początek zakresu dat wizyt (ISO 8601)"),
+    OpenApiParameter(name='date_to', type=str, required=False, description="Koniec zakresu dat wizyt (ISO 8601)"),
+]
+
+
+def requested_fields(request, name='fields'):
+    """Lista pól z parametru zapytania `name` (oddzielone przecinkami) lub None dla odczytu bez parametru."""
+    if request is None or request.method != 'GET':
+        return None
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    return [field.strip() for field in value.split(',') if field.strip()]
+
+
+def parse_date_bound(value, end=False):
+    """
+    Granica zakresu dat z parametru zapytania (data lub data z czasem w ISO 8601).
+
+    Sama data jako koniec zakresu obejmuje cały dzień (zwracany jest początek dnia następnego).
+    """
+    try:
+        # Najpierw sama data - parse_datetime przyjmuje również "RRRR-MM-DD" (jako północ)
+        day = parse_date(value)
+        moment = None if day else parse_datetime(value)
+    except ValueError:
+        moment = day = None
+    if moment is None and day is None:
+        raise ValidationError(f"Nieprawidłowa data: {value}")
+    if day is not None:
+        moment = datetime.combine(day + timedelta(days=1) if end else day, datetime.min.time())
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def visit_filters(request):
+    """Filtry wizyt z parametrów `patient`, `date_from`, `date_to` (ValidationError przy błędnych)."""
+    filters = {}
+    errors = {}
+    patient = request.query_params.get('patient')
+    if patient:
+        if patient.isdigit():
+            filters['patient_id'] = int(patient)
+        else:
+            errors['patient'] = ["Oczekiwano ID pacjenta"]
+    for name, end in (('date_from', False), ('date_to', True)):
+        value = request.query_params.get(name)
+        if value:
+            try:
+                filters[name] = parse_date_bound(value, end=end)
+            except ValidationError as error:
+                errors[name] = error.detail
+    if errors:
+        raise ValidationError(errors)
+    return filters
+
+
+def positive_number(request, name, default):
+    """Dodatnia liczba z parametru zapytania `name` (domyślna przy braku parametru)."""
+    value = request.query_params.get(name)
+    if not value:
+        return default
+    try:
+        number = float(value)
+    except ValueError:
+        number = None
+    if number is None or not number > 0 or number == float('inf'):
+        raise ValidationError({name: ["Oczekiwano liczby większej od zera"]})
+    return number
+
+
+def optimize_queryset(queryset, serializer, extra_columns=()):
+    """
+    Ogranicza zapytanie do kolumn używanych przez serializer i pobiera relacje zagnieżdżone
+    jednym zapytaniem na relację (Prefetch z tym samym ograniczeniem kolumn).
+
+    Liczba zapytań nie zależy od liczby wierszy, a ciężkie kolumny JSON nieobecne
+    w odpowiedzi nie są odczytywane z bazy.
+    """
+    serializer = getattr(serializer, 'child', serializer)
+    model = queryset.model
+    columns = {field.name for field in model._meta.concrete_fields}
+    relations = {field.name: field for field in model._meta.related_objects}
+    sources = {field.source for field in serializer.fields.values()}
 
-class PatientViewSet(viewsets.ModelViewSet):
+    queryset = queryset.only(*((sources | set(extra_columns)) & columns))
+    for name, field in serializer.fields.items():
+        relation = relations.get(field.source)
+        if relation is not None:
+            related = optimize_queryset(relation.related_model.objects.all(), field, [relation.field.name])
+            queryset = queryset.prefetch_related(Prefetch(field.source, queryset=related))
+    return queryset
+
+
+class SparseFieldsViewSetMixin:
+    """
+    Lista z lekkim serializerem (`list_serializer_class`) i parametrem `fields=` dla odczytu.
+
+    Z `fields=` odpowiedź zawiera wyłącznie wskazane pola pełnego serializera, a zapytanie
+    pobiera z bazy tylko odpowiadające im kolumny (plus kolumny sortowania paginacji).
+    """
+    list_serializer_class = None
+
+    def requested_fields(self):
+        return requested_fields(getattr(self, 'request', None))
+
+    def get_serializer_class(self):
+        if self.action == 'list' and self.list_serializer_class and self.requested_fields() is None:
+            return self.list_serializer_class
+        return super().get_serializer_class()
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.requested_fields()
+        if fields is not None:
+            kwargs['fields'] = fields
+        return super().get_serializer(*args, **kwargs)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action not in ('list', 'retrieve'):
+            return queryset
+        ordering = [name.lstrip('-') for name in getattr(self.paginator, 'ordering', ())]
+        return optimize_queryset(queryset, self.get_serializer(), ordering)
+
+
+@extend_schema_view(
+    list=extend_schema(parameters=[FIELDS_PARAMETER, VISIT_FIELDS_PARAMETER]),
+    retrieve=extend_schema(parameters=[FIELDS_PARAMETER, VISIT_FIELDS_PARAMETER]),
+)
+class PatientViewSet(SparseFieldsViewSetMixin, viewsets.ModelViewSet):
     queryset = Patient.objects.all()
     serializer_class = PatientSerializer
+    list_serializer_class = PatientListSerializer
+    pagination_class = PatientCursorPagination
 
+    def get_serializer(self, *args, **kwargs):
+        visit_fields = requested_fields(getattr(self, 'request', None), 'visit_fields')
+        if visit_fields is not None and self.get_serializer_class() is PatientSerializer:
+            kwargs['visit_fields'] = visit_fields
+        return super().get_serializer(*args, **kwargs)
 
-class VisitViewSet(viewsets.ModelViewSet):
+
+@extend_schema_view(
+    list=extend_schema(parameters=[FIELDS_PARAMETER, *VISIT_FILTER_PARAMETERS]),
+    retrieve=extend_schema(parameters=[FIELDS_PARAMETER]),
+)
+class VisitViewSet(SparseFieldsViewSetMixin, viewsets.ModelViewSet):
     queryset = Visit.objects.all()
     serializer_class = VisitSerializer
+    list_serializer_class = VisitListSerializer
+    pagination_class = VisitCursorPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        # Filtry pacjenta i zakresu dat - zakres po indeksie (patient_id, visit_date)
+        if self.action in ('list', 'calendar'):
+            queryset = filter_visits(queryset, **visit_filters(self.request))
+        return queryset
+
+    @extend_schema(
+        summary="Wizyty do kalendarza",
+        description="Lekka lista wizyt (id, pacjent, data, procent stresu) z filtrami patient, date_from, date_to "
+                    "(date_to włącznie dla samej daty). Paginacja kursorowa jak na liście wizyt.",
+        parameters=VISIT_FILTER_PARAMETERS,
+        responses=VisitCalendarSerializer(many=True),
+    )
+    @action(detail=False, methods=['get'])
+    def calendar(self, request):
+        visits = self.get_queryset().annotate(patient_name=PATIENT_NAME).only(*VISIT_CALENDAR_COLUMNS)
+        page = self.paginate_queryset(visits)
+        return self.get_paginated_response(VisitCalendarSerializer(page, many=True).data)
 
 
 class PatientWithVisitsView(APIView):
     serializer_class = PatientSerializer
 
+    @extend_schema(parameters=[FIELDS_PARAMETER, VISIT_FIELDS_PARAMETER], responses=PatientSerializer)
     def get(self, request, pk):
         try:
-            patient = Patient.objects.get(pk=pk)
+            serializer = self.serializer_class(
+                fields=requested_fields(request), visit_fields=requested_fields(request, 'visit_fields')
+            )
+        except ValidationError as error:
+            return Response(error.detail, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            patient = optimize_queryset(Patient.objects.all(), serializer).get(pk=pk)
         except Patient.DoesNotExist:
             return Response({"detail": "Not found"}, status=status.HTTP_404_NOT_FOUND)
-        serializer = self.serializer_class(patient)
+        serializer.instance = patient
         return Response(serializer.data)
 
 
@@ -96,7 +301,7 @@ class CreateSessionSimulationView(APIView):
         duration_sec = data.get('duration_sec', 300)
         
         # Generuj timeline_data używając generate_simulated_data i klasyfikacji
-        timeline_data, metadata = create_session_simulation(duration_sec=duration_sec)
+        timeline_data, metadata = create_session_simulation(duration_sec=duration_sec, patient_id=patient.id)
 
         # Utwórz wizytę przypisaną do pacjenta
         visit_date = data.get('visit_date') or timezone.now()
@@ -109,8 +314,22 @@ class CreateSessionSimulationView(APIView):
             stress_percentage=metadata['stress_percentage'],
             amusement_percentage=metadata['amusement_percentage'],
             meditation_percentage=metadata['meditation_percentage'],
+            unusable_percentage=metadata['unusable_percentage'],
+            peak_stress_seconds=metadata['peak_stress_seconds'],
+            signal_quality_ratio=metadata['signal_quality_ratio'],
+            hrv_metrics=metadata['hrv_metrics'],
+            session_embedding=(metadata['session_embedding'] or {}).get('vector'),
+            embedding_model_version=(metadata['session_embedding'] or {}).get('model_version'),
             timeline_data=timeline_data
         )
+        
+        # Sygnały wizyty zasilają profil normalizacji pacjenta dla kolejnych wizyt
+        if metadata['signal_statistics']:
+            update_normalization_profile(patient.id, metadata['signal_statistics'])
+        
+        # Cechy okien do douczania głowy klasyfikatora pacjenta po oznaczeniu okien
+        if metadata['feature_cache']:
+            save_feature_cache(visit, metadata['feature_cache'])
 
         # Zwróć wizytę wraz z timeline
         response_serializer = VisitSerializer(visit)
@@ -171,7 +390,9 @@ class AIAnalysisServiceView(APIView):
             'baseline_percentage': visit.baseline_percentage,
             'stress_percentage': visit.stress_percentage,
             'amusement_percentage': visit.amusement_percentage,
-            'meditation_percentage': visit.meditation_percentage
+            'meditation_percentage': visit.meditation_percentage,
+            'unusable_percentage': visit.unusable_percentage,
+            'hrv_metrics': visit.hrv_metrics
         }
 
         try:
@@ -196,6 +417,178 @@ class AIAnalysisServiceView(APIView):
             )
 
 
+class SimilarVisitsView(APIView):
+    """
+    Endpoint do wyszukiwania wizyt (wszystkich pacjentów) o podobnym przebiegu fizjologicznym.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    MAX_K = 50
+    
+    @extend_schema(
+        summary="Znajdź podobne wizyty",
+        description="""
+        Zwraca k wizyt najbardziej podobnych do wskazanej na podstawie embeddingu sesji
+        (uśrednione cechy modelu klasyfikacji, podobieństwo cosinusowe, indeks przybliżony IVF).
+        
+        Parametry:
+        - visit_id: ID wizyty (w URL)
+        - k: liczba wyników (domyślnie 10, maksymalnie 50)
+        """,
+        parameters=[OpenApiParameter('k', int, description='Liczba wyników (1-50)')],
+        responses={
+            200: {'description': 'Lista podobnych wizyt z podobieństwem'},
+            400: {'description': 'Nieprawidłowe k lub wizyta bez embeddingu bieżącego modelu'},
+            404: {'description': 'Wizyta nie istnieje'},
+        }
+    )
+    def get(self, request, visit_id):
+        try:
+            visit = Visit.objects.only('id', 'session_embedding', 'embedding_model_version').get(pk=visit_id)
+        except Visit.DoesNotExist:
+            return Response(
+                {"detail": f"Visit o ID {visit_id} nie istnieje"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        try:
+            k = int(request.query_params.get('k', 10))
+        except ValueError:
+            k = 0
+        if not 1 <= k <= self.MAX_K:
+            return Response(
+                {"detail": f"Parametr k musi być liczbą od 1 do {self.MAX_K}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        start = time.perf_counter()
+        neighbours = find_similar_visits(visit, k)
+        search_ms = (time.perf_counter() - start) * 1000
+        if neighbours is None:
+            return Response(
+                {"detail": "Wizyta nie ma embeddingu sesji z bieżącego modelu."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        similarity = dict(neighbours)
+        visits = Visit.objects.select_related('patient').in_bulk(list(similarity))
+        results = []
+        for neighbour_id, score in neighbours:
+            if neighbour_id in visits:
+                results.append({
+                    **SimilarVisitSerializer(visits[neighbour_id]).data,
+                    'similarity': round(score, 4),
+                })
+        
+        return Response({
+            'visit_id': visit.id,
+            'k': k,
+            'search_ms': round(search_ms, 3),
+            'results': results,
+        }, status=status.HTTP_200_OK)
+
+
+class VisitWindowLabelsView(APIView):
+    """
+    Endpoint do oznaczania okien wizyty przez terapeutę (dane do douczania głowy pacjenta).
+    """
+    permission_classes = [IsAuthenticated]
+    
+    @extend_schema(
+        summary="Oznacz okna wizyty",
+        description="""
+        Zapisuje etykiety okien wizyty - jedna etykieta na punkt timeline
+        (0 Baseline, 1 Stress, 2 Amusement, 3 Meditation lub null dla okien bez etykiety).
+        """,
+        request=VisitWindowLabelsSerializer,
+        responses={
+            200: {'description': 'Etykiety zapisane'},
+            400: {'description': 'Nieprawidłowe etykiety lub liczba etykiet różna od liczby okien'},
+            404: {'description': 'Wizyta nie istnieje'},
+        }
+    )
+    def put(self, request, visit_id):
+        try:
+            visit = Visit.objects.only('id', 'timeline_data').get(pk=visit_id)
+        except Visit.DoesNotExist:
+            return Response(
+                {"detail": f"Visit o ID {visit_id} nie istnieje"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        serializer = VisitWindowLabelsSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        labels = serializer.validated_data['labels']
+        num_windows = len(visit.timeline_data or [])
+        if len(labels) != num_windows:
+            return Response(
+                {"detail": f"Liczba etykiet ({len(labels)}) różni się od liczby okien wizyty ({num_windows})"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # update() zamiast save() - zmiana etykiet nie uruchamia ponownej analizy AI wizyty
+        Visit.objects.filter(pk=visit.pk).update(window_labels=labels)
+        return Response({
+            'visit_id': visit.id,
+            'labelled_windows': sum(label is not None for label in labels),
+        }, status=status.HTTP_200_OK)
+
+
+class PatientHeadAdaptationView(APIView):
+    """
+    Endpoint do douczania głowy klasyfikatora na oznaczonych oknach wizyt pacjenta.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    @extend_schema(
+        summary="Dostosuj klasyfikator do pacjenta",
+        description="""
+        Douczanie samej głowy klasyfikatora na zapisanych cechach (float16) oznaczonych okien
+        wszystkich wizyt pacjenta. Kolejne wizyty pacjenta są klasyfikowane douczoną głową.
+        
+        Zwraca raport: liczba okien, dokładność głowy globalnej i douczonej na oknach
+        walidacyjnych oraz czas treningu.
+        """,
+        request=None,
+        responses={
+            200: {'description': 'Głowa douczona - raport treningu'},
+            400: {'description': 'Za mało oznaczonych okien'},
+            404: {'description': 'Pacjent nie istnieje'},
+        }
+    )
+    def post(self, request, patient_id):
+        if not Patient.objects.filter(pk=patient_id).exists():
+            return Response(
+                {"detail": f"Patient o ID {patient_id} nie istnieje"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        try:
+            report = adapt_patient_head(patient_id)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_200_OK)
+    
+    @extend_schema(
+        summary="Przywróć klasyfikator globalny dla pacjenta",
+        responses={
+            204: {'description': 'Głowa pacjenta usunięta'},
+            404: {'description': 'Pacjent nie ma douczonej głowy'},
+        }
+    )
+    def delete(self, request, patient_id):
+        deleted, _ = PatientClassifierHead.objects.filter(patient_id=patient_id).delete()
+        invalidate_patient_head(patient_id)
+        if not deleted:
+            return Response(
+                {"detail": f"Patient o ID {patient_id} nie ma douczonej głowy klasyfikatora"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
 class StressClassDistributionView(APIView):
     """
     Endpoint do obliczania procentowego udziału klas stresu dla każdego pacjenta i każdej sesji.
@@ -209,7 +602,7 @@ class StressClassDistributionView(APIView):
         
         Zwraca:
         - patients: Lista pacjentów z agregowanymi procentami klas stresu
-        - sessions: Lista wszystkich sesji z procentami klas stresu
+        - sessions: Strona listy sesji z procentami klas stresu (paginacja kursorowa: next / previous)
         
         Klasy stresu:
         - Baseline
@@ -217,8 +610,17 @@ class StressClassDistributionView(APIView):
         - Amusement
         - Meditation
         
-        Procenty są obliczane jako średnie ważone na podstawie czasu trwania sesji.
+        Dodatkowo unusable_percentage - odsetek okien pominiętych z powodu niskiej jakości sygnału.
+        
+        Procenty są obliczane jako średnie ważone na podstawie czasu trwania sesji. Bez filtra dat
+        odczytywane są sumy pacjentów utrzymywane przyrostowo (PatientStressAggregate).
+        Filtry (opcjonalne): patient, date_from, date_to (data lub data z czasem; date_to włącznie dla samej daty).
         """,
+        parameters=[
+            *VISIT_FILTER_PARAMETERS,
+            OpenApiParameter(name='page_size', type=int, required=False, description="Liczba sesji na stronie (domyślnie 100, maks. 1000)"),
+            OpenApiParameter(name='cursor', type=str, required=False, description="Kursor strony sesji (z pola next / previous)"),
+        ],
         responses={
             200: {
                 'description': 'Sukces - zwraca rozkład klas stresu',
@@ -234,7 +636,8 @@ class StressClassDistributionView(APIView):
                                     'baseline_percentage': 45.2,
                                     'stress_percentage': 25.8,
                                     'amusement_percentage': 15.0,
-                                    'meditation_percentage': 14.0
+                                    'meditation_percentage': 14.0,
+                                    'unusable_percentage': 0.0
                                 }
                             }
                         ],
@@ -248,13 +651,17 @@ class StressClassDistributionView(APIView):
                                     'baseline_percentage': 40.0,
                                     'stress_percentage': 30.0,
                                     'amusement_percentage': 20.0,
-                                    'meditation_percentage': 10.0
+                                    'meditation_percentage': 10.0,
+                                    'unusable_percentage': 0.0
                                 }
                             }
-                        ]
+                        ],
+                        'next': None,
+                        'previous': None,
                     }
                 }
-            }
+            },
+            400: {'description': 'Nieprawidłowy filtr'},
         }
     )
     def get(self, request):
@@ -263,109 +670,125 @@ class StressClassDistributionView(APIView):
         
         Oblicza procentowy udział klas stresu dla każdego pacjenta i każdej sesji.
         """
-        # Pobierz wszystkie wizyty (każda wizyta ma pacjenta)
-        visits = Visit.objects.select_related('patient').all()
-        
-        # Struktury do przechowywania danych
-        patients_data = defaultdict(lambda: {
-            'patient_id': None,
-            'patient_name': '',
-            'total_sessions': 0,
-            'total_duration_seconds': 0,
-            'weighted_baseline': 0.0,
-            'weighted_stress': 0.0,
-            'weighted_amusement': 0.0,
-            'weighted_meditation': 0.0,
-            'total_weight': 0.0
-        })
-        
-        sessions_list = []
-        
-        # Przetwórz każdą sesję
-        for visit in visits:
-            patient = visit.patient
-            patient_id = patient.id
-            patient_name = f"{patient.first_name} {patient.last_name}"
-
-            # Pobierz procenty z wizyty (jeśli są null, użyj 0)
-            baseline = visit.baseline_percentage or 0.0
-            stress = visit.stress_percentage or 0.0
-            amusement = visit.amusement_percentage or 0.0
-            meditation = visit.meditation_percentage or 0.0
-
-            # Czas trwania wizyty (używany jako waga)
-            duration = visit.total_duration_seconds or 0
-
-            # Dodaj dane wizyty do listy (nazwa pola session_id pozostawiona dla kompatybilności)
-            sessions_list.append({
-                'session_id': visit.id,
-                'patient_id': patient_id,
-                'patient_name': patient_name,
-                'visit_id': visit.id,
-                'duration_seconds': duration,
-                'created_at': visit.visit_date.isoformat() if visit.visit_date else None,
-                'stress_classes': {
-                    'baseline_percentage': round(baseline, 2),
-                    'stress_percentage': round(stress, 2),
-                    'amusement_percentage': round(amusement, 2),
-                    'meditation_percentage': round(meditation, 2)
-                }
-            })
-
-            # Agreguj dane dla pacjenta (średnia ważona)
-            patient_data = patients_data[patient_id]
-            patient_data['patient_id'] = patient_id
-            patient_data['patient_name'] = patient_name
-            patient_data['total_sessions'] += 1
-            patient_data['total_duration_seconds'] += duration
-
-            # Oblicz średnią ważoną
-            if duration > 0:
-                patient_data['weighted_baseline'] += baseline * duration
-                patient_data['weighted_stress'] += stress * duration
-                patient_data['weighted_amusement'] += amusement * duration
-                patient_data['weighted_meditation'] += meditation * duration
-                patient_data['total_weight'] += duration
-        
-        # Przygotuj listę pacjentów z obliczonymi procentami
-        patients_list = []
-        for patient_id, patient_data in patients_data.items():
-            total_weight = patient_data['total_weight']
-            
-            # Oblicz średnie ważone procenty
-            if total_weight > 0:
-                baseline_avg = patient_data['weighted_baseline'] / total_weight
-                stress_avg = patient_data['weighted_stress'] / total_weight
-                amusement_avg = patient_data['weighted_amusement'] / total_weight
-                meditation_avg = patient_data['weighted_meditation'] / total_weight
-            else:
-                baseline_avg = 0.0
-                stress_avg = 0.0
-                amusement_avg = 0.0
-                meditation_avg = 0.0
-            
-            patients_list.append({
-                'patient_id': patient_data['patient_id'],
-                'patient_name': patient_data['patient_name'],
-                'total_sessions': patient_data['total_sessions'],
-                'total_duration_seconds': patient_data['total_duration_seconds'],
-                'stress_classes': {
-                    'baseline_percentage': round(baseline_avg, 2),
-                    'stress_percentage': round(stress_avg, 2),
-                    'amusement_percentage': round(amusement_avg, 2),
-                    'meditation_percentage': round(meditation_avg, 2)
-                }
-            })
-        
-        # Sortuj listy
-        patients_list.sort(key=lambda x: x['patient_id'])
-        sessions_list.sort(key=lambda x: x['session_id'])
+        try:
+            filters = visit_filters(request)
+        except ValidationError as error:
+            return Response(error.detail, status=status.HTTP_400_BAD_REQUEST)
+        visits = filter_visits(Visit.objects.all(), **filters)
+
+        # Bez zakresu dat - odczyt bieżących sum z PatientStressAggregate, z zakresem - agregacja wizyt
+        if 'date_from' in filters or 'date_to' in filters:
+            patients_list = patient_stress_distribution(visits)
+        else:
+            patients_list = aggregated_stress_distribution(filters.get('patient_id'))
+
+        paginator = SessionCursorPagination()
+        page = paginator.paginate_queryset(session_rows(visits), request, view=self)
         
         return Response({
             'patients': patients_list,
-            'sessions': sessions_list,
+            'sessions': [session_distribution(row) for row in page],
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
             'summary': {
                 'total_patients': len(patients_list),
-                'total_sessions': len(sessions_list)
+                'total_sessions': sum(patient['total_sessions'] for patient in patients_list)
             }
         }, status=status.HTTP_200_OK)
+
+
+class DashboardSummaryView(APIView):
+    """
+    Endpoint z podsumowaniem panelu (liczniki, średni stres, najnowsze alerty).
+    """
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        summary="Podsumowanie panelu",
+        description=f"""
+        Statystyki panelu liczone w bazie danych zamiast pobierania wszystkich pacjentów i wizyt:
+        - total_patients: liczba pacjentów
+        - recent_visits: wizyty z ostatnich 30 dni
+        - average_stress_percentage: średni procent stresu wizyt (null, gdy brak danych)
+        - patients_needing_attention: pacjenci z wizytą o stresie powyżej 50%
+        - high_stress_visits: do 5 najnowszych wizyt o stresie powyżej 50%
+        - recent_stress_moments: do 5 najnowszych momentów stresu z historii wizyt
+
+        Wynik jest przechowywany w cache do {DASHBOARD_CACHE_TTL} s i unieważniany przy zmianie wizyt lub pacjentów.
+        """,
+        responses={200: {'description': 'Podsumowanie panelu'}},
+    )
+    def get(self, request):
+        return Response(get_dashboard_summary(), status=status.HTTP_200_OK)
+
+
+class StressAlertsView(APIView):
+    """
+    Endpoint z wizytami przekraczającymi progi stresu, od najpoważniejszych.
+    """
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        summary="Alerty stresu",
+        description=f"""
+        Wizyty, w których procent stresu >= min_stress lub najdłuższy nieprzerwany epizod stresu
+        >= min_peak_seconds, posortowane malejąco po severity (większy ze stosunków wartości do progu),
+        a następnie po dacie wizyty. Paginacja kursorowa (next / previous).
+
+        Domyślne progi: {ALERT_STRESS_PERCENTAGE}% oraz {ALERT_PEAK_STRESS_SECONDS} s
+        (zmienne środowiskowe ALERT_STRESS_PERCENTAGE, ALERT_PEAK_STRESS_SECONDS).
+        Filtry (opcjonalne): patient, date_from, date_to (data lub data z czasem; date_to włącznie dla samej daty).
+        """,
+        parameters=[
+            OpenApiParameter(name='min_stress', type=float, required=False, description="Próg procentu stresu"),
+            OpenApiParameter(name='min_peak_seconds', type=float, required=False, description="Próg najdłuższego epizodu stresu (s)"),
+            *VISIT_FILTER_PARAMETERS,
+            OpenApiParameter(name='page_size', type=int, required=False, description="Liczba alertów na stronie (domyślnie 50, maks. 200)"),
+            OpenApiParameter(name='cursor', type=str, required=False, description="Kursor strony (z pola next / previous)"),
+        ],
+        responses={
+            200: {
+                'description': 'Strona alertów',
+                'examples': {
+                    'application/json': {
+                        'results': [
+                            {
+                                'visit_id': 12,
+                                'patient_id': 1,
+                                'patient_name': 'Jan Kowalski',
+                                'visit_date': '2025-03-10T09:30:00+00:00',
+                                'stress_percentage': 72.5,
+                                'peak_stress_seconds': 90.0,
+                                'severity': 1.45,
+                            }
+                        ],
+                        'next': None,
+                        'previous': None,
+                    }
+                }
+            },
+            400: {'description': 'Nieprawidłowy próg lub filtr'},
+        }
+    )
+    def get(self, request):
+        errors = {}
+        thresholds = {}
+        for name, default in (('min_stress', ALERT_STRESS_PERCENTAGE), ('min_peak_seconds', ALERT_PEAK_STRESS_SECONDS)):
+            try:
+                thresholds[name] = positive_number(request, name, default)
+            except ValidationError as error:
+                errors.update(error.detail)
+        try:
+            filters = visit_filters(request)
+        except ValidationError as error:
+            errors.update(error.detail)
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        paginator = AlertCursorPagination()
+        page = paginator.paginate_queryset(alert_visits(**thresholds, **filters), request, view=self)
+        return Response({
+            'results': [alert_row(row) for row in page],
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
+        }, status=status.HTTP_200_OK)
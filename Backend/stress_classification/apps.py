@@ -1,3 +1,5 @@
+import os
+
 from django.apps import AppConfig
 
 
@@ -5,3 +7,9 @@ class StressClassificationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'stress_classification'
 
+    def ready(self):
+        # Gunicorn (preload_app) ustawia STRESS_EAGER_LOAD, aby wagi załadować w procesie
+        # master przed forkiem workerów; komendy manage.py nie płacą kosztu ładowania modelu
+        if os.getenv('STRESS_EAGER_LOAD', 'False') == 'True':
+            from .ml_service import preload_stress_service
+            preload_stress_service()
@@ -0,0 +1,192 @@
+"""
+Autotuning parametrów inferencji (batch size i liczba wątków torch) przy starcie serwisu.
+
+Dla każdej kombinacji batch size x liczba wątków intra-op wykonywany jest krótki
+benchmark na syntetycznych oknach. Najszybsza konfiguracja dla danej maszyny
+i liczby workerów gunicorna jest zapisywana w lokalnym pliku cache, dzięki czemu
+kolejne starty nie powtarzają pomiarów. Przy pustym cache pomiar wykonuje tylko jeden
+proces (blokada pliku) - pozostałe workery czekają na jego wynik, zamiast mierzyć
+jednocześnie na tych samych rdzeniach i zapisać zafałszowane wyniki.
+"""
+import contextlib
+import json
+import os
+import platform
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import torch
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows (brak flock)
+    fcntl = None
+
+# --- KONFIGURACJA AUTOTUNINGU ---
+AUTOTUNE_BATCH_SIZES = (16, 32, 64, 128)
+AUTOTUNE_SYNTHETIC_WINDOWS = 256   # Liczba syntetycznych okien w benchmarku
+AUTOTUNE_REPEATS = 3               # Liczba powtórzeń (bierzemy najlepszy czas)
+CACHE_VERSION = 1
+
+
+def get_worker_count() -> int:
+    """Zwraca liczbę procesów workerów współdzielących maszynę (WEB_CONCURRENCY jak w gunicornie)."""
+    try:
+        return max(1, int(os.getenv('WEB_CONCURRENCY', '1')))
+    except ValueError:
+        return 1
+
+
+def candidate_thread_counts(worker_count: int) -> List[int]:
+    """Zwraca kandydatów liczby wątków intra-op, tak by workery nie przekroczyły liczby rdzeni."""
+    cores = os.cpu_count() or 1
+    max_threads = max(1, cores // worker_count)
+    return sorted({1, max(1, max_threads // 2), max_threads})
+
+
+def host_signature(model_path: Path, worker_count: int) -> Dict:
+    """Opisuje maszynę i model - zmiana któregokolwiek pola unieważnia zapisany wynik."""
+    stat = model_path.stat()
+    return {
+        'cache_version': CACHE_VERSION,
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count() or 1,
+        'worker_count': worker_count,
+        'torch_version': torch.__version__,
+        'model_size': stat.st_size,
+        'model_mtime': int(stat.st_mtime),
+    }
+
+
+def load_cached_result(cache_path: Path, signature: Dict) -> Optional[Dict]:
+    """Zwraca zapisany wynik autotuningu, jeśli pasuje do sygnatury maszyny."""
+    try:
+        with open(cache_path) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if cached.get('signature') != signature:
+        return None
+    return cached
+
+
+def save_result(cache_path: Path, result: Dict):
+    """Zapisuje wynik autotuningu (atomowo, bo kilka workerów może startować równocześnie)."""
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_suffix(f'.{os.getpid()}.tmp')
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump(result, f, indent=2)
+        os.replace(tmp_path, cache_path)
+    finally:
+        # Po nieudanym zapisie nie zostawiamy częściowego pliku tymczasowego
+        tmp_path.unlink(missing_ok=True)
+
+
+@contextlib.contextmanager
+def cache_lock(cache_path: Path):
+    """
+    Blokada wyłączna (flock) na pliku obok cache, współdzielona przez procesy workerów.
+
+    Gdy nie da się jej założyć (brak fcntl, katalog tylko do odczytu), autotuning
+    działa bez blokady jak dotychczas.
+    """
+    lock_file = None
+    if fcntl is not None:
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            lock_file = open(cache_path.with_suffix('.lock'), 'a')
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        except OSError:
+            if lock_file is not None:
+                lock_file.close()
+            lock_file = None
+    try:
+        yield
+    finally:
+        if lock_file is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+
+def benchmark_config(model: torch.nn.Module, inputs: torch.Tensor, batch_size: int,
+                     num_threads: int, repeats: int = AUTOTUNE_REPEATS) -> float:
+    """Mierzy przepustowość (okna/s) modelu dla danej konfiguracji."""
+    torch.set_num_threads(num_threads)
+    best_time = float('inf')
+
+    with torch.no_grad():
+        # Rozgrzewka - pierwsze wywołanie inicjalizuje kernele
+        model(inputs[:batch_size])
+
+        for _ in range(repeats):
+            start = time.perf_counter()
+            for i in range(0, len(inputs), batch_size):
+                model(inputs[i:i + batch_size])
+            best_time = min(best_time, time.perf_counter() - start)
+
+    return len(inputs) / best_time
+
+
+def autotune(model: torch.nn.Module, model_path: Path, cache_path: Path, device: torch.device,
+             num_channels: int, seq_len: int, force: bool = False) -> Dict:
+    """
+    Wybiera najszybszą kombinację batch size x liczba wątków dla tej maszyny.
+
+    Returns:
+        Słownik z wybraną konfiguracją ('batch_size', 'num_threads'), wynikami
+        wszystkich kandydatów oraz źródłem wyniku ('cache' lub 'benchmark').
+    """
+    worker_count = get_worker_count()
+    signature = host_signature(model_path, worker_count)
+
+    # Workery startujące równocześnie czekają na pierwszy pomiar i odczytują go z cache
+    with cache_lock(cache_path):
+        if not force:
+            cached = load_cached_result(cache_path, signature)
+            if cached is not None:
+                return {**cached, 'source': 'cache'}
+
+        return _run_autotune(model, cache_path, device, num_channels, seq_len, worker_count, signature)
+
+
+def _run_autotune(model: torch.nn.Module, cache_path: Path, device: torch.device, num_channels: int,
+                  seq_len: int, worker_count: int, signature: Dict) -> Dict:
+    """Mierzy wszystkie kombinacje kandydatów i zapisuje najszybszą w cache."""
+    original_threads = torch.get_num_threads()
+    generator = torch.Generator().manual_seed(0)
+    inputs = torch.randn(AUTOTUNE_SYNTHETIC_WINDOWS, num_channels, seq_len, generator=generator).to(device)
+
+    candidates = []
+    try:
+        for num_threads in candidate_thread_counts(worker_count):
+            for batch_size in AUTOTUNE_BATCH_SIZES:
+                throughput = benchmark_config(model, inputs, batch_size, num_threads)
+                candidates.append({
+                    'batch_size': batch_size,
+                    'num_threads': num_threads,
+                    'windows_per_second': round(throughput, 1),
+                })
+    finally:
+        torch.set_num_threads(original_threads)
+
+    best = max(candidates, key=lambda c: c['windows_per_second'])
+    result = {
+        'batch_size': best['batch_size'],
+        'num_threads': best['num_threads'],
+        'windows_per_second': best['windows_per_second'],
+        'candidates': candidates,
+        'signature': signature,
+        'tuned_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+    try:
+        save_result(cache_path, result)
+    except OSError:
+        # Brak zapisu cache nie blokuje startu - wynik i tak zostanie użyty w tym procesie
+        pass
+
+    return {**result, 'source': 'benchmark'}
@@ -0,0 +1,708 @@
+"""
+Benchmarki serwisu klasyfikacji stresu.
+
+Każdy benchmark zwraca słownik z wynikami (gotowy do zapisu jako JSON) i jest dostępny
+z linii poleceń przez `python manage.py stress_benchmark <nazwa>`.
+"""
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import numpy as np
+import pandas as pd
+import torch
+
+from .data_simulator import generate_calibration_windows, generate_simulated_data
+from .cascade import BASELINE_CLASS, CALIBRATION_QUANTILES, compute_gate_features
+from .embedding_index import EmbeddingIndex
+from .features import compute_window_features
+from .hrv import compute_session_hrv, HRV_BUDGET_DURATION_SEC, HRV_TIME_BUDGET_SEC
+from .shadow import SHADOW_CPU_BUDGET
+from .signal_quality import compute_signal_quality
+from .smoothing import default_transition_matrix, smooth_predictions
+from .ml_service import (
+    StressClassificationService,
+    build_classifier,
+    load_classifier,
+    segment_data,
+    CASCADE_AGREEMENT_TARGET,
+    CLASS_NAMES,
+    COARSE_STEP_SEC,
+    NUM_CHANNELS,
+    SEQ_LEN,
+    SQI_THRESHOLD,
+    STEP_SEC,
+    TARGET_RATE,
+    WINDOW_SEC,
+)
+
+MEMORY_FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+
+# Architektura modelu do pomiaru pamięci wag (~60 MB fp32) - przy oryginalnych ~300 kB
+# przyrosty pamięci ginęłyby w szumie alokatora
+MEMORY_BENCHMARK_ARCHITECTURE = {
+    'conv_channels': (256, 512),
+    'lstm_hidden_size': 1024,
+    'lstm_num_layers': 2,
+    'fc_hidden_size': 256,
+}
+SHARED_CLEAN_MIN_FRACTION = 0.9  # Minimalny udział stron pliku wag liczonych jako Shared_Clean przy mmap
+
+
+def read_memory_rollup() -> Dict[str, int]:
+    """Zwraca statystyki pamięci bieżącego procesu (kB) z /proc/self/smaps_rollup."""
+    rollup = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].rstrip(':') in MEMORY_FIELDS:
+                rollup[parts[0].rstrip(':')] = int(parts[1])
+    return rollup
+
+
+def read_file_mappings(paths) -> Dict[str, int]:
+    """Sumuje statystyki pamięci (kB) mapowań podanych plików z /proc/self/smaps."""
+    paths = {str(path) for path in paths}
+    totals = {field: 0 for field in MEMORY_FIELDS}
+    inside = False
+    with open('/proc/self/smaps') as f:
+        for line in f:
+            parts = line.split()
+            if not parts[0].endswith(':'):
+                # Nagłówek mapowania: zakres adresów, uprawnienia, ..., ścieżka pliku
+                inside = len(parts) >= 6 and parts[5] in paths
+            elif inside and parts[0].rstrip(':') in MEMORY_FIELDS:
+                totals[parts[0].rstrip(':')] += int(parts[1])
+    return totals
+
+
+def _touch_weights(model):
+    """Odczytuje wszystkie wagi, aby ich strony faktycznie trafiły do pamięci procesu."""
+    with torch.no_grad():
+        for parameter in model.parameters():
+            float(parameter.sum())
+
+
+def _memory_worker(warm_up_path, model_paths, architecture, mmap, barrier, results):
+    """Proces symulujący workera gunicorna: ładuje kilka wersji modelu i raportuje pamięć."""
+    # Rozgrzewka: pierwszy model ładuje biblioteki i inicjalizuje alokator torch,
+    # dzięki czemu pomiar obejmuje tylko koszt kolejnych wersji wag
+    _touch_weights(load_classifier(warm_up_path, mmap=mmap))
+    barrier.wait()
+    before = read_memory_rollup()
+
+    models = [load_classifier(path, architecture=architecture, mmap=mmap) for path in model_paths]
+    for model in models:
+        _touch_weights(model)
+
+    # Pomiar dopiero gdy wszystkie workery mają modele w pamięci - PSS zależy od współdzielenia
+    barrier.wait()
+    after = read_memory_rollup()
+    mappings = read_file_mappings(model_paths)
+    barrier.wait()
+    results.put({
+        'rollup': {field: after[field] - before[field] for field in MEMORY_FIELDS},
+        'weight_mappings': mappings,
+    })
+
+
+def benchmark_weight_memory(num_workers: int = 4, num_versions: int = 3,
+                            architecture: Optional[Dict] = None) -> Dict:
+    """
+    Mierzy pamięć zajmowaną przez wagi na worker przy ładowaniu przez mmap i do prywatnej sterty.
+
+    Każdy worker ładuje `num_versions` wersji modelu o architekturze `architecture` (domyślnie
+    MEMORY_BENCHMARK_ARCHITECTURE, ~60 MB) zapisanych jako osobne pliki w katalogu wag serwisu
+    (ten sam system plików co produkcyjne wagi, a nie tmpfs). Raport zawiera PSS każdego workera
+    i średnie przyrosty pól smaps_rollup (kB) oraz statystyki samych mapowań plików wag.
+    Przy mmap strony plików wag muszą być liczone jako Shared_Clean (co najmniej
+    SHARED_CLEAN_MIN_FRACTION rozmiaru plików) - w przeciwnym razie zgłaszany jest AssertionError.
+    """
+    if architecture is None:
+        architecture = MEMORY_BENCHMARK_ARCHITECTURE
+    source_path = StressClassificationService()._get_model_path()
+    context = multiprocessing.get_context('fork')
+    report = {'num_workers': num_workers, 'num_versions': num_versions, 'architecture': architecture,
+              'modes': {}}
+
+    with tempfile.TemporaryDirectory(dir=source_path.parent, prefix='.weight-memory-') as tmp_dir:
+        torch.manual_seed(0)
+        model_paths = []
+        for version in range(num_versions):
+            path = Path(tmp_dir) / f'model_v{version}.pth'
+            with open(path, 'wb') as f:
+                torch.save(build_classifier('cnn_lstm', architecture).state_dict(), f)
+                # Świeżo zapisane strony w page cache są brudne i liczyłyby się jako Shared_Dirty
+                # aż do zapisu na dysk - produkcyjne wagi są czytane z już zapisanego pliku
+                f.flush()
+                os.fsync(f.fileno())
+            model_paths.append(path)
+
+        weights_kb = sum(path.stat().st_size for path in model_paths) // 1024
+        report['weights_kb_per_version'] = weights_kb // num_versions
+
+        for mode, mmap in (('private_heap', False), ('mmap', True)):
+            barrier = context.Barrier(num_workers)
+            results = context.Queue()
+            workers = [
+                context.Process(target=_memory_worker,
+                                args=(source_path, model_paths, architecture, mmap, barrier, results))
+                for _ in range(num_workers)
+            ]
+            for worker in workers:
+                worker.start()
+            samples = [results.get() for _ in workers]
+            for worker in workers:
+                worker.join()
+
+            report['modes'][mode] = {
+                'pss_per_worker': [sample['rollup']['Pss'] for sample in samples],
+                'rollup': {
+                    field: round(sum(sample['rollup'][field] for sample in samples) / num_workers, 1)
+                    for field in MEMORY_FIELDS
+                },
+                'weight_mappings': {
+                    field: round(sum(sample['weight_mappings'][field] for sample in samples) / num_workers, 1)
+                    for field in MEMORY_FIELDS
+                },
+            }
+
+    shared_clean = min(sample['weight_mappings']['Shared_Clean'] for sample in samples)
+    report['shared_clean_fraction'] = round(shared_clean / weights_kb, 3)
+    if num_workers > 1 and shared_clean < SHARED_CLEAN_MIN_FRACTION * weights_kb:
+        raise AssertionError(
+            f"Wagi przez mmap nie są współdzielone: Shared_Clean {shared_clean} kB "
+            f"z {weights_kb} kB plików wag"
+        )
+    return report
+
+
+def best_time(function: Callable, repeats: int = 3) -> float:
+    """Zwraca najlepszy czas (s) z kilku wywołań funkcji."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def simulated_recordings(num_recordings: int, duration_sec: int, seed: int = 1):
+    """Generuje symulowane nagrania (acc, bvp, eda, temp) o stałym ziarnie."""
+    random_state = np.random.get_state()
+    np.random.seed(seed)
+    try:
+        return [generate_simulated_data(duration_sec=duration_sec) for _ in range(num_recordings)]
+    finally:
+        np.random.set_state(random_state)
+
+
+def split_calibration_set(calibration, seed: int = 0):
+    """Dzieli zbiór kalibracyjny (X, y) losowo na dwie połowy: do kalibracji i do ewaluacji."""
+    X, y = calibration
+    order = np.random.default_rng(seed).permutation(len(X))
+    first, second = np.sort(order[:len(X) // 2]), np.sort(order[len(X) // 2:])
+    if y is None:
+        return (X[first], None), (X[second], None)
+    return (X[first], y[first]), (X[second], y[second])
+
+
+def gate_quantile_sweep(service, X_calibration: np.ndarray, X_eval: np.ndarray) -> list:
+    """
+    Pokrycie i zgodność bramki dla każdego kwantyla kalibracji (progi z X_calibration, pomiar na X_eval).
+
+    Pokazuje kompromis przyspieszenia i zgodności także wtedy, gdy żaden kwantyl nie osiąga celu.
+    """
+    calibration_predictions, _ = service.predict(X_calibration, use_cascade=False)
+    eval_predictions, _ = service.predict(X_eval, use_cascade=False)
+    calibration_features = compute_gate_features(X_calibration, TARGET_RATE)
+    eval_features = compute_gate_features(X_eval, TARGET_RATE)
+    baseline = calibration_predictions == BASELINE_CLASS
+    if not baseline.any():
+        return []
+
+    sweep = []
+    for quantile in CALIBRATION_QUANTILES:
+        thresholds = np.quantile(calibration_features[baseline], quantile, axis=0)
+        gated = np.all(eval_features <= thresholds, axis=1)
+        sweep.append({
+            'quantile': quantile,
+            'gated_fraction': round(float(gated.mean()), 4),
+            'gated_agreement': round(float((eval_predictions[gated] == BASELINE_CLASS).mean()), 4) if gated.any() else None,
+        })
+    return sweep
+
+
+def benchmark_cascade(agreement_target: float = CASCADE_AGREEMENT_TARGET) -> Dict:
+    """
+    Porównuje pełną inferencję z kaskadą (bramka Baseline + CNN-LSTM) na zbiorze kalibracyjnym.
+
+    Bramka kalibrowana jest na jednej połowie zbioru (okna osób wydzielonych z treningu lub,
+    bez pliku zbioru, okna symulowane - `calibration_source`), a ewaluowana na drugiej.
+    Raportuje przyspieszenie etapu predykcji, zgodność klas z pełną inferencją, trafność
+    względem etykiet (jeśli są), odsetek okien obsłużonych przez bramkę oraz pokrycie
+    i zgodność dla każdego kwantyla progów. Klasy w zbiorze z WESAD są zrównoważone,
+    więc odsetek pominiętych okien jest niższy niż w typowym nagraniu z przewagą Baseline.
+    """
+    service = StressClassificationService()
+    service.load_model()
+
+    calibration = service.get_calibration_set()
+    calibration_half, (X_eval, y_eval) = split_calibration_set(calibration)
+    gate = service.calibrate_cascade(agreement_target, calibration=calibration_half)
+
+    full_predictions, _ = service.predict(X_eval, use_cascade=False)
+    cascade_predictions, _, gated = service._predict(X_eval, use_cascade=True)
+
+    full_time = best_time(lambda: service.predict(X_eval, use_cascade=False))
+    cascade_time = best_time(lambda: service.predict(X_eval, use_cascade=True))
+
+    report = {
+        'calibration_source': service.calibration_source,
+        'num_windows': int(len(X_eval)),
+        'prediction_counts': np.bincount(full_predictions, minlength=len(CLASS_NAMES)).tolist(),
+        'agreement_target': agreement_target,
+        'gate': gate.describe() if gate is not None else None,
+        'cascade_check': service.cascade_check,
+        'quantile_sweep': gate_quantile_sweep(service, calibration_half[0], X_eval),
+        'gated_fraction': float(gated.mean()),
+        'agreement_with_full': float((full_predictions == cascade_predictions).mean()),
+        'full_seconds': round(full_time, 4),
+        'cascade_seconds': round(cascade_time, 4),
+        'speedup': round(full_time / cascade_time, 2),
+    }
+    if y_eval is not None:
+        report['label_counts'] = np.bincount(y_eval, minlength=len(CLASS_NAMES)).tolist()
+        report['full_accuracy'] = float((full_predictions == y_eval).mean())
+        report['cascade_accuracy'] = float((cascade_predictions == y_eval).mean())
+    return report
+
+
+def class_prototypes(service, seed: int = 0) -> list:
+    """
+    Dobiera dla każdej klasy poziom i amplitudę kanałów, które model klasyfikuje jako tę klasę.
+
+    Spośród okien symulowanych w rozkładzie populacji (generate_calibration_windows) wybiera
+    dla każdej klasy okno o najwyższym prawdopodobieństwie tej klasy i zwraca jego średnią
+    i odchylenie standardowe per kanał. Nie wymaga zbioru kalibracyjnego z WESAD.
+    """
+    X = generate_calibration_windows(service.mean, service.std, seq_len=SEQ_LEN, seed=seed)
+    _, probabilities = service.predict(X, use_cascade=False)
+    best = probabilities.argmax(axis=0)
+    return [(X[index].mean(axis=0), X[index].std(axis=0)) for index in best]
+
+
+def episode_recording(prototypes: list, duration_sec: int, episode_range_sec=(300, 1800), seed: int = 0):
+    """
+    Symuluje wielogodzinne nagranie (po przepróbkowaniu do TARGET_RATE) złożone z epizodów klas.
+
+    Każdy epizod trwa losowo episode_range_sec i ma poziom oraz amplitudę szumu prototypu swojej
+    klasy (class_prototypes); kolejne epizody mają różne klasy. Nagranie jest dzielone na
+    nakładające się okna jak w classify (segment_data), więc okna na granicach epizodów mieszają
+    dwie klasy. Zwraca okna i klasę epizodu w środku każdego okna.
+    """
+    generator = np.random.default_rng(seed)
+    num_samples = duration_sec * TARGET_RATE
+    values = np.empty((num_samples, NUM_CHANNELS), dtype=np.float32)
+    sample_labels = np.empty(num_samples, dtype=np.int64)
+
+    position, label = 0, BASELINE_CLASS
+    while position < num_samples:
+        length = int(generator.uniform(*episode_range_sec) * TARGET_RATE)
+        level, scale = prototypes[label]
+        end = min(num_samples, position + length)
+        values[position:end] = level + scale * generator.normal(size=(end - position, NUM_CHANNELS))
+        sample_labels[position:end] = label
+        position = end
+        label = generator.choice([other for other in range(len(prototypes)) if other != label])
+
+    X_segments = segment_data(pd.DataFrame(values), TARGET_RATE, WINDOW_SEC, STEP_SEC)
+    centres = np.arange(len(X_segments)) * STEP_SEC * TARGET_RATE + SEQ_LEN // 2
+    return X_segments, sample_labels[centres]
+
+
+def benchmark_adaptive_stride(duration_hours: float = 8.0) -> Dict:
+    """
+    Porównuje klasyfikację co STEP_SEC z trybem adaptacyjnym na wielogodzinnym nagraniu.
+
+    Nagranie to symulowane epizody klas trwające 5-30 minut (episode_recording), więc predykcje
+    zmieniają klasę na granicach epizodów. Raportuje przyspieszenie etapu predykcji, zgodność
+    klas per okno z pełną klasyfikacją, liczbę zmian klasy epizodów i pełnej klasyfikacji,
+    zgodność pełnej klasyfikacji z klasą epizodu oraz odsetek okien faktycznie przepuszczonych
+    przez model w trybie adaptacyjnym (w tym doklasyfikowanych w przedziałach ze zmianą klasy
+    lub niską pewnością).
+    """
+    service = StressClassificationService()
+    service.load_model()
+
+    X_segments, labels = episode_recording(class_prototypes(service), int(duration_hours * 3600))
+
+    full_predictions, _ = service.predict(X_segments)
+    adaptive_predictions, _, _, classified = service._predict_adaptive(X_segments)
+    coarse = np.zeros(len(X_segments), dtype=bool)
+    coarse[::max(1, COARSE_STEP_SEC // STEP_SEC)] = True
+    coarse[-1] = True
+
+    full_time = best_time(lambda: service.predict(X_segments))
+    adaptive_time = best_time(lambda: service._predict_adaptive(X_segments))
+
+    return {
+        'duration_hours': duration_hours,
+        'num_windows': int(len(X_segments)),
+        'label_counts': np.bincount(labels, minlength=len(CLASS_NAMES)).tolist(),
+        'label_changes': int((labels[1:] != labels[:-1]).sum()),
+        'prediction_changes': int((full_predictions[1:] != full_predictions[:-1]).sum()),
+        'label_agreement': float((full_predictions == labels).mean()),
+        'classified_fraction': float(classified.mean()),
+        'refined_fraction': float((classified & ~coarse).mean()),
+        'agreement_with_full': float((full_predictions == adaptive_predictions).mean()),
+        'full_seconds': round(full_time, 4),
+        'adaptive_seconds': round(adaptive_time, 4),
+        'speedup': round(full_time / adaptive_time, 2),
+    }
+
+
+def benchmark_bf16(num_windows: int = 4096, batch_sizes=(32, 128, 512)) -> Dict:
+    """
+    Mierzy przepustowość inferencji fp32 i bf16 (autocast) oraz wynik kontroli dokładności.
+
+    Przepustowość liczona jest na syntetycznych oknach dla kilku rozmiarów batcha,
+    kontrola dokładności (zgodność klas i tolerancja prawdopodobieństw z domyślnymi progami) -
+    na zbiorze kalibracyjnym używanym przy włączaniu trybu bf16.
+    """
+    service = StressClassificationService()
+    service.load_model()
+
+    report = {
+        'bf16_supported': service.bf16_supported(),
+        'num_windows': num_windows,
+        'precision_check': None,
+        'throughput': [],
+    }
+    if not report['bf16_supported']:
+        return report
+
+    service.enable_bf16()
+    report['precision_check'] = service.precision_check
+
+    generator = np.random.default_rng(0)
+    X_segments = generator.normal(size=(num_windows, SEQ_LEN, NUM_CHANNELS)) * service.std + service.mean
+    original_batch_size = service.batch_size
+
+    try:
+        for batch_size in batch_sizes:
+            service.batch_size = batch_size
+            row = {'batch_size': batch_size}
+            for precision in ('fp32', 'bf16'):
+                service._run_model(X_segments[:batch_size], precision=precision)
+                elapsed = best_time(lambda: service._run_model(X_segments, precision=precision))
+                row[f'{precision}_windows_per_second'] = round(num_windows / elapsed, 1)
+            row['speedup'] = round(row['bf16_windows_per_second'] / row['fp32_windows_per_second'], 2)
+            report['throughput'].append(row)
+    finally:
+        service.batch_size = original_batch_size
+
+    return report
+
+
+def benchmark_window_features(durations_sec=(600, 3600, 4 * 3600)) -> Dict:
+    """
+    Mierzy koszt ekstrakcji cech fizjologicznych per okno na tle preprocessingu i predykcji.
+
+    Dla każdej długości nagrania raportowany jest czas całkowity i mikrosekundy na okno
+    dla: preprocessingu (resampling + segmentacja), cech (HR, EDA, ruch) i predykcji modelu.
+    """
+    service = StressClassificationService()
+    service.load_model()
+
+    results = []
+    for duration_sec in durations_sec:
+        acc, bvp, eda, temp = simulated_recordings(1, duration_sec)[0]
+        X_segments = service.preprocess_signals(acc, bvp, eda, temp)
+        num_windows = len(X_segments)
+
+        timings = {
+            'preprocess': best_time(lambda: service.preprocess_signals(acc, bvp, eda, temp)),
+            'features': best_time(lambda: compute_window_features(acc, bvp, eda, num_windows, WINDOW_SEC, STEP_SEC)),
+            'predict': best_time(lambda: service.predict(X_segments)),
+        }
+        features = compute_window_features(acc, bvp, eda, num_windows, WINDOW_SEC, STEP_SEC)
+
+        results.append({
+            'duration_sec': duration_sec,
+            'num_windows': num_windows,
+            **{f'{stage}_seconds': round(elapsed, 4) for stage, elapsed in timings.items()},
+            **{f'{stage}_us_per_window': round(elapsed / num_windows * 1e6, 1) for stage, elapsed in timings.items()},
+            'median_heart_rate_bpm': round(float(np.nanmedian(features['heart_rate_bpm'])), 1),
+        })
+
+    return {'recordings': results}
+
+
+def benchmark_hrv(duration_sec: int = HRV_BUDGET_DURATION_SEC) -> Dict:
+    """
+    Mierzy czas analizy HRV (detekcja uderzeń + metryki sesji) dla długiego nagrania BVP.
+
+    Domyślnie 8 godzin - wynik porównywany jest z budżetem HRV_TIME_BUDGET_SEC,
+    ten sam limit egzekwuje test jednostkowy.
+    """
+    _, bvp, _, _ = simulated_recordings(1, duration_sec)[0]
+    elapsed = best_time(lambda: compute_session_hrv(bvp))
+
+    return {
+        'duration_sec': duration_sec,
+        'num_samples': int(len(bvp)),
+        'hrv_seconds': round(elapsed, 4),
+        'time_budget_seconds': HRV_TIME_BUDGET_SEC,
+        'within_budget': elapsed <= HRV_TIME_BUDGET_SEC,
+        'metrics': compute_session_hrv(bvp),
+    }
+
+
+def inject_artifacts(acc: np.ndarray, bvp: np.ndarray, eda: np.ndarray, fraction: float, seed: int = 0):
+    """
+    Wstawia artefakty do kopii sygnałów w losowych odcinkach o długości okna.
+
+    Naprzemiennie: odłączona opaska (płaski sygnał, EDA = 0) i silny ruch (szum ACC).
+    Zwraca (acc, bvp, eda, liczba odcinków).
+    """
+    from .features import ACC_RATE, BVP_RATE, EDA_RATE
+
+    acc, bvp, eda = acc.copy(), bvp.copy(), eda.copy()
+    generator = np.random.default_rng(seed)
+    duration_sec = len(eda) / EDA_RATE
+    num_artifacts = int(duration_sec / WINDOW_SEC * fraction)
+    starts = generator.choice(int(duration_sec // WINDOW_SEC), size=num_artifacts, replace=False) * WINDOW_SEC
+
+    for k, start in enumerate(starts):
+        acc_slice = slice(int(start * ACC_RATE), int((start + WINDOW_SEC) * ACC_RATE))
+        if k % 2 == 0:
+            acc[acc_slice] = acc[acc_slice.start]
+            bvp[int(start * BVP_RATE):int((start + WINDOW_SEC) * BVP_RATE)] = 0.0
+            eda[int(start * EDA_RATE):int((start + WINDOW_SEC) * EDA_RATE)] = 0.0
+        else:
+            acc[acc_slice] += generator.normal(scale=50.0, size=acc[acc_slice].shape)
+    return acc, bvp, eda, num_artifacts
+
+
+def benchmark_signal_quality(duration_sec: int = 3600, artifact_fraction: float = 0.2) -> Dict:
+    """
+    Mierzy koszt indeksu jakości sygnału i oszczędność predykcji dzięki pomijaniu złych okien.
+
+    Do symulowanego nagrania wstawiane są artefakty (odłączona opaska, silny ruch)
+    w `artifact_fraction` odcinków; raportowany jest odsetek odrzuconych okien
+    oraz czas predykcji wszystkich okien i tylko okien powyżej progu SQI.
+    """
+    service = StressClassificationService()
+    service.load_model()
+
+    acc, bvp, eda, temp = simulated_recordings(1, duration_sec)[0]
+    acc, bvp, eda, num_artifacts = inject_artifacts(acc, bvp, eda, artifact_fraction)
+    X_segments = service.preprocess_signals(acc, bvp, eda, temp)
+    num_windows = len(X_segments)
+
+    quality = compute_signal_quality(acc, bvp, eda, num_windows, WINDOW_SEC, STEP_SEC)
+    usable = quality['sqi'] >= SQI_THRESHOLD
+    all_windows = np.ones(num_windows, dtype=bool)
+
+    sqi_time = best_time(lambda: compute_signal_quality(acc, bvp, eda, num_windows, WINDOW_SEC, STEP_SEC))
+    full_time = best_time(lambda: service._predict_usable(X_segments, all_windows, adaptive=False))
+    filtered_time = best_time(lambda: service._predict_usable(X_segments, usable, adaptive=False))
+
+    return {
+        'duration_sec': duration_sec,
+        'num_windows': num_windows,
+        'injected_artifacts': num_artifacts,
+        'sqi_threshold': SQI_THRESHOLD,
+        'unusable_fraction': round(float(1.0 - usable.mean()), 4),
+        'component_failures': {
+            name: int((values < SQI_THRESHOLD).sum()) for name, values in quality.items() if name != 'sqi'
+        },
+        'sqi_seconds': round(sqi_time, 4),
+        'sqi_us_per_window': round(sqi_time / num_windows * 1e6, 1),
+        'predict_all_seconds': round(full_time, 4),
+        'predict_usable_seconds': round(filtered_time, 4),
+        'predict_time_saved': round(1.0 - (filtered_time + sqi_time) / full_time, 4),
+    }
+
+
+def simulated_class_sequence(num_windows: int, transition_matrix: np.ndarray, noise: float, seed: int = 0):
+    """
+    Generuje sekwencję klas z łańcucha Markowa i zaszumione prawdopodobieństwa modelu.
+
+    Returns:
+        Tuple (klasy prawdziwe (T,), prawdopodobieństwa (T, K))
+    """
+    generator = np.random.default_rng(seed)
+    num_classes = len(transition_matrix)
+    cumulative = transition_matrix.cumsum(axis=1)
+    draws = generator.random(num_windows)
+    labels = np.empty(num_windows, dtype=int)
+    labels[0] = generator.integers(num_classes)
+    for t in range(1, num_windows):
+        labels[t] = min(np.searchsorted(cumulative[labels[t - 1]], draws[t]), num_classes - 1)
+
+    logits = generator.normal(scale=noise, size=(num_windows, num_classes))
+    logits[np.arange(num_windows), labels] += 1.0
+    probabilities = np.exp(logits)
+    return labels, probabilities / probabilities.sum(axis=1, keepdims=True)
+
+
+def benchmark_smoothing(durations_hours=(8, 7 * 24, 30 * 24), noise: float = 1.0) -> Dict:
+    """
+    Mierzy koszt dekodowania Viterbiego na bardzo długich sekwencjach okien (co STEP_SEC).
+
+    Sekwencje klas pochodzą z łańcucha Markowa o domyślnej macierzy przejść, a prawdopodobieństwa
+    są zaszumione; raportowany jest czas, zgodność z prawdziwymi klasami przed i po wygładzeniu
+    oraz liczba zmian klasy między sąsiednimi oknami.
+    """
+    transition_matrix = default_transition_matrix(len(CLASS_NAMES), self_transition=0.99)
+    results = []
+    for hours in durations_hours:
+        num_windows = int(hours * 3600 / STEP_SEC)
+        labels, probabilities = simulated_class_sequence(num_windows, transition_matrix, noise)
+
+        raw = probabilities.argmax(axis=1)
+        smoothed = smooth_predictions(probabilities, transition_matrix)
+        elapsed = best_time(lambda: smooth_predictions(probabilities, transition_matrix), repeats=1 if hours > 24 else 3)
+
+        results.append({
+            'duration_hours': hours,
+            'num_windows': num_windows,
+            'viterbi_seconds': round(elapsed, 4),
+            'us_per_window': round(elapsed / num_windows * 1e6, 2),
+            'raw_accuracy': round(float((raw == labels).mean()), 4),
+            'smoothed_accuracy': round(float((smoothed == labels).mean()), 4),
+            'true_class_changes': int((np.diff(labels) != 0).sum()),
+            'raw_class_changes': int((np.diff(raw) != 0).sum()),
+            'smoothed_class_changes': int((np.diff(smoothed) != 0).sum()),
+        })
+
+    return {'noise': noise, 'sequences': results}
+
+
+def clustered_embeddings(num_vectors: int, dimension: int, num_clusters: int, spread: float = 0.3, seed: int = 0):
+    """Syntetyczne embeddingi sesji skupione wokół `num_clusters` losowych kierunków."""
+    generator = np.random.default_rng(seed)
+    centers = generator.normal(size=(num_clusters, dimension))
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    vectors = centers[generator.integers(num_clusters, size=num_vectors)]
+    vectors = vectors + generator.normal(scale=spread / np.sqrt(dimension), size=(num_vectors, dimension))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def benchmark_similar_sessions(num_visits: int = 50000, dimension: int = 64, k: int = 10,
+                               num_queries: int = 200, spread: float = 1.0) -> Dict:
+    """
+    Mierzy czas zapytania o podobne sesje w indeksie IVF i dokładność (recall@k) względem
+    przeszukiwania dokładnego, a także koszt budowy, zapisu i przyrostowego dodania wektora.
+    """
+    vectors = clustered_embeddings(num_visits, dimension, num_clusters=max(1, num_visits // 100), spread=spread)
+    queries = vectors[np.random.default_rng(1).choice(num_visits, num_queries, replace=False)]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        index = EmbeddingIndex(Path(tmp_dir) / 'index.npz', model_version='benchmark')
+        start = time.perf_counter()
+        index.build(list(range(num_visits)), vectors)
+        build_seconds = time.perf_counter() - start
+        save_seconds = best_time(index.save, repeats=1)
+        add_seconds = best_time(lambda: index.add(num_visits, vectors[0]), repeats=1)
+
+        exact = np.argsort(-(queries @ vectors.T), axis=1)[:, :k]
+        start = time.perf_counter()
+        results = [index.search(query, k) for query in queries]
+        ivf_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        for query in queries:
+            np.argpartition(-(vectors @ query), k)[:k]
+        exact_seconds = time.perf_counter() - start
+
+    recall = np.mean([
+        len({item_id for item_id, _ in result} & set(exact_row.tolist())) / k
+        for result, exact_row in zip(results, exact)
+    ])
+    return {
+        'num_visits': num_visits,
+        'dimension': dimension,
+        'spread': spread,
+        'num_lists': 0 if index.centroids is None else len(index.centroids),
+        'k': k,
+        'recall_at_k': round(float(recall), 4),
+        'ivf_query_ms': round(ivf_seconds / num_queries * 1000, 3),
+        'exact_query_ms': round(exact_seconds / num_queries * 1000, 3),
+        'build_seconds': round(build_seconds, 3),
+        'save_seconds': round(save_seconds, 3),
+        'incremental_add_seconds': round(add_seconds, 3),
+    }
+
+
+def benchmark_shadow(num_requests: int = 20, duration_sec: int = 1800,
+                     cpu_budgets=(float('inf'), SHADOW_CPU_BUDGET)) -> Dict:
+    """
+    Mierzy wpływ ewaluacji w cieniu na czas klasyfikacji (kandydat = te same wagi).
+
+    Dla każdego budżetu CPU każde żądanie jest wysyłane do kandydata (sample_rate = 1);
+    raportuje medianę czasu żądania, liczniki pominięć i zgodność z raportu.
+    """
+    recordings = simulated_recordings(num_requests, duration_sec)
+    runtime_dir = Path(tempfile.mkdtemp())
+    try:
+        service = StressClassificationService()
+        service.load_model()
+        service._get_runtime_dir = lambda: runtime_dir
+
+        config_path = runtime_dir / 'candidate.json'
+        config_path.write_text(json.dumps({
+            'model_type': service._get_model_config()['model_type'],
+            'weights': str(service._get_model_path()),
+            'architecture': service._get_model_config()['architecture'],
+        }))
+
+        def request_latencies():
+            latencies = []
+            for signals in recordings:
+                start = time.perf_counter()
+                service.classify(*signals)
+                latencies.append((time.perf_counter() - start) * 1000)
+            return latencies
+
+        results = {'num_requests': num_requests, 'duration_sec': duration_sec}
+        results['baseline_p50_ms'] = round(float(np.median(request_latencies())), 2)
+
+        results['shadow'] = []
+        for cpu_budget in cpu_budgets:
+            service.shadow = service.load_shadow_model(config_path)
+            service.shadow.sample_rate = 1.0
+            service.shadow.budget.rate = cpu_budget
+            latencies = request_latencies()
+            service.shadow.drain()
+            results['shadow'].append({
+                'cpu_budget': cpu_budget if np.isfinite(cpu_budget) else None,
+                'p50_ms': round(float(np.median(latencies)), 2),
+                'counters': dict(service.shadow.counters),
+            })
+            (runtime_dir / 'shadow.sqlite3').unlink()
+
+        service.shadow = None
+        return results
+    finally:
+        shutil.rmtree(runtime_dir, ignore_errors=True)
+
+
+BENCHMARKS = {
+    'weight-memory': benchmark_weight_memory,
+    'cascade': benchmark_cascade,
+    'adaptive-stride': benchmark_adaptive_stride,
+    'bf16': benchmark_bf16,
+    'window-features': benchmark_window_features,
+    'hrv': benchmark_hrv,
+    'signal-quality': benchmark_signal_quality,
+    'smoothing': benchmark_smoothing,
+    'similar-sessions': benchmark_similar_sessions,
+    'shadow': benchmark_shadow,
+}
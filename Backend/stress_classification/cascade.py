@@ -0,0 +1,111 @@
+"""
+Tani filtr wstępny (kaskada) przed modelem CNN-LSTM.
+
+Dla każdego okna liczone są wektorowo trzy cechy: nachylenie EDA, wariancja modułu ACC
+i amplituda BVP. Okna, w których wszystkie cechy są poniżej progów, są oznaczane jako
+pewny Baseline i nie trafiają do sieci neuronowej. Progi są kalibrowane na zbiorze
+kalibracyjnym tak, aby zgodność z pełną inferencją nie spadła poniżej zadanego celu.
+"""
+from typing import Optional
+
+import numpy as np
+
+# Indeksy kanałów w oknie: ACC_x, ACC_y, ACC_z, BVP, EDA, TEMP
+ACC_CHANNELS = slice(0, 3)
+BVP_CHANNEL = 3
+EDA_CHANNEL = 4
+
+FEATURE_NAMES = ('eda_slope', 'acc_magnitude_variance', 'bvp_amplitude')
+BASELINE_CLASS = 0
+
+# Kwantyle cech okien Baseline sprawdzane podczas kalibracji (od najbardziej agresywnego)
+CALIBRATION_QUANTILES = (0.95, 0.9, 0.8, 0.7, 0.6, 0.5, 0.4, 0.3)
+
+
+def compute_gate_features(X_segments: np.ndarray, sample_rate: float) -> np.ndarray:
+    """
+    Liczy cechy bramki dla wszystkich okien naraz.
+
+    Args:
+        X_segments: Surowe (nieznormalizowane) okna o kształcie (N, kroki_czasowe, kanały)
+        sample_rate: Częstotliwość próbkowania okien w Hz
+
+    Returns:
+        Tablica (N, 3): |nachylenie EDA| [µS/s], wariancja modułu ACC, amplituda BVP (p95 - p5)
+    """
+    num_steps = X_segments.shape[1]
+    t = np.arange(num_steps) / sample_rate
+    t_centered = t - t.mean()
+
+    # Nachylenie regresji liniowej EDA względem czasu (najmniejsze kwadraty, jedno mnożenie macierzy)
+    eda = X_segments[:, :, EDA_CHANNEL]
+    eda_slope = np.abs((eda - eda.mean(axis=1, keepdims=True)) @ t_centered / (t_centered @ t_centered))
+
+    acc_magnitude = np.linalg.norm(X_segments[:, :, ACC_CHANNELS], axis=2)
+    acc_variance = acc_magnitude.var(axis=1)
+
+    bvp_low, bvp_high = np.percentile(X_segments[:, :, BVP_CHANNEL], [5, 95], axis=1)
+    bvp_amplitude = bvp_high - bvp_low
+
+    return np.column_stack([eda_slope, acc_variance, bvp_amplitude])
+
+
+class BaselineGate:
+    """Bramka oznaczająca okna pewnego Baseline na podstawie progów cech."""
+
+    def __init__(self, thresholds: np.ndarray, baseline_probabilities: np.ndarray,
+                 agreement: float, coverage: float, quantile: float):
+        self.thresholds = thresholds
+        self.baseline_probabilities = baseline_probabilities
+        self.agreement = agreement
+        self.coverage = coverage
+        self.quantile = quantile
+
+    def mask(self, features: np.ndarray) -> np.ndarray:
+        """Zwraca maskę okien, które bramka klasyfikuje jako Baseline."""
+        return np.all(features <= self.thresholds, axis=1)
+
+    def describe(self) -> dict:
+        """Zwraca opis kalibracji bramki (do diagnostyki i raportów)."""
+        return {
+            'thresholds': {name: float(value) for name, value in zip(FEATURE_NAMES, self.thresholds)},
+            'calibration_agreement': float(self.agreement),
+            'calibration_coverage': float(self.coverage),
+            'quantile': self.quantile,
+        }
+
+    @classmethod
+    def calibrate(cls, features: np.ndarray, predictions: np.ndarray, probabilities: np.ndarray,
+                  agreement_target: float) -> Optional['BaselineGate']:
+        """
+        Dobiera progi bramki na zbiorze kalibracyjnym.
+
+        Progi to kwantyle cech okien, które pełny model sklasyfikował jako Baseline.
+        Wybierany jest najwyższy kwantyl (największe pokrycie), dla którego odsetek okien
+        przepuszczonych przez bramkę i sklasyfikowanych przez model jako Baseline
+        wynosi co najmniej agreement_target. Zwraca None, jeśli żaden kwantyl nie spełnia celu
+        albo zbiór nie zawiera okien obu rodzajów - bez okien spoza Baseline zgodność wynosi
+        zawsze 1.0 i niczego nie mierzy.
+        """
+        baseline_mask = predictions == BASELINE_CLASS
+        if not baseline_mask.any() or baseline_mask.all():
+            return None
+
+        for quantile in CALIBRATION_QUANTILES:
+            thresholds = np.quantile(features[baseline_mask], quantile, axis=0)
+            gated = np.all(features <= thresholds, axis=1)
+            if not gated.any():
+                continue
+
+            agreement = float((predictions[gated] == BASELINE_CLASS).mean())
+            if agreement >= agreement_target:
+                baseline_probabilities = probabilities[gated & baseline_mask].mean(axis=0)
+                return cls(
+                    thresholds=thresholds,
+                    baseline_probabilities=baseline_probabilities,
+                    agreement=agreement,
+                    coverage=float(gated.mean()),
+                    quantile=quantile,
+                )
+
+        return None
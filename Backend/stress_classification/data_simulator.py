@@ -13,6 +13,12 @@ TEMP_RATE = 4  # Hz
 # Długość symulacji w sekundach
 DEFAULT_DURATION_SEC = 300  # 5 minut
 
+# --- ZASTĘPCZY ZBIÓR KALIBRACYJNY (gdy brak okien osób wydzielonych z WESAD) ---
+CALIBRATION_WINDOWS = 2048
+CALIBRATION_SEED = 0
+CALIBRATION_OFFSET_RANGE = 2.0          # Przesunięcie poziomu kanałów (w odchyleniach std. populacji)
+CALIBRATION_NOISE_RANGE = (0.05, 1.0)   # Zakres amplitudy zmienności w oknie (w odchyleniach std.)
+
 
 def generate_simulated_data(duration_sec: int = DEFAULT_DURATION_SEC) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
     """
@@ -97,3 +103,23 @@ def generate_simulated_data(duration_sec: int = DEFAULT_DURATION_SEC) -> Tuple[n
     
     return acc, bvp, eda, temp
 
+
+def generate_calibration_windows(mean: np.ndarray, std: np.ndarray, num_windows: int = CALIBRATION_WINDOWS,
+                                 seq_len: int = 120, seed: int = CALIBRATION_SEED) -> np.ndarray:
+    """
+    Generuje deterministyczne surowe okna w rozkładzie populacji (parametry normalizacji modelu).
+
+    Każde okno ma losowe przesunięcie poziomu kanałów i amplitudę zmienności, więc model
+    klasyfikuje je do wszystkich klas z różną pewnością - w przeciwieństwie do
+    generate_simulated_data, którego jednostki odbiegają od WESAD i które model klasyfikuje
+    w całości jako Baseline. Okna nie mają etykiet.
+
+    Returns:
+        Tablica (num_windows, seq_len, kanały) w jednostkach sygnałów po resamplingu do 4 Hz
+    """
+    generator = np.random.default_rng(seed)
+    num_channels = len(mean)
+    offsets = generator.uniform(-CALIBRATION_OFFSET_RANGE, CALIBRATION_OFFSET_RANGE, size=(num_windows, 1, num_channels))
+    scales = generator.uniform(*CALIBRATION_NOISE_RANGE, size=(num_windows, 1, num_channels))
+    noise = generator.normal(size=(num_windows, seq_len, num_channels))
+    return ((offsets + scales * noise) * std + mean).astype(np.float32)
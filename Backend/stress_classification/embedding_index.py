@@ -0,0 +1,259 @@
+"""
+Indeks przybliżonego wyszukiwania najbliższych sąsiadów (ANN) dla embeddingów sesji.
+
+Embeddingi są znormalizowane (L2), więc podobieństwo to iloczyn skalarny (cosinus).
+Indeks typu IVF: wektory przypisane są do najbliższego centroidu (k-means), a zapytanie
+przeszukuje tylko `nprobe` list o centroidach najbliższych zapytaniu. Poniżej IVF_MIN_SIZE
+wektorów przeszukiwanie jest dokładne (jedno mnożenie macierzy).
+
+Indeks żyje w pamięci procesu i jest zapisywany atomowo do pliku .npz w katalogu runtime.
+Zapis odbywa się pod blokadą pliku (fcntl), a przed dodaniem wektora indeks jest wczytywany
+ponownie, jeśli plik zmienił inny worker - kolejne workery nie gubią nawzajem swoich zmian.
+"""
+import fcntl
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# --- KONFIGURACJA INDEKSU ---
+IVF_MIN_SIZE = 2048          # Poniżej - przeszukiwanie dokładne
+IVF_LISTS_PER_SQRT = 1.0     # Liczba list = IVF_LISTS_PER_SQRT * sqrt(N)
+IVF_NPROBE = 8               # Liczba przeszukiwanych list
+IVF_RETRAIN_GROWTH = 4.0     # Ponowny trening centroidów, gdy indeks urósł tyle razy od ostatniego
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_SIZE = 20000
+
+
+def normalize_vectors(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def train_centroids(vectors: np.ndarray, num_lists: int, seed: int = 0) -> np.ndarray:
+    """Sferyczny k-means (podobieństwo cosinusowe) na próbce wektorów."""
+    generator = np.random.default_rng(seed)
+    if len(vectors) > KMEANS_SAMPLE_SIZE:
+        vectors = vectors[generator.choice(len(vectors), KMEANS_SAMPLE_SIZE, replace=False)]
+    centroids = vectors[generator.choice(len(vectors), num_lists, replace=False)].copy()
+
+    for _ in range(KMEANS_ITERATIONS):
+        assignment = (vectors @ centroids.T).argmax(axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        empty = np.bincount(assignment, minlength=num_lists) == 0
+        # Puste listy dostają losowe wektory, aby nie tracić centroidów
+        sums[empty] = vectors[generator.choice(len(vectors), int(empty.sum()))]
+        centroids = normalize_vectors(sums)
+    return centroids
+
+
+class EmbeddingIndex:
+    """
+    Indeks IVF embeddingów (identyfikator -> wektor) z zapisem na dysk.
+
+    `model_version` wiąże indeks z modelem, który wygenerował embeddingi - embeddingi
+    różnych modeli nie są porównywalne.
+    """
+
+    def __init__(self, path: Path, model_version: Optional[str] = None, dimension: Optional[int] = None):
+        self.path = Path(path)
+        self.model_version = model_version
+        self.dimension = dimension
+        self.ids = np.empty(0, dtype=np.int64)
+        self.vectors = np.empty((0, dimension or 0), dtype=np.float32)
+        self.lists = np.empty(0, dtype=np.int32)
+        self.centroids = None
+        self.trained_size = 0
+        self._mtime = None
+        self._order = None
+        self._offsets = None
+        self._lock = threading.RLock()
+
+    # --- Trwałość ---
+
+    @contextmanager
+    def _file_lock(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path.with_suffix('.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _file_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def is_stale(self) -> bool:
+        """Czy plik indeksu został zmieniony od ostatniego odczytu/zapisu w tym procesie."""
+        return self._file_mtime() != self._mtime
+
+    def load(self) -> bool:
+        """Wczytuje indeks z pliku. Zwraca False, gdy brak pliku lub pasującej wersji modelu."""
+        with self._lock:
+            mtime = self._file_mtime()
+            if mtime is None:
+                return False
+            with np.load(self.path, allow_pickle=False) as data:
+                model_version = str(data['model_version'])
+                if self.model_version is not None and model_version != self.model_version:
+                    return False
+                self.model_version = model_version
+                self.ids = data['ids']
+                self.vectors = data['vectors']
+                self.lists = data['lists']
+                self.centroids = data['centroids'] if data['centroids'].size else None
+                self.trained_size = int(data['trained_size'])
+                self.dimension = self.vectors.shape[1]
+            self._mtime = mtime
+            self._order = None
+            return True
+
+    def save(self):
+        """Zapisuje indeks atomowo (plik tymczasowy + rename)."""
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix='.npz')
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(
+                    f,
+                    model_version=np.array(self.model_version or ''),
+                    ids=self.ids,
+                    vectors=self.vectors,
+                    lists=self.lists,
+                    centroids=self.centroids if self.centroids is not None else np.empty((0, self.vectors.shape[1]), dtype=np.float32),
+                    trained_size=np.array(self.trained_size),
+                )
+            os.replace(tmp_path, self.path)
+            self._mtime = self._file_mtime()
+
+    def refresh(self):
+        """Wczytuje indeks ponownie, jeśli zmienił go inny proces."""
+        if self.is_stale():
+            self.load()
+
+    # --- Budowa i aktualizacja ---
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        if self.centroids is None:
+            return np.zeros(len(vectors), dtype=np.int32)
+        return (vectors @ self.centroids.T).argmax(axis=1).astype(np.int32)
+
+    def _maybe_retrain(self):
+        """Trenuje centroidy, gdy indeks przekroczył IVF_MIN_SIZE lub urósł IVF_RETRAIN_GROWTH razy."""
+        size = len(self.ids)
+        if size < IVF_MIN_SIZE or (self.trained_size and size < self.trained_size * IVF_RETRAIN_GROWTH):
+            return
+        num_lists = max(1, int(IVF_LISTS_PER_SQRT * np.sqrt(size)))
+        self.centroids = train_centroids(self.vectors, num_lists)
+        self.lists = self._assign(self.vectors)
+        self.trained_size = size
+        self._order = None
+
+    def build(self, ids: List[int], vectors: np.ndarray):
+        """Buduje indeks od zera."""
+        with self._lock:
+            self.ids = np.asarray(ids, dtype=np.int64)
+            if len(self.ids):
+                self.vectors = normalize_vectors(vectors).reshape(len(self.ids), -1)
+                self.dimension = self.vectors.shape[1]
+            else:
+                self.vectors = np.empty((0, self.dimension or 0), dtype=np.float32)
+            self.centroids = None
+            self.trained_size = 0
+            self.lists = self._assign(self.vectors)
+            self._maybe_retrain()
+            self._order = None
+
+    def _upsert(self, item_id: int, vector: np.ndarray):
+        vector = normalize_vectors(vector).reshape(1, -1)
+        position = np.flatnonzero(self.ids == item_id)
+        if len(position):
+            self.vectors[position[0]] = vector[0]
+            self.lists[position[0]] = self._assign(vector)[0]
+        else:
+            self.ids = np.append(self.ids, item_id)
+            self.vectors = np.concatenate([self.vectors.reshape(-1, vector.shape[1]), vector])
+            self.lists = np.append(self.lists, self._assign(vector))
+        self._order = None
+        self._maybe_retrain()
+
+    def add(self, item_id: int, vector: np.ndarray, persist: bool = True):
+        """Dodaje lub zastępuje wektor (przyrostowo) i zapisuje indeks."""
+        with self._lock:
+            if not persist:
+                self._upsert(item_id, vector)
+                return
+            with self._file_lock():
+                self.refresh()
+                self._upsert(item_id, vector)
+                self.save()
+
+    def remove(self, item_id: int, persist: bool = True):
+        with self._lock:
+            if persist:
+                with self._file_lock():
+                    self.refresh()
+                    self._remove(item_id)
+                    self.save()
+            else:
+                self._remove(item_id)
+
+    def _remove(self, item_id: int):
+        keep = self.ids != item_id
+        if keep.all():
+            return
+        self.ids, self.vectors, self.lists = self.ids[keep], self.vectors[keep], self.lists[keep]
+        self._order = None
+
+    # --- Wyszukiwanie ---
+
+    def _list_layout(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Pozycje wektorów posortowane po listach i początki list (odświeżane po zmianach)."""
+        if self._order is None:
+            num_lists = len(self.centroids) if self.centroids is not None else 1
+            self._order = np.argsort(self.lists, kind='stable')
+            self._offsets = np.concatenate([[0], np.cumsum(np.bincount(self.lists, minlength=num_lists))])
+        return self._order, self._offsets
+
+    def search(self, vector: np.ndarray, k: int = 10, nprobe: int = IVF_NPROBE,
+               exclude: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        Zwraca do `k` par (identyfikator, podobieństwo cosinusowe) posortowanych malejąco.
+
+        exclude - identyfikator pomijany w wynikach (np. sama wizyta zapytania).
+        """
+        with self._lock:
+            if not len(self.ids):
+                return []
+            query = normalize_vectors(vector).reshape(-1)
+
+            if self.centroids is None:
+                candidates = np.arange(len(self.ids))
+            else:
+                order, offsets = self._list_layout()
+                probe = np.argsort(self.centroids @ query)[::-1][:nprobe]
+                candidates = np.concatenate([order[offsets[i]:offsets[i + 1]] for i in probe])
+
+            if exclude is not None:
+                candidates = candidates[self.ids[candidates] != exclude]
+            scores = self.vectors[candidates] @ query
+
+            top = min(k, len(candidates))
+            if top == 0:
+                return []
+            best = np.argpartition(-scores, top - 1)[:top]
+            best = best[np.argsort(-scores[best])]
+            return [(int(self.ids[candidates[i]]), float(scores[i])) for i in best]
+
+    def __len__(self):
+        return len(self.ids)
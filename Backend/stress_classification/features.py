@@ -0,0 +1,196 @@
+"""
+Cechy fizjologiczne per okno liczone na sygnałach w oryginalnej częstotliwości.
+
+Dla każdego okna klasyfikacji zwracane są:
+- tętno (HR) z odstępów między pikami BVP,
+- składowa toniczna (SCL) i fazowa EDA oraz liczba odpowiedzi skórno-galwanicznych (SCR),
+- energia ruchu (wariancja modułu ACC).
+
+Filtry i detekcja pików są wykonywane raz na całym sygnale, a wartości per okno liczone są
+dla wszystkich okien naraz z sum prefiksowych i np.searchsorted - koszt nie zależy od
+nakładania się okien.
+"""
+from typing import Dict, List, Optional
+
+import numpy as np
+from scipy import signal
+
+# Częstotliwości próbkowania sygnałów wejściowych (jak w preprocess_signals)
+ACC_RATE = 32  # Hz
+BVP_RATE = 64  # Hz
+EDA_RATE = 4   # Hz
+
+# --- KONFIGURACJA DETEKCJI ---
+BVP_BAND_HZ = (0.7, 3.5)          # Pasmo tętna 42-210 bpm
+IBI_RANGE_SEC = (0.33, 1.5)       # Fizjologiczny zakres odstępów między uderzeniami
+BVP_PEAK_PROMINENCE = 0.5         # Minimalna prominencja piku (ułamek odchylenia std. przefiltrowanego BVP)
+MIN_BEATS_PER_WINDOW = 2          # Minimalna liczba poprawnych IBI do wyznaczenia HR
+EDA_SMOOTHING_CUTOFF_HZ = 1.0     # Wygładzenie szumu EDA przed detekcją SCR
+EDA_TONIC_CUTOFF_HZ = 0.05        # Składowa toniczna: dolnoprzepustowy filtr EDA
+SCR_MIN_AMPLITUDE = 0.05          # µS - minimalna amplituda (prominencja) odpowiedzi fazowej
+SCR_MIN_DISTANCE_SEC = 1.0
+
+FEATURE_NAMES = ('heart_rate_bpm', 'eda_tonic_mean', 'eda_phasic_mean', 'scr_count', 'motion_energy')
+
+
+def window_bounds(num_windows: int, sample_rate: float, window_sec: float, step_sec: float,
+                  num_samples: int) -> tuple:
+    """Zwraca indeksy początku i końca (wyłącznie) każdego okna w sygnale o danej częstotliwości."""
+    starts = np.arange(num_windows) * int(step_sec * sample_rate)
+    ends = np.minimum(starts + int(window_sec * sample_rate), num_samples)
+    return starts, ends
+
+
+def window_means(values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Średnie wartości w oknach liczone z sumy prefiksowej."""
+    prefix = np.concatenate([[0.0], np.cumsum(values)])
+    return (prefix[ends] - prefix[starts]) / np.maximum(ends - starts, 1)
+
+
+def _sosfiltfilt(sos: np.ndarray, values: np.ndarray) -> Optional[np.ndarray]:
+    """Filtracja zero-fazowa; None, gdy sygnał jest krótszy niż padding filtra."""
+    if len(values) <= 3 * (2 * len(sos) + 1):
+        return None
+    return signal.sosfiltfilt(sos, values)
+
+
+def detect_bvp_peaks(bvp: np.ndarray, sample_rate: float = BVP_RATE) -> np.ndarray:
+    """
+    Wykrywa uderzenia serca (piki BVP po filtracji pasmowej) w jednym przebiegu po całym sygnale.
+
+    Próg prominencji odrzuca wtórne maksima (fala dykrotyczna, oscylacje filtra).
+    """
+    sos = signal.butter(2, BVP_BAND_HZ, btype='bandpass', fs=sample_rate, output='sos')
+    filtered = _sosfiltfilt(sos, bvp)
+    if filtered is None:
+        filtered = bvp - bvp.mean()
+    peaks, _ = signal.find_peaks(
+        filtered,
+        distance=max(1, int(IBI_RANGE_SEC[0] * sample_rate)),
+        prominence=BVP_PEAK_PROMINENCE * filtered.std()
+    )
+    return peaks
+
+
+def beat_intervals(peaks: np.ndarray, sample_rate: float = BVP_RATE) -> tuple:
+    """
+    Odstępy między uderzeniami (IBI).
+
+    Returns:
+        Tuple (ibi, valid) - ibi[k] to odstęp między pikiem k-1 i k w sekundach (ibi[0] = 0),
+        valid to maska odstępów w fizjologicznym zakresie IBI_RANGE_SEC
+    """
+    ibi = np.diff(peaks, prepend=peaks[0] if len(peaks) else 0) / sample_rate
+    valid = (ibi >= IBI_RANGE_SEC[0]) & (ibi <= IBI_RANGE_SEC[1])
+    return ibi, valid
+
+
+def heart_rate(peaks: np.ndarray, starts: np.ndarray, ends: np.ndarray, sample_rate: float = BVP_RATE) -> np.ndarray:
+    """
+    Tętno (bpm) per okno ze średniego odstępu między pikami BVP.
+
+    Uwzględniane są tylko odstępy, których oba piki leżą w oknie i mieszczą się
+    w IBI_RANGE_SEC. Okna z mniej niż MIN_BEATS_PER_WINDOW odstępami dostają NaN.
+    """
+    ibi, valid = beat_intervals(peaks, sample_rate)
+    ibi_prefix = np.concatenate([[0.0], np.cumsum(np.where(valid, ibi, 0.0))])
+    valid_prefix = np.concatenate([[0], np.cumsum(valid)])
+
+    # Piki w oknie to peaks[lo:hi]; odstępy z obydwoma końcami w oknie to ibi[lo+1:hi]
+    lo = np.searchsorted(peaks, starts)
+    hi = np.searchsorted(peaks, ends)
+    first = np.minimum(lo + 1, hi)
+    ibi_sum = ibi_prefix[hi] - ibi_prefix[first]
+    ibi_count = valid_prefix[hi] - valid_prefix[first]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        hr = 60.0 * ibi_count / ibi_sum
+    return np.where(ibi_count >= MIN_BEATS_PER_WINDOW, hr, np.nan)
+
+
+def eda_components(eda: np.ndarray, starts: np.ndarray, ends: np.ndarray, sample_rate: float = EDA_RATE) -> tuple:
+    """
+    Rozkład EDA na składową toniczną (filtr dolnoprzepustowy) i fazową (wygładzony sygnał
+    minus składowa toniczna). Piki SCR to maksima składowej fazowej o prominencji
+    co najmniej SCR_MIN_AMPLITUDE.
+
+    Returns:
+        Tuple (średnia toniczna, średnia fazowa, liczba pików SCR) - tablice per okno
+    """
+    tonic_sos = signal.butter(2, EDA_TONIC_CUTOFF_HZ, btype='lowpass', fs=sample_rate, output='sos')
+    smoothing_sos = signal.butter(2, EDA_SMOOTHING_CUTOFF_HZ, btype='lowpass', fs=sample_rate, output='sos')
+    tonic = _sosfiltfilt(tonic_sos, eda)
+    smoothed = _sosfiltfilt(smoothing_sos, eda)
+    if tonic is None:
+        tonic = smoothed = np.full_like(eda, eda.mean())
+    phasic = smoothed - tonic
+
+    scr_peaks, _ = signal.find_peaks(
+        phasic,
+        prominence=SCR_MIN_AMPLITUDE,
+        distance=max(1, int(SCR_MIN_DISTANCE_SEC * sample_rate))
+    )
+    scr_count = np.searchsorted(scr_peaks, ends) - np.searchsorted(scr_peaks, starts)
+
+    return window_means(tonic, starts, ends), window_means(phasic, starts, ends), scr_count
+
+
+def motion_energy(acc: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Energia ruchu per okno: wariancja modułu ACC (składowa stała/grawitacja usunięta)."""
+    magnitude = np.linalg.norm(acc, axis=1)
+    mean = window_means(magnitude, starts, ends)
+    mean_square = window_means(magnitude ** 2, starts, ends)
+    return np.maximum(mean_square - mean ** 2, 0.0)
+
+
+def compute_window_features(acc: np.ndarray, bvp: np.ndarray, eda: np.ndarray, num_windows: int,
+                            window_sec: float, step_sec: float,
+                            bvp_peaks: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """
+    Liczy cechy fizjologiczne dla wszystkich okien klasyfikacji.
+
+    Args:
+        acc: ACC (N, 3) w ACC_RATE
+        bvp: BVP (N,) lub (N, 1) w BVP_RATE
+        eda: EDA (N,) lub (N, 1) w EDA_RATE
+        num_windows: Liczba okien (jak w segmentacji do klasyfikacji)
+        bvp_peaks: Wykryte wcześniej piki BVP (np. współdzielone z HRV); None - wykrywane tutaj
+
+    Returns:
+        Słownik {nazwa cechy: tablica (num_windows,)}
+    """
+    acc = np.asarray(acc, dtype=float)
+    bvp = np.asarray(bvp, dtype=float).reshape(-1)
+    eda = np.asarray(eda, dtype=float).reshape(-1)
+
+    bvp_starts, bvp_ends = window_bounds(num_windows, BVP_RATE, window_sec, step_sec, len(bvp))
+    eda_starts, eda_ends = window_bounds(num_windows, EDA_RATE, window_sec, step_sec, len(eda))
+    acc_starts, acc_ends = window_bounds(num_windows, ACC_RATE, window_sec, step_sec, len(acc))
+
+    if bvp_peaks is None:
+        bvp_peaks = detect_bvp_peaks(bvp)
+    tonic_mean, phasic_mean, scr_count = eda_components(eda, eda_starts, eda_ends)
+
+    return {
+        'heart_rate_bpm': heart_rate(bvp_peaks, bvp_starts, bvp_ends),
+        'eda_tonic_mean': tonic_mean,
+        'eda_phasic_mean': phasic_mean,
+        'scr_count': scr_count,
+        'motion_energy': motion_energy(acc, acc_starts, acc_ends),
+    }
+
+
+def features_to_records(features: Dict[str, np.ndarray]) -> List[Dict[str, Optional[float]]]:
+    """Zamienia cechy na listę słowników per okno (NaN -> None, gotowe do JSON)."""
+    num_windows = len(next(iter(features.values()))) if features else 0
+    records = []
+    for i in range(num_windows):
+        record = {}
+        for name, values in features.items():
+            value = values[i]
+            if np.issubdtype(values.dtype, np.integer):
+                record[name] = int(value)
+            else:
+                record[name] = None if np.isnan(value) else round(float(value), 4)
+        records.append(record)
+    return records
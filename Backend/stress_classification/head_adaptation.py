@@ -0,0 +1,137 @@
+"""
+Adaptacja klasyfikatora do pacjenta - douczanie samej głowy (`classifier`) na zapisanych cechach.
+
+Przy klasyfikacji wizyty cechy okien z zamrożonej części modelu (CNN + LSTM, w modelu ucznia TCN)
+zapisywane są raz jako float16. Gdy terapeuta oznaczy okna wizyt pacjenta, głowa modelu jest
+douczana wyłącznie na tych cechach - bez ponownego przejścia przez CNN-LSTM, więc trening trwa
+sekundy na CPU. Wagi startują z głowy globalnej i są do niej przyciągane (kara L2), co chroni
+przed przeuczeniem na kilkudziesięciu oknach.
+"""
+import copy
+import io
+import time
+from typing import Dict, Optional
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+# --- KONFIGURACJA DOUCZANIA ---
+MIN_LABELLED_WINDOWS = 30        # Minimum oznaczonych okien (z cechami), aby douczać głowę
+HEAD_STEPS = 300                 # Kroki optymalizacji (niezależnie od liczby okien)
+HEAD_BATCH_SIZE = 256
+HEAD_LEARNING_RATE = 3e-3
+HEAD_ANCHOR_WEIGHT = 1e-2        # Siła przyciągania wag do głowy globalnej
+HEAD_VALIDATION_FRACTION = 0.2   # Część okien odłożona do porównania głowy globalnej i douczonej
+FEATURE_DTYPE = np.float16
+
+
+def encode_features(features: np.ndarray) -> bytes:
+    """Cechy okien (okna, wymiar) jako bajty float16 (okna bez cech - wiersze NaN)."""
+    return np.ascontiguousarray(features, dtype=FEATURE_DTYPE).tobytes()
+
+
+def decode_features(data: bytes, num_windows: int, dimension: int) -> np.ndarray:
+    return np.frombuffer(data, dtype=FEATURE_DTYPE).reshape(num_windows, dimension).astype(np.float32)
+
+
+def serialize_head_state(head: nn.Module) -> bytes:
+    """Wagi głowy jako plik .npz (bez pickle)."""
+    buffer = io.BytesIO()
+    np.savez(buffer, **{name: tensor.detach().cpu().numpy() for name, tensor in head.state_dict().items()})
+    return buffer.getvalue()
+
+
+def deserialize_head_state(data: bytes) -> Dict[str, np.ndarray]:
+    with np.load(io.BytesIO(data), allow_pickle=False) as arrays:
+        return {name: arrays[name] for name in arrays.files}
+
+
+def build_head(base_head: nn.Module, state: Dict[str, np.ndarray]) -> nn.Module:
+    """Kopia głowy globalnej z wagami pacjenta."""
+    head = copy.deepcopy(base_head)
+    head.load_state_dict({name: torch.from_numpy(np.asarray(value)) for name, value in state.items()})
+    return head.eval()
+
+
+def _accuracy(head: nn.Module, features: torch.Tensor, labels: torch.Tensor) -> Optional[float]:
+    if len(labels) == 0:
+        return None
+    with torch.no_grad():
+        return float((head(features).argmax(dim=1) == labels).float().mean())
+
+
+def fine_tune_head(base_head: nn.Module, features: np.ndarray, labels: np.ndarray, num_classes: int,
+                   steps: int = HEAD_STEPS, seed: int = 0) -> tuple:
+    """
+    Douczanie kopii głowy globalnej na cechach oznaczonych okien.
+
+    Strata to entropia krzyżowa z wagami klas (odwrotność częstości) plus kara L2 za odejście
+    od wag globalnych. Okna walidacyjne nie biorą udziału w treningu.
+
+    Returns:
+        Tuple (głowa w trybie eval, raport z dokładnością głowy globalnej i douczonej)
+    """
+    start = time.perf_counter()
+    generator = torch.Generator().manual_seed(seed)
+    order = torch.randperm(len(labels), generator=generator)
+    num_validation = int(len(labels) * HEAD_VALIDATION_FRACTION)
+    validation, training = order[:num_validation], order[num_validation:]
+
+    X = torch.as_tensor(features, dtype=torch.float32)
+    y = torch.as_tensor(labels, dtype=torch.long)
+    X_train, y_train = X[training], y[training]
+
+    base_head = copy.deepcopy(base_head).float().eval()
+    head = copy.deepcopy(base_head).train()
+    for parameter in head.parameters():
+        parameter.requires_grad_(True)
+    anchors = [parameter.detach().clone() for parameter in head.parameters()]
+
+    counts = torch.bincount(y_train, minlength=num_classes).float()
+    class_weights = torch.where(counts > 0, len(y_train) / (num_classes * counts.clamp(min=1)), torch.zeros_like(counts))
+    criterion = nn.CrossEntropyLoss(weight=class_weights)
+    optimizer = torch.optim.Adam(head.parameters(), lr=HEAD_LEARNING_RATE)
+
+    for _ in range(steps):
+        batch = torch.randint(len(y_train), (min(HEAD_BATCH_SIZE, len(y_train)),), generator=generator)
+        loss = criterion(head(X_train[batch]), y_train[batch])
+        loss = loss + HEAD_ANCHOR_WEIGHT * sum(
+            ((parameter - anchor) ** 2).sum() for parameter, anchor in zip(head.parameters(), anchors)
+        )
+        optimizer.zero_grad()
+        loss.backward()
+        optimizer.step()
+
+    head.eval()
+    for parameter in head.parameters():
+        parameter.requires_grad_(False)
+
+    report = {
+        'labelled_windows': int(len(labels)),
+        'training_windows': int(len(training)),
+        'validation_windows': int(num_validation),
+        'class_counts': torch.bincount(y, minlength=num_classes).tolist(),
+        'global_accuracy': _accuracy(base_head, X[validation], y[validation]),
+        'adapted_accuracy': _accuracy(head, X[validation], y[validation]),
+        'training_seconds': round(time.perf_counter() - start, 3),
+    }
+    return head, report
+
+
+class WindowFeatureCollector:
+    """
+    Zbiera cechy okien (float16) w kolejności okien nagrania podczas inferencji.
+
+    Przekazywany do ścieżki predykcji jako `sink(indeksy_okien, cechy)`; okna, które nie przeszły
+    przez model (filtr jakości, kaskada, adaptacyjny krok), pozostają wierszami NaN.
+    """
+
+    def __init__(self, num_windows: int):
+        self.num_windows = num_windows
+        self.features = None
+
+    def __call__(self, rows: np.ndarray, features: np.ndarray):
+        if self.features is None:
+            self.features = np.full((self.num_windows, features.shape[1]), np.nan, dtype=FEATURE_DTYPE)
+        self.features[rows] = features
@@ -0,0 +1,165 @@
+"""
+Zmienność rytmu serca (HRV) z sygnału BVP dla całej sesji i dla okien klasyfikacji.
+
+Uderzenia są wykrywane raz na całym sygnale BVP 64 Hz (features.detect_bvp_peaks).
+Metryki czasowe (RMSSD, SDNN, pNN50) per okno liczone są dla wszystkich okien naraz
+z sum prefiksowych; LF/HF wyznaczane jest dla całej sesji z tachogramu (Welch),
+bo 30-sekundowe okno jest krótsze niż okres pasma LF (do 25 s).
+"""
+import time
+from typing import Dict, Optional
+
+import numpy as np
+from scipy import signal
+
+from .features import beat_intervals, detect_bvp_peaks, window_bounds, BVP_RATE
+
+# --- KONFIGURACJA HRV ---
+NN50_THRESHOLD_SEC = 0.05          # Próg pNN50: różnica kolejnych IBI > 50 ms
+TACHOGRAM_RATE = 4.0               # Hz - równomierne próbkowanie tachogramu do analizy widmowej
+LF_BAND_HZ = (0.04, 0.15)
+HF_BAND_HZ = (0.15, 0.4)
+MIN_SPECTRAL_DURATION_SEC = 120    # Minimalna długość nagrania dla LF/HF
+WELCH_SEGMENT_SEC = 256            # Długość segmentu Welcha (rozdzielczość ~0.004 Hz)
+
+# Budżet czasu analizy HRV dla 8-godzinnego nagrania (sprawdzany przez test i benchmark)
+HRV_TIME_BUDGET_SEC = 3.0
+HRV_BUDGET_DURATION_SEC = 8 * 3600
+
+
+def _successive_differences(ibi: np.ndarray, valid: np.ndarray) -> tuple:
+    """
+    Różnice kolejnych IBI: diff[k] = ibi[k] - ibi[k-1] (diff[0] = 0).
+
+    Returns:
+        Tuple (diff, diff_valid) - różnica jest poprawna, gdy oba odstępy są poprawne
+    """
+    diff = np.diff(ibi, prepend=ibi[0] if len(ibi) else 0.0)
+    diff_valid = valid & np.concatenate([[False], valid[:-1]]) if len(valid) else valid
+    return diff, diff_valid
+
+
+def _prefix(values: np.ndarray) -> np.ndarray:
+    return np.concatenate([[0.0], np.cumsum(values, dtype=float)])
+
+
+def spectral_hrv(peaks: np.ndarray, ibi: np.ndarray, valid: np.ndarray,
+                 sample_rate: float = BVP_RATE) -> Dict[str, Optional[float]]:
+    """
+    Moc w pasmach LF i HF tachogramu (ms^2) oraz stosunek LF/HF.
+
+    Tachogram (poprawne IBI w chwilach uderzeń) jest interpolowany liniowo do TACHOGRAM_RATE,
+    a widmo liczone metodą Welcha. Dla nagrań krótszych niż MIN_SPECTRAL_DURATION_SEC
+    zwracane są wartości None.
+    """
+    empty = {'lf_power_ms2': None, 'hf_power_ms2': None, 'lf_hf_ratio': None}
+    if valid.sum() < 3:
+        return empty
+
+    beat_times = peaks[valid] / sample_rate
+    ibi_ms = ibi[valid] * 1000.0
+    if beat_times[-1] - beat_times[0] < MIN_SPECTRAL_DURATION_SEC:
+        return empty
+
+    grid = np.arange(beat_times[0], beat_times[-1], 1.0 / TACHOGRAM_RATE)
+    tachogram = signal.detrend(np.interp(grid, beat_times, ibi_ms))
+    frequencies, power = signal.welch(
+        tachogram,
+        fs=TACHOGRAM_RATE,
+        nperseg=min(len(tachogram), int(WELCH_SEGMENT_SEC * TACHOGRAM_RATE))
+    )
+    df = frequencies[1] - frequencies[0]
+
+    def band_power(band):
+        mask = (frequencies >= band[0]) & (frequencies < band[1])
+        return float(power[mask].sum() * df)
+
+    lf, hf = band_power(LF_BAND_HZ), band_power(HF_BAND_HZ)
+    return {
+        'lf_power_ms2': round(lf, 2),
+        'hf_power_ms2': round(hf, 2),
+        'lf_hf_ratio': round(lf / hf, 3) if hf > 0 else None,
+    }
+
+
+def session_hrv(peaks: np.ndarray, sample_rate: float = BVP_RATE) -> Dict[str, Optional[float]]:
+    """
+    Metryki HRV dla całej sesji: średnie tętno, RMSSD, SDNN, pNN50 oraz LF/HF.
+
+    Wartości czasowe w milisekundach, pNN50 w procentach. Brak poprawnych odstępów -> None.
+    """
+    ibi, valid = beat_intervals(peaks, sample_rate)
+    diff, diff_valid = _successive_differences(ibi, valid)
+    nn = ibi[valid]
+    successive = diff[diff_valid]
+
+    metrics = {
+        'num_beats': int(len(peaks)),
+        'valid_intervals': int(len(nn)),
+        'mean_heart_rate_bpm': round(float(60.0 / nn.mean()), 2) if len(nn) else None,
+        'sdnn_ms': round(float(nn.std() * 1000.0), 2) if len(nn) >= 2 else None,
+        'rmssd_ms': round(float(np.sqrt(np.mean(successive ** 2)) * 1000.0), 2) if len(successive) else None,
+        'pnn50': round(float(np.mean(np.abs(successive) > NN50_THRESHOLD_SEC) * 100.0), 2) if len(successive) else None,
+    }
+    metrics.update(spectral_hrv(peaks, ibi, valid, sample_rate))
+    return metrics
+
+
+def window_hrv(peaks: np.ndarray, starts: np.ndarray, ends: np.ndarray,
+               sample_rate: float = BVP_RATE) -> Dict[str, np.ndarray]:
+    """
+    Metryki HRV (RMSSD, SDNN w ms, pNN50 w %) dla wszystkich okien naraz.
+
+    Okno [start, end) w próbkach BVP obejmuje odstępy ibi[lo+1:hi] (oba piki w oknie)
+    i różnice diff[lo+2:hi]. Sumy liczone są z sum prefiksowych; okna bez wystarczającej
+    liczby odstępów dostają NaN.
+    """
+    ibi, valid = beat_intervals(peaks, sample_rate)
+    diff, diff_valid = _successive_differences(ibi, valid)
+
+    count_prefix = _prefix(valid)
+    sum_prefix = _prefix(np.where(valid, ibi, 0.0))
+    square_prefix = _prefix(np.where(valid, ibi ** 2, 0.0))
+    diff_count_prefix = _prefix(diff_valid)
+    diff_square_prefix = _prefix(np.where(diff_valid, diff ** 2, 0.0))
+    nn50_prefix = _prefix(diff_valid & (np.abs(diff) > NN50_THRESHOLD_SEC))
+
+    lo = np.searchsorted(peaks, starts)
+    hi = np.searchsorted(peaks, ends)
+    first_ibi = np.minimum(lo + 1, hi)
+    first_diff = np.minimum(lo + 2, hi)
+
+    count = count_prefix[hi] - count_prefix[first_ibi]
+    total = sum_prefix[hi] - sum_prefix[first_ibi]
+    squares = square_prefix[hi] - square_prefix[first_ibi]
+    diff_count = diff_count_prefix[hi] - diff_count_prefix[first_diff]
+    diff_squares = diff_square_prefix[hi] - diff_square_prefix[first_diff]
+    nn50 = nn50_prefix[hi] - nn50_prefix[first_diff]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = total / count
+        variance = np.maximum(squares / count - mean ** 2, 0.0)
+        sdnn = np.where(count >= 2, np.sqrt(variance) * 1000.0, np.nan)
+        rmssd = np.where(diff_count >= 1, np.sqrt(diff_squares / diff_count) * 1000.0, np.nan)
+        pnn50 = np.where(diff_count >= 1, nn50 / diff_count * 100.0, np.nan)
+
+    return {'rmssd_ms': rmssd, 'sdnn_ms': sdnn, 'pnn50': pnn50}
+
+
+def compute_window_hrv(peaks: np.ndarray, num_windows: int, window_sec: float, step_sec: float,
+                       num_samples: int, sample_rate: float = BVP_RATE) -> Dict[str, np.ndarray]:
+    """Metryki HRV dla okien klasyfikacji (te same granice co segmentacja)."""
+    starts, ends = window_bounds(num_windows, sample_rate, window_sec, step_sec, num_samples)
+    return window_hrv(peaks, starts, ends, sample_rate)
+
+
+def compute_session_hrv(bvp: np.ndarray, sample_rate: float = BVP_RATE,
+                        peaks: Optional[np.ndarray] = None) -> Dict[str, Optional[float]]:
+    """Wykrywa uderzenia (jeśli nie podano pików) i zwraca metryki HRV sesji wraz z czasem obliczeń."""
+    start = time.perf_counter()
+    if peaks is None:
+        peaks = detect_bvp_peaks(np.asarray(bvp, dtype=float).reshape(-1), sample_rate)
+    metrics = session_hrv(peaks, sample_rate)
+    metrics['duration_seconds'] = round(len(np.asarray(bvp).reshape(-1)) / sample_rate, 1)
+    metrics['compute_seconds'] = round(time.perf_counter() - start, 4)
+    return metrics
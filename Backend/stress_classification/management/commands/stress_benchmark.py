@@ -0,0 +1,24 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from stress_classification.benchmarks import BENCHMARKS
+
+
+class Command(BaseCommand):
+    help = "Uruchamia benchmark serwisu klasyfikacji stresu i wypisuje raport JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('benchmark', choices=sorted(BENCHMARKS), help="Nazwa benchmarku")
+        parser.add_argument('--output', help="Opcjonalna ścieżka pliku, do którego zapisać raport")
+
+    def handle(self, *args, **options):
+        report = BENCHMARKS[options['benchmark']]()
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+            self.stdout.write(self.style.SUCCESS(f"Raport zapisany w {options['output']}"))
+        else:
+            self.stdout.write(output)
@@ -12,6 +12,25 @@ from pathlib import Path
 from datetime import datetime, timedelta
 from typing import Optional, Dict
 import os
+import contextlib
+import hashlib
+import json
+import logging
+import threading
+import time
+
+from .autotune import autotune, get_worker_count, candidate_thread_counts
+from .cascade import BaselineGate, compute_gate_features, BASELINE_CLASS
+from .data_simulator import generate_calibration_windows
+from .features import compute_window_features, detect_bvp_peaks, features_to_records
+from .hrv import compute_session_hrv, compute_window_hrv
+from .signal_quality import compute_signal_quality
+from .smoothing import load_transition_matrix, smooth_predictions
+from .normalization import personalize_segments, profile_is_ready, signal_statistics
+from .head_adaptation import WindowFeatureCollector, build_head, fine_tune_head, serialize_head_state
+from .shadow import ShadowEvaluator, ShadowStore, SHADOW_MODEL_CONFIG, SHADOW_DB_FILENAME
+
+logger = logging.getLogger(__name__)
 
 # --- KONFIGURACJA PRZETWARZANIA ---
 TARGET_RATE = 4    # Hz - Docelowa częstotliwość próbkowania
@@ -22,9 +41,73 @@ STEP_SEC = 10      # Sekundy - Przesunięcie okna (overlap: 20 sekund)
 BATCH_SIZE = 32
 DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 NUM_CLASSES = 4  # 0: Baseline, 1: Stress, 2: Amusement, 3: Meditation
+NUM_CHANNELS = 6  # ACC_x, ACC_y, ACC_z, BVP, EDA, TEMP
+SEQ_LEN = WINDOW_SEC * TARGET_RATE
+
+# Opcjonalny plik konfiguracyjny modelu (typ, plik wag, rozmiary warstw) - np. odchudzony model
+MODEL_CONFIG_PATH = os.getenv('STRESS_MODEL_CONFIG')
+
+# Wagi ładowane przez mmap - strony pliku w page cache są współdzielone przez wszystkie procesy
+MMAP_WEIGHTS = os.getenv('STRESS_MMAP_WEIGHTS', 'True') == 'True'
+
+# --- PRECYZJA INFERENCJI ---
+# 'fp32' (domyślnie) lub 'bf16' - autocast bfloat16 dla ścieżki Conv1d/LSTM na CPU z natywnym bf16.
+# Tryb bf16 jest włączany tylko, jeśli na zbiorze kalibracyjnym (okna wszystkich klas) zgodność
+# klas z fp32 wynosi co najmniej BF16_MIN_AGREEMENT, a prawdopodobieństwa żadnego okna nie
+# różnią się od fp32 o więcej niż BF16_MAX_PROBABILITY_DIFF.
+INFERENCE_PRECISION = os.getenv('STRESS_INFERENCE_PRECISION', 'fp32')
+BF16_MIN_AGREEMENT = float(os.getenv('STRESS_BF16_MIN_AGREEMENT', '0.99'))
+BF16_MAX_PROBABILITY_DIFF = float(os.getenv('STRESS_BF16_MAX_PROBABILITY_DIFF', '0.05'))
+
+# --- KONFIGURACJA AUTOTUNINGU ---
+AUTOTUNE_ENABLED = os.getenv('STRESS_AUTOTUNE', 'True') == 'True'
+AUTOTUNE_CACHE_PATH = os.getenv('STRESS_AUTOTUNE_CACHE')
+
+# --- KONFIGURACJA KASKADY (filtr wstępny przed CNN-LSTM) ---
+CASCADE_ENABLED = os.getenv('STRESS_CASCADE', 'False') == 'True'
+CASCADE_AGREEMENT_TARGET = float(os.getenv('STRESS_CASCADE_AGREEMENT', '0.98'))
+
+# --- KONFIGURACJA ADAPTACYJNEGO KROKU ---
+# Najpierw klasyfikacja co COARSE_STEP_SEC, potem doklasyfikowanie co STEP_SEC tylko tam,
+# gdzie sąsiednie zgrubne predykcje się różnią lub pewność jest niska
+ADAPTIVE_STRIDE_ENABLED = os.getenv('STRESS_ADAPTIVE_STRIDE', 'False') == 'True'
+COARSE_STEP_SEC = 30
+ADAPTIVE_CONFIDENCE_THRESHOLD = float(os.getenv('STRESS_ADAPTIVE_CONFIDENCE', '0.8'))
+
+# Cechy fizjologiczne per okno (HR, SCR, ruch) w odpowiedzi klasyfikacji
+WINDOW_FEATURES_ENABLED = os.getenv('STRESS_WINDOW_FEATURES', 'True') == 'True'
+
+# Metryki HRV (sesja i okna) z uderzeń wykrytych w BVP
+HRV_ENABLED = os.getenv('STRESS_HRV', 'True') == 'True'
+
+# Indeks jakości sygnału (SQI) - okna poniżej progu nie trafiają do modelu (0 wyłącza filtr)
+SQI_THRESHOLD = float(os.getenv('STRESS_SQI_THRESHOLD', '0.5'))
+
+# Wygładzanie czasowe predykcji (HMM + Viterbi) - ogranicza przeskoki klas między sąsiednimi oknami
+TEMPORAL_SMOOTHING_ENABLED = os.getenv('STRESS_TEMPORAL_SMOOTHING', 'False') == 'True'
+
+# Embedding sesji (uśrednione cechy modelu z okien) do wyszukiwania podobnych sesji
+SESSION_EMBEDDING_ENABLED = os.getenv('STRESS_SESSION_EMBEDDING', 'True') == 'True'
+EMBEDDING_MAX_WINDOWS = 64  # Okna (równomiernie rozłożone) użyte do embeddingu - stały koszt dla długich nagrań
+
+# Normalizacja EDA/TEMP profilem pacjenta zamiast parametrów globalnych (patient_management)
+PATIENT_NORMALIZATION_ENABLED = os.getenv('STRESS_PATIENT_NORMALIZATION', 'False') == 'True'
+
+# Głowy klasyfikatora douczone per pacjent (head_adaptation.py) - używane, gdy pacjent ma głowę bieżącego modelu
+PATIENT_HEAD_ENABLED = os.getenv('STRESS_PATIENT_HEADS', 'True') == 'True'
+
+# --- ZBIÓR KALIBRACYJNY (kaskada, kontrola bf16) ---
+# Surowe okna osób wydzielonych z treningu z etykietami 0-3, eksportowane przez
+# `train_on_multiple_files.py --calibration` (domyślnie cnn/calibration_windows.npz).
+# Bez pliku używane są deterministyczne okna symulowane w rozkładzie populacji (bez etykiet).
+CALIBRATION_SET_PATH = os.getenv('STRESS_CALIBRATION_SET')
 
 # Nazwy klas
 CLASS_NAMES = ['Baseline', 'Stress', 'Amusement', 'Meditation']
+
+# Okna odrzucone przez filtr jakości sygnału (nie są klasyfikowane)
+UNUSABLE_CLASS = -1
+UNUSABLE_CLASS_NAME = 'Unusable'
 CLASS_DESCRIPTIONS = {
     0: {
         'name': 'Baseline',
@@ -49,10 +132,21 @@ CLASS_DESCRIPTIONS = {
         'description': 'Relaksacja - obniżona aktywność, stan spokoju',
         'stress_level': 0,
         'level_name': 'Brak stresu'
+    },
+    UNUSABLE_CLASS: {
+        'name': UNUSABLE_CLASS_NAME,
+        'description': 'Niska jakość sygnału (artefakt, odłączona opaska) - okno pominięte',
+        'stress_level': None,
+        'level_name': 'Brak danych'
     }
 }
 
 
+def get_class_name(class_id: int) -> str:
+    """Zwraca nazwę klasy, uwzględniając okna odrzucone przez filtr jakości."""
+    return UNUSABLE_CLASS_NAME if class_id == UNUSABLE_CLASS else CLASS_NAMES[class_id]
+
+
 def resample_signal(df_signal, original_rate, target_rate):
     """Unifikuje częstotliwość próbkowania (downsampling) za pomocą SciPy resample."""
     if original_rate == target_rate:
@@ -64,18 +158,24 @@ def resample_signal(df_signal, original_rate, target_rate):
 
 
 def segment_data(df_combined, target_rate, window_sec, step_sec):
-    """Segmentuje dane na okna czasowe."""
+    """Segmentuje dane na okna czasowe (widok przesuwnego okna zamiast pętli po iloc)."""
     window_samples = window_sec * target_rate
     step_samples = step_sec * target_rate
     
-    segments = []
+    values = df_combined.values
+    if len(values) < window_samples:
+        return np.empty((0, window_samples, values.shape[1]))
     
-    for start in range(0, len(df_combined) - window_samples + 1, step_samples):
-        end = start + window_samples
-        data_segment = df_combined.iloc[start:end].values
-        segments.append(data_segment)
-    
-    return np.array(segments)
+    # (okna, kanały, kroki_czasowe) -> (okna, kroki_czasowe, kanały)
+    windows = np.lib.stride_tricks.sliding_window_view(values, window_samples, axis=0)[::step_samples]
+    return np.ascontiguousarray(windows.transpose(0, 2, 1))
+
+
+def _subset_sink(sink, indices: np.ndarray):
+    """Przekazuje cechy podzbioru okien do `sink` z indeksami okien całego nagrania."""
+    if sink is None:
+        return None
+    return lambda rows, features: sink(indices[rows], features)
 
 
 def normalize_data(X, mean, std):
@@ -105,58 +205,252 @@ class WESADDataset(Dataset):
 
 
 class CNNLSTMClassifier(nn.Module):
-    """Łączona architektura CNN-LSTM dla szeregów czasowych."""
+    """
+    Łączona architektura CNN-LSTM dla szeregów czasowych.
     
-    def __init__(self, num_channels, seq_len, num_classes):
+    Rozmiary warstw są konfigurowalne, aby serwis mógł ładować odchudzone (przycięte)
+    wersje modelu opisane w pliku konfiguracyjnym. Domyślne wartości odpowiadają
+    oryginalnemu modelowi (32/64 kanały konwolucji, LSTM 2x64).
+    """
+    
+    def __init__(self, num_channels, seq_len, num_classes, conv_channels=(32, 64),
+                 lstm_hidden_size=64, lstm_num_layers=2, fc_hidden_size=32):
         super(CNNLSTMClassifier, self).__init__()
         
+        conv1_channels, conv2_channels = conv_channels
+        
         self.cnn_layers = nn.Sequential(
-            nn.Conv1d(num_channels, 32, kernel_size=8, padding=1),
+            nn.Conv1d(num_channels, conv1_channels, kernel_size=8, padding=1),
             nn.ReLU(),
             nn.MaxPool1d(kernel_size=2, stride=2),
             
-            nn.Conv1d(32, 64, kernel_size=4, padding=1),
+            nn.Conv1d(conv1_channels, conv2_channels, kernel_size=4, padding=1),
             nn.ReLU(),
             nn.MaxPool1d(kernel_size=2, stride=2)
         )
         
-        lstm_input_size = 64
+        lstm_input_size = conv2_channels
         
         self.lstm = nn.LSTM(
             input_size=lstm_input_size, 
-            hidden_size=64, 
-            num_layers=2, 
+            hidden_size=lstm_hidden_size, 
+            num_layers=lstm_num_layers, 
             batch_first=True, 
             bidirectional=False
         )
         
         self.classifier = nn.Sequential(
-            nn.Linear(64, 32),
+            nn.Linear(lstm_hidden_size, fc_hidden_size),
             nn.ReLU(),
             nn.Dropout(0.5),
-            nn.Linear(32, num_classes)
+            nn.Linear(fc_hidden_size, num_classes)
         )
 
-    def forward(self, x):
+    def extract_features(self, x):
+        """Stan końcowy ostatniej warstwy LSTM - reprezentacja okna przed klasyfikatorem."""
         x = self.cnn_layers(x)
         x = x.transpose(1, 2)
         lstm_out, (hn, cn) = self.lstm(x)
-        final_state = hn[-1]
+        return hn[-1]
+
+    def forward(self, x):
+        final_state = self.extract_features(x)
         logits = self.classifier(final_state)
         return logits
 
 
+class TemporalConvClassifier(nn.Module):
+    """
+    Model wyłącznie konwolucyjny (TCN) - uczeń destylowany z CNN-LSTM.
+    
+    Pierwsze `pooled_layers` bloków skraca sekwencję (MaxPool 2x), kolejne używają rosnącej
+    dylatacji (1, 2, 4, ...), dzięki czemu pole recepcyjne pokrywa okno bez rekurencji i wszystkie
+    kroki czasowe liczone są równolegle. Cechy są uśredniane po czasie.
+    """
+    
+    def __init__(self, num_channels, seq_len, num_classes, channels=(16, 32, 32, 64), kernel_size=5,
+                 pooled_layers=2):
+        super(TemporalConvClassifier, self).__init__()
+        
+        layers = []
+        in_channels = num_channels
+        for i, out_channels in enumerate(channels):
+            dilation = 2 ** max(0, i - pooled_layers)
+            layers += [
+                nn.Conv1d(in_channels, out_channels, kernel_size,
+                          padding=dilation * (kernel_size - 1) // 2, dilation=dilation),
+                nn.BatchNorm1d(out_channels),
+                nn.ReLU(),
+            ]
+            if i < pooled_layers:
+                layers.append(nn.MaxPool1d(kernel_size=2, stride=2))
+            in_channels = out_channels
+        
+        self.tcn_layers = nn.Sequential(*layers)
+        self.classifier = nn.Linear(in_channels, num_classes)
+
+    def extract_features(self, x):
+        """Cechy uśrednione po czasie - reprezentacja okna przed klasyfikatorem."""
+        return self.tcn_layers(x).mean(dim=2)
+
+    def forward(self, x):
+        x = self.extract_features(x)
+        logits = self.classifier(x)
+        return logits
+
+
+# Typy modeli obsługiwane przez plik konfiguracyjny (pole "model_type")
+MODEL_TYPES = {
+    'cnn_lstm': CNNLSTMClassifier,
+    'tcn': TemporalConvClassifier,
+}
+
+
+def compare_precision(reference_predictions: np.ndarray, reference_probabilities: np.ndarray,
+                      predictions: np.ndarray, probabilities: np.ndarray,
+                      min_agreement: float, max_probability_diff: float) -> Dict:
+    """
+    Porównuje predykcje obniżonej precyzji z referencyjnymi (fp32) na zbiorze kalibracyjnym.
+    
+    Tryb jest akceptowany, jeśli zgodność klas wynosi co najmniej min_agreement, największa
+    różnica prawdopodobieństw (max |p - p_ref|) nie przekracza max_probability_diff, a predykcje
+    referencyjne zawierają okna spoza Baseline - inaczej porównanie nie sprawdza granic decyzji.
+    """
+    agreement = float((reference_predictions == predictions).mean())
+    probability_diff = float(np.abs(reference_probabilities - probabilities).max())
+    report = {
+        'enabled': False,
+        'agreement': agreement,
+        'min_agreement': min_agreement,
+        'max_probability_diff': probability_diff,
+        'probability_tolerance': max_probability_diff,
+        'num_windows': int(len(reference_predictions)),
+        'prediction_counts': np.bincount(reference_predictions, minlength=NUM_CLASSES).tolist(),
+    }
+    
+    if (reference_predictions == BASELINE_CLASS).all():
+        report['reason'] = "Model nie przewiduje na zbiorze kalibracyjnym okien spoza Baseline"
+    elif agreement < min_agreement:
+        report['reason'] = f"Zgodność klas {agreement:.2%} < {min_agreement:.2%}"
+    elif probability_diff > max_probability_diff:
+        report['reason'] = f"Różnica prawdopodobieństw {probability_diff:.4f} > {max_probability_diff:.4f}"
+    else:
+        report['enabled'] = True
+    return report
+
+
+def load_model_config(config_path: Optional[Path]) -> Dict:
+    """
+    Wczytuje plik konfiguracyjny modelu (JSON).
+    
+    Format:
+        {
+            "model_type": "cnn_lstm",
+            "weights": "stress_classifier_slim.pth",   # ścieżka względem pliku konfiguracji
+            "architecture": {"conv_channels": [24, 48], "lstm_hidden_size": 48, ...}
+        }
+    
+    Bez pliku konfiguracyjnego zwraca opis oryginalnego modelu z folderu cnn.
+    """
+    if config_path is None:
+        return {'model_type': 'cnn_lstm', 'weights': None, 'architecture': {}}
+    
+    config_path = Path(config_path)
+    if not config_path.exists():
+        raise FileNotFoundError(f"Konfiguracja modelu nie znaleziona: {config_path}")
+    
+    with open(config_path) as f:
+        config = json.load(f)
+    
+    if config.get('model_type', 'cnn_lstm') not in MODEL_TYPES:
+        raise ValueError(f"Nieznany typ modelu '{config['model_type']}' (dostępne: {', '.join(MODEL_TYPES)})")
+    
+    weights = config.get('weights')
+    return {
+        'model_type': config.get('model_type', 'cnn_lstm'),
+        'weights': str(config_path.parent / weights) if weights else None,
+        'architecture': config.get('architecture', {}),
+    }
+
+
+def build_classifier(model_type: str = 'cnn_lstm', architecture: Optional[Dict] = None) -> nn.Module:
+    """Tworzy model danego typu o rozmiarach warstw opisanych w konfiguracji."""
+    return MODEL_TYPES[model_type](
+        num_channels=NUM_CHANNELS,
+        seq_len=SEQ_LEN,
+        num_classes=NUM_CLASSES,
+        **(architecture or {})
+    )
+
+
+def load_classifier(model_path: Path, model_type: str = 'cnn_lstm', architecture: Optional[Dict] = None,
+                    device: torch.device = DEVICE, mmap: bool = MMAP_WEIGHTS) -> nn.Module:
+    """
+    Tworzy model i ładuje jego wagi z pliku.
+    
+    Przy mmap=True (tylko CPU) plik wag jest mapowany do pamięci, a parametry modelu wskazują
+    bezpośrednio na zmapowane strony (load_state_dict(assign=True)) zamiast kopii w prywatnej
+    stercie procesu. Model jest budowany na urządzeniu 'meta', więc nie alokujemy też wag
+    inicjalizacyjnych, które i tak zostałyby nadpisane.
+    """
+    use_mmap = mmap and device.type == 'cpu'
+    
+    if use_mmap:
+        state_dict = torch.load(model_path, map_location=device, mmap=True, weights_only=True)
+        with torch.device('meta'):
+            model = build_classifier(model_type, architecture)
+        model.load_state_dict(state_dict, assign=True)
+    else:
+        model = build_classifier(model_type, architecture).to(device)
+        model.load_state_dict(torch.load(model_path, map_location=device))
+    
+    model.eval()
+    return model
+
+
 class StressClassificationService:
     """Serwis do klasyfikacji stresu."""
     
-    def __init__(self):
+    def __init__(self, model_config_path: Optional[Path] = None):
+        self.model_config_path = model_config_path or MODEL_CONFIG_PATH
+        self.model_config = None
         self.model = None
         self.mean = None
         self.std = None
         self.model_loaded = False
+        self.batch_size = BATCH_SIZE
+        self.tuning = None
+        self.model_version = None
+        self.warm = False
+        self.warm_up_seconds = None
+        self.num_threads = None
+        self.inference_slots = 1
+        self.cascade_gate = None
+        self.cascade_check = None
+        self._calibration_set = None
+        self.calibration_source = None
+        self.precision = 'fp32'
+        self.precision_check = None
+        self.transition_matrix = None
+        self.transition_source = None
+        self.shadow = None
+        # Blokada cyklu życia (ładowanie, autotuning, rozgrzewka) - po inicjalizacji
+        # odczyty sprawdzają tylko flagi i nie biorą blokady
+        self._lifecycle_lock = threading.RLock()
+        self._inference_semaphore = threading.BoundedSemaphore(1)
         
+    def _get_model_config(self) -> Dict:
+        """Zwraca konfigurację modelu (wczytywaną raz z pliku STRESS_MODEL_CONFIG)."""
+        if self.model_config is None:
+            self.model_config = load_model_config(self.model_config_path)
+        return self.model_config
+    
     def _get_model_path(self):
-        """Zwraca ścieżkę do modelu z folderu cnn w serwisie."""
+        """Zwraca ścieżkę do wag modelu z konfiguracji lub z folderu cnn w serwisie."""
+        weights = self._get_model_config()['weights']
+        if weights:
+            return Path(weights)
+        
         base_dir = Path(__file__).resolve().parent  # folder serwisu, gdzie jest ten plik
         model_path = base_dir / 'cnn' / 'stress_classifier_multi_subject.pth'
         return model_path
@@ -167,11 +461,64 @@ class StressClassificationService:
         norm_path = base_dir / 'cnn' / 'normalization_params.npz'
         return norm_path
     
-    def load_model(self):
-        """Ładuje model i parametry normalizacji."""
-        if self.model_loaded:
+    def _get_transition_matrix_path(self):
+        """Zwraca ścieżkę do wyuczonej macierzy przejść klas z folderu cnn w serwisie."""
+        base_dir = Path(__file__).resolve().parent
+        return base_dir / 'cnn' / 'transition_matrix.npy'
+    
+    def _get_calibration_set_path(self):
+        """Zwraca ścieżkę do zbioru kalibracyjnego (STRESS_CALIBRATION_SET lub folder cnn w serwisie)."""
+        if CALIBRATION_SET_PATH:
+            return Path(CALIBRATION_SET_PATH)
+        return Path(__file__).resolve().parent / 'cnn' / 'calibration_windows.npz'
+    
+    def _get_runtime_dir(self):
+        """Zwraca katalog na pliki generowane w trakcie działania serwisu (cache, statystyki)."""
+        runtime_dir = os.getenv('STRESS_RUNTIME_DIR')
+        if runtime_dir:
+            return Path(runtime_dir)
+        return Path(__file__).resolve().parent.parent / 'media' / 'stress_classification'
+    
+    def _get_shadow_store_path(self):
+        """Zwraca ścieżkę do bazy porównań ewaluacji w cieniu."""
+        return self._get_runtime_dir() / SHADOW_DB_FILENAME
+    
+    def _get_autotune_cache_path(self):
+        """Zwraca ścieżkę do pliku z wynikiem autotuningu."""
+        if AUTOTUNE_CACHE_PATH:
+            return Path(AUTOTUNE_CACHE_PATH)
+        return self._get_runtime_dir() / 'autotune.json'
+    
+    def load_model(self, tune: bool = True):
+        """
+        Ładuje model i parametry normalizacji.
+        
+        Args:
+            tune: Czy uruchomić autotuning po załadowaniu wag. Proces master gunicorna
+                ładuje tylko wagi (tune=False), a pomiary wykonuje każdy worker po forku.
+        """
+        if self.model_loaded and (not tune or self.num_threads is not None):
             return
         
+        with self._lifecycle_lock:
+            if not self.model_loaded:
+                self._load_weights()
+            
+            if tune and self.num_threads is None:
+                if AUTOTUNE_ENABLED:
+                    # Dobór batch size i liczby wątków dla tej maszyny
+                    self.tune(self._get_model_path())
+                else:
+                    self._apply_thread_budget(candidate_thread_counts(get_worker_count())[-1])
+                
+                if INFERENCE_PRECISION == 'bf16':
+                    self.enable_bf16()
+                
+                if CASCADE_ENABLED:
+                    self.calibrate_cascade()
+    
+    def _load_weights(self):
+        """Wczytuje wagi modelu i parametry normalizacji z plików."""
         model_path = self._get_model_path()
         norm_path = self._get_norm_params_path()
         
@@ -186,21 +533,276 @@ class StressClassificationService:
         self.mean = norm_params['mean']
         self.std = norm_params['std']
         
-        # Inicjalizacja modelu
-        num_channels = 6
-        seq_len = 120
+        # Inicjalizacja modelu i ładowanie wag
+        model_config = self._get_model_config()
+        self.model = load_classifier(model_path, model_config['model_type'], model_config['architecture'])
+        self.model_version = self._compute_model_version(model_path)
         
-        self.model = CNNLSTMClassifier(
-            num_channels=num_channels,
-            seq_len=seq_len,
-            num_classes=NUM_CLASSES
-        ).to(DEVICE)
+        # Macierz przejść do wygładzania czasowego (domyślna, gdy brak wyuczonej)
+        self.transition_matrix, self.transition_source = load_transition_matrix(
+            self._get_transition_matrix_path(), NUM_CLASSES
+        )
         
-        # Ładowanie wag modelu
-        self.model.load_state_dict(torch.load(model_path, map_location=DEVICE))
-        self.model.eval()
+        if SHADOW_MODEL_CONFIG:
+            self.shadow = self.load_shadow_model(SHADOW_MODEL_CONFIG)
         self.model_loaded = True
     
+    def load_shadow_model(self, config_path: Path) -> Optional[ShadowEvaluator]:
+        """
+        Ładuje model kandydujący do ewaluacji w cieniu (plik konfiguracji jak STRESS_MODEL_CONFIG).
+        
+        Błąd ładowania kandydata nie blokuje modelu produkcyjnego - ewaluacja jest wtedy wyłączona.
+        """
+        try:
+            config = load_model_config(Path(config_path))
+            if not config['weights']:
+                raise ValueError("Konfiguracja kandydata musi wskazywać plik wag ('weights')")
+            weights = Path(config['weights'])
+            model = load_classifier(weights, config['model_type'], config['architecture'])
+            evaluator = ShadowEvaluator(
+                model, self._compute_model_version(weights), ShadowStore(self._get_shadow_store_path()),
+                self.mean, self.std, NUM_CLASSES, device=DEVICE
+            )
+        except Exception as e:
+            logger.error(f"Nie udało się załadować modelu kandydującego ({config_path}): {e}")
+            return None
+        logger.info(f"Ewaluacja w cieniu włączona dla modelu {evaluator.model_version}")
+        return evaluator
+    
+    @staticmethod
+    def _compute_model_version(model_path: Path) -> str:
+        """Zwraca wersję modelu jako skrót SHA-256 pliku z wagami."""
+        digest = hashlib.sha256()
+        with open(model_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()[:12]
+    
+    def warm_up(self):
+        """
+        Ładuje model (jeśli trzeba) i wykonuje rozgrzewkowy forward pass.
+        
+        Pierwsze wywołanie modelu w procesie inicjalizuje kernele torch - wykonujemy je
+        przed przyjęciem ruchu, aby pierwsza klasyfikacja nie płaciła tego kosztu.
+        """
+        if self.warm:
+            return
+        
+        with self._lifecycle_lock:
+            if self.warm:
+                return
+            
+            start = time.perf_counter()
+            self.load_model()
+            
+            inputs = torch.zeros(self.batch_size, NUM_CHANNELS, SEQ_LEN, device=DEVICE)
+            with torch.no_grad():
+                self.model(inputs)
+            
+            self.warm_up_seconds = time.perf_counter() - start
+            self.warm = True
+    
+    def get_readiness(self) -> Dict:
+        """Zwraca stan gotowości serwisu do obsługi ruchu."""
+        return {
+            'status': 'ready' if self.warm else 'warming',
+            'model_loaded': self.model_loaded,
+            'warm': self.warm,
+            'model_version': self.model_version,
+            'warm_up_seconds': self.warm_up_seconds,
+            'pid': os.getpid(),
+        }
+    
+    def tune(self, model_path: Path, force: bool = False):
+        """Uruchamia autotuning (lub odczytuje wynik z cache) i stosuje wybraną konfigurację."""
+        with self._lifecycle_lock:
+            self.tuning = autotune(
+                self.model,
+                model_path,
+                self._get_autotune_cache_path(),
+                DEVICE,
+                num_channels=NUM_CHANNELS,
+                seq_len=SEQ_LEN,
+                force=force
+            )
+            self.batch_size = self.tuning['batch_size']
+            self._apply_thread_budget(self.tuning['num_threads'])
+    
+    def _apply_thread_budget(self, num_threads: int):
+        """
+        Ustawia liczbę wątków torch i liczbę równoległych inferencji w procesie.
+        
+        Pula wątków intra-op jest globalna dla procesu, ale każdy wątek żądania (gthread/ASGI)
+        uruchamiający model tworzy własny zespół wątków OpenMP. Liczbę równoległych
+        forward passów ograniczamy tak, by workery x inferencje x wątki <= liczba rdzeni.
+        """
+        cores = os.cpu_count() or 1
+        self.inference_slots = max(1, cores // (get_worker_count() * num_threads))
+        self._inference_semaphore = threading.BoundedSemaphore(self.inference_slots)
+        if torch.get_num_threads() != num_threads:
+            torch.set_num_threads(num_threads)
+        self.num_threads = num_threads
+    
+    def get_calibration_set(self) -> tuple:
+        """
+        Zwraca zbiór kalibracyjny (X, y) - surowe okna i etykiety 0-3 osób wydzielonych z treningu.
+        
+        Bez pliku zbioru zwraca okna symulowane w rozkładzie populacji (generate_calibration_windows)
+        z y=None. Źródło zbioru trafia do `calibration_source` ('file' lub 'simulated').
+        """
+        if self._calibration_set is None:
+            if not self.model_loaded:
+                self.load_model(tune=False)
+            path = self._get_calibration_set_path()
+            if path.exists():
+                with np.load(path) as calibration:
+                    self._calibration_set = (calibration['X'], calibration['y'].astype(np.int64))
+                self.calibration_source = 'file'
+            else:
+                logger.warning(f"Brak zbioru kalibracyjnego {path} - kalibracja na oknach symulowanych")
+                self._calibration_set = (generate_calibration_windows(self.mean, self.std, seq_len=SEQ_LEN), None)
+                self.calibration_source = 'simulated'
+        return self._calibration_set
+    
+    def calibrate_cascade(self, agreement_target: Optional[float] = None,
+                          calibration: Optional[tuple] = None) -> Optional[BaselineGate]:
+        """
+        Kalibruje bramkę kaskady względem pełnej inferencji na zbiorze kalibracyjnym.
+        
+        Bramka pozostaje wyłączona (wszystkie okna trafiają do modelu), jeśli model nie przewiduje
+        na zbiorze żadnego okna spoza Baseline albo żaden próg nie osiąga zadanej zgodności.
+        Powód i źródło zbioru trafiają do `cascade_check`.
+        calibration - zbiór (X, y) zamiast get_calibration_set() (np. część zbioru w benchmarku).
+        """
+        if agreement_target is None:
+            agreement_target = CASCADE_AGREEMENT_TARGET
+        if calibration is None:
+            calibration = self.get_calibration_set()
+        
+        X_calibration, labels = calibration
+        predictions, probabilities = self._run_model(X_calibration)
+        features = compute_gate_features(X_calibration, TARGET_RATE)
+        
+        self.cascade_gate = BaselineGate.calibrate(features, predictions, probabilities, agreement_target)
+        self.cascade_check = {
+            'enabled': self.cascade_gate is not None,
+            'calibration_source': self.calibration_source,
+            'agreement_target': agreement_target,
+            'num_windows': int(len(X_calibration)),
+            'label_counts': np.bincount(labels, minlength=NUM_CLASSES).tolist() if labels is not None else None,
+            'prediction_counts': np.bincount(predictions, minlength=NUM_CLASSES).tolist(),
+        }
+        
+        if self.cascade_gate is not None:
+            if labels is not None:
+                gated = self.cascade_gate.mask(features)
+                self.cascade_check['gated_label_agreement'] = float((labels[gated] == BASELINE_CLASS).mean())
+            logger.info(f"Kaskada skalibrowana: {self.cascade_gate.describe()}")
+        else:
+            if (predictions == BASELINE_CLASS).all():
+                self.cascade_check['reason'] = "Model nie przewiduje na zbiorze kalibracyjnym okien spoza Baseline"
+            elif not (predictions == BASELINE_CLASS).any():
+                self.cascade_check['reason'] = "Model nie przewiduje na zbiorze kalibracyjnym okien Baseline"
+            else:
+                self.cascade_check['reason'] = f"Żaden próg nie osiąga zgodności {agreement_target:.2%}"
+            logger.warning(f"Kaskada wyłączona - {self.cascade_check['reason']}")
+        return self.cascade_gate
+    
+    @staticmethod
+    def bf16_supported() -> bool:
+        """Sprawdza, czy CPU ma natywne wsparcie bf16 (AVX512-BF16/AMX) w oneDNN."""
+        if DEVICE.type != 'cpu' or not torch.backends.mkldnn.is_available():
+            return False
+        is_supported = getattr(torch.ops.mkldnn, '_is_mkldnn_bf16_supported', None)
+        return bool(is_supported and is_supported())
+    
+    def enable_bf16(self, min_agreement: Optional[float] = None,
+                    max_probability_diff: Optional[float] = None) -> bool:
+        """
+        Włącza inferencję bf16, jeśli przejdzie kontrolę dokładności na zbiorze kalibracyjnym
+        (compare_precision - zgodność klas i tolerancja prawdopodobieństw względem fp32).
+        Bez pliku zbioru kontrola odbywa się na oknach symulowanych (get_calibration_set).
+        
+        Returns:
+            True jeśli tryb bf16 został włączony, False jeśli pozostaje fp32
+        """
+        if min_agreement is None:
+            min_agreement = BF16_MIN_AGREEMENT
+        if max_probability_diff is None:
+            max_probability_diff = BF16_MAX_PROBABILITY_DIFF
+        
+        if not self.bf16_supported():
+            self.precision_check = {'enabled': False, 'reason': 'CPU bez natywnego wsparcia bf16'}
+            logger.warning("Tryb bf16 niedostępny - CPU bez natywnego wsparcia bf16, używam fp32")
+            return False
+        
+        X_calibration = self.get_calibration_set()[0]
+        fp32_predictions, fp32_probabilities = self._run_model(X_calibration, precision='fp32')
+        bf16_predictions, bf16_probabilities = self._run_model(X_calibration, precision='bf16')
+        
+        self.precision_check = compare_precision(
+            fp32_predictions, fp32_probabilities, bf16_predictions, bf16_probabilities,
+            min_agreement, max_probability_diff
+        )
+        self.precision_check['calibration_source'] = self.calibration_source
+        
+        if self.precision_check['enabled']:
+            self.precision = 'bf16'
+            logger.info(
+                f"Inferencja bf16 włączona (zgodność z fp32: {self.precision_check['agreement']:.2%}, "
+                f"max różnica prawdopodobieństw: {self.precision_check['max_probability_diff']:.4f})"
+            )
+        else:
+            logger.warning(f"Inferencja bf16 odrzucona - {self.precision_check['reason']}, używam fp32")
+        return self.precision_check['enabled']
+    
+    def get_diagnostics(self) -> Dict:
+        """Zwraca informacje diagnostyczne o konfiguracji inferencji."""
+        tuning = None
+        if self.tuning is not None:
+            tuning = {
+                'source': self.tuning['source'],
+                'batch_size': self.tuning['batch_size'],
+                'num_threads': self.tuning['num_threads'],
+                'windows_per_second': self.tuning['windows_per_second'],
+                'tuned_at': self.tuning.get('tuned_at'),
+                'worker_count': self.tuning['signature']['worker_count'],
+                'candidates': self.tuning['candidates'],
+            }
+        
+        return {
+            'model_loaded': self.model_loaded,
+            'model_version': self.model_version,
+            'model_type': self._get_model_config()['model_type'],
+            'architecture': self._get_model_config()['architecture'],
+            'warm': self.warm,
+            'device': str(DEVICE),
+            'cpu_count': os.cpu_count(),
+            'batch_size': self.batch_size,
+            'num_threads': torch.get_num_threads(),
+            'inference_slots': self.inference_slots,
+            'mmap_weights': MMAP_WEIGHTS and DEVICE.type == 'cpu',
+            'precision': self.precision,
+            'precision_check': self.precision_check,
+            'temporal_smoothing_enabled': TEMPORAL_SMOOTHING_ENABLED,
+            'transition_matrix_source': self.transition_source,
+            'cascade_enabled': CASCADE_ENABLED,
+            'cascade': self.cascade_gate.describe() if self.cascade_gate is not None else None,
+            'cascade_check': self.cascade_check,
+            'autotune_enabled': AUTOTUNE_ENABLED,
+            'autotune': tuning,
+            'shadow': self.shadow.describe() if self.shadow is not None else None,
+        }
+    
+    def get_shadow_report(self) -> Dict:
+        """Zwraca porównania modeli kandydujących z produkcyjnym (ze wszystkich workerów)."""
+        return {
+            'enabled': self.shadow is not None,
+            'model_version': self.model_version,
+            'process': self.shadow.describe() if self.shadow is not None else None,
+            'models': ShadowStore(self._get_shadow_store_path()).report(),
+        }
+    
     def preprocess_signals(self, acc: np.ndarray, bvp: np.ndarray, eda: np.ndarray, temp: np.ndarray) -> np.ndarray:
         """Przetwarza surowe sygnały i zwraca dane gotowe do klasyfikacji."""
         # Konwersja do DataFrame
@@ -237,26 +839,161 @@ class StressClassificationService:
         
         return X_segments
     
-    def predict(self, X_segments: np.ndarray) -> tuple:
+    def predict(self, X_segments: np.ndarray, use_cascade: Optional[bool] = None) -> tuple:
         """Wykonuje predykcje dla segmentów."""
+        predictions, probabilities, _ = self._predict(X_segments, use_cascade)
+        return predictions, probabilities
+    
+    def _predict(self, X_segments: np.ndarray, use_cascade: Optional[bool] = None,
+                 head: Optional[nn.Module] = None, sink=None,
+                 gate_segments: Optional[np.ndarray] = None) -> tuple:
+        """
+        Wykonuje predykcje z opcjonalną kaskadą.
+        
+        Okna oznaczone przez bramkę jako pewny Baseline dostają klasę Baseline i średnie
+        prawdopodobieństwa z kalibracji; pozostałe trafiają do CNN-LSTM.
+        head i sink - jak w _run_model.
+        gate_segments - surowe okna dla cech bramki, gdy X_segments są przemapowane profilem
+        pacjenta (progi bramki są skalibrowane w jednostkach populacji); domyślnie X_segments.
+        
+        Returns:
+            Tuple (predictions, probabilities, gated) - gated to maska okien pominiętych przez model
+        """
         if not self.model_loaded:
             self.load_model()
         
+        if use_cascade is None:
+            # Bramka jest skalibrowana względem głowy globalnej - głowa pacjenta widzi wszystkie okna
+            use_cascade = CASCADE_ENABLED and head is None
+        
+        num_segments = len(X_segments)
+        gated = np.zeros(num_segments, dtype=bool)
+        if use_cascade and self.cascade_gate is not None:
+            if gate_segments is None:
+                gate_segments = X_segments
+            gated = self.cascade_gate.mask(compute_gate_features(gate_segments, TARGET_RATE))
+        
+        if not gated.any():
+            predictions, probabilities = self._run_model(X_segments, head=head, sink=sink)
+            return predictions, probabilities, gated
+        
+        predictions = np.full(num_segments, BASELINE_CLASS, dtype=np.int64)
+        probabilities = np.tile(self.cascade_gate.baseline_probabilities.astype(np.float32), (num_segments, 1))
+        
+        if not gated.all():
+            model_predictions, model_probabilities = self._run_model(
+                X_segments[~gated], head=head, sink=_subset_sink(sink, np.flatnonzero(~gated))
+            )
+            predictions[~gated] = model_predictions
+            probabilities[~gated] = model_probabilities
+        
+        return predictions, probabilities, gated
+    
+    def _predict_adaptive(self, X_segments: np.ndarray, use_cascade: Optional[bool] = None,
+                          head: Optional[nn.Module] = None, sink=None,
+                          gate_segments: Optional[np.ndarray] = None) -> tuple:
+        """
+        Predykcja z adaptacyjnym krokiem.
+        
+        Okna co COARSE_STEP_SEC są klasyfikowane zawsze. Okna pośrednie (co STEP_SEC) są
+        klasyfikowane tylko w przedziałach, gdzie zgrubne predykcje na końcach przedziału
+        się różnią lub któraś ma pewność poniżej ADAPTIVE_CONFIDENCE_THRESHOLD. W pozostałych
+        przedziałach okna dziedziczą wynik najbliższego zgrubnego okna, więc wynik ma ten sam
+        kształt co przy pełnej klasyfikacji.
+        
+        gate_segments - jak w _predict.
+        
+        Returns:
+            Tuple (predictions, probabilities, gated, classified) - classified to maska okien,
+            które faktycznie zostały sklasyfikowane
+        """
+        if gate_segments is None:
+            gate_segments = X_segments
+        num_segments = len(X_segments)
+        factor = max(1, COARSE_STEP_SEC // STEP_SEC)
+        
+        coarse_idx = np.arange(0, num_segments, factor)
+        if coarse_idx[-1] != num_segments - 1:
+            coarse_idx = np.append(coarse_idx, num_segments - 1)
+        
+        coarse_predictions, coarse_probabilities, coarse_gated = self._predict(
+            X_segments[coarse_idx], use_cascade, head, _subset_sink(sink, coarse_idx),
+            gate_segments=gate_segments[coarse_idx]
+        )
+        
+        # Przedziały między kolejnymi zgrubnymi oknami wymagające doklasyfikowania
+        confident = coarse_probabilities.max(axis=1) >= ADAPTIVE_CONFIDENCE_THRESHOLD
+        needs_refinement = (
+            (coarse_predictions[:-1] != coarse_predictions[1:]) | ~confident[:-1] | ~confident[1:]
+        )
+        
+        all_idx = np.arange(num_segments)
+        is_coarse = np.zeros(num_segments, dtype=bool)
+        is_coarse[coarse_idx] = True
+        interval = np.clip(np.searchsorted(coarse_idx, all_idx, side='right') - 1, 0, max(len(coarse_idx) - 2, 0))
+        refine = ~is_coarse & needs_refinement[interval] if len(needs_refinement) else np.zeros(num_segments, dtype=bool)
+        
+        # Okna pośrednie dziedziczą wynik najbliższego zgrubnego okna
+        left = coarse_idx[interval]
+        right = coarse_idx[np.minimum(interval + 1, len(coarse_idx) - 1)]
+        nearest = np.where(all_idx - left <= right - all_idx, interval, np.minimum(interval + 1, len(coarse_idx) - 1))
+        
+        predictions = coarse_predictions[nearest].copy()
+        probabilities = coarse_probabilities[nearest].copy()
+        gated = np.zeros(num_segments, dtype=bool)
+        gated[coarse_idx] = coarse_gated
+        
+        if refine.any():
+            refine_predictions, refine_probabilities, refine_gated = self._predict(
+                X_segments[refine], use_cascade, head, _subset_sink(sink, np.flatnonzero(refine)),
+                gate_segments=gate_segments[refine]
+            )
+            predictions[refine] = refine_predictions
+            probabilities[refine] = refine_probabilities
+            gated[refine] = refine_gated
+        
+        return predictions, probabilities, gated, is_coarse | refine
+    
+    def _autocast(self, precision: str):
+        """Zwraca kontekst autocast dla wybranej precyzji."""
+        if precision == 'bf16':
+            return torch.autocast(device_type='cpu', dtype=torch.bfloat16)
+        return contextlib.nullcontext()
+    
+    def _run_model(self, X_segments: np.ndarray, precision: Optional[str] = None,
+                   head: Optional[nn.Module] = None, sink=None) -> tuple:
+        """
+        Normalizuje okna i uruchamia na nich CNN-LSTM.
+        
+        head - głowa klasyfikatora zamiast `model.classifier` (np. douczona dla pacjenta),
+        sink - funkcja sink(indeksy_okien, cechy) odbierająca cechy okien sprzed głowy.
+        """
+        if precision is None:
+            precision = self.precision
+        if head is None:
+            head = self.model.classifier
+        
         # Normalizacja
         X_normalized = normalize_data(X_segments, self.mean, self.std)
         
         # Tworzenie datasetu i dataloadera
         dataset = WESADDataset(X_normalized)
-        dataloader = DataLoader(dataset, batch_size=BATCH_SIZE, shuffle=False)
+        dataloader = DataLoader(dataset, batch_size=self.batch_size, shuffle=False)
         
         # Predykcja
         all_predictions = []
         all_probabilities = []
         
-        with torch.no_grad():
+        offset = 0
+        with self._inference_semaphore, torch.no_grad(), self._autocast(precision):
             for inputs in dataloader:
                 inputs = inputs.to(DEVICE)
-                outputs = self.model(inputs)
+                features = self.model.extract_features(inputs)
+                outputs = head(features).float()
+                
+                if sink is not None:
+                    sink(np.arange(offset, offset + len(inputs)), features.float().cpu().numpy())
+                offset += len(inputs)
                 
                 # Oblicz prawdopodobieństwa (softmax)
                 probabilities = torch.softmax(outputs, dim=1)
@@ -267,19 +1004,51 @@ class StressClassificationService:
         
         return np.array(all_predictions), np.array(all_probabilities)
     
+    def session_embedding(self, X_segments: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Embedding sesji: uśrednione cechy modelu (stan końcowy LSTM / cechy TCN) znormalizowane L2.
+        
+        Liczony na co najwyżej EMBEDDING_MAX_WINDOWS równomiernie rozłożonych oknach,
+        więc koszt nie rośnie z długością nagrania.
+        """
+        if len(X_segments) == 0:
+            return None
+        if not self.model_loaded:
+            self.load_model()
+        
+        sample = np.linspace(0, len(X_segments) - 1, min(len(X_segments), EMBEDDING_MAX_WINDOWS)).astype(int)
+        inputs = torch.tensor(normalize_data(X_segments[sample], self.mean, self.std), dtype=torch.float32)
+        inputs = inputs.permute(0, 2, 1).to(DEVICE)
+        
+        with self._inference_semaphore, torch.no_grad(), self._autocast(self.precision):
+            features = self.model.extract_features(inputs).float().mean(dim=0).cpu().numpy()
+        
+        return features / max(float(np.linalg.norm(features)), 1e-12)
+    
     def analyze_stress_level(self, predictions: np.ndarray, probabilities: np.ndarray, 
                             start_timestamp: Optional[datetime] = None) -> Dict:
-        """Analizuje poziom stresu na podstawie predykcji."""
+        """
+        Analizuje poziom stresu na podstawie predykcji.
+        
+        Okna odrzucone przez filtr jakości (UNUSABLE_CLASS) liczą się do czasu nagrania
+        i procentów, ale nie do dominującej klasy ani średnich prawdopodobieństw.
+        """
         num_segments = len(predictions)
+        usable = predictions != UNUSABLE_CLASS
+        unusable_segments = int(num_segments - usable.sum())
         
         # Rozkład klas
         class_counts = Counter(predictions)
+        usable_counts = Counter(predictions[usable])
         
         # Oblicz średnie prawdopodobieństwa dla każdej klasy
-        mean_probs = probabilities.mean(axis=0)
+        mean_probs = probabilities[usable].mean(axis=0) if usable.any() else np.zeros(NUM_CLASSES)
         
         # Znajdź dominującą klasę
-        dominant_class = class_counts.most_common(1)[0][0]
+        if usable_counts:
+            dominant_class = usable_counts.most_common(1)[0][0]
+        else:
+            dominant_class = UNUSABLE_CLASS
         dominant_count = class_counts[dominant_class]
         dominant_percentage = (dominant_count / num_segments) * 100
         
@@ -304,19 +1073,23 @@ class StressClassificationService:
         return {
             'num_segments': num_segments,
             'dominant_class': int(dominant_class),
-            'dominant_class_name': CLASS_NAMES[dominant_class],
+            'dominant_class_name': get_class_name(dominant_class),
             'dominant_percentage': float(dominant_percentage),
             'class_distribution': {int(k): int(v) for k, v in class_counts.items()},
             'mean_probabilities': {CLASS_NAMES[i]: float(mean_probs[i]) for i in range(4)},
             'stress_segments': int(stress_segments),
             'stress_percentage': float(stress_percentage),
+            'unusable_segments': unusable_segments,
+            'unusable_percentage': float(unusable_segments / num_segments * 100),
             'overall_stress_level': overall_stress_level,
             'stress_value': int(stress_value),
             'total_time_seconds': int(num_segments * STEP_SEC)
         }
     
     def generate_json_output(self, predictions: np.ndarray, probabilities: np.ndarray, 
-                           results: Dict, start_timestamp: Optional[datetime] = None) -> Dict:
+                           results: Dict, start_timestamp: Optional[datetime] = None,
+                           features: Optional[Dict[str, np.ndarray]] = None,
+                           signal_quality: Optional[np.ndarray] = None) -> Dict:
         """Generuje strukturę JSON z wynikami klasyfikacji dla frontendu."""
         
         # Jeśli nie podano timestampu, użyj aktualnego czasu
@@ -326,14 +1099,16 @@ class StressClassificationService:
         # Generuj listę wszystkich segmentów z timestampami
         segments = []
         stress_moments = []
+        feature_records = features_to_records(features) if features is not None else None
         
         for i in range(len(predictions)):
             segment_start_time = start_timestamp + timedelta(seconds=i * STEP_SEC)
             segment_end_time = segment_start_time + timedelta(seconds=WINDOW_SEC)
             
             predicted_class = int(predictions[i])
-            class_name = CLASS_NAMES[predicted_class]
+            class_name = get_class_name(predicted_class)
             stress_level = CLASS_DESCRIPTIONS[predicted_class]['stress_level']
+            usable = predicted_class != UNUSABLE_CLASS
             
             segment_data = {
                 'timestamp': segment_start_time.isoformat(),
@@ -346,9 +1121,13 @@ class StressClassificationService:
                 'stress_level_name': CLASS_DESCRIPTIONS[predicted_class]['level_name'],
                 'probabilities': {
                     CLASS_NAMES[j]: float(probabilities[i][j]) for j in range(4)
-                },
-                'confidence': float(probabilities[i][predicted_class])
+                } if usable else None,
+                'confidence': float(probabilities[i][predicted_class]) if usable else None
             }
+            if signal_quality is not None:
+                segment_data['signal_quality'] = round(float(signal_quality[i]), 3)
+            if feature_records is not None:
+                segment_data['features'] = feature_records[i]
             segments.append(segment_data)
             
             # Jeśli to segment ze stresem, dodaj do stress_moments
@@ -395,7 +1174,8 @@ class StressClassificationService:
                 'stress_percentage': float(results['stress_percentage']),
                 'stress_segments_count': results['stress_segments'],
                 'dominant_class': results['dominant_class_name'],
-                'dominant_class_percentage': float(results['dominant_percentage'])
+                'dominant_class_percentage': float(results['dominant_percentage']),
+                'unusable_percentage': float(results['unusable_percentage'])
             },
             'statistics': {
                 'class_distribution': class_statistics,
@@ -410,20 +1190,251 @@ class StressClassificationService:
         
         return json_output
     
+    def _predict_usable(self, X_segments: np.ndarray, usable: np.ndarray, adaptive: bool,
+                        head: Optional[nn.Module] = None, sink=None,
+                        gate_segments: Optional[np.ndarray] = None) -> tuple:
+        """
+        Klasyfikuje tylko okna o wystarczającej jakości sygnału.
+        
+        Pozostałe okna dostają UNUSABLE_CLASS i zerowe prawdopodobieństwa.
+        gate_segments - jak w _predict.
+        
+        Returns:
+            Tuple (predictions, probabilities, gated, classified) dla wszystkich okien - gated to okna
+            przypisane przez bramkę kaskady, classified to okna, które przeszły przez ścieżkę predykcji
+            (bez okien odziedziczonych w trybie adaptacyjnym); wyjściem modelu są okna classified & ~gated
+        """
+        num_segments = len(X_segments)
+        predictions = np.full(num_segments, UNUSABLE_CLASS, dtype=int)
+        probabilities = np.zeros((num_segments, NUM_CLASSES), dtype=np.float32)
+        gated = np.zeros(num_segments, dtype=bool)
+        classified = np.zeros(num_segments, dtype=bool)
+        
+        if not usable.any():
+            return predictions, probabilities, gated, classified
+        
+        X_usable = X_segments[usable]
+        gate_usable = gate_segments[usable] if gate_segments is not None else None
+        usable_sink = _subset_sink(sink, np.flatnonzero(usable))
+        if adaptive:
+            usable_predictions, usable_probabilities, usable_gated, usable_classified = self._predict_adaptive(
+                X_usable, head=head, sink=usable_sink, gate_segments=gate_usable
+            )
+        else:
+            usable_predictions, usable_probabilities, usable_gated = self._predict(
+                X_usable, head=head, sink=usable_sink, gate_segments=gate_usable
+            )
+            usable_classified = np.ones(len(X_usable), dtype=bool)
+        
+        predictions[usable] = usable_predictions
+        probabilities[usable] = usable_probabilities
+        gated[usable] = usable_gated
+        classified[usable] = usable_classified
+        return predictions, probabilities, gated, classified
+    
+    def smooth(self, predictions: np.ndarray, probabilities: np.ndarray) -> np.ndarray:
+        """
+        Wygładza klasy okien dekodowaniem Viterbiego (HMM z macierzą przejść modelu).
+        
+        Okna odrzucone przez filtr jakości nie wpływają na dekodowanie i pozostają UNUSABLE_CLASS.
+        """
+        if not self.model_loaded:
+            self.load_model()
+        
+        usable = predictions != UNUSABLE_CLASS
+        smoothed = smooth_predictions(probabilities, self.transition_matrix, usable)
+        return np.where(usable, smoothed, UNUSABLE_CLASS)
+    
+    def adapt_head(self, features: np.ndarray, labels: np.ndarray) -> tuple:
+        """
+        Douczanie głowy klasyfikatora na zapisanych cechach oznaczonych okien pacjenta.
+        
+        Returns:
+            Tuple (wagi głowy jako bajty .npz, raport douczania)
+        """
+        if not self.model_loaded:
+            self.load_model()
+        head, report = fine_tune_head(self.model.classifier, features, labels, NUM_CLASSES)
+        report['model_version'] = self.model_version
+        return serialize_head_state(head), report
+    
     def classify(self, acc: np.ndarray, bvp: np.ndarray, eda: np.ndarray, temp: np.ndarray,
-                start_timestamp: Optional[datetime] = None) -> Dict:
-        """Główna metoda klasyfikacji - przetwarza sygnały i zwraca JSON z wynikami."""
+                start_timestamp: Optional[datetime] = None, adaptive: Optional[bool] = None,
+                smoothing: Optional[bool] = None, normalization_profile: Optional[Dict] = None,
+                classifier_head: Optional[Dict] = None, return_feature_cache: bool = False) -> Dict:
+        """
+        Główna metoda klasyfikacji - przetwarza sygnały i zwraca JSON z wynikami.
+        
+        normalization_profile to profil pacjenta (normalization.py); używany, gdy ma dość próbek.
+        Odpowiedź zawiera `signal_statistics` nagrania do przyrostowej aktualizacji profilu.
+        classifier_head to wagi głowy douczonej dla pacjenta (head_adaptation.py) dla bieżącej wersji modelu.
+        Przy return_feature_cache=True odpowiedź zawiera `feature_cache` - cechy okien (float16,
+        tablica numpy - nie JSON) do późniejszego douczania głowy.
+        """
+        if adaptive is None:
+            adaptive = ADAPTIVE_STRIDE_ENABLED
+        if smoothing is None:
+            smoothing = TEMPORAL_SMOOTHING_ENABLED
+        
         # Przetwarzanie sygnałów
         X_segments = self.preprocess_signals(acc, bvp, eda, temp)
         
+        # Statystyki nagrania z nienakładających się okien (każda próbka liczona raz)
+        recording_statistics = signal_statistics(
+            X_segments[::max(1, WINDOW_SEC // STEP_SEC)].reshape(-1, X_segments.shape[-1])
+        )
+        
+        # Profil normalizacji pacjenta
+        personalized = profile_is_ready(normalization_profile)
+        X_model = X_segments
+        if personalized:
+            if not self.model_loaded:
+                self.load_model()
+            X_model = personalize_segments(X_segments, normalization_profile, self.mean, self.std)
+        
+        # Głowa klasyfikatora douczona dla pacjenta
+        head = None
+        if classifier_head is not None and PATIENT_HEAD_ENABLED:
+            if not self.model_loaded:
+                self.load_model()
+            head = build_head(self.model.classifier, classifier_head)
+        feature_collector = WindowFeatureCollector(len(X_segments)) if return_feature_cache else None
+        
+        # Jakość sygnału - okna poniżej progu SQI nie trafiają do modelu
+        sqi = compute_signal_quality(acc, bvp, eda, len(X_segments), WINDOW_SEC, STEP_SEC)['sqi']
+        usable = sqi >= SQI_THRESHOLD
+        
         # Predykcja
-        predictions, probabilities = self.predict(X_segments)
+        predict_start = time.perf_counter()
+        # Cechy bramki kaskady liczone z surowych okien - progi są w jednostkach populacji
+        predictions, probabilities, gated, classified = self._predict_usable(
+            X_model, usable, adaptive, head=head, sink=feature_collector, gate_segments=X_segments
+        )
+        predict_seconds = time.perf_counter() - predict_start
+        
+        # Ewaluacja modelu kandydującego w tle - tylko okna faktycznie sklasyfikowane przez głowę globalną
+        # (bez okien przypisanych przez bramkę kaskady i odziedziczonych w trybie adaptacyjnym), przed wygładzaniem
+        if self.shadow is not None and head is None:
+            evaluated = usable & classified & ~gated
+            self.shadow.submit(X_model[evaluated], predictions[evaluated], predict_seconds, self.model_version)
+        
+        # Embedding sesji (tylko okna o wystarczającej jakości sygnału). Liczony bez profilu pacjenta,
+        # żeby wizyty sprzed i po zebraniu profilu były porównywalne w jednym indeksie
+        embedding = None
+        if SESSION_EMBEDDING_ENABLED:
+            embedding = self.session_embedding(X_segments[usable])
+        
+        # Wygładzanie czasowe (prawdopodobieństwa segmentów pozostają surowymi wyjściami modelu)
+        raw_predictions = predictions
+        if smoothing:
+            predictions = self.smooth(predictions, probabilities)
+        
+        # Cechy fizjologiczne per okno i HRV (na sygnałach w oryginalnej częstotliwości).
+        # Uderzenia serca wykrywane są raz i współdzielone przez HR, HRV okien i HRV sesji.
+        bvp = np.asarray(bvp, dtype=float).reshape(-1)
+        bvp_peaks = detect_bvp_peaks(bvp) if (WINDOW_FEATURES_ENABLED or HRV_ENABLED) else None
+        
+        features = None
+        if WINDOW_FEATURES_ENABLED:
+            features = compute_window_features(acc, bvp, eda, len(X_segments), WINDOW_SEC, STEP_SEC, bvp_peaks)
+            if HRV_ENABLED:
+                features.update(compute_window_hrv(bvp_peaks, len(X_segments), WINDOW_SEC, STEP_SEC, len(bvp)))
+        
+        hrv_metrics = compute_session_hrv(bvp, peaks=bvp_peaks) if HRV_ENABLED else None
         
         # Analiza wyników
         results = self.analyze_stress_level(predictions, probabilities, start_timestamp)
         
         # Generowanie JSON
-        json_output = self.generate_json_output(predictions, probabilities, results, start_timestamp)
+        json_output = self.generate_json_output(predictions, probabilities, results, start_timestamp, features, sqi)
+        json_output['metadata']['cascade_gated_segments'] = int(gated.sum())
+        json_output['metadata']['adaptive_stride'] = bool(adaptive)
+        json_output['metadata']['classified_segments'] = int(classified.sum())
+        json_output['metadata']['patient_normalization'] = personalized
+        json_output['metadata']['classifier_head'] = 'patient' if head is not None else 'global'
+        json_output['metadata']['temporal_smoothing'] = bool(smoothing)
+        json_output['metadata']['smoothed_segments'] = int((predictions != raw_predictions).sum())
+        json_output['metadata']['unusable_segments'] = results['unusable_segments']
+        json_output['metadata']['signal_quality'] = {
+            'threshold': SQI_THRESHOLD,
+            'mean_sqi': round(float(sqi.mean()), 4),
+            'usable_ratio': round(float(usable.mean()), 4),
+        }
+        json_output['hrv'] = hrv_metrics
+        json_output['signal_statistics'] = recording_statistics
+        json_output['session_embedding'] = {
+            'model_version': self.model_version,
+            'vector': [round(float(value), 6) for value in embedding],
+        } if embedding is not None else None
+        if feature_collector is not None and feature_collector.features is not None:
+            json_output['feature_cache'] = {
+                'model_version': self.model_version,
+                'features': feature_collector.features,
+            }
         
         return json_output
 
+
+
+# Singleton instance serwisu
+_stress_service = None
+_stress_service_lock = threading.Lock()
+
+
+def get_stress_service() -> StressClassificationService:
+    """
+    Zwraca singleton instance serwisu klasyfikacji (załadowany i rozgrzany).
+    
+    Double-checked locking: po inicjalizacji odczyt nie bierze blokady, a równoczesne
+    pierwsze żądania (gthread/ASGI) czekają na jedno ładowanie modelu.
+    """
+    global _stress_service
+    service = _stress_service
+    if service is not None and service.warm:
+        return service
+    
+    with _stress_service_lock:
+        if _stress_service is None:
+            _stress_service = StressClassificationService()
+        service = _stress_service
+    
+    if not service.warm:
+        try:
+            service.warm_up()
+            logger.info("Model klasyfikacji stresu załadowany pomyślnie")
+        except Exception as e:
+            logger.error(f"Błąd podczas ładowania modelu: {e}")
+            raise
+    return service
+
+
+def get_service_readiness() -> Dict:
+    """Zwraca stan gotowości singletona bez wymuszania ładowania modelu."""
+    if _stress_service is None:
+        return {
+            'status': 'not_loaded',
+            'model_loaded': False,
+            'warm': False,
+            'model_version': None,
+            'warm_up_seconds': None,
+            'pid': os.getpid(),
+        }
+    return _stress_service.get_readiness()
+
+
+def preload_stress_service():
+    """
+    Ładuje wagi modelu bez rozgrzewki - wywoływane w procesie master gunicorna (preload_app).
+    
+    Wagi załadowane przed forkiem są współdzielone przez workery (copy-on-write).
+    Autotuning i rozgrzewka wykonywane są już w każdym workerze (hook post_fork),
+    bo wymagają uruchomienia puli wątków torch, której nie należy tworzyć przed forkiem.
+    Pomiar autotuningu wykonuje jeden worker naraz (blokada pliku cache w autotune.py).
+    """
+    global _stress_service
+    with _stress_service_lock:
+        if _stress_service is None:
+            _stress_service = StressClassificationService()
+    _stress_service.load_model(tune=False)
+    logger.info("Wagi modelu klasyfikacji stresu załadowane przed forkiem workerów")
+    return _stress_service
@@ -0,0 +1,129 @@
+"""
+Profile normalizacji per pacjent.
+
+Globalne parametry z cnn/normalization_params.npz opisują całą populację WESAD, a poziom EDA
+i temperatura skóry różnią się między osobami o więcej niż zmiany wywołane stresem.
+Profil pacjenta to bieżące statystyki Welforda (liczba próbek, średnia, suma kwadratów odchyleń)
+kanałów po resamplingu do 4 Hz, łączone przyrostowo z kolejnych wizyt (wzór Chana).
+
+Przy klasyfikacji wybrane kanały są przemapowywane z rozkładu pacjenta na rozkład populacji,
+więc po globalnej normalizacji model widzi z-score względem pacjenta - bez zmian w ścieżce
+inferencji ani modelu. Bramka kaskady i embedding sesji nadal dostają surowe okna (progi
+i indeks podobnych sesji są w jednostkach populacji).
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional
+
+import numpy as np
+
+# --- KONFIGURACJA PROFILI ---
+PERSONALIZED_CHANNELS = (4, 5)          # EDA, TEMP (kolejność kanałów jak w preprocess_signals)
+MIN_PROFILE_SAMPLES = 10 * 60 * 4       # Minimum 10 minut nagrań (4 Hz), zanim profil zostanie użyty
+MIN_PROFILE_STD = 1e-3                  # Dolne ograniczenie odchylenia std. profilu
+
+PROFILE_CACHE_SIZE = int(os.getenv('STRESS_PROFILE_CACHE_SIZE', '256'))
+PROFILE_CACHE_TTL_SEC = float(os.getenv('STRESS_PROFILE_CACHE_TTL', '300'))
+
+
+def signal_statistics(samples: np.ndarray) -> Dict:
+    """Statystyki Welforda (count, mean, m2) dla próbek (N, kanały) w formacie gotowym do JSON."""
+    samples = np.asarray(samples, dtype=float)
+    mean = samples.mean(axis=0)
+    return {
+        'count': int(len(samples)),
+        'mean': mean.tolist(),
+        'm2': ((samples - mean) ** 2).sum(axis=0).tolist(),
+    }
+
+
+def merge_statistics(profile: Optional[Dict], statistics: Dict) -> Dict:
+    """Łączy statystyki profilu z nowymi (równoległy wariant Welforda - wzór Chana)."""
+    if not profile or not profile.get('count'):
+        return dict(statistics)
+    if not statistics.get('count'):
+        return dict(profile)
+
+    count_a, count_b = profile['count'], statistics['count']
+    mean_a, mean_b = np.asarray(profile['mean']), np.asarray(statistics['mean'])
+    count = count_a + count_b
+    delta = mean_b - mean_a
+
+    return {
+        'count': int(count),
+        'mean': (mean_a + delta * count_b / count).tolist(),
+        'm2': (np.asarray(profile['m2']) + np.asarray(statistics['m2']) + delta ** 2 * count_a * count_b / count).tolist(),
+    }
+
+
+def profile_mean_std(profile: Dict) -> tuple:
+    """Średnia i odchylenie std. (populacyjne) z profilu."""
+    mean = np.asarray(profile['mean'])
+    std = np.sqrt(np.asarray(profile['m2']) / profile['count'])
+    return mean, np.maximum(std, MIN_PROFILE_STD)
+
+
+def profile_is_ready(profile: Optional[Dict]) -> bool:
+    """Czy profil ma dość próbek, by zastąpić parametry globalne."""
+    return bool(profile) and profile.get('count', 0) >= MIN_PROFILE_SAMPLES
+
+
+def personalize_segments(X_segments: np.ndarray, profile: Dict, global_mean: np.ndarray,
+                         global_std: np.ndarray, channels=PERSONALIZED_CHANNELS) -> np.ndarray:
+    """
+    Przemapowuje wybrane kanały okien z rozkładu pacjenta na rozkład populacji.
+
+    x' = (x - mean_pacjenta) / std_pacjenta * std_globalne + mean_globalne,
+    więc normalize_data(x', mean_globalne, std_globalne) = (x - mean_pacjenta) / std_pacjenta.
+    """
+    channels = list(channels)
+    mean, std = profile_mean_std(profile)
+    X_personalized = X_segments.astype(float, copy=True)
+    X_personalized[..., channels] = (
+        (X_segments[..., channels] - mean[channels]) / std[channels] * global_std[channels] + global_mean[channels]
+    )
+    return X_personalized
+
+
+class ProfileCache:
+    """
+    Pamięć podręczna LRU profili w procesie (bez zapytania do bazy przy każdej klasyfikacji).
+
+    Wpisy wygasają po `ttl` sekundach, dzięki czemu workery, które nie zapisywały profilu,
+    odczytają jego nowszą wersję z bazy. Brak profilu (None) również jest zapamiętywany.
+    """
+
+    def __init__(self, max_size: int = PROFILE_CACHE_SIZE, ttl: float = PROFILE_CACHE_TTL_SEC):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, loader: Callable[[Hashable], Optional[Dict]]) -> Optional[Dict]:
+        """Zwraca profil z pamięci podręcznej lub wczytuje go funkcją `loader` i zapamiętuje."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[1] < self.ttl:
+                self._entries.move_to_end(key)
+                return entry[0]
+
+        profile = loader(key)
+        self.put(key, profile)
+        return profile
+
+    def put(self, key: Hashable, profile: Optional[Dict]):
+        with self._lock:
+            self._entries[key] = (profile, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
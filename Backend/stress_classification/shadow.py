@@ -0,0 +1,305 @@
+"""
+Ewaluacja w cieniu (shadow) modelu kandydującego na ruchu produkcyjnym.
+
+Wybrana losowo część żądań klasyfikacji (SHADOW_SAMPLE_RATE) jest po odpowiedzi modelu
+produkcyjnego przekazywana do modelu kandydującego w wątku w tle - żądanie nie czeka na
+kandydata. Wynik kandydata nie trafia do odpowiedzi; porównanie (zgodność okien, macierz
+pomyłek, opóźnienia) zapisywane jest w lokalnej bazie SQLite w katalogu runtime serwisu,
+wspólnej dla wszystkich workerów, i agregowane per para wersji modeli.
+
+Koszt CPU ograniczony jest budżetem (token bucket): kandydat dostaje SHADOW_CPU_BUDGET
+sekund CPU na sekundę zegara. Zużycie szacowane jest jako czas forward passu x liczba wątków
+torch (górne ograniczenie). Żądania wylosowane przy wyczerpanym budżecie lub pełnej kolejce
+są pomijane i liczone w licznikach procesu.
+"""
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import torch
+
+logger = logging.getLogger(__name__)
+
+# --- KONFIGURACJA EWALUACJI W CIENIU ---
+SHADOW_MODEL_CONFIG = os.getenv('STRESS_SHADOW_MODEL_CONFIG')       # Konfiguracja kandydata (format jak STRESS_MODEL_CONFIG)
+SHADOW_SAMPLE_RATE = float(os.getenv('STRESS_SHADOW_SAMPLE_RATE', '0.1'))
+SHADOW_CPU_BUDGET = float(os.getenv('STRESS_SHADOW_CPU_BUDGET', '0.25'))  # Sekundy CPU na sekundę zegara
+SHADOW_BUDGET_BURST_SEC = 1.0    # Maksymalny zapas budżetu (sekundy CPU)
+SHADOW_MAX_PENDING = 2           # Maksymalna liczba oczekujących ewaluacji w procesie
+SHADOW_BATCH_SIZE = 64
+SHADOW_REPORT_MAX_RUNS = 10000   # Raport liczony z ostatnich N porównań
+SHADOW_DB_FILENAME = 'shadow.sqlite3'
+
+STRESS_CLASS = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS shadow_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT NOT NULL,
+    primary_version TEXT NOT NULL,
+    candidate_version TEXT NOT NULL,
+    windows INTEGER NOT NULL,
+    agreeing_windows INTEGER NOT NULL,
+    dominant_agree INTEGER NOT NULL,
+    primary_stress_windows INTEGER NOT NULL,
+    candidate_stress_windows INTEGER NOT NULL,
+    primary_latency_ms REAL NOT NULL,
+    candidate_latency_ms REAL NOT NULL,
+    confusion TEXT NOT NULL
+)
+"""
+
+
+def cohen_kappa(confusion: np.ndarray) -> Optional[float]:
+    """Współczynnik kappa Cohena z macierzy pomyłek (wiersze - model produkcyjny, kolumny - kandydat)."""
+    total = confusion.sum()
+    if total == 0:
+        return None
+    observed = np.trace(confusion) / total
+    expected = (confusion.sum(axis=1) @ confusion.sum(axis=0)) / total ** 2
+    if expected >= 1.0:
+        return 1.0
+    return float((observed - expected) / (1.0 - expected))
+
+
+def _percentiles(values: List[float]) -> Dict:
+    p50, p95 = np.percentile(values, [50, 95])
+    return {'p50': round(float(p50), 2), 'p95': round(float(p95), 2)}
+
+
+class ShadowStore:
+    """Lokalny magazyn porównań (SQLite) współdzielony przez workery."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    @contextmanager
+    def _connect(self):
+        """Połączenie na czas jednej operacji (commit przy wyjściu, zamykane zawsze)."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=10)
+        try:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(_SCHEMA)
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def record(self, run: Dict):
+        with self._connect() as connection:
+            connection.execute(
+                'INSERT INTO shadow_runs (created_at, primary_version, candidate_version, windows, '
+                'agreeing_windows, dominant_agree, primary_stress_windows, candidate_stress_windows, '
+                'primary_latency_ms, candidate_latency_ms, confusion) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (
+                    run['created_at'], run['primary_version'], run['candidate_version'], run['windows'],
+                    run['agreeing_windows'], int(run['dominant_agree']), run['primary_stress_windows'],
+                    run['candidate_stress_windows'], run['primary_latency_ms'], run['candidate_latency_ms'],
+                    json.dumps(run['confusion']),
+                )
+            )
+
+    def report(self, max_runs: int = SHADOW_REPORT_MAX_RUNS) -> List[Dict]:
+        """Agreguje ostatnie porównania per para (wersja produkcyjna, wersja kandydata)."""
+        if not self.path.exists():
+            return []
+        with self._connect() as connection:
+            rows = connection.execute(
+                'SELECT created_at, primary_version, candidate_version, windows, agreeing_windows, '
+                'dominant_agree, primary_stress_windows, candidate_stress_windows, '
+                'primary_latency_ms, candidate_latency_ms, confusion '
+                'FROM shadow_runs ORDER BY id DESC LIMIT ?',
+                (max_runs,)
+            ).fetchall()
+
+        groups = {}
+        for row in rows:
+            groups.setdefault((row[1], row[2]), []).append(row)
+
+        report = []
+        for (primary_version, candidate_version), group in groups.items():
+            windows = sum(row[3] for row in group)
+            confusion = np.sum([json.loads(row[10]) for row in group], axis=0)
+            per_class_windows = confusion.sum(axis=1)
+            report.append({
+                'primary_version': primary_version,
+                'candidate_version': candidate_version,
+                'requests': len(group),
+                'windows': windows,
+                'window_agreement': round(sum(row[4] for row in group) / windows, 4) if windows else None,
+                'kappa': cohen_kappa(confusion),
+                'per_class_agreement': [
+                    round(float(confusion[i, i] / per_class_windows[i]), 4) if per_class_windows[i] else None
+                    for i in range(len(confusion))
+                ],
+                'dominant_class_agreement': round(sum(row[5] for row in group) / len(group), 4),
+                'primary_stress_ratio': round(sum(row[6] for row in group) / windows, 4) if windows else None,
+                'candidate_stress_ratio': round(sum(row[7] for row in group) / windows, 4) if windows else None,
+                'primary_latency_ms': _percentiles([row[8] for row in group]),
+                'candidate_latency_ms': _percentiles([row[9] for row in group]),
+                'confusion': confusion.astype(int).tolist(),
+                'first_seen': group[-1][0],
+                'last_seen': group[0][0],
+            })
+        return sorted(report, key=lambda entry: entry['last_seen'], reverse=True)
+
+
+class CpuBudget:
+    """Token bucket sekund CPU: `rate` sekund na sekundę zegara, zapas do `burst` sekund."""
+
+    def __init__(self, rate: float, burst: float = SHADOW_BUDGET_BURST_SEC):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def available(self) -> bool:
+        with self._lock:
+            self._refill()
+            return self._tokens > 0
+
+    def charge(self, cpu_seconds: float):
+        with self._lock:
+            self._refill()
+            self._tokens -= cpu_seconds
+
+
+class ShadowEvaluator:
+    """
+    Uruchamia model kandydujący w tle na próbce żądań i zapisuje porównanie z modelem produkcyjnym.
+
+    Kandydat używa parametrów normalizacji modelu produkcyjnego. Pula wątków tworzona jest
+    przy pierwszym użyciu, więc obiekt można utworzyć w procesie master gunicorna przed forkiem.
+    """
+
+    def __init__(self, model: torch.nn.Module, model_version: str, store: ShadowStore,
+                 mean: np.ndarray, std: np.ndarray, num_classes: int, sample_rate: float = SHADOW_SAMPLE_RATE,
+                 cpu_budget: float = SHADOW_CPU_BUDGET, max_pending: int = SHADOW_MAX_PENDING,
+                 device: torch.device = torch.device('cpu')):
+        self.model = model
+        self.model_version = model_version
+        self.store = store
+        self.mean = mean
+        self.std = std
+        self.num_classes = num_classes
+        self.sample_rate = sample_rate
+        self.budget = CpuBudget(cpu_budget)
+        self.max_pending = max_pending
+        self.device = device
+        self.counters = Counter()
+        self._executor = None
+        self._futures = set()
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='stress-shadow')
+        return self._executor
+
+    def submit(self, X_segments: np.ndarray, primary_predictions: np.ndarray,
+               primary_latency_sec: float, primary_version: str) -> str:
+        """
+        Kolejkuje ewaluację kandydata (bez czekania na wynik).
+
+        Returns:
+            'submitted', 'not_sampled', 'budget' (wyczerpany budżet CPU) lub 'queue_full'
+        """
+        if len(X_segments) == 0 or random.random() >= self.sample_rate:
+            return self._count('not_sampled')
+        if not self.budget.available():
+            return self._count('budget')
+
+        with self._lock:
+            if len(self._futures) >= self.max_pending:
+                self.counters['queue_full'] += 1
+                return 'queue_full'
+            future = self._get_executor().submit(
+                self._evaluate, X_segments, primary_predictions, primary_latency_sec, primary_version
+            )
+            self._futures.add(future)
+            self.counters['submitted'] += 1
+        future.add_done_callback(self._finished)
+        return 'submitted'
+
+    def _count(self, outcome: str) -> str:
+        with self._lock:
+            self.counters[outcome] += 1
+        return outcome
+
+    def _finished(self, future):
+        with self._lock:
+            self._futures.discard(future)
+        if future.exception() is not None:
+            self._count('errors')
+            logger.error(f"Błąd ewaluacji w cieniu: {future.exception()}")
+        else:
+            self._count('completed')
+
+    def predict(self, X_segments: np.ndarray) -> np.ndarray:
+        """Klasy okien według modelu kandydującego."""
+        X_normalized = (X_segments - self.mean) / self.std
+        predictions = []
+        with torch.no_grad():
+            for start in range(0, len(X_normalized), SHADOW_BATCH_SIZE):
+                inputs = torch.tensor(X_normalized[start:start + SHADOW_BATCH_SIZE], dtype=torch.float32)
+                outputs = self.model(inputs.permute(0, 2, 1).to(self.device))
+                predictions.append(outputs.argmax(dim=1).cpu().numpy())
+        return np.concatenate(predictions)
+
+    def _evaluate(self, X_segments: np.ndarray, primary_predictions: np.ndarray,
+                  primary_latency_sec: float, primary_version: str):
+        start = time.perf_counter()
+        candidate_predictions = self.predict(X_segments)
+        elapsed = time.perf_counter() - start
+        self.budget.charge(elapsed * torch.get_num_threads())
+
+        confusion = np.zeros((self.num_classes, self.num_classes), dtype=int)
+        np.add.at(confusion, (primary_predictions, candidate_predictions), 1)
+
+        self.store.record({
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'primary_version': primary_version,
+            'candidate_version': self.model_version,
+            'windows': int(len(X_segments)),
+            'agreeing_windows': int(np.trace(confusion)),
+            'dominant_agree': confusion.sum(axis=1).argmax() == confusion.sum(axis=0).argmax(),
+            'primary_stress_windows': int((primary_predictions == STRESS_CLASS).sum()),
+            'candidate_stress_windows': int((candidate_predictions == STRESS_CLASS).sum()),
+            'primary_latency_ms': primary_latency_sec * 1000,
+            'candidate_latency_ms': elapsed * 1000,
+            'confusion': confusion.tolist(),
+        })
+
+    def drain(self, timeout: Optional[float] = None):
+        """Czeka na zakończenie oczekujących ewaluacji (testy, benchmarki, zamykanie workera)."""
+        with self._lock:
+            futures = list(self._futures)
+        wait(futures, timeout=timeout)
+
+    def describe(self) -> Dict:
+        return {
+            'candidate_version': self.model_version,
+            'sample_rate': self.sample_rate,
+            'cpu_budget': self.budget.rate,
+            'pending': len(self._futures),
+            'counters': dict(self.counters),
+        }
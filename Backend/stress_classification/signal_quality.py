@@ -0,0 +1,108 @@
+"""
+Indeks jakości sygnału (SQI) per okno, liczony przed inferencją.
+
+Dla każdego okna wyznaczane są (wektorowo, z sum prefiksowych na sygnałach w oryginalnej
+częstotliwości) cztery składowe w zakresie 0-1, gdzie 1 oznacza czysty sygnał:
+- flatline: odsetek próbek bez zmian (odłączona opaska, zamrożony czujnik),
+- clipping: odsetek próbek BVP w nasyceniu (plateau na minimum/maksimum nagrania),
+- motion: artefakt ruchowy - zmienność modułu ACC względem typowej dla nagrania,
+- eda_dropout: odsetek próbek EDA poniżej poziomu kontaktu elektrod ze skórą.
+
+SQI okna to minimum składowych. Okna poniżej progu nie trafiają do modelu
+i są oznaczane w wynikach jako 'Unusable'.
+"""
+from typing import Dict
+
+import numpy as np
+
+from .features import window_bounds, window_means, ACC_RATE, BVP_RATE, EDA_RATE
+
+# --- KONFIGURACJA SQI ---
+FLATLINE_EPSILON = 1e-6          # Zmiana między próbkami uznawana za brak zmiany
+CLIPPING_EPSILON = 1e-9          # Tolerancja porównania z minimum/maksimum nagrania
+EDA_MIN_CONTACT = 0.02           # µS - poniżej: brak kontaktu elektrod (dropout)
+MOTION_RATIO_LOW = 3.0           # Zmienność ACC (względem mediany okien) bez kary
+MOTION_RATIO_HIGH = 8.0          # Zmienność ACC, przy której okno jest całkowicie nieużyteczne
+BAD_FRACTION_LIMIT = 0.5         # Odsetek złych próbek, przy którym składowa spada do 0
+
+COMPONENT_NAMES = ('flatline', 'clipping', 'motion', 'eda_dropout')
+
+
+def _fraction_score(bad_fraction: np.ndarray) -> np.ndarray:
+    """Zamienia odsetek złych próbek na ocenę 0-1 (0 przy BAD_FRACTION_LIMIT i więcej)."""
+    return np.clip(1.0 - bad_fraction / BAD_FRACTION_LIMIT, 0.0, 1.0)
+
+
+def _flat_fraction(values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Odsetek próbek w oknie, które nie zmieniły się względem poprzedniej."""
+    flat = np.abs(np.diff(values, prepend=np.nan)) <= FLATLINE_EPSILON
+    return window_means(flat, starts, ends)
+
+
+def flatline_score(acc_magnitude: np.ndarray, bvp: np.ndarray, eda: np.ndarray, bounds: Dict) -> np.ndarray:
+    """Ocena braku zamrożenia sygnału - najgorszy z sygnałów ACC, BVP i EDA."""
+    worst = np.maximum.reduce([
+        _flat_fraction(acc_magnitude, *bounds['acc']),
+        _flat_fraction(bvp, *bounds['bvp']),
+        _flat_fraction(eda, *bounds['eda']),
+    ])
+    return _fraction_score(worst)
+
+
+def clipping_score(bvp: np.ndarray, bounds: Dict) -> np.ndarray:
+    """Ocena braku nasycenia BVP: próbki na minimum/maksimum nagrania, powtórzone co najmniej dwa razy."""
+    at_extreme = (bvp >= bvp.max() - CLIPPING_EPSILON) | (bvp <= bvp.min() + CLIPPING_EPSILON)
+    plateau = at_extreme & np.concatenate([[False], at_extreme[:-1]])
+    return _fraction_score(window_means(plateau, *bounds['bvp']))
+
+
+def motion_score(acc_magnitude: np.ndarray, bounds: Dict) -> np.ndarray:
+    """
+    Ocena braku artefaktu ruchowego.
+
+    Odchylenie standardowe modułu ACC w oknie jest porównywane z medianą dla nagrania
+    (jednostki ACC zależą od urządzenia, więc próg jest względny).
+    """
+    mean = window_means(acc_magnitude, *bounds['acc'])
+    mean_square = window_means(acc_magnitude ** 2, *bounds['acc'])
+    std = np.sqrt(np.maximum(mean_square - mean ** 2, 0.0))
+
+    typical = np.median(std) if len(std) else 0.0
+    if typical <= 0:
+        return np.ones_like(std)
+    ratio = std / typical
+    return np.clip((MOTION_RATIO_HIGH - ratio) / (MOTION_RATIO_HIGH - MOTION_RATIO_LOW), 0.0, 1.0)
+
+
+def eda_dropout_score(eda: np.ndarray, bounds: Dict) -> np.ndarray:
+    """Ocena kontaktu elektrod EDA."""
+    return _fraction_score(window_means(eda < EDA_MIN_CONTACT, *bounds['eda']))
+
+
+def compute_signal_quality(acc: np.ndarray, bvp: np.ndarray, eda: np.ndarray, num_windows: int,
+                           window_sec: float, step_sec: float) -> Dict[str, np.ndarray]:
+    """
+    Liczy składowe jakości i SQI dla wszystkich okien klasyfikacji.
+
+    Returns:
+        Słownik {nazwa składowej: tablica (num_windows,)} oraz 'sqi' - minimum składowych
+    """
+    acc = np.asarray(acc, dtype=float)
+    bvp = np.asarray(bvp, dtype=float).reshape(-1)
+    eda = np.asarray(eda, dtype=float).reshape(-1)
+    acc_magnitude = np.linalg.norm(acc, axis=1)
+
+    bounds = {
+        'acc': window_bounds(num_windows, ACC_RATE, window_sec, step_sec, len(acc)),
+        'bvp': window_bounds(num_windows, BVP_RATE, window_sec, step_sec, len(bvp)),
+        'eda': window_bounds(num_windows, EDA_RATE, window_sec, step_sec, len(eda)),
+    }
+
+    components = {
+        'flatline': flatline_score(acc_magnitude, bvp, eda, bounds),
+        'clipping': clipping_score(bvp, bounds),
+        'motion': motion_score(acc_magnitude, bounds),
+        'eda_dropout': eda_dropout_score(eda, bounds),
+    }
+    components['sqi'] = np.minimum.reduce([components[name] for name in COMPONENT_NAMES])
+    return components
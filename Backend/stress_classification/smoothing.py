@@ -0,0 +1,97 @@
+"""
+Wygładzanie czasowe predykcji okien - ukryty model Markowa (HMM) dekodowany algorytmem Viterbiego.
+
+Stany ukryte to klasy (Baseline, Stress, Amusement, Meditation), emisje to prawdopodobieństwa
+zwrócone przez model dla kolejnych okien, a macierz przejść jest estymowana z sekwencji etykiet
+WESAD w skrypcie treningowym (transition_matrix.npy obok wag). Model był trenowany z samplerem
+wyrównującym klasy, więc jego wyjścia traktujemy bezpośrednio jako wiarygodności emisji
+(bez dzielenia przez prior klas).
+
+Rekurencja Viterbiego jest z natury sekwencyjna w czasie, ale każdy krok to jedna operacja
+na macierzy (K x K) w numpy, a wskaźniki wsteczne trzymane są w jednej tablicy (T, K).
+"""
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+# --- KONFIGURACJA WYGŁADZANIA ---
+DEFAULT_SELF_TRANSITION = 0.9    # Prawdopodobieństwo pozostania w klasie, gdy brak wyuczonej macierzy
+MIN_EMISSION_PROBABILITY = 1e-6  # Dolne ograniczenie prawdopodobieństw przed logarytmem
+
+
+def default_transition_matrix(num_classes: int, self_transition: float = DEFAULT_SELF_TRANSITION) -> np.ndarray:
+    """Macierz przejść z prawdopodobieństwem pozostania `self_transition` i równymi pozostałymi przejściami."""
+    off_diagonal = (1.0 - self_transition) / (num_classes - 1)
+    matrix = np.full((num_classes, num_classes), off_diagonal)
+    np.fill_diagonal(matrix, self_transition)
+    return matrix
+
+
+def load_transition_matrix(path: Path, num_classes: int) -> tuple:
+    """
+    Wczytuje wyuczoną macierz przejść (wiersz = klasa bieżąca, kolumna = następna).
+
+    Returns:
+        Tuple (macierz znormalizowana wierszami, źródło: 'learned' lub 'default')
+    """
+    path = Path(path)
+    if not path.exists():
+        return default_transition_matrix(num_classes), 'default'
+
+    matrix = np.load(path).astype(float)
+    if matrix.shape != (num_classes, num_classes) or (matrix < 0).any():
+        raise ValueError(f"Nieprawidłowa macierz przejść w {path}: kształt {matrix.shape}")
+    return matrix / matrix.sum(axis=1, keepdims=True), 'learned'
+
+
+def viterbi(log_emissions: np.ndarray, log_transition: np.ndarray,
+            log_initial: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Najbardziej prawdopodobna sekwencja stanów.
+
+    Args:
+        log_emissions: Log-wiarygodności emisji (T, K)
+        log_transition: Log-prawdopodobieństwa przejść (K, K)
+        log_initial: Log-prawdopodobieństwa stanu początkowego (K,); None - rozkład równomierny
+
+    Returns:
+        Sekwencja stanów (T,)
+    """
+    num_steps, num_states = log_emissions.shape
+    path = np.zeros(num_steps, dtype=int)
+    if num_steps == 0:
+        return path
+
+    scores = log_emissions[0] + (log_initial if log_initial is not None else 0.0)
+    backpointers = np.empty((num_steps, num_states), dtype=np.intp)
+    states = np.arange(num_states)
+    candidates = np.empty((num_states, num_states))
+
+    for t in range(1, num_steps):
+        # candidates[i, j] = wynik ścieżki kończącej się w i + przejście i -> j
+        np.add(scores[:, None], log_transition, out=candidates)
+        best = candidates.argmax(axis=0)
+        backpointers[t] = best
+        scores = candidates[best, states] + log_emissions[t]
+
+    path[-1] = scores.argmax()
+    for t in range(num_steps - 1, 0, -1):
+        path[t - 1] = backpointers[t, path[t]]
+    return path
+
+
+def smooth_predictions(probabilities: np.ndarray, transition_matrix: np.ndarray,
+                       usable: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Wygładza klasy okien dekodowaniem Viterbiego na prawdopodobieństwach modelu.
+
+    Okna oznaczone w `usable` jako False (pominięte przez filtr jakości) mają emisję
+    równomierną - nie wpływają na decyzję, a sekwencja przechodzi przez nie ciągle.
+    Zwrócone klasy dla tych okien należy nadpisać przez wywołującego.
+    """
+    log_emissions = np.log(np.clip(probabilities, MIN_EMISSION_PROBABILITY, 1.0))
+    if usable is not None:
+        log_emissions[~usable] = 0.0
+    log_transition = np.log(np.clip(transition_matrix, MIN_EMISSION_PROBABILITY, 1.0))
+    return viterbi(log_emissions, log_transition)
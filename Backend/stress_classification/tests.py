@@ -1,4 +1,1044 @@
-from django.test import TestCase
+import importlib
+import itertools
+import json
+import os
+import sys
+import tempfile
+import threading
+from unittest import mock, skipUnless
 
-# Na razie puste
+import numpy as np
+import torch
+from django.apps import apps
+from django.test import SimpleTestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
 
+from . import autotune, data_simulator, ml_service
+from pathlib import Path
+
+from .benchmarks import (
+    SHARED_CLEAN_MIN_FRACTION,
+    benchmark_weight_memory,
+    clustered_embeddings,
+    episode_recording,
+    inject_artifacts,
+    simulated_recordings,
+)
+from .cascade import BaselineGate, compute_gate_features
+from .embedding_index import EmbeddingIndex
+from .features import ACC_RATE, BVP_RATE, EDA_RATE, compute_window_features, detect_bvp_peaks
+from .hrv import compute_session_hrv, compute_window_hrv, HRV_BUDGET_DURATION_SEC, HRV_TIME_BUDGET_SEC
+from .ml_service import StressClassificationService, get_stress_service, UNUSABLE_CLASS, UNUSABLE_CLASS_NAME
+from .normalization import ProfileCache, merge_statistics, personalize_segments, signal_statistics
+from .shadow import CpuBudget, ShadowEvaluator, ShadowStore
+from .signal_quality import compute_signal_quality
+from .smoothing import default_transition_matrix, smooth_predictions, viterbi
+
+CONCURRENT_THREADS = 32
+TRAINING_DIR = Path(__file__).resolve().parents[2] / 'MachineLearningService'
+
+
+class StressServiceLifecycleTests(SimpleTestCase):
+    """Testy cyklu życia singletona serwisu klasyfikacji pod równoczesnym obciążeniem."""
+
+    def setUp(self):
+        self.runtime_dir = tempfile.TemporaryDirectory()
+        self.env_patch = mock.patch.dict(os.environ, {'STRESS_RUNTIME_DIR': self.runtime_dir.name})
+        self.env_patch.start()
+        self.original_service = ml_service._stress_service
+        self.original_threads = torch.get_num_threads()
+        ml_service._stress_service = None
+
+    def tearDown(self):
+        ml_service._stress_service = self.original_service
+        torch.set_num_threads(self.original_threads)
+        self.env_patch.stop()
+        self.runtime_dir.cleanup()
+
+    def _run_concurrently(self, target):
+        barrier = threading.Barrier(CONCURRENT_THREADS)
+        results = [None] * CONCURRENT_THREADS
+        errors = []
+
+        def worker(index):
+            barrier.wait()
+            try:
+                results[index] = target()
+            except Exception as e:  # pragma: no cover - raportowane przez assert poniżej
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(CONCURRENT_THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        return results
+
+    def test_concurrent_first_requests_load_model_once(self):
+        original_load_weights = StressClassificationService._load_weights
+        load_calls = []
+
+        def slow_load_weights(service):
+            load_calls.append(threading.get_ident())
+            # Poszerzamy okno wyścigu - bez synchronizacji kilka wątków ładowałoby model
+            threading.Event().wait(0.05)
+            original_load_weights(service)
+
+        with mock.patch.object(StressClassificationService, '_load_weights', slow_load_weights):
+            services = self._run_concurrently(get_stress_service)
+
+        self.assertEqual(len(load_calls), 1)
+        self.assertEqual(len({id(service) for service in services}), 1)
+        self.assertTrue(services[0].warm)
+
+    def test_warm_service_is_returned_without_locking(self):
+        service = get_stress_service()
+
+        with mock.patch.object(ml_service, '_stress_service_lock') as lock:
+            self.assertIs(get_stress_service(), service)
+
+        lock.__enter__.assert_not_called()
+
+    def test_thread_pool_is_configured_once_within_core_budget(self):
+        with mock.patch.object(ml_service, 'AUTOTUNE_ENABLED', False), \
+                mock.patch('torch.set_num_threads', wraps=torch.set_num_threads) as set_num_threads:
+            services = self._run_concurrently(get_stress_service)
+
+        service = services[0]
+        self.assertLessEqual(set_num_threads.call_count, 1)
+        self.assertLessEqual(torch.get_num_threads() * service.inference_slots, os.cpu_count() or 1)
+
+    def test_concurrent_predictions_respect_inference_slots(self):
+        service = get_stress_service()
+        X_segments = np.random.randn(8, ml_service.SEQ_LEN, ml_service.NUM_CHANNELS)
+        original_forward = service.model.forward
+        state = {'active': 0, 'max_active': 0}
+        state_lock = threading.Lock()
+
+        def tracking_forward(x):
+            with state_lock:
+                state['active'] += 1
+                state['max_active'] = max(state['max_active'], state['active'])
+            try:
+                threading.Event().wait(0.01)
+                return original_forward(x)
+            finally:
+                with state_lock:
+                    state['active'] -= 1
+
+        with mock.patch.object(service.model, 'forward', tracking_forward):
+            results = self._run_concurrently(lambda: service.predict(X_segments))
+
+        self.assertLessEqual(state['max_active'], service.inference_slots)
+        for predictions, probabilities in results:
+            self.assertEqual(predictions.shape, (8,))
+            self.assertEqual(probabilities.shape, (8, ml_service.NUM_CLASSES))
+
+    def test_readiness_endpoint_turns_ready_after_warm_up(self):
+        client = APIClient()
+
+        response = client.get(reverse('health-ready'))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.data['status'], 'not_loaded')
+
+        ml_service.preload_stress_service()
+        response = client.get(reverse('health-ready'))
+        self.assertEqual(response.status_code, 503)
+        self.assertTrue(response.data['model_loaded'])
+        self.assertFalse(response.data['warm'])
+
+        service = get_stress_service()
+        response = client.get(reverse('health-ready'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'ready')
+        self.assertEqual(response.data['model_version'], service.model_version)
+
+    def test_warm_up_loads_model_and_runs_forward_pass_once(self):
+        service = StressClassificationService()
+
+        with mock.patch.object(ml_service, 'AUTOTUNE_ENABLED', False):
+            service.warm_up()
+            with mock.patch.object(service.model, 'forward', wraps=service.model.forward) as forward:
+                service.warm_up()
+
+        self.assertTrue(service.model_loaded)
+        self.assertTrue(service.warm)
+        self.assertIsNotNone(service.num_threads)
+        self.assertGreater(service.warm_up_seconds, 0)
+        forward.assert_not_called()
+
+    def test_app_ready_preloads_weights_only_with_eager_flag(self):
+        app_config = apps.get_app_config('stress_classification')
+
+        with mock.patch.dict(os.environ, {'STRESS_EAGER_LOAD': 'False'}):
+            app_config.ready()
+        self.assertIsNone(ml_service._stress_service)
+
+        with mock.patch.dict(os.environ, {'STRESS_EAGER_LOAD': 'True'}), \
+                mock.patch.object(ml_service, 'autotune') as autotune_call:
+            app_config.ready()
+
+        service = ml_service._stress_service
+        self.assertTrue(service.model_loaded)
+        # Przed forkiem tylko wagi - bez autotuningu i rozgrzewki (pula wątków torch)
+        self.assertFalse(service.warm)
+        self.assertIsNone(service.num_threads)
+        autotune_call.assert_not_called()
+
+
+def synthetic_bvp(intervals_sec, sample_rate=BVP_RATE):
+    """Sygnał BVP z impulsami w zadanych odstępach między uderzeniami."""
+    beat_times = np.cumsum(intervals_sec)
+    t = np.arange(int((beat_times[-1] + 1) * sample_rate)) / sample_rate
+    nearest = np.abs(t[:, None] - beat_times[None, :]).min(axis=1)
+    return np.exp(-0.5 * (nearest / 0.08) ** 2)
+
+
+class HRVTests(SimpleTestCase):
+    """Testy metryk HRV i budżetu czasu dla długich nagrań."""
+
+    def test_metrics_match_known_intervals(self):
+        # Naprzemienne IBI 800/900 ms: RMSSD = 100 ms, SDNN = 50 ms, pNN50 = 100%
+        bvp = synthetic_bvp(np.tile([0.8, 0.9], 200))
+        metrics = compute_session_hrv(bvp)
+
+        self.assertEqual(metrics['num_beats'], 400)
+        self.assertAlmostEqual(metrics['mean_heart_rate_bpm'], 60 / 0.85, delta=0.5)
+        self.assertAlmostEqual(metrics['rmssd_ms'], 100, delta=5)
+        self.assertAlmostEqual(metrics['sdnn_ms'], 50, delta=3)
+        self.assertEqual(metrics['pnn50'], 100.0)
+        self.assertIsNotNone(metrics['lf_hf_ratio'])
+
+    def test_window_metrics_match_session_metrics_for_steady_rhythm(self):
+        bvp = synthetic_bvp(np.tile([0.8, 0.9], 200))
+        peaks = detect_bvp_peaks(bvp)
+        windows = compute_window_hrv(peaks, 10, ml_service.WINDOW_SEC, ml_service.STEP_SEC, len(bvp))
+
+        np.testing.assert_allclose(windows['rmssd_ms'], 100, atol=5)
+        np.testing.assert_allclose(windows['sdnn_ms'], 50, atol=3)
+        np.testing.assert_array_equal(windows['pnn50'], 100.0)
+
+    def test_eight_hour_recording_fits_time_budget(self):
+        _, bvp, _, _ = simulated_recordings(1, HRV_BUDGET_DURATION_SEC)[0]
+
+        metrics = compute_session_hrv(bvp)
+
+        self.assertLessEqual(metrics['compute_seconds'], HRV_TIME_BUDGET_SEC)
+        self.assertEqual(metrics['duration_seconds'], HRV_BUDGET_DURATION_SEC)
+        self.assertGreater(metrics['valid_intervals'], 0)
+
+
+class SignalQualityTests(SimpleTestCase):
+    """Testy filtra jakości sygnału przed inferencją."""
+
+    def setUp(self):
+        acc, bvp, eda, temp = simulated_recordings(1, 600)[0]
+        self.clean = (acc, bvp, eda, temp)
+        self.noisy = (*inject_artifacts(acc, bvp, eda, fraction=0.2)[:3], temp)
+        self.num_windows = len(StressClassificationService().preprocess_signals(*self.clean))
+
+    def test_clean_recording_is_fully_usable(self):
+        acc, bvp, eda, _ = self.clean
+        sqi = compute_signal_quality(acc, bvp, eda, self.num_windows, ml_service.WINDOW_SEC, ml_service.STEP_SEC)['sqi']
+        self.assertTrue((sqi >= ml_service.SQI_THRESHOLD).all())
+
+    def test_unusable_windows_are_skipped_by_model(self):
+        service = StressClassificationService()
+        service.load_model()
+
+        with mock.patch.object(service, '_predict', wraps=service._predict) as predict:
+            result = service.classify(*self.noisy, adaptive=False)
+
+        unusable = [segment for segment in result['segments'] if segment['class_id'] == UNUSABLE_CLASS]
+        self.assertTrue(unusable)
+        self.assertEqual(len(predict.call_args.args[0]), self.num_windows - len(unusable))
+        self.assertEqual(result['metadata']['unusable_segments'], len(unusable))
+        for segment in unusable:
+            self.assertEqual(segment['class_name'], UNUSABLE_CLASS_NAME)
+            self.assertIsNone(segment['stress_level'])
+            self.assertLess(segment['signal_quality'], ml_service.SQI_THRESHOLD)
+        self.assertAlmostEqual(
+            result['summary']['unusable_percentage'], len(unusable) / self.num_windows * 100
+        )
+
+
+class TemporalSmoothingTests(SimpleTestCase):
+    """Testy wygładzania czasowego predykcji (Viterbi)."""
+
+    def test_viterbi_matches_exhaustive_search(self):
+        generator = np.random.default_rng(0)
+        for _ in range(10):
+            log_emissions = np.log(generator.dirichlet(np.ones(3), size=6))
+            log_transition = np.log(generator.dirichlet(np.ones(3), size=3))
+
+            def score(path):
+                return log_emissions[0, path[0]] + sum(
+                    log_transition[path[t - 1], path[t]] + log_emissions[t, path[t]] for t in range(1, len(path))
+                )
+
+            best = max(itertools.product(range(3), repeat=6), key=score)
+            self.assertEqual(tuple(viterbi(log_emissions, log_transition)), best)
+
+    def test_isolated_flips_are_removed(self):
+        probabilities = np.tile([0.7, 0.1, 0.1, 0.1], (20, 1))
+        probabilities[[5, 12]] = [0.35, 0.45, 0.1, 0.1]
+
+        smoothed = smooth_predictions(probabilities, default_transition_matrix(4))
+
+        self.assertEqual(probabilities.argmax(axis=1)[5], 1)
+        self.assertTrue((smoothed == 0).all())
+
+    def test_unusable_windows_stay_unusable(self):
+        service = StressClassificationService()
+        service.load_model()
+        predictions = np.array([1, 1, UNUSABLE_CLASS, 1, 0, 1])
+        probabilities = np.tile([0.2, 0.6, 0.1, 0.1], (6, 1))
+        probabilities[2] = 0.0
+        probabilities[4] = [0.4, 0.35, 0.15, 0.1]
+
+        smoothed = service.smooth(predictions, probabilities)
+
+        np.testing.assert_array_equal(smoothed, [1, 1, UNUSABLE_CLASS, 1, 1, 1])
+
+
+class NormalizationProfileTests(SimpleTestCase):
+    """Testy profili normalizacji per pacjent."""
+
+    def test_incremental_statistics_match_full_recording(self):
+        generator = np.random.default_rng(0)
+        visits = [generator.normal(loc=i, scale=i + 1, size=(500 * (i + 1), 6)) for i in range(3)]
+
+        profile = None
+        for samples in visits:
+            profile = merge_statistics(profile, signal_statistics(samples))
+
+        all_samples = np.concatenate(visits)
+        self.assertEqual(profile['count'], len(all_samples))
+        np.testing.assert_allclose(profile['mean'], all_samples.mean(axis=0))
+        np.testing.assert_allclose(np.asarray(profile['m2']) / profile['count'], all_samples.var(axis=0))
+
+    def test_personalized_channels_become_patient_z_scores(self):
+        generator = np.random.default_rng(1)
+        X_segments = generator.normal(loc=5.0, scale=2.0, size=(10, 120, 6))
+        profile = signal_statistics(X_segments.reshape(-1, 6))
+        global_mean, global_std = np.zeros(6), np.full(6, 10.0)
+
+        X_normalized = ml_service.normalize_data(
+            personalize_segments(X_segments, profile, global_mean, global_std), global_mean, global_std
+        )
+
+        eda_temp = X_normalized[..., [4, 5]].reshape(-1, 2)
+        np.testing.assert_allclose(eda_temp.mean(axis=0), 0.0, atol=1e-9)
+        np.testing.assert_allclose(eda_temp.std(axis=0), 1.0)
+        np.testing.assert_allclose(X_normalized[..., :4], X_segments[..., :4] / 10.0)
+
+    def test_cascade_and_embedding_see_raw_windows_with_ready_profile(self):
+        service = StressClassificationService()
+        service.load_model()
+        signals = simulated_recordings(1, 900)[0]
+        X_segments = service.preprocess_signals(*signals)
+        # Profil pacjenta z wyraźnie innym poziomem EDA niż populacja
+        samples = X_segments.reshape(-1, ml_service.NUM_CHANNELS).copy()
+        samples[:, 4] += 5.0
+        profile = signal_statistics(np.tile(samples, (2, 1)))
+        service.cascade_gate = mock.Mock(baseline_probabilities=np.array([1.0, 0.0, 0.0, 0.0]))
+        service.cascade_gate.mask.side_effect = lambda features: np.zeros(len(features), dtype=bool)
+
+        with mock.patch.object(ml_service, 'CASCADE_ENABLED', True), \
+                mock.patch.object(ml_service, 'SQI_THRESHOLD', 0.0):
+            personalized = service.classify(*signals, adaptive=False, normalization_profile=profile)
+            gate_features = service.cascade_gate.mask.call_args.args[0]
+            population = service.classify(*signals, adaptive=False)
+
+        self.assertTrue(personalized['metadata']['patient_normalization'])
+        np.testing.assert_allclose(gate_features, compute_gate_features(X_segments, ml_service.TARGET_RATE))
+        self.assertEqual(personalized['session_embedding'], population['session_embedding'])
+
+    def test_cache_evicts_least_recently_used_and_expires(self):
+        loads = []
+
+        def loader(key):
+            loads.append(key)
+            return {'count': key}
+
+        cache = ProfileCache(max_size=2, ttl=60)
+        cache.get(1, loader)
+        cache.get(2, loader)
+        cache.get(1, loader)
+        cache.get(3, loader)  # usuwa 2 - najdawniej używany
+        cache.get(1, loader)
+        cache.get(2, loader)
+        self.assertEqual(loads, [1, 2, 3, 2])
+
+        cache.ttl = 0
+        cache.get(1, loader)
+        self.assertEqual(loads[-1], 1)
+
+
+class EmbeddingIndexTests(SimpleTestCase):
+    """Testy indeksu ANN embeddingów sesji."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp_dir.name) / 'index.npz'
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_ivf_search_matches_exact_neighbours(self):
+        vectors = clustered_embeddings(5000, 32, num_clusters=50)
+        index = EmbeddingIndex(self.path, model_version='v1')
+        index.build(list(range(len(vectors))), vectors)
+        self.assertIsNotNone(index.centroids)
+
+        queries = vectors[:50]
+        exact = np.argsort(-(queries @ vectors.T), axis=1)[:, :10]
+        recall = np.mean([
+            len({item_id for item_id, _ in index.search(query, 10)} & set(row.tolist())) / 10
+            for query, row in zip(queries, exact)
+        ])
+        self.assertGreaterEqual(recall, 0.9)
+
+    def test_incremental_updates_are_shared_through_file(self):
+        vectors = clustered_embeddings(10, 8, num_clusters=2)
+        first = EmbeddingIndex(self.path, model_version='v1')
+        first.build(list(range(10)), vectors)
+        first.save()
+
+        second = EmbeddingIndex(self.path, model_version='v1')
+        self.assertTrue(second.load())
+        second.add(100, vectors[3])
+        first.add(101, vectors[3])  # wczytuje zmianę drugiego procesu przed zapisem
+
+        third = EmbeddingIndex(self.path, model_version='v1')
+        third.load()
+        neighbours = [item_id for item_id, _ in third.search(vectors[3], k=3, exclude=3)]
+        self.assertEqual(sorted(neighbours[:2]), [100, 101])
+        self.assertFalse(EmbeddingIndex(self.path, model_version='v2').load())
+
+
+class ShadowEvaluationTests(SimpleTestCase):
+    """Testy ewaluacji modelu kandydującego w cieniu."""
+
+    def setUp(self):
+        self.runtime_dir = tempfile.TemporaryDirectory()
+        self.env_patch = mock.patch.dict(os.environ, {'STRESS_RUNTIME_DIR': self.runtime_dir.name})
+        self.env_patch.start()
+
+    def tearDown(self):
+        self.env_patch.stop()
+        self.runtime_dir.cleanup()
+
+    def test_identical_candidate_agrees_with_primary(self):
+        service = StressClassificationService()
+        service.load_model()
+        config_path = Path(self.runtime_dir.name) / 'candidate.json'
+        config_path.write_text(json.dumps({'weights': str(service._get_model_path())}))
+
+        service.shadow = service.load_shadow_model(config_path)
+        service.shadow.sample_rate = 1.0
+        for signals in simulated_recordings(2, 900):
+            service.classify(*signals, adaptive=False)
+        service.shadow.drain()
+
+        report = service.get_shadow_report()
+        self.assertEqual(service.shadow.counters['completed'], 2)
+        self.assertEqual(len(report['models']), 1)
+        entry = report['models'][0]
+        self.assertEqual(entry['candidate_version'], service.model_version)
+        self.assertEqual(entry['requests'], 2)
+        self.assertEqual(entry['window_agreement'], 1.0)
+        self.assertEqual(entry['dominant_class_agreement'], 1.0)
+
+    def test_only_windows_classified_by_primary_model_are_submitted(self):
+        service = StressClassificationService()
+        service.load_model()
+        service.shadow = mock.Mock()
+        # Bramka przypisuje Baseline co drugiemu oknu każdego wywołania modelu
+        service.cascade_gate = mock.Mock(baseline_probabilities=np.array([1.0, 0.0, 0.0, 0.0]))
+        service.cascade_gate.mask.side_effect = lambda features: np.arange(len(features)) % 2 == 0
+        predict_usable = service._predict_usable
+        results = []
+
+        def record_predict_usable(*args, **kwargs):
+            results.append(predict_usable(*args, **kwargs))
+            return results[-1]
+
+        with mock.patch.object(ml_service, 'CASCADE_ENABLED', True), \
+                mock.patch.object(service, '_predict_usable', side_effect=record_predict_usable), \
+                mock.patch.object(service, '_run_model', wraps=service._run_model) as run_model:
+            service.classify(*simulated_recordings(1, 900)[0], adaptive=True)
+
+        _, _, gated, classified = results[0]
+        X_submitted, submitted_predictions = service.shadow.submit.call_args.args[:2]
+
+        self.assertTrue(gated.any())
+        self.assertFalse(classified.all())
+        self.assertEqual(len(X_submitted), int((classified & ~gated).sum()))
+        self.assertEqual(len(X_submitted), sum(len(call.args[0]) for call in run_model.call_args_list))
+        self.assertEqual(len(submitted_predictions), len(X_submitted))
+
+    def test_sampling_budget_and_queue_limit_skip_requests(self):
+        store = ShadowStore(Path(self.runtime_dir.name) / 'shadow.sqlite3')
+        evaluator = ShadowEvaluator(None, 'candidate', store, 0.0, 1.0, num_classes=4, sample_rate=0.0)
+        X = np.zeros((3, ml_service.SEQ_LEN, ml_service.NUM_CHANNELS))
+        predictions = np.zeros(3, dtype=int)
+        self.assertEqual(evaluator.submit(X, predictions, 0.01, 'primary'), 'not_sampled')
+
+        evaluator.sample_rate = 1.0
+        evaluator.budget.rate = 0.0
+        evaluator.budget.charge(evaluator.budget.burst)
+        self.assertEqual(evaluator.submit(X, predictions, 0.01, 'primary'), 'budget')
+
+        evaluator.budget = CpuBudget(rate=1.0)
+        evaluator.max_pending = 0
+        self.assertEqual(evaluator.submit(X, predictions, 0.01, 'primary'), 'queue_full')
+        self.assertEqual(store.report(), [])
+
+
+class CascadeCalibrationTests(SimpleTestCase):
+    """Testy kalibracji bramki kaskady na zbiorze kalibracyjnym."""
+
+    def setUp(self):
+        generator = np.random.default_rng(0)
+        self.features = generator.uniform(size=(200, 3))
+        self.predictions = np.repeat([0, 1], 100)
+        self.probabilities = np.eye(4)[self.predictions]
+
+    def test_gate_is_rejected_when_agreement_target_is_missed(self):
+        # Okna Stress mają te same cechy co Baseline - żaden próg ich nie oddzieli
+        gate = BaselineGate.calibrate(self.features, self.predictions, self.probabilities, agreement_target=0.98)
+        self.assertIsNone(gate)
+
+        self.features[self.predictions == 1] += 10.0
+        gate = BaselineGate.calibrate(self.features, self.predictions, self.probabilities, agreement_target=0.98)
+        self.assertEqual(gate.agreement, 1.0)
+        self.assertEqual(gate.quantile, 0.95)
+
+    def test_gate_is_rejected_without_non_baseline_predictions(self):
+        predictions = np.zeros(200, dtype=int)
+        gate = BaselineGate.calibrate(self.features, predictions, np.eye(4)[predictions], agreement_target=0.0)
+        self.assertIsNone(gate)
+
+    def test_service_reports_why_cascade_stays_disabled(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'calibration_windows.npz'
+            X = np.zeros((4, ml_service.SEQ_LEN, ml_service.NUM_CHANNELS), dtype=np.float32)
+            np.savez_compressed(path, X=X, y=np.arange(4))
+            service = StressClassificationService()
+
+            all_baseline = (np.zeros(4, dtype=int), np.tile([1.0, 0.0, 0.0, 0.0], (4, 1)))
+            with mock.patch.object(ml_service, 'CALIBRATION_SET_PATH', str(path)), \
+                    mock.patch.object(service, '_run_model', return_value=all_baseline):
+                self.assertIsNone(service.calibrate_cascade(agreement_target=0.0))
+
+        self.assertEqual(service.cascade_check['calibration_source'], 'file')
+        self.assertFalse(service.cascade_check['enabled'])
+        self.assertIn('spoza Baseline', service.cascade_check['reason'])
+        self.assertEqual(service.cascade_check['label_counts'], [1, 1, 1, 1])
+
+    def test_simulated_calibration_set_is_used_without_file(self):
+        service = StressClassificationService()
+
+        with mock.patch.object(ml_service, 'CALIBRATION_SET_PATH', '/nonexistent/calibration_windows.npz'):
+            service.calibrate_cascade()
+            X, y = service.get_calibration_set()
+
+        self.assertIsNone(y)
+        self.assertEqual(X.shape, (data_simulator.CALIBRATION_WINDOWS, ml_service.SEQ_LEN, ml_service.NUM_CHANNELS))
+        self.assertEqual(service.cascade_check['calibration_source'], 'simulated')
+        self.assertIsNone(service.cascade_check['label_counts'])
+        # Okna symulowane pokrywają rozkład populacji - model musi widzieć w nich klasy spoza Baseline
+        self.assertGreater(sum(service.cascade_check['prediction_counts'][1:]), 0)
+        self.assertEqual(service.cascade_check['enabled'], service.cascade_gate is not None)
+        if service.cascade_gate is None:
+            self.assertIn('Żaden próg', service.cascade_check['reason'])
+
+        # Zbiór jest deterministyczny - kolejne usługi kalibrują się na tych samych oknach
+        other = StressClassificationService()
+        with mock.patch.object(ml_service, 'CALIBRATION_SET_PATH', '/nonexistent/calibration_windows.npz'):
+            np.testing.assert_array_equal(other.get_calibration_set()[0], X)
+
+
+class PrecisionCheckTests(SimpleTestCase):
+    """Testy kontroli dokładności trybu bf16 względem fp32."""
+
+    def setUp(self):
+        # Okna wszystkich klas, część blisko granicy decyzji Baseline/Stress
+        self.predictions = np.repeat(np.arange(4), 25)
+        self.probabilities = np.full((100, 4), 0.1)
+        self.probabilities[np.arange(100), self.predictions] = 0.7
+
+    def compare(self, predictions, probabilities):
+        return ml_service.compare_precision(
+            self.predictions, self.probabilities, predictions, probabilities,
+            min_agreement=0.99, max_probability_diff=0.05
+        )
+
+    def test_identical_outputs_pass(self):
+        report = self.compare(self.predictions, self.probabilities)
+        self.assertTrue(report['enabled'])
+        self.assertEqual(report['prediction_counts'], [25, 25, 25, 25])
+
+    def test_probability_drift_is_rejected_without_class_changes(self):
+        probabilities = self.probabilities.copy()
+        probabilities[:, 0] += 0.08
+
+        report = self.compare(self.predictions, probabilities)
+
+        self.assertEqual(report['agreement'], 1.0)
+        self.assertFalse(report['enabled'])
+        self.assertIn('Różnica prawdopodobieństw', report['reason'])
+
+    def test_class_flips_near_decision_boundary_are_rejected(self):
+        predictions = self.predictions.copy()
+        predictions[:5] = 1
+
+        report = self.compare(predictions, self.probabilities)
+
+        self.assertEqual(report['agreement'], 0.95)
+        self.assertFalse(report['enabled'])
+        self.assertIn('Zgodność klas', report['reason'])
+
+    def test_all_baseline_calibration_is_rejected(self):
+        self.predictions = np.zeros(100, dtype=int)
+        report = self.compare(self.predictions, self.probabilities)
+        self.assertFalse(report['enabled'])
+        self.assertIn('spoza Baseline', report['reason'])
+
+    def load_with_bf16_flag(self, min_agreement=ml_service.BF16_MIN_AGREEMENT,
+                            max_probability_diff=ml_service.BF16_MAX_PROBABILITY_DIFF):
+        service = StressClassificationService()
+        with mock.patch.object(ml_service, 'CALIBRATION_SET_PATH', '/nonexistent/calibration_windows.npz'), \
+                mock.patch.object(ml_service, 'INFERENCE_PRECISION', 'bf16'), \
+                mock.patch.object(ml_service, 'AUTOTUNE_ENABLED', False), \
+                mock.patch.object(ml_service, 'CASCADE_ENABLED', False), \
+                mock.patch.object(StressClassificationService, 'bf16_supported', return_value=True), \
+                mock.patch.object(ml_service, 'BF16_MIN_AGREEMENT', min_agreement), \
+                mock.patch.object(ml_service, 'BF16_MAX_PROBABILITY_DIFF', max_probability_diff):
+            service.load_model()
+        return service
+
+    def test_flag_runs_guard_on_simulated_calibration_set(self):
+        service = self.load_with_bf16_flag()
+        check = service.precision_check
+
+        self.assertEqual(check['calibration_source'], 'simulated')
+        self.assertEqual(check['num_windows'], data_simulator.CALIBRATION_WINDOWS)
+        self.assertGreater(sum(check['prediction_counts'][1:]), 0)
+        passes = (check['agreement'] >= ml_service.BF16_MIN_AGREEMENT
+                  and check['max_probability_diff'] <= ml_service.BF16_MAX_PROBABILITY_DIFF)
+        self.assertEqual(check['enabled'], passes)
+        self.assertEqual(service.precision, 'bf16' if passes else 'fp32')
+
+    def test_flag_enables_bf16_when_guard_passes(self):
+        service = self.load_with_bf16_flag(min_agreement=0.9, max_probability_diff=1.0)
+
+        self.assertTrue(service.precision_check['enabled'])
+        self.assertEqual(service.precision, 'bf16')
+
+        with mock.patch.object(service, '_autocast', wraps=service._autocast) as autocast:
+            result = service.classify(*simulated_recordings(1, 600)[0], adaptive=False)
+
+        self.assertEqual(result['metadata']['num_segments'], len(result['segments']))
+        autocast.assert_called_with('bf16')
+
+
+class AdaptiveStrideTests(SimpleTestCase):
+    """Testy adaptacyjnego kroku klasyfikacji (zgrubne okna + doklasyfikowanie przedziałów)."""
+
+    def setUp(self):
+        # Okna zgrubne: 0, 3, ..., 30 i ostatnie 31. Zmiany klasy w przedziałach (9, 12] i (18, 21],
+        # krótki epizod w oknie 26 widoczny tylko dzięki niskiej pewności zgrubnego okna 27
+        self.classes = np.zeros(32, dtype=int)
+        self.classes[11:20] = 1
+        self.classes[26] = 2
+        self.confidence = np.full(32, 0.95)
+        self.confidence[27] = 0.5
+        self.X = np.zeros((32, ml_service.SEQ_LEN, ml_service.NUM_CHANNELS))
+        self.X[:, 0, 0] = np.arange(32)
+
+    def stub_predict(self, X_segments, use_cascade=None, head=None, sink=None, gate_segments=None):
+        index = X_segments[:, 0, 0].astype(int)
+        probabilities = np.tile(((1 - self.confidence[index]) / 3)[:, None], (1, 4))
+        probabilities[np.arange(len(index)), self.classes[index]] = self.confidence[index]
+        return self.classes[index], probabilities, np.zeros(len(index), dtype=bool)
+
+    def test_refined_windows_match_full_stride_classification(self):
+        service = StressClassificationService()
+        full_predictions, full_probabilities, _ = self.stub_predict(self.X)
+
+        with mock.patch.object(service, '_predict', side_effect=self.stub_predict) as predict:
+            predictions, probabilities, gated, classified = service._predict_adaptive(self.X)
+
+        self.assertEqual(predictions.shape, full_predictions.shape)
+        self.assertEqual(probabilities.shape, full_probabilities.shape)
+        self.assertEqual(gated.shape, (32,))
+        np.testing.assert_array_equal(predictions, full_predictions)
+        np.testing.assert_array_equal(probabilities[classified], full_probabilities[classified])
+
+        # Drugie wywołanie modelu dostaje tylko okna pośrednie przedziałów do doklasyfikowania
+        refined = predict.call_args_list[1].args[0][:, 0, 0].astype(int)
+        np.testing.assert_array_equal(refined, [10, 11, 19, 20, 25, 26, 28, 29])
+        self.assertEqual(int(classified.sum()), 12 + len(refined))
+
+    def test_stable_confident_recording_classifies_only_coarse_windows(self):
+        self.classes[:] = 0
+        self.confidence[:] = 0.95
+        service = StressClassificationService()
+
+        with mock.patch.object(service, '_predict', side_effect=self.stub_predict) as predict:
+            predictions, _, _, classified = service._predict_adaptive(self.X)
+
+        self.assertEqual(predict.call_count, 1)
+        np.testing.assert_array_equal(np.flatnonzero(classified), [0, 3, 6, 9, 12, 15, 18, 21, 24, 27, 30, 31])
+        self.assertTrue((predictions == 0).all())
+
+    def test_episode_recording_has_class_transitions(self):
+        # Prototypy klas rozróżnialne po poziomie pierwszego kanału
+        prototypes = [(np.full(ml_service.NUM_CHANNELS, float(label)), np.full(ml_service.NUM_CHANNELS, 0.01))
+                      for label in range(4)]
+
+        X_segments, labels = episode_recording(prototypes, duration_sec=2 * 3600)
+
+        self.assertEqual(X_segments.shape[1:], (ml_service.SEQ_LEN, ml_service.NUM_CHANNELS))
+        self.assertEqual(len(X_segments), (2 * 3600 - ml_service.WINDOW_SEC) // ml_service.STEP_SEC + 1)
+        self.assertGreater(int((labels[1:] != labels[:-1]).sum()), 3)
+        # Okno w środku epizodu ma poziom prototypu klasy epizodu
+        inside = np.flatnonzero(np.ptp(X_segments[:, :, 0], axis=1) < 0.5)
+        np.testing.assert_allclose(X_segments[inside, :, 0].mean(axis=1), labels[inside], atol=0.05)
+
+
+class AutotuneCacheTests(SimpleTestCase):
+    """Testy cache wyniku autotuningu (klucz sygnatury maszyny, atomowy zapis, uszkodzony plik)."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.model_path = Path(self.directory.name) / 'model.pth'
+        self.model_path.write_bytes(b'weights')
+        self.cache_path = Path(self.directory.name) / 'autotune.json'
+        self.model = torch.nn.Conv1d(ml_service.NUM_CHANNELS, 2, 3)
+        # Najszybszy jest batch 64 (przy każdej liczbie wątków)
+        self.benchmark_patch = mock.patch.object(
+            autotune, 'benchmark_config',
+            side_effect=lambda model, inputs, batch_size, num_threads: 1000.0 - abs(batch_size - 64)
+        )
+        self.benchmark = self.benchmark_patch.start()
+        self.env_patch = mock.patch.dict(os.environ, {'WEB_CONCURRENCY': '1'})
+        self.env_patch.start()
+
+    def tearDown(self):
+        self.env_patch.stop()
+        self.benchmark_patch.stop()
+        self.directory.cleanup()
+
+    def run_autotune(self, force=False):
+        return autotune.autotune(
+            self.model, self.model_path, self.cache_path, torch.device('cpu'),
+            num_channels=ml_service.NUM_CHANNELS, seq_len=ml_service.SEQ_LEN, force=force
+        )
+
+    def test_result_is_reused_only_for_the_same_host_signature(self):
+        first = self.run_autotune()
+        self.assertEqual(first['source'], 'benchmark')
+        self.assertEqual(first['batch_size'], 64)
+        measured = self.benchmark.call_count
+
+        second = self.run_autotune()
+        self.assertEqual(second['source'], 'cache')
+        self.assertEqual(second['batch_size'], 64)
+        self.assertEqual(self.benchmark.call_count, measured)
+
+        # Inna liczba workerów lub inne wagi modelu unieważniają zapisany wynik
+        with mock.patch.dict(os.environ, {'WEB_CONCURRENCY': '2'}):
+            self.assertEqual(self.run_autotune()['source'], 'benchmark')
+        self.model_path.write_bytes(b'new weights')
+        self.assertEqual(self.run_autotune()['source'], 'benchmark')
+        self.assertEqual(self.run_autotune()['source'], 'cache')
+        self.assertEqual(self.run_autotune(force=True)['source'], 'benchmark')
+
+    def test_concurrent_cold_start_benchmarks_once(self):
+        # Workery startujące z pustym cache - mierzy tylko pierwszy, reszta czeka na jego wynik
+        def slow_benchmark(model, inputs, batch_size, num_threads):
+            threading.Event().wait(0.005)
+            return 1000.0 - abs(batch_size - 64)
+
+        self.benchmark.side_effect = slow_benchmark
+        barrier = threading.Barrier(4)
+        sources = []
+
+        def worker():
+            barrier.wait()
+            sources.append(self.run_autotune()['source'])
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(sources), ['benchmark', 'cache', 'cache', 'cache'])
+        candidates = len(autotune.candidate_thread_counts(1)) * len(autotune.AUTOTUNE_BATCH_SIZES)
+        self.assertEqual(self.benchmark.call_count, candidates)
+
+    def test_corrupt_cache_falls_back_to_benchmark_and_is_rewritten(self):
+        self.cache_path.write_text('{"batch_size": 16, "signa')
+
+        result = self.run_autotune()
+
+        self.assertEqual(result['source'], 'benchmark')
+        self.assertEqual(json.loads(self.cache_path.read_text())['batch_size'], 64)
+
+    def test_interrupted_write_keeps_previous_cache(self):
+        self.run_autotune()
+        previous = self.cache_path.read_text()
+
+        def interrupted_dump(result, f, **kwargs):
+            f.write('{"batch_size": ')
+            raise OSError('Brak miejsca na dysku')
+
+        with mock.patch.object(autotune.json, 'dump', side_effect=interrupted_dump):
+            result = self.run_autotune(force=True)
+
+        # Błąd zapisu nie blokuje startu, a plik cache nie jest nadpisany częściowym wynikiem
+        self.assertEqual(result['source'], 'benchmark')
+        self.assertEqual(self.cache_path.read_text(), previous)
+        self.assertEqual(list(Path(self.directory.name).glob('*.tmp')), [])
+        self.assertEqual(self.run_autotune()['source'], 'cache')
+
+
+def mapped_ranges(path):
+    """Zakresy adresów, pod którymi plik jest zmapowany w pamięci procesu (/proc/self/maps)."""
+    ranges = []
+    with open('/proc/self/maps') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 6 and parts[5] == str(path):
+                start, end = (int(address, 16) for address in parts[0].split('-'))
+                ranges.append((start, end))
+    return ranges
+
+
+@skipUnless(os.path.exists('/proc/self/maps'), "Wymaga /proc/self/maps (Linux)")
+class MmapWeightsTests(SimpleTestCase):
+    """Testy ładowania wag przez mmap."""
+
+    def setUp(self):
+        self.model_path = StressClassificationService()._get_model_path().resolve()
+
+    def test_mmap_weights_point_into_mapped_file(self):
+        model = ml_service.load_classifier(self.model_path, mmap=True, device=torch.device('cpu'))
+        ranges = mapped_ranges(self.model_path)
+
+        self.assertTrue(ranges)
+        for name, parameter in model.named_parameters():
+            self.assertFalse(parameter.is_meta, name)
+            address = parameter.data_ptr()
+            self.assertTrue(any(start <= address < end for start, end in ranges), name)
+
+    def test_mmap_and_copied_weights_give_identical_outputs(self):
+        mapped = ml_service.load_classifier(self.model_path, mmap=True, device=torch.device('cpu'))
+        copied = ml_service.load_classifier(self.model_path, mmap=False, device=torch.device('cpu'))
+        generator = torch.Generator().manual_seed(0)
+        inputs = torch.randn(8, ml_service.NUM_CHANNELS, ml_service.SEQ_LEN, generator=generator)
+
+        self.assertFalse(mapped.training)
+        copied_state = copied.state_dict()
+        for name, mapped_parameter in mapped.state_dict().items():
+            self.assertTrue(torch.equal(mapped_parameter, copied_state[name]), name)
+        with torch.no_grad():
+            self.assertTrue(torch.equal(mapped(inputs), copied(inputs)))
+
+    @skipUnless(ml_service.MMAP_WEIGHTS and ml_service.DEVICE.type == 'cpu', "Wagi przez mmap wyłączone")
+    def test_service_loads_weights_through_mmap(self):
+        service = StressClassificationService()
+        service._load_weights()
+        ranges = mapped_ranges(self.model_path)
+
+        address = next(service.model.parameters()).data_ptr()
+        self.assertTrue(any(start <= address < end for start, end in ranges))
+        self.assertTrue(service.get_diagnostics()['mmap_weights'])
+
+    def test_mmap_weight_pages_are_shared_clean_across_workers(self):
+        architecture = {'conv_channels': (64, 128), 'lstm_hidden_size': 256, 'lstm_num_layers': 2,
+                        'fc_hidden_size': 64}
+
+        report = benchmark_weight_memory(num_workers=2, num_versions=1, architecture=architecture)
+
+        self.assertGreaterEqual(report['shared_clean_fraction'], SHARED_CLEAN_MIN_FRACTION)
+        mapped, private = report['modes']['mmap'], report['modes']['private_heap']
+        self.assertEqual(len(mapped['pss_per_worker']), 2)
+        self.assertEqual(private['weight_mappings']['Rss'], 0)
+        # Dwa workery dzielą strony wag - PSS mapowań to połowa ich RSS
+        self.assertAlmostEqual(mapped['weight_mappings']['Pss'], mapped['weight_mappings']['Rss'] / 2, delta=8)
+
+
+class WindowFeaturesTests(SimpleTestCase):
+    """Testy cech fizjologicznych per okno na sygnałach o znanych parametrach."""
+
+    DURATION_SEC = 360
+
+    def setUp(self):
+        self.num_windows = (self.DURATION_SEC - ml_service.WINDOW_SEC) // ml_service.STEP_SEC + 1
+        self.window_starts = np.arange(self.num_windows) * ml_service.STEP_SEC
+        self.acc = np.tile([0.0, 0.0, 1.0], (self.DURATION_SEC * ACC_RATE, 1))
+        self.bvp = synthetic_bvp(np.full(self.DURATION_SEC, 1.0))[:self.DURATION_SEC * BVP_RATE]
+        self.eda = np.full(self.DURATION_SEC * EDA_RATE, 2.0)
+
+    def features(self):
+        return compute_window_features(
+            self.acc, self.bvp, self.eda, self.num_windows, ml_service.WINDOW_SEC, ml_service.STEP_SEC
+        )
+
+    def test_heart_rate_follows_beat_intervals(self):
+        # 150 s przy IBI 0.75 s (80 bpm), 150 s przy IBI 0.6 s (100 bpm), potem 60 s bez sygnału
+        bvp = synthetic_bvp(np.concatenate([np.full(200, 0.75), np.full(250, 0.6)]))
+        self.bvp = np.concatenate([bvp, np.zeros(self.DURATION_SEC * BVP_RATE - len(bvp))])
+
+        heart_rate = self.features()['heart_rate_bpm']
+
+        window_ends = self.window_starts + ml_service.WINDOW_SEC
+        np.testing.assert_allclose(heart_rate[window_ends <= 150], 80, atol=1)
+        np.testing.assert_allclose(heart_rate[(self.window_starts >= 151) & (window_ends <= 300)], 100, atol=1)
+        self.assertTrue(np.isnan(heart_rate[self.window_starts >= 302]).all())
+
+    def test_scr_count_matches_phasic_responses(self):
+        # Odpowiedzi SCR (narastanie 1 s, zanik 3 s, 0.3 µS) z maksimum w 6 s, 26 s, 46 s, ...
+        t = np.arange(len(self.eda)) / EDA_RATE
+        peak_times = np.arange(6, self.DURATION_SEC - 10, 20)
+        for peak_time in peak_times:
+            rise = (t >= peak_time - 1) & (t < peak_time)
+            decay = t >= peak_time
+            self.eda[rise] += 0.3 * (t[rise] - peak_time + 1)
+            self.eda[decay] += 0.3 * np.exp(-(t[decay] - peak_time) / 3)
+        self.eda += 0.002 * t  # powolny dryf składowej tonicznej
+
+        scr_count = self.features()['scr_count']
+
+        expected = [
+            int(((peak_times >= start) & (peak_times < start + ml_service.WINDOW_SEC)).sum())
+            for start in self.window_starts
+        ]
+        np.testing.assert_array_equal(scr_count, expected)
+
+    def test_motion_energy_is_variance_of_acc_magnitude(self):
+        # Od 180 s moduł ACC oscyluje wokół grawitacji z amplitudą 0.5 g (wariancja 0.125)
+        t = np.arange(len(self.acc)) / ACC_RATE
+        moving = t >= 180
+        self.acc[moving, 2] += 0.5 * np.sin(2 * np.pi * t[moving])
+
+        motion_energy = self.features()['motion_energy']
+
+        np.testing.assert_allclose(motion_energy[self.window_starts + ml_service.WINDOW_SEC <= 180], 0, atol=1e-9)
+        np.testing.assert_allclose(motion_energy[self.window_starts >= 180], 0.125, rtol=1e-3)
+
+
+def import_training_module(name):
+    """Importuje moduł skryptów treningowych (MachineLearningService), np. do testów zgodności eksportu."""
+    with mock.patch.object(sys, 'path', [str(TRAINING_DIR), *sys.path]):
+        return importlib.import_module(name)
+
+
+@skipUnless(TRAINING_DIR.exists(), "Wymaga katalogu MachineLearningService")
+class PrunedModelTests(SimpleTestCase):
+    """Testy przycinania modelu i ładowania wyeksportowanej konfiguracji przez serwis."""
+
+    def setUp(self):
+        self.prune = import_training_module('prune_model')
+        self.base = self.prune.CNNLSTMClassifier(ml_service.NUM_CHANNELS, ml_service.SEQ_LEN, ml_service.NUM_CLASSES)
+        self.base.load_state_dict(torch.load(StressClassificationService()._get_model_path(), map_location='cpu'))
+        self.base.eval()
+        generator = torch.Generator().manual_seed(0)
+        self.inputs = torch.randn(16, ml_service.NUM_CHANNELS, ml_service.SEQ_LEN, generator=generator)
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_zero_ratio_is_identity(self):
+        pruned = self.prune.prune_model(self.base, 0.0)
+
+        self.assertEqual(self.prune.get_architecture(pruned), self.prune.get_architecture(self.base))
+        base_state = self.base.state_dict()
+        for name, tensor in pruned.state_dict().items():
+            self.assertTrue(torch.equal(tensor, base_state[name]), name)
+        with torch.no_grad():
+            self.assertTrue(torch.equal(pruned(self.inputs), self.base(self.inputs)))
+
+    def test_pruned_config_round_trips_through_load_classifier(self):
+        pruned = self.prune.prune_model(self.base, 0.5)
+        config_path = self.prune.export_model(pruned, Path(self.directory.name), 'stress_classifier_pruned_50')
+        config = ml_service.load_model_config(config_path)
+
+        self.assertEqual(config['architecture']['conv_channels'], [16, 32])
+        with torch.no_grad():
+            expected = pruned(self.inputs)
+            for mmap in (True, False):
+                model = ml_service.load_classifier(
+                    Path(config['weights']), config['model_type'], config['architecture'],
+                    device=torch.device('cpu'), mmap=mmap
+                )
+                self.assertTrue(torch.equal(model(self.inputs), expected), f"mmap={mmap}")
+
+        service = StressClassificationService(model_config_path=config_path)
+        result = service.classify(*simulated_recordings(1, 300)[0], adaptive=False)
+        self.assertEqual(service.model.lstm.hidden_size, 32)
+        self.assertEqual(result['metadata']['num_segments'], len(result['segments']))
+
+    def test_export_is_refused_below_agreement_or_accuracy_floor(self):
+        self.assertIn('Zgodność', self.prune.export_rejection(0.44, 0.0))
+        self.assertIn('Spadek dokładności', self.prune.export_rejection(0.95, -0.1))
+        self.assertIsNone(self.prune.export_rejection(0.95, -0.01))
+        self.assertIsNone(self.prune.export_rejection(0.5, -0.2, min_agreement=0.4, max_accuracy_drop=0.3))
+
+
+@skipUnless(TRAINING_DIR.exists(), "Wymaga katalogu MachineLearningService")
+class DistilledModelTests(SimpleTestCase):
+    """Testy zgodności modelu ucznia (TCN) eksportowanego przez skrypt treningowy z serwisem."""
+
+    def setUp(self):
+        self.training = import_training_module('train_on_multiple_files')
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_exported_tcn_config_loads_and_classifies(self):
+        torch.manual_seed(0)
+        # Architektura inna niż domyślna - rozbieżność nazw lub kształtów wag wyszłaby przy ładowaniu
+        student = self.training.TemporalConvClassifier(
+            ml_service.NUM_CHANNELS, ml_service.SEQ_LEN, ml_service.NUM_CLASSES,
+            channels=(8, 16, 24), kernel_size=3, pooled_layers=1
+        )
+        for layer in student.tcn_layers:
+            if isinstance(layer, torch.nn.BatchNorm1d):
+                layer.running_mean.uniform_(-1, 1)
+                layer.running_var.uniform_(0.5, 2)
+        student.eval()
+        weights_path = Path(self.directory.name) / 'stress_classifier_tcn_student.pth'
+        torch.save(student.state_dict(), weights_path)
+        config_path = self.training.save_model_config(
+            weights_path, 'tcn', self.training.get_tcn_architecture(student)
+        )
+
+        service = StressClassificationService(model_config_path=config_path)
+        service.load_model(tune=False)
+
+        self.assertIsInstance(service.model, ml_service.MODEL_TYPES['tcn'])
+        loaded_state = service.model.state_dict()
+        expected_state = student.state_dict()
+        self.assertEqual(list(loaded_state), list(expected_state))
+        for name, tensor in expected_state.items():
+            self.assertTrue(torch.equal(loaded_state[name], tensor), name)
+
+        inputs = torch.randn(8, ml_service.NUM_CHANNELS, ml_service.SEQ_LEN)
+        with torch.no_grad():
+            self.assertTrue(torch.allclose(service.model(inputs), student(inputs), atol=1e-6))
+
+        result = service.classify(*simulated_recordings(1, 300)[0], adaptive=False)
+        self.assertEqual(result['metadata']['num_segments'], len(result['segments']))
+        valid_classes = set(range(ml_service.NUM_CLASSES)) | {UNUSABLE_CLASS}
+        self.assertTrue({segment['class_id'] for segment in result['segments']} <= valid_classes)
@@ -1,9 +1,11 @@
 from django.urls import path
-from .views import StressClassificationView
+from .views import StressClassificationView, StressDiagnosticsView, ShadowReportView
 
 app_name = 'stress_classification'
 
 urlpatterns = [
     path('', StressClassificationView.as_view(), name='classify'),
+    path('diagnostics/', StressDiagnosticsView.as_view(), name='diagnostics'),
+    path('shadow/', ShadowReportView.as_view(), name='shadow-report'),
 ]
 
@@ -4,7 +4,7 @@ from rest_framework import status
 from rest_framework.permissions import AllowAny
 from drf_spectacular.utils import extend_schema, OpenApiExample
 from .serializers import StressClassificationRequestSerializer
-from .ml_service import StressClassificationService
+from .ml_service import get_stress_service, get_service_readiness
 from .data_simulator import generate_simulated_data
 import numpy as np
 from datetime import datetime
@@ -12,22 +12,6 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-# Singleton instance serwisu
-_stress_service = None
-
-def get_stress_service():
-    """Zwraca singleton instance serwisu klasyfikacji."""
-    global _stress_service
-    if _stress_service is None:
-        _stress_service = StressClassificationService()
-        try:
-            _stress_service.load_model()
-            logger.info("Model klasyfikacji stresu załadowany pomyślnie")
-        except Exception as e:
-            logger.error(f"Błąd podczas ładowania modelu: {e}")
-            raise
-    return _stress_service
-
 
 class StressClassificationView(APIView):
     """
@@ -207,3 +191,109 @@ class StressClassificationView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+
+
+class StressDiagnosticsView(APIView):
+    """
+    Endpoint diagnostyczny serwisu klasyfikacji.
+    
+    Zwraca konfigurację inferencji wybraną przez autotuning (batch size, liczba wątków)
+    wraz z wynikami pomiarów dla wszystkich kandydatów.
+    """
+    permission_classes = [AllowAny]
+    
+    @extend_schema(
+        summary="Diagnostyka serwisu klasyfikacji",
+        description="""
+        Zwraca informacje o konfiguracji inferencji:
+        - device, cpu_count, batch_size, num_threads
+        - autotune: wynik autotuningu (źródło: cache lub benchmark) i pomiary kandydatów
+        """,
+        responses={
+            200: {'description': 'Sukces - zwraca diagnostykę serwisu'},
+            500: {'description': 'Błąd serwera - problem z modelem'}
+        }
+    )
+    def get(self, request):
+        """
+        GET /api/stress-classification/diagnostics/
+        """
+        try:
+            service = get_stress_service()
+        except Exception as e:
+            return Response(
+                {'error': 'Błąd podczas ładowania modelu', 'details': str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        
+        return Response(service.get_diagnostics(), status=status.HTTP_200_OK)
+
+
+class ShadowReportView(APIView):
+    """
+    Raport ewaluacji w cieniu (shadow) modelu kandydującego.
+    
+    Agreguje porównania zapisane przez wszystkie workery per para wersji modeli.
+    """
+    permission_classes = [AllowAny]
+    
+    @extend_schema(
+        summary="Raport ewaluacji modelu kandydującego",
+        description="""
+        Zwraca dla każdej pary (model produkcyjny, kandydat):
+        - requests, windows: liczba porównanych żądań i okien
+        - window_agreement, kappa, per_class_agreement, confusion: zgodność klas okien
+        - dominant_class_agreement: zgodność dominującej klasy sesji
+        - primary/candidate_stress_ratio: odsetek okien Stress
+        - primary/candidate_latency_ms: p50 i p95 czasu predykcji
+        
+        Oraz liczniki bieżącego procesu (wysłane, pominięte przez budżet CPU lub pełną kolejkę).
+        """,
+        responses={
+            200: {'description': 'Sukces - zwraca raport ewaluacji w cieniu'},
+            500: {'description': 'Błąd serwera - problem z modelem'}
+        }
+    )
+    def get(self, request):
+        """
+        GET /api/stress-classification/shadow/
+        """
+        try:
+            service = get_stress_service()
+        except Exception as e:
+            return Response(
+                {'error': 'Błąd podczas ładowania modelu', 'details': str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        
+        return Response(service.get_shadow_report(), status=status.HTTP_200_OK)
+
+
+class ReadinessView(APIView):
+    """
+    Endpoint gotowości (readiness probe) dla load balancera.
+    
+    Zwraca 200 tylko gdy model w tym workerze jest załadowany i rozgrzany,
+    w przeciwnym razie 503 - load balancer nie kieruje wtedy ruchu do workera.
+    """
+    permission_classes = [AllowAny]
+    authentication_classes = []
+    
+    @extend_schema(
+        summary="Gotowość serwisu klasyfikacji",
+        description="""
+        Zwraca stan gotowości workera: wersję modelu (skrót SHA-256 wag),
+        flagę rozgrzania i czas rozgrzewki.
+        """,
+        responses={
+            200: {'description': 'Worker gotowy - model załadowany i rozgrzany'},
+            503: {'description': 'Worker nie jest jeszcze gotowy'}
+        }
+    )
+    def get(self, request):
+        """
+        GET /health/ready
+        """
+        readiness = get_service_readiness()
+        response_status = status.HTTP_200_OK if readiness['warm'] else status.HTTP_503_SERVICE_UNAVAILABLE
+        return Response(readiness, status=response_status)
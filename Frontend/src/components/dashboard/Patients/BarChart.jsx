@@ -14,14 +14,14 @@ const BarChart = ({ data }) => {
 		// 1. Parsowanie danych - obsługa różnych struktur
 		let parsedData = []
 		if (Array.isArray(data) && data.length > 0) {
-			// Jeśli to tablica segmentów
-			parsedData = data.map(d => ({
+			// Jeśli to tablica segmentów (okna o niskiej jakości sygnału mają stress_level = null)
+			parsedData = data.filter(d => d.stress_level !== null).map(d => ({
 				timestamp: new Date(d.timestamp || d.timestamp_start || d.time_seconds),
 				stress_level: +d.stress_level || 0,
 			}))
 		} else if (data && data.segments && Array.isArray(data.segments) && data.segments.length > 0) {
 			// Jeśli to obiekt z segments
-			parsedData = data.segments.map(d => ({
+			parsedData = data.segments.filter(d => d.stress_level !== null).map(d => ({
 				timestamp: new Date(d.timestamp || d.timestamp_start),
 				stress_level: +d.stress_level || 0,
 			}))
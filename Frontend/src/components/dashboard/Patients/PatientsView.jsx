@@ -16,7 +16,7 @@ import Patient from './Patient/Patient'
 import AddPatientCard from './AddPatientCard'
 import PatientDetailView from './PatientDetailView'
 import EditPatient from './EditPatient'
-import { axiosInstance } from '../../../context/AuthContext'
+import { axiosInstance, fetchAllPages } from '../../../context/AuthContext'
 
 function PatientsView({ onViewChange }) {
 	const [patients, setPatients] = useState([])
@@ -30,8 +30,7 @@ function PatientsView({ onViewChange }) {
 	const fetchPatients = async () => {
 		try {
 			setListLoading(true)
-			const response = await axiosInstance.get('/api/patients/')
-			setPatients(response.data.results || response.data || [])
+			setPatients(await fetchAllPages('/api/patients/'))
 		} catch (error) {
 			console.error('There was an error fetching the patients!', error)
 		} finally {
@@ -16,7 +16,7 @@ import {
 	ArrowBack as ArrowBackIcon,
 	Person as PersonIcon,
 } from '@mui/icons-material'
-import { axiosInstance } from '../../../context/AuthContext'
+import { fetchAllPages } from '../../../context/AuthContext'
 
 function ReportView({ onBack }) {
 	const [patients, setPatients] = useState([])
@@ -29,8 +29,9 @@ function ReportView({ onBack }) {
 				setLoading(true)
 				setError(null)
 
-				const response = await axiosInstance.get('/api/patients/')
-				const patientsData = response.data.results || response.data || []
+				const patientsData = await fetchAllPages('/api/patients/', {
+					fields: 'id,first_name,last_name,pesel,long_term_summary',
+				})
 				
 				// Filtruj tylko pacjentów z long_term_summary
 				const patientsWithSummary = patientsData.filter(
@@ -14,36 +14,7 @@ import {
 	Chip,
 } from '@mui/material'
 import { Warning as WarningIcon, AccessTime as AccessTimeIcon } from '@mui/icons-material'
-import axios from 'axios'
-
-// Configure axios instance
-const axiosInstance = axios.create({
-	baseURL: import.meta.env.DEV ? '' : '',
-	headers: {
-		'Content-Type': 'application/json',
-	},
-})
-
-// Add request interceptor to include auth token
-axiosInstance.interceptors.request.use(
-	config => {
-		const tokens = localStorage.getItem('authTokens')
-		if (tokens) {
-			try {
-				const parsedTokens = JSON.parse(tokens)
-				if (parsedTokens?.access) {
-					config.headers.Authorization = `Bearer ${parsedTokens.access}`
-				}
-			} catch (error) {
-				console.error('Error parsing tokens:', error)
-			}
-		}
-		return config
-	},
-	error => {
-		return Promise.reject(error)
-	}
-)
+import { axiosInstance } from '../../../context/AuthContext'
 
 function StressAlerts() {
 	const [highStressPatients, setHighStressPatients] = useState([])
@@ -55,56 +26,24 @@ function StressAlerts() {
 			try {
 				setLoading(true)
 
-				// Pobierz pacjentów
-				const patientsResponse = await axiosInstance.get('/api/patients/')
-				const patients = patientsResponse.data.results || patientsResponse.data || []
-				const patientsMap = new Map(patients.map(p => [p.id, p]))
-
-				// Pobierz wizyty
-				const visitsResponse = await axiosInstance.get('/api/visits/')
-				const visits = visitsResponse.data.results || visitsResponse.data || []
-
-				// Znajdź pacjentów z wysokim poziomem stresu (>50%)
-				const highStressList = []
-				const stressMomentsList = []
-
-				visits.forEach(visit => {
-					if (visit.stress_history && visit.stress_history.summary) {
-						const stressPercentage = visit.stress_history.summary.stress_percentage || 0
-						
-						if (stressPercentage > 50) {
-							const patient = patientsMap.get(visit.patient)
-							if (patient) {
-								highStressList.push({
-									patientId: visit.patient,
-									patientName: `${patient.first_name} ${patient.last_name}`,
-									stressLevel: stressPercentage,
-									visitDate: visit.visit_date,
-									visitId: visit.id,
-								})
-							}
-						}
-
-						// Pobierz ostatnie momenty stresu
-						if (visit.stress_history.stress_moments && visit.stress_history.stress_moments.length > 0) {
-							const patient = patientsMap.get(visit.patient)
-							visit.stress_history.stress_moments.forEach(moment => {
-								stressMomentsList.push({
-									patientId: visit.patient,
-									patientName: patient ? `${patient.first_name} ${patient.last_name}` : 'Nieznany',
-									timestamp: moment.timestamp,
-									duration: moment.duration_seconds,
-									confidence: moment.confidence,
-									visitId: visit.id,
-								})
-							})
-						}
-					}
-				})
+				// Alerty z podsumowania panelu liczonego po stronie serwera
+				const { data: summary } = await axiosInstance.get('/api/dashboard/summary/')
 
-				// Sortuj: najnowsze pierwsze
-				highStressList.sort((a, b) => new Date(b.visitDate) - new Date(a.visitDate))
-				stressMomentsList.sort((a, b) => new Date(b.timestamp) - new Date(a.timestamp))
+				const highStressList = summary.high_stress_visits.map(visit => ({
+					patientId: visit.patient_id,
+					patientName: visit.patient_name,
+					stressLevel: visit.stress_percentage,
+					visitDate: visit.visit_date,
+					visitId: visit.visit_id,
+				}))
+				const stressMomentsList = summary.recent_stress_moments.map(moment => ({
+					patientId: moment.patient_id,
+					patientName: moment.patient_name,
+					timestamp: moment.timestamp,
+					duration: moment.duration_seconds,
+					confidence: moment.confidence,
+					visitId: moment.visit_id,
+				}))
 
 				setHighStressPatients(highStressList.slice(0, 5)) // Top 5
 				setRecentStressMoments(stressMomentsList.slice(0, 5)) // Top 5
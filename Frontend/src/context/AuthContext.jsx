@@ -89,6 +89,19 @@ axiosInstance.interceptors.response.use(
 	}
 )
 
+// Pobiera wszystkie strony listy z paginacją kursorową ({ next, previous, results })
+export const fetchAllPages = async (url, params = {}) => {
+	const results = []
+	let cursor = null
+	do {
+		const response = await axiosInstance.get(url, { params: cursor ? { ...params, cursor } : params })
+		if (Array.isArray(response.data)) return response.data
+		results.push(...response.data.results)
+		cursor = response.data.next ? new URL(response.data.next, window.location.origin).searchParams.get('cursor') : null
+	} while (cursor)
+	return results
+}
+
 const AuthContext = createContext()
 export default AuthContext
 
@@ -0,0 +1,286 @@
+"""
+Strukturalne przycinanie (pruning) modelu CNN-LSTM i eksport odchudzonej architektury.
+
+Usuwane są całe kanały konwolucji i jednostki ukryte LSTM o najmniejszej ważności
+(norma L1 wag wchodzących i wychodzących), a następnie przycięty model jest dostrajany
+(fine-tuning) na danych treningowych. Dla każdego stopnia przycięcia raportowana jest
+dokładność na wydzielonych osobach, zgodność klas z modelem bazowym oraz przepustowość
+inferencji na CPU. Model poniżej progu zgodności lub dokładności nie jest eksportowany.
+
+Wynik eksportu to plik wag (.pth) i plik konfiguracyjny (.json) opisujący rozmiary warstw,
+który serwis klasyfikacji ładuje przez zmienną STRESS_MODEL_CONFIG.
+
+Użycie:
+    python prune_model.py --ratios 0.25 0.5 0.75 --output-dir pruned
+"""
+import argparse
+import json
+from pathlib import Path
+
+import torch
+import torch.nn as nn
+import torch.optim as optim
+from torch.utils.data import DataLoader
+
+from train_on_multiple_files import (
+    CNNLSTMClassifier,
+    WESADDataset,
+    count_parameters,
+    create_weighted_sampler,
+    load_subject_split,
+    measure_throughput,
+    save_model_config,
+    train_model,
+    BATCH_SIZE,
+    DEVICE,
+    LATENCY_BATCH_SIZE,
+    NUM_CLASSES,
+)
+
+# --- KONFIGURACJA PRZYCINANIA ---
+PRUNE_RATIOS = (0.25, 0.5, 0.75)   # Odsetek usuwanych kanałów / jednostek LSTM
+FINETUNE_EPOCHS = 5
+FINETUNE_LEARNING_RATE = 0.0003
+MIN_AGREEMENT = 0.9        # Minimalna zgodność klas z modelem bazowym na wydzielonych osobach
+MAX_ACCURACY_DROP = 0.05   # Maksymalny spadek dokładności względem modelu bazowego
+
+
+def get_architecture(model: CNNLSTMClassifier) -> dict:
+    """Zwraca rozmiary warstw modelu w formacie pliku konfiguracyjnego."""
+    return {
+        'conv_channels': [model.cnn_layers[0].out_channels, model.cnn_layers[3].out_channels],
+        'lstm_hidden_size': model.lstm.hidden_size,
+        'lstm_num_layers': model.lstm.num_layers,
+        'fc_hidden_size': model.classifier[0].out_features,
+    }
+
+
+def top_k_indices(importance: torch.Tensor, keep: int) -> torch.Tensor:
+    """Zwraca posortowane indeksy `keep` najważniejszych elementów."""
+    return torch.sort(torch.topk(importance, keep).indices).values
+
+
+def lstm_gate_rows(units: torch.Tensor, hidden_size: int) -> torch.Tensor:
+    """Wiersze macierzy wag LSTM odpowiadające jednostkom we wszystkich 4 bramkach (i, f, g, o)."""
+    return torch.cat([gate * hidden_size + units for gate in range(4)])
+
+
+def lstm_unit_importance(model: CNNLSTMClassifier, layer: int) -> torch.Tensor:
+    """
+    Ważność jednostek ukrytych warstwy LSTM: suma norm L1 wag wchodzących (wszystkie bramki,
+    wejście i rekurencja) oraz wag wychodzących (kolejna warstwa LSTM lub klasyfikator).
+    """
+    hidden_size = model.lstm.hidden_size
+    weight_ih = getattr(model.lstm, f'weight_ih_l{layer}')
+    weight_hh = getattr(model.lstm, f'weight_hh_l{layer}')
+
+    incoming = (weight_ih.abs().sum(dim=1) + weight_hh.abs().sum(dim=1)).view(4, hidden_size).sum(dim=0)
+    recurrent_out = weight_hh.abs().sum(dim=0)
+
+    if layer + 1 < model.lstm.num_layers:
+        outgoing = getattr(model.lstm, f'weight_ih_l{layer + 1}').abs().sum(dim=0)
+    else:
+        outgoing = model.classifier[0].weight.abs().sum(dim=0)
+
+    return incoming + recurrent_out + outgoing
+
+
+@torch.no_grad()
+def prune_model(model: CNNLSTMClassifier, ratio: float) -> CNNLSTMClassifier:
+    """
+    Tworzy przycięty model, usuwając `ratio` najmniej ważnych kanałów konwolucji
+    i jednostek ukrytych LSTM. Wagi pozostałych elementów są kopiowane bez zmian.
+    """
+    model = model.cpu().eval()
+    conv1, conv2 = model.cnn_layers[0], model.cnn_layers[3]
+    hidden_size = model.lstm.hidden_size
+    num_layers = model.lstm.num_layers
+
+    def keep_count(size):
+        return max(1, int(round(size * (1.0 - ratio))))
+
+    # Kanały konwolucji - norma L1 filtrów
+    keep_conv1 = top_k_indices(conv1.weight.abs().sum(dim=(1, 2)), keep_count(conv1.out_channels))
+    keep_conv2 = top_k_indices(conv2.weight[:, keep_conv1].abs().sum(dim=(1, 2)), keep_count(conv2.out_channels))
+
+    # Jednostki LSTM - każda warstwa wybiera własny podzbiór, ale nn.LSTM wymaga wspólnego rozmiaru
+    new_hidden_size = keep_count(hidden_size)
+    keep_units = [top_k_indices(lstm_unit_importance(model, layer), new_hidden_size) for layer in range(num_layers)]
+
+    pruned = CNNLSTMClassifier(
+        num_channels=conv1.in_channels,
+        seq_len=None,
+        num_classes=model.classifier[3].out_features,
+        conv_channels=(len(keep_conv1), len(keep_conv2)),
+        lstm_hidden_size=new_hidden_size,
+        lstm_num_layers=num_layers,
+        fc_hidden_size=model.classifier[0].out_features,
+    )
+
+    new_conv1, new_conv2 = pruned.cnn_layers[0], pruned.cnn_layers[3]
+    new_conv1.weight.copy_(conv1.weight[keep_conv1])
+    new_conv1.bias.copy_(conv1.bias[keep_conv1])
+    new_conv2.weight.copy_(conv2.weight[keep_conv2][:, keep_conv1])
+    new_conv2.bias.copy_(conv2.bias[keep_conv2])
+
+    for layer in range(num_layers):
+        units = keep_units[layer]
+        inputs = keep_conv2 if layer == 0 else keep_units[layer - 1]
+        rows = lstm_gate_rows(units, hidden_size)
+
+        getattr(pruned.lstm, f'weight_ih_l{layer}').copy_(getattr(model.lstm, f'weight_ih_l{layer}')[rows][:, inputs])
+        getattr(pruned.lstm, f'weight_hh_l{layer}').copy_(getattr(model.lstm, f'weight_hh_l{layer}')[rows][:, units])
+        getattr(pruned.lstm, f'bias_ih_l{layer}').copy_(getattr(model.lstm, f'bias_ih_l{layer}')[rows])
+        getattr(pruned.lstm, f'bias_hh_l{layer}').copy_(getattr(model.lstm, f'bias_hh_l{layer}')[rows])
+
+    pruned.classifier[0].weight.copy_(model.classifier[0].weight[:, keep_units[-1]])
+    pruned.classifier[0].bias.copy_(model.classifier[0].bias)
+    pruned.classifier[3].load_state_dict(model.classifier[3].state_dict())
+
+    return pruned.eval()
+
+
+@torch.no_grad()
+def evaluate_accuracy(model: nn.Module, dataset: WESADDataset) -> float:
+    """Zwraca dokładność modelu na zbiorze danych."""
+    model.eval()
+    dataloader = DataLoader(dataset, batch_size=LATENCY_BATCH_SIZE, shuffle=False)
+    correct = 0
+    for inputs, labels in dataloader:
+        outputs = model(inputs.to(DEVICE))
+        correct += (outputs.argmax(dim=1).cpu() == labels).sum().item()
+    return correct / len(dataset)
+
+
+@torch.no_grad()
+def predict_classes(model: nn.Module, dataset: WESADDataset) -> torch.Tensor:
+    """Zwraca klasy przewidziane przez model dla wszystkich okien zbioru."""
+    model.eval()
+    dataloader = DataLoader(dataset, batch_size=LATENCY_BATCH_SIZE, shuffle=False)
+    return torch.cat([model(inputs.to(DEVICE)).argmax(dim=1).cpu() for inputs, _ in dataloader])
+
+
+def export_rejection(agreement: float, accuracy_delta: float, min_agreement: float = MIN_AGREEMENT,
+                     max_accuracy_drop: float = MAX_ACCURACY_DROP):
+    """Zwraca powód odrzucenia przyciętego modelu albo None, jeśli model może zostać wyeksportowany."""
+    if agreement < min_agreement:
+        return f"Zgodność z modelem bazowym {agreement:.2%} < {min_agreement:.2%}"
+    if accuracy_delta < -max_accuracy_drop:
+        return f"Spadek dokładności {-accuracy_delta:.2%} > {max_accuracy_drop:.2%}"
+    return None
+
+
+def fine_tune(model: CNNLSTMClassifier, dataset: WESADDataset, num_epochs: int = FINETUNE_EPOCHS):
+    """Dostraja przycięty model z mniejszym learning rate."""
+    model.to(DEVICE)
+    dataloader = DataLoader(
+        dataset,
+        batch_size=BATCH_SIZE,
+        sampler=create_weighted_sampler(dataset),
+        drop_last=True
+    )
+    optimizer = optim.Adam(model.parameters(), lr=FINETUNE_LEARNING_RATE)
+    train_model(model, dataloader, nn.CrossEntropyLoss(), optimizer, num_epochs)
+    model.eval()
+
+
+def export_model(model: CNNLSTMClassifier, output_dir: Path, name: str) -> Path:
+    """Zapisuje wagi i plik konfiguracyjny odchudzonego modelu. Zwraca ścieżkę konfiguracji."""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    weights_path = output_dir / f'{name}.pth'
+    torch.save(model.cpu().state_dict(), weights_path)
+    return save_model_config(weights_path, 'cnn_lstm', get_architecture(model))
+
+
+def main():
+    base_dir = Path(__file__).parent
+    parser = argparse.ArgumentParser(description='Strukturalne przycinanie modelu CNN-LSTM')
+    parser.add_argument('--model', type=str, default=str(base_dir / 'stress_classifier_multi_subject.pth'),
+                        help='Ścieżka do wag modelu bazowego')
+    parser.add_argument('--norm', type=str, default=str(base_dir / 'normalization_params.npz'),
+                        help='Ścieżka do parametrów normalizacji')
+    parser.add_argument('--data-dir', type=str, default=str(base_dir / 'data'),
+                        help='Folder z plikami Sx.pkl')
+    parser.add_argument('--ratios', type=float, nargs='+', default=list(PRUNE_RATIOS),
+                        help='Stopnie przycięcia (odsetek usuwanych kanałów i jednostek)')
+    parser.add_argument('--epochs', type=int, default=FINETUNE_EPOCHS,
+                        help='Liczba epok dostrajania po przycięciu')
+    parser.add_argument('--output-dir', type=str, default=str(base_dir / 'pruned'),
+                        help='Folder na odchudzone modele i raport')
+    parser.add_argument('--min-agreement', type=float, default=MIN_AGREEMENT,
+                        help='Minimalna zgodność klas z modelem bazowym wymagana do eksportu')
+    parser.add_argument('--max-accuracy-drop', type=float, default=MAX_ACCURACY_DROP,
+                        help='Maksymalny spadek dokładności względem modelu bazowego wymagany do eksportu')
+    args = parser.parse_args()
+
+    (X_train, Y_train), (X_holdout, Y_holdout) = load_subject_split(Path(args.data_dir), Path(args.norm))
+    train_dataset = WESADDataset(X_train, Y_train)
+    holdout_dataset = WESADDataset(X_holdout, Y_holdout)
+    num_channels, seq_len = train_dataset.X.shape[1], train_dataset.X.shape[2]
+
+    base_model = CNNLSTMClassifier(num_channels, seq_len, NUM_CLASSES)
+    base_model.load_state_dict(torch.load(args.model, map_location='cpu'))
+    base_model.eval()
+
+    base_throughput = measure_throughput(base_model, num_channels, seq_len)
+    base_predictions = predict_classes(base_model.to(DEVICE), holdout_dataset)
+    report = {
+        'holdout_windows': len(holdout_dataset),
+        'min_agreement': args.min_agreement,
+        'max_accuracy_drop': args.max_accuracy_drop,
+        'baseline': {
+            'architecture': get_architecture(base_model),
+            'parameters': count_parameters(base_model),
+            'holdout_accuracy': round(evaluate_accuracy(base_model.to(DEVICE), holdout_dataset), 4),
+            'windows_per_second': round(base_throughput, 1),
+        },
+        'pruned': [],
+    }
+
+    output_dir = Path(args.output_dir)
+    for ratio in args.ratios:
+        print("\n" + "=" * 60)
+        print(f"PRZYCINANIE: {ratio:.0%}")
+        print("=" * 60)
+
+        pruned = prune_model(base_model, ratio)
+        accuracy_before = evaluate_accuracy(pruned.to(DEVICE), holdout_dataset)
+        fine_tune(pruned, train_dataset, args.epochs)
+        accuracy_after = evaluate_accuracy(pruned, holdout_dataset)
+        agreement = (predict_classes(pruned, holdout_dataset) == base_predictions).float().mean().item()
+        throughput = measure_throughput(pruned, num_channels, seq_len)
+
+        accuracy_delta = accuracy_after - report['baseline']['holdout_accuracy']
+        rejection = export_rejection(agreement, accuracy_delta, args.min_agreement, args.max_accuracy_drop)
+        config_path = None
+        if rejection is None:
+            config_path = export_model(pruned, output_dir, f'stress_classifier_pruned_{int(ratio * 100)}')
+
+        report['pruned'].append({
+            'ratio': ratio,
+            'architecture': get_architecture(pruned),
+            'parameters': count_parameters(pruned),
+            'holdout_accuracy_before_finetune': round(accuracy_before, 4),
+            'holdout_accuracy': round(accuracy_after, 4),
+            'accuracy_delta': round(accuracy_delta, 4),
+            'agreement_with_baseline': round(agreement, 4),
+            'windows_per_second': round(throughput, 1),
+            'speedup': round(throughput / base_throughput, 2),
+            'exported': rejection is None,
+            'rejection_reason': rejection,
+            'config': config_path.name if config_path is not None else None,
+        })
+        print(f"Dokładność: {accuracy_after:.4f}, zgodność z bazowym: {agreement:.4f}, "
+              f"przepustowość: {throughput:.0f} okien/s ({throughput / base_throughput:.2f}x)")
+        if rejection is not None:
+            print(f"Model nie został wyeksportowany - {rejection}")
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    report_path = output_dir / 'pruning_report.json'
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nRaport zapisany jako: {report_path}")
+
+
+if __name__ == '__main__':
+    main()
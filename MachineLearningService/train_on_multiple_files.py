@@ -1,4 +1,7 @@
+import argparse
+import json
 import pickle
+import time
 import numpy as np
 import pandas as pd
 from scipy import signal
@@ -6,6 +9,7 @@ from collections import Counter
 import os
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 import torch.optim as optim
 from torch.utils.data import Dataset, DataLoader, WeightedRandomSampler
 from pathlib import Path
@@ -22,6 +26,22 @@ LEARNING_RATE = 0.001
 DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 NUM_CLASSES = 4  # 0: Baseline, 1: Stress, 2: Amusement, 3: Meditation
 
+# --- KONFIGURACJA DESTYLACJI ---
+DISTILL_EPOCHS = 30
+DISTILL_TEMPERATURE = 4.0   # Temperatura zmiękczająca rozkład nauczyciela
+DISTILL_ALPHA = 0.7         # Waga straty destylacyjnej względem cross-entropy z etykietami
+HOLDOUT_SUBJECTS = 2        # Liczba ostatnich osób wydzielonych do ewaluacji
+LATENCY_BATCH_SIZE = 64
+LATENCY_WINDOWS = 1024
+LATENCY_REPEATS = 3
+
+# --- KONFIGURACJA WYGŁADZANIA CZASOWEGO ---
+TRANSITION_PSEUDOCOUNT = 1.0  # Wygładzanie Laplace'a zliczeń przejść (przejścia niewidziane w danych)
+
+# --- ZBIÓR KALIBRACYJNY SERWISU (kaskada, kontrola bf16) ---
+CALIBRATION_WINDOWS_PER_CLASS = 256  # Maksymalna liczba okien każdej klasy z osób wydzielonych
+CALIBRATION_SEED = 0
+
 # Słownik konwersji etykiet
 LABEL_MAP = {
     0: 'transient/not_defined',
@@ -172,47 +192,99 @@ class WESADDataset(Dataset):
 
 
 class CNNLSTMClassifier(nn.Module):
-    """Łączona architektura CNN-LSTM dla szeregów czasowych."""
+    """
+    Łączona architektura CNN-LSTM dla szeregów czasowych.
+    
+    Rozmiary warstw są konfigurowalne (odchudzone modele z prune_model.py),
+    domyślne wartości odpowiadają oryginalnej architekturze.
+    """
     
-    def __init__(self, num_channels, seq_len, num_classes):
+    def __init__(self, num_channels, seq_len, num_classes, conv_channels=(32, 64),
+                 lstm_hidden_size=64, lstm_num_layers=2, fc_hidden_size=32):
         super(CNNLSTMClassifier, self).__init__()
         
+        conv1_channels, conv2_channels = conv_channels
+        
         self.cnn_layers = nn.Sequential(
-            nn.Conv1d(num_channels, 32, kernel_size=8, padding=1),
+            nn.Conv1d(num_channels, conv1_channels, kernel_size=8, padding=1),
             nn.ReLU(),
             nn.MaxPool1d(kernel_size=2, stride=2),
             
-            nn.Conv1d(32, 64, kernel_size=4, padding=1),
+            nn.Conv1d(conv1_channels, conv2_channels, kernel_size=4, padding=1),
             nn.ReLU(),
             nn.MaxPool1d(kernel_size=2, stride=2)
         )
         
-        lstm_input_size = 64
+        lstm_input_size = conv2_channels
         
         self.lstm = nn.LSTM(
             input_size=lstm_input_size, 
-            hidden_size=64, 
-            num_layers=2, 
+            hidden_size=lstm_hidden_size, 
+            num_layers=lstm_num_layers, 
             batch_first=True, 
             bidirectional=False
         )
         
         self.classifier = nn.Sequential(
-            nn.Linear(64, 32),
+            nn.Linear(lstm_hidden_size, fc_hidden_size),
             nn.ReLU(),
             nn.Dropout(0.5),
-            nn.Linear(32, num_classes)
+            nn.Linear(fc_hidden_size, num_classes)
         )
 
-    def forward(self, x):
+    def extract_features(self, x):
+        """Stan końcowy ostatniej warstwy LSTM - reprezentacja okna przed klasyfikatorem."""
         x = self.cnn_layers(x)
         x = x.transpose(1, 2)
         lstm_out, (hn, cn) = self.lstm(x)
-        final_state = hn[-1]
+        return hn[-1]
+
+    def forward(self, x):
+        final_state = self.extract_features(x)
         logits = self.classifier(final_state)
         return logits
 
 
+class TemporalConvClassifier(nn.Module):
+    """
+    Model wyłącznie konwolucyjny (TCN) - uczeń destylowany z CNN-LSTM.
+    
+    Pierwsze `pooled_layers` bloków skraca sekwencję (MaxPool 2x), kolejne używają rosnącej
+    dylatacji (1, 2, 4, ...), dzięki czemu pole recepcyjne pokrywa okno bez rekurencji i wszystkie
+    kroki czasowe liczone są równolegle. Cechy są uśredniane po czasie.
+    """
+    
+    def __init__(self, num_channels, seq_len, num_classes, channels=(16, 32, 32, 64), kernel_size=5,
+                 pooled_layers=2):
+        super(TemporalConvClassifier, self).__init__()
+        
+        layers = []
+        in_channels = num_channels
+        for i, out_channels in enumerate(channels):
+            dilation = 2 ** max(0, i - pooled_layers)
+            layers += [
+                nn.Conv1d(in_channels, out_channels, kernel_size,
+                          padding=dilation * (kernel_size - 1) // 2, dilation=dilation),
+                nn.BatchNorm1d(out_channels),
+                nn.ReLU(),
+            ]
+            if i < pooled_layers:
+                layers.append(nn.MaxPool1d(kernel_size=2, stride=2))
+            in_channels = out_channels
+        
+        self.tcn_layers = nn.Sequential(*layers)
+        self.classifier = nn.Linear(in_channels, num_classes)
+
+    def extract_features(self, x):
+        """Cechy uśrednione po czasie - reprezentacja okna przed klasyfikatorem."""
+        return self.tcn_layers(x).mean(dim=2)
+
+    def forward(self, x):
+        x = self.extract_features(x)
+        logits = self.classifier(x)
+        return logits
+
+
 def create_weighted_sampler(dataset):
     """Tworzy sampler, który równoważy niezbalansowane klasy."""
     
@@ -263,6 +335,282 @@ def train_model(model, dataloader, criterion, optimizer, num_epochs):
     print("Trening zakończony!")
 
 
+# --- DESTYLACJA WIEDZY ---
+
+class DistillationDataset(WESADDataset):
+    """Dataset z etykietami i logitami nauczyciela (liczonymi raz przed treningiem)."""
+    def __init__(self, X, Y, teacher_logits):
+        super().__init__(X, Y)
+        self.teacher_logits = teacher_logits
+
+    def __getitem__(self, idx):
+        return self.X[idx], self.Y[idx], self.teacher_logits[idx]
+
+
+@torch.no_grad()
+def compute_logits(model, X, batch_size=LATENCY_BATCH_SIZE):
+    """Zwraca logity modelu dla tensora X (próbki, kanały, kroki_czasowe)."""
+    model.eval()
+    return torch.cat([model(X[i:i + batch_size].to(DEVICE)).cpu() for i in range(0, len(X), batch_size)])
+
+
+def distillation_loss(student_logits, teacher_logits, labels, temperature, alpha):
+    """
+    Strata destylacyjna: KL między zmiękczonymi rozkładami ucznia i nauczyciela
+    (skalowana przez T^2, aby gradienty miały skalę niezależną od temperatury)
+    plus cross-entropy z prawdziwymi etykietami.
+    """
+    soft_loss = F.kl_div(
+        F.log_softmax(student_logits / temperature, dim=1),
+        F.softmax(teacher_logits / temperature, dim=1),
+        reduction='batchmean'
+    ) * temperature ** 2
+    hard_loss = F.cross_entropy(student_logits, labels)
+    return alpha * soft_loss + (1 - alpha) * hard_loss
+
+
+def train_student(student, dataloader, optimizer, num_epochs,
+                  temperature=DISTILL_TEMPERATURE, alpha=DISTILL_ALPHA):
+    """Pętla treningowa ucznia na miękkich etykietach nauczyciela."""
+    student.train()
+    
+    for epoch in range(num_epochs):
+        running_loss = 0.0
+        
+        for inputs, labels, teacher_logits in dataloader:
+            inputs, labels, teacher_logits = inputs.to(DEVICE), labels.to(DEVICE), teacher_logits.to(DEVICE)
+            
+            optimizer.zero_grad()
+            loss = distillation_loss(student(inputs), teacher_logits, labels, temperature, alpha)
+            loss.backward()
+            optimizer.step()
+            
+            running_loss += loss.item()
+        
+        print(f"Epoch {epoch+1}/{num_epochs}, Distillation loss: {running_loss / len(dataloader):.4f}")
+    
+    student.eval()
+    print("Destylacja zakończona!")
+
+
+@torch.no_grad()
+def measure_throughput(model, num_channels, seq_len):
+    """Mierzy przepustowość inferencji na CPU (okna/s, najlepszy z kilku pomiarów)."""
+    model = model.cpu().eval()
+    inputs = torch.randn(LATENCY_WINDOWS, num_channels, seq_len, generator=torch.Generator().manual_seed(0))
+    model(inputs[:LATENCY_BATCH_SIZE])
+    
+    best_time = float('inf')
+    for _ in range(LATENCY_REPEATS):
+        start = time.perf_counter()
+        for i in range(0, LATENCY_WINDOWS, LATENCY_BATCH_SIZE):
+            model(inputs[i:i + LATENCY_BATCH_SIZE])
+        best_time = min(best_time, time.perf_counter() - start)
+    return LATENCY_WINDOWS / best_time
+
+
+def count_parameters(model):
+    return sum(p.numel() for p in model.parameters())
+
+
+def find_subject_files(data_dir):
+    """Zwraca pliki Sx.pkl (x od 1 do 10) obecne w folderze danych."""
+    return [data_dir / f'S{i}.pkl' for i in range(1, 11) if (data_dir / f'S{i}.pkl').exists()]
+
+
+def load_subject_split(data_dir, norm_params_path, holdout_subjects=HOLDOUT_SUBJECTS):
+    """
+    Wczytuje pliki Sx.pkl i dzieli je na osoby treningowe i wydzielone (ostatnie holdout_subjects).
+    Dane są normalizowane parametrami zapisanymi przy treningu modelu bazowego.
+    
+    Returns:
+        ((X_train, Y_train), (X_holdout, Y_holdout)) z etykietami przekodowanymi na 0-3
+    """
+    pkl_files = find_subject_files(data_dir)
+    if len(pkl_files) <= holdout_subjects:
+        raise FileNotFoundError(f"Za mało plików Sx.pkl w {data_dir} (potrzeba > {holdout_subjects})")
+    
+    norm_params = np.load(norm_params_path)
+    mean, std = norm_params['mean'], norm_params['std']
+    
+    def load_files(files):
+        X_all, Y_all = [], []
+        for pkl_file in files:
+            X, Y = preprocess_single_file(str(pkl_file))
+            if X is not None:
+                X_all.append(X)
+                Y_all.append(Y)
+        # Przekodowanie etykiet z 1,2,3,4 na 0,1,2,3
+        return (np.concatenate(X_all) - mean) / std, np.concatenate(Y_all) - 1
+    
+    train_files, holdout_files = pkl_files[:-holdout_subjects], pkl_files[-holdout_subjects:]
+    print(f"Osoby treningowe: {[f.stem for f in train_files]}, wydzielone: {[f.stem for f in holdout_files]}")
+    return load_files(train_files), load_files(holdout_files)
+
+
+def estimate_transition_matrix(label_sequences, num_classes=NUM_CLASSES, pseudocount=TRANSITION_PSEUDOCOUNT):
+    """
+    Estymuje macierz przejść klas HMM z sekwencji etykiet kolejnych okien (jedna sekwencja na osobę).
+    
+    Okna bez docelowej etykiety (stany przejściowe protokołu) są odfiltrowane wcześniej,
+    więc ich pominięcie liczy się jako bezpośrednie przejście między sąsiednimi warunkami.
+    
+    Returns:
+        Macierz (num_classes, num_classes) znormalizowana wierszami (wiersz = klasa bieżąca)
+    """
+    counts = np.full((num_classes, num_classes), pseudocount)
+    for labels in label_sequences:
+        np.add.at(counts, (labels[:-1], labels[1:]), 1)
+    return counts / counts.sum(axis=1, keepdims=True)
+
+
+def save_transition_matrix(label_sequences, output_path):
+    """Zapisuje macierz przejść dla wygładzania czasowego w serwisie (transition_matrix.npy)."""
+    transition_matrix = estimate_transition_matrix(label_sequences)
+    np.save(output_path, transition_matrix)
+    print(f"Macierz przejść zapisana jako: {output_path}")
+    print(f"  Prawdopodobieństwa pozostania w klasie: {np.round(np.diag(transition_matrix), 4).tolist()}")
+    return transition_matrix
+
+
+def save_calibration_set(data_dir, output_path, holdout_subjects=HOLDOUT_SUBJECTS,
+                         windows_per_class=CALIBRATION_WINDOWS_PER_CLASS, seed=CALIBRATION_SEED):
+    """
+    Zapisuje zbiór kalibracyjny serwisu (calibration_windows.npz) z osób wydzielonych.
+    
+    Okna są surowe (nieznormalizowane, 4 Hz) - serwis normalizuje je tak jak nagrania.
+    Z każdej klasy losowanych jest co najwyżej windows_per_class okien, żeby zbiór
+    zawierał okna spoza Baseline i pozostał mały.
+    
+    Returns:
+        Liczba okien każdej klasy (0-3) w zapisanym zbiorze
+    """
+    holdout_files = find_subject_files(data_dir)[-holdout_subjects:]
+    X_all, Y_all = [], []
+    for pkl_file in holdout_files:
+        X, Y = preprocess_single_file(str(pkl_file))
+        if X is not None:
+            X_all.append(X)
+            Y_all.append(Y - 1)
+    if not X_all:
+        raise FileNotFoundError(f"Brak danych osób wydzielonych w {data_dir}")
+    X_all, Y_all = np.concatenate(X_all), np.concatenate(Y_all)
+    
+    generator = np.random.default_rng(seed)
+    selected = np.sort(np.concatenate([
+        generator.permutation(np.flatnonzero(Y_all == label))[:windows_per_class]
+        for label in range(NUM_CLASSES)
+    ]))
+    class_counts = np.bincount(Y_all[selected], minlength=NUM_CLASSES)
+    
+    np.savez_compressed(output_path, X=X_all[selected].astype(np.float32), y=Y_all[selected])
+    print(f"Zbiór kalibracyjny zapisany jako: {output_path}")
+    print(f"  Osoby: {[f.stem for f in holdout_files]}, okna per klasa: {class_counts.tolist()}")
+    return class_counts
+
+
+def save_model_config(weights_path, model_type, architecture):
+    """Zapisuje plik konfiguracyjny modelu dla serwisu (STRESS_MODEL_CONFIG). Zwraca jego ścieżkę."""
+    config_path = Path(weights_path).with_suffix('.json')
+    with open(config_path, 'w') as f:
+        json.dump({
+            'model_type': model_type,
+            'weights': Path(weights_path).name,
+            'architecture': architecture,
+        }, f, indent=2)
+    return config_path
+
+
+def get_tcn_architecture(model):
+    """Zwraca rozmiary warstw modelu TemporalConvClassifier w formacie pliku konfiguracyjnego."""
+    return {
+        'channels': [layer.out_channels for layer in model.tcn_layers if isinstance(layer, nn.Conv1d)],
+        'kernel_size': model.tcn_layers[0].kernel_size[0],
+        'pooled_layers': sum(isinstance(layer, nn.MaxPool1d) for layer in model.tcn_layers),
+    }
+
+
+def distill(teacher_path=None, norm_params_path=None, output_dir=None, num_epochs=DISTILL_EPOCHS):
+    """
+    Destyluje CNN-LSTM (nauczyciel) do modelu TemporalConvClassifier (uczeń).
+    
+    Uczeń trenuje na osobach treningowych, a na wydzielonych osobach raportowane są:
+    zgodność klas ucznia z nauczycielem, dokładność obu modeli i przepustowość CPU.
+    """
+    base_dir = Path(__file__).parent
+    teacher_path = Path(teacher_path or base_dir / 'stress_classifier_multi_subject.pth')
+    norm_params_path = Path(norm_params_path or base_dir / 'normalization_params.npz')
+    output_dir = Path(output_dir or base_dir)
+    
+    print("\n" + "="*60)
+    print("ETAP 1: WCZYTANIE DANYCH I NAUCZYCIELA")
+    print("="*60)
+    
+    (X_train, Y_train), (X_holdout, Y_holdout) = load_subject_split(base_dir / 'data', norm_params_path)
+    train_dataset = WESADDataset(X_train, Y_train)
+    holdout_dataset = WESADDataset(X_holdout, Y_holdout)
+    num_channels, seq_len = train_dataset.X.shape[1], train_dataset.X.shape[2]
+    
+    teacher = CNNLSTMClassifier(num_channels, seq_len, NUM_CLASSES).to(DEVICE)
+    teacher.load_state_dict(torch.load(teacher_path, map_location=DEVICE))
+    teacher.eval()
+    
+    distill_dataset = DistillationDataset(X_train, Y_train, compute_logits(teacher, train_dataset.X))
+    dataloader = DataLoader(
+        distill_dataset,
+        batch_size=BATCH_SIZE,
+        sampler=create_weighted_sampler(distill_dataset),
+        drop_last=True
+    )
+    
+    print("\n" + "="*60)
+    print("ETAP 2: DESTYLACJA")
+    print("="*60)
+    
+    student = TemporalConvClassifier(num_channels, seq_len, NUM_CLASSES).to(DEVICE)
+    print(f"Parametry nauczyciela: {count_parameters(teacher):,}, ucznia: {count_parameters(student):,}")
+    print(f"Temperatura: {DISTILL_TEMPERATURE}, alpha: {DISTILL_ALPHA}, Epochs: {num_epochs}")
+    
+    optimizer = optim.Adam(student.parameters(), lr=LEARNING_RATE)
+    train_student(student, dataloader, optimizer, num_epochs)
+    
+    print("\n" + "="*60)
+    print("ETAP 3: EWALUACJA NA WYDZIELONYCH OSOBACH")
+    print("="*60)
+    
+    teacher_predictions = compute_logits(teacher, holdout_dataset.X).argmax(dim=1)
+    student_predictions = compute_logits(student, holdout_dataset.X).argmax(dim=1)
+    teacher_throughput = measure_throughput(teacher, num_channels, seq_len)
+    student_throughput = measure_throughput(student, num_channels, seq_len)
+    
+    report = {
+        'holdout_windows': len(holdout_dataset),
+        'agreement_with_teacher': round((teacher_predictions == student_predictions).float().mean().item(), 4),
+        'teacher_accuracy': round((teacher_predictions == holdout_dataset.Y).float().mean().item(), 4),
+        'student_accuracy': round((student_predictions == holdout_dataset.Y).float().mean().item(), 4),
+        'teacher_parameters': count_parameters(teacher),
+        'student_parameters': count_parameters(student),
+        'teacher_windows_per_second': round(teacher_throughput, 1),
+        'student_windows_per_second': round(student_throughput, 1),
+        'speedup': round(student_throughput / teacher_throughput, 2),
+        'temperature': DISTILL_TEMPERATURE,
+        'alpha': DISTILL_ALPHA,
+    }
+    for key, value in report.items():
+        print(f"  {key}: {value}")
+    
+    output_dir.mkdir(parents=True, exist_ok=True)
+    student_path = output_dir / 'stress_classifier_tcn_student.pth'
+    torch.save(student.cpu().state_dict(), student_path)
+    config_path = save_model_config(student_path, 'tcn', get_tcn_architecture(student))
+    print(f"\nUczeń zapisany jako: {student_path} (konfiguracja: {config_path})")
+    
+    report_path = output_dir / 'distillation_report.json'
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Raport zapisany jako: {report_path}")
+
+
 # --- GŁÓWNA FUNKCJA ---
 
 def main():
@@ -270,11 +618,7 @@ def main():
     data_dir = Path(__file__).parent / 'data'
     
     # Znajdź wszystkie pliki Sx.pkl (gdzie x to liczba od 1 do 10)
-    pkl_files = []
-    for i in range(1, 11):
-        pkl_file = data_dir / f'S{i}.pkl'
-        if pkl_file.exists():
-            pkl_files.append(pkl_file)
+    pkl_files = find_subject_files(data_dir)
     
     if len(pkl_files) == 0:
         print("Błąd: Nie znaleziono żadnych plików Sx.pkl w folderze data/")
@@ -388,11 +732,43 @@ def main():
     np.savez_compressed(norm_params_path, mean=mean, std=std)
     print(f"Parametry normalizacji zapisane jako: {norm_params_path}")
     
+    # Macierz przejść klas dla wygładzania czasowego (etykiety przekodowane na 0-3 per osoba)
+    save_transition_matrix([Y - 1 for Y in all_Y], data_dir.parent / 'transition_matrix.npy')
+    
     print("\n" + "="*60)
     print("WSZYSTKIE ETAPY ZAKOŃCZONE POMYŚLNIE!")
     print("="*60)
 
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(description='Trening modelu CNN-LSTM na wielu plikach WESAD')
+    parser.add_argument('--distill', action='store_true',
+                        help='Zamiast treningu destyluj zapisany CNN-LSTM do modelu TemporalConvClassifier')
+    parser.add_argument('--teacher', type=str, default=None,
+                        help='Ścieżka do wag nauczyciela (domyślnie: stress_classifier_multi_subject.pth)')
+    parser.add_argument('--output-dir', type=str, default=None,
+                        help='Folder na model ucznia i raport destylacji')
+    parser.add_argument('--epochs', type=int, default=DISTILL_EPOCHS,
+                        help='Liczba epok destylacji')
+    parser.add_argument('--transitions', action='store_true',
+                        help='Tylko estymuj macierz przejść klas (bez treningu) i zapisz transition_matrix.npy')
+    parser.add_argument('--calibration', action='store_true',
+                        help='Tylko zapisz zbiór kalibracyjny serwisu (okna osób wydzielonych) jako calibration_windows.npz')
+    args = parser.parse_args()
+    
+    if args.transitions:
+        base_dir = Path(__file__).parent
+        label_sequences = []
+        for pkl_file in find_subject_files(base_dir / 'data'):
+            _, Y = preprocess_single_file(str(pkl_file))
+            if Y is not None:
+                label_sequences.append(Y - 1)
+        save_transition_matrix(label_sequences, base_dir / 'transition_matrix.npy')
+    elif args.calibration:
+        base_dir = Path(__file__).parent
+        save_calibration_set(base_dir / 'data', base_dir / 'calibration_windows.npz')
+    elif args.distill:
+        distill(teacher_path=args.teacher, output_dir=args.output_dir, num_epochs=args.epochs)
+    else:
+        main()
 